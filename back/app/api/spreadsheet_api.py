@@ -2,21 +2,24 @@ import json
 import logging
 from pathlib import Path
 from traceback import format_exc
-from uuid import uuid4
-from zipfile import ZipFile
+from typing import Iterator, Optional, Union
 
-from django.core.files.storage import default_storage
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.core.files.base import ContentFile
-from ninja import File, UploadedFile
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from ninja import File, Form, Query, UploadedFile
 
 from app.api import CustomRouter, endpoint
-from app.controllers.installment_controller import InstallmentController
+from app.controllers.chunked_upload_controller import ChunkedUploadController
 from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_job_controller import FINISHED_STATUSES, SpreadsheetJobController
+from app.controllers.spreadsheet_results_controller import SpreadsheetResultsController
 from app.dtos import SpreadsheetDTO
-from app.schemas import ReturnSchema
-from app.schemas.spreadsheet_schemas import ProcessSpreadsheetResponse, SaveSpreadsheetSchema
-from core.settings import MEDIA_ROOT
+from app.exceptions import HttpFriendlyException
+from app.models import SpreadsheetJob
+from app.schemas import PaginatedOutSchema, ReturnSchema
+from app.schemas.spreadsheet_schemas import (
+    ChunkedUploadSchema, CreateChunkedUploadSchema, FinalizeChunkedUploadSchema, ProcessSpreadsheetResponse, SaveSpreadsheetSchema, SpreadsheetJobProgressSchema, SpreadsheetJobStatusSchema,
+    SpreadsheetMessagesQuery, SpreadsheetRemovalsSchema, SpreadsheetResultsPageSchema, SpreadsheetResultsQuery
+)
 from core.custom_request import CustomRequest
 
 
@@ -24,53 +27,53 @@ lgr = logging.getLogger(__name__)
 spreadsheet_router = CustomRouter(tags=["Planilhas"])
 
 
-@spreadsheet_router.post('/process', response={201: ReturnSchema[ProcessSpreadsheetResponse], 200: ReturnSchema})
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Diz se o cliente aceita gzip segundo o cabeçalho Accept-Encoding. Uma
+    codificação com `q=0` é recusada; sem `gzip` no cabeçalho vale o `*`.
+    """
+    weights = {}
+    for coding in accept_encoding.split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name.lower()] = weight
+
+    weight = weights.get('gzip', weights.get('x-gzip', weights.get('*', 0.0)))
+    return weight > 0
+
+
+@spreadsheet_router.post('/process', response={201: ReturnSchema[ProcessSpreadsheetResponse], 409: ReturnSchema, 422: ReturnSchema})
 @endpoint("Processar planilha")
 def process_spreadsheet(
     request: CustomRequest,
-    spreadsheet: UploadedFile = File(...),
-    boletos: UploadedFile = File(...),
+    spreadsheet: Optional[UploadedFile] = File(None),
+    boletos: Optional[UploadedFile] = File(None),
+    spreadsheet_upload_id: Optional[str] = Form(None),
+    boletos_upload_id: Optional[str] = Form(None),
     ):
-    # casto para os tipos certos de arquivo
-    s: InMemoryUploadedFile = spreadsheet  # type: ignore
-    b: InMemoryUploadedFile = boletos  # type: ignore
-
-    operation_uuid = uuid4()
+    """
+    Enfileira o processamento da planilha e retorna imediatamente o job_id.
+    O andamento pode ser acompanhado em /status/{job_id}.
 
+    Cada arquivo pode ir na própria requisição ou, se for grande, ser enviado
+    antes em partes por /uploads e referenciado aqui pelo upload_id.
+    """
     try:
-        # Extrai os boletos
-        lgr.debug(f"Salvando arquivo de boletos para operação {operation_uuid}")
-        with ZipFile(b.file) as zip_file:
-            zip_file.extractall(Path(MEDIA_ROOT) / str(operation_uuid) / 'boletos')
-
-        # Salva a planilha
-        lgr.debug(f"Salvando arquivo de planilha para operação {operation_uuid}")
-        default_storage.save(f'{operation_uuid}/spreadsheet.csv', s.file)
-
-        # Remove parcelas vencidas do banco
-        InstallmentController.remove_overdue_installments()
-
-        # Processa a planilha
-        results = SpreadsheetController.process_spreadsheet(operation_uuid)
-        lgr.debug(f"Resultados do processamento da planilha para operação {operation_uuid}: {len(results.payers)} pagadores, {len(results.creditors)} credores")
-        if len(results.payers) == 0 and len(results.creditors) == 0:
-            return ReturnSchema(
-                code=200,
-                message='Não existem novas informações a serem processadas!'
-            )
-        
-        # Salva o resultado em JSON usando o método model_dump do Pydantic
-        results_json = results.model_dump(mode='json')
-
-        default_storage.save(
-            f'{operation_uuid}/results.json',
-            ContentFile(json.dumps(results_json, ensure_ascii=False, indent=2).encode('utf-8'))
-        )
-
+        job = SpreadsheetJobController.enqueue(spreadsheet, boletos, spreadsheet_upload_id, boletos_upload_id)
         return ReturnSchema(
             code=201,
-            data={"job_id": str(operation_uuid)}
+            data={"job_id": str(job.uuid)}
         )
+    except HttpFriendlyException:
+        raise
     except Exception as e:
         lgr.error(f"Erro ao processar planilha: {str(e)}")
         return ReturnSchema(
@@ -79,30 +82,165 @@ def process_spreadsheet(
         )
 
 
-@spreadsheet_router.get('/results/{job_id}', response={200: ReturnSchema[SpreadsheetDTO]})
+@spreadsheet_router.post('/uploads', response={201: ReturnSchema[ChunkedUploadSchema]})
+@endpoint("Iniciar envio em partes")
+def create_chunked_upload(
+    request: CustomRequest,
+    body: CreateChunkedUploadSchema,
+    ):
+    """
+    Inicia o envio em partes de um arquivo grande. As partes são mandadas para
+    /uploads/{upload_id}/chunks e o envio é concluído em /uploads/{upload_id}/finalize.
+    """
+    upload = ChunkedUploadController.create(body)
+    return ReturnSchema(
+        code=201,
+        data=ChunkedUploadSchema.from_upload(upload)
+    )
+
+
+@spreadsheet_router.get('/uploads/{upload_id}', response={200: ReturnSchema[ChunkedUploadSchema]})
+@endpoint()
+def get_chunked_upload(
+    request: CustomRequest,
+    upload_id: str,
+    ):
+    """
+    Situação do envio. Depois de uma falha, o cliente continua a partir do
+    byte indicado em `received`.
+    """
+    upload = ChunkedUploadController.get_by_uuid(upload_id)
+    return ReturnSchema(
+        code=200,
+        data=ChunkedUploadSchema.from_upload(upload)
+    )
+
+
+@spreadsheet_router.put('/uploads/{upload_id}/chunks', response={200: ReturnSchema[ChunkedUploadSchema], 409: ReturnSchema})
+@endpoint()
+def put_chunk(
+    request: CustomRequest,
+    upload_id: str,
+    offset: int,
+    ):
+    """
+    Grava o corpo da requisição (bytes crus) a partir de `offset`. O
+    cabeçalho opcional X-Chunk-SHA256 confere a integridade da parte.
+    """
+    upload = ChunkedUploadController.get_by_uuid(upload_id)
+    upload = ChunkedUploadController.write_chunk(upload, offset, request, request.headers.get('X-Chunk-SHA256'))
+    return ReturnSchema(
+        code=200,
+        data=ChunkedUploadSchema.from_upload(upload)
+    )
+
+
+@spreadsheet_router.post('/uploads/{upload_id}/finalize', response={200: ReturnSchema[ChunkedUploadSchema], 409: ReturnSchema})
+@endpoint()
+def finalize_chunked_upload(
+    request: CustomRequest,
+    upload_id: str,
+    body: FinalizeChunkedUploadSchema,
+    ):
+    upload = ChunkedUploadController.get_by_uuid(upload_id)
+    upload = ChunkedUploadController.finalize(upload, body.sha256)
+    return ReturnSchema(
+        code=200,
+        data=ChunkedUploadSchema.from_upload(upload)
+    )
+
+
+@spreadsheet_router.get('/status/{job_id}', response={200: ReturnSchema[SpreadsheetJobStatusSchema]})
+@endpoint()
+def get_spreadsheet_status(
+    request: CustomRequest,
+    job_id: str,
+    ):
+    job = SpreadsheetJobController.get_by_uuid(job_id)
+    return ReturnSchema(
+        code=200,
+        data=SpreadsheetJobStatusSchema.from_job(job)
+    )
+
+
+@spreadsheet_router.get('/progress/{job_id}', response={200: ReturnSchema[SpreadsheetJobProgressSchema]})
+@endpoint()
+def get_spreadsheet_progress(
+    request: CustomRequest,
+    job_id: str,
+    ):
+    """
+    Andamento do processamento: etapa atual, contadores de linhas e tempo
+    gasto por etapa. Lê apenas o registro do processamento.
+    """
+    job = SpreadsheetJobController.get_by_uuid(job_id)
+    return ReturnSchema(
+        code=200,
+        data=SpreadsheetJobProgressSchema.from_job(job)
+    )
+
+
+@spreadsheet_router.get('/progress/{job_id}/stream', response={})
+def stream_spreadsheet_progress(request: CustomRequest, job_id: str) -> StreamingHttpResponse:
+    """
+    Server-sent events com o andamento do processamento. Um evento é enviado
+    a cada mudança e o stream sempre termina com o evento `end`: com
+    `finished` verdadeiro quando o processamento foi concluído ou falhou, ou
+    falso quando o stream atingiu PROGRESS_STREAM_MAX_SECONDS e o cliente
+    deve se reconectar para continuar acompanhando.
+    """
+    job = SpreadsheetJobController.get_by_uuid(job_id)
+
+    def events() -> Iterator[str]:
+        current = job
+        for current in SpreadsheetJobController.watch(job):
+            yield f"data: {SpreadsheetJobProgressSchema.from_job(current).model_dump_json()}\n\n"
+        finished = current.status in FINISHED_STATUSES
+        yield f"event: end\ndata: {json.dumps({'finished': finished})}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Impede que um proxy (nginx) segure os eventos em buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@spreadsheet_router.get('/results/{job_id}', response={200: ReturnSchema[Union[SpreadsheetResultsPageSchema, SpreadsheetDTO]], 409: ReturnSchema})
 @endpoint("Obter resultados da planilha")
 def get_spreadsheet_results(
     request: CustomRequest,
     job_id: str,
+    query: Query[SpreadsheetResultsQuery],
     ):
+    """
+    Com `page`, devolve uma página de pagadores (com filtros opcionais por
+    credor, novos/existentes e avisos) e um resumo do processamento. Sem
+    `page`, devolve o resultado completo.
+    """
+    job = SpreadsheetJobController.get_by_uuid(job_id)
+    if job.status != SpreadsheetJob.Status.DONE.value:
+        return ReturnSchema(
+            code=409,
+            message=f'O processamento ainda não foi concluído (status: {job.status}).'
+        )
+
     try:
-        results_path = Path(MEDIA_ROOT) / job_id / 'results.json'
+        operation_path = SpreadsheetController.operation_path(job.uuid)
         
-        if not results_path.exists():
+        if not SpreadsheetResultsController.exists(operation_path):
             return ReturnSchema(
                 code=404,
                 message='Resultados não encontrados para o job_id fornecido.'
             )
 
-        # Carrega o JSON e converte para DTO
-        with results_path.open('r', encoding='utf-8') as f:
-            results_data = json.load(f)
+        if query.page is None:
+            data = SpreadsheetResultsController.load_all(operation_path)
+        else:
+            data = SpreadsheetResultsController.load_page(operation_path, query)
 
-        # Reconstrói o DTO a partir dos dados JSON
-        results_dto = SpreadsheetDTO.from_json(results_data)
         return ReturnSchema(
             code=200,
-            data=results_dto
+            data=data
         )
     
     except Exception as e:
@@ -113,7 +251,66 @@ def get_spreadsheet_results(
         )
 
 
-@spreadsheet_router.post('/save_results/{job_id}', response={200: ReturnSchema[str]})
+def _results_path(job_id: str) -> Path:
+    """
+    Pasta com os resultados de um processamento concluído.
+    """
+    job = SpreadsheetJobController.get_by_uuid(job_id)
+    if job.status != SpreadsheetJob.Status.DONE.value:
+        raise HttpFriendlyException(409, f'O processamento ainda não foi concluído (status: {job.status}).')
+
+    operation_path = SpreadsheetController.operation_path(job.uuid)
+    if not SpreadsheetResultsController.exists(operation_path):
+        raise HttpFriendlyException(404, 'Resultados não encontrados para o job_id fornecido.')
+    return operation_path
+
+
+@spreadsheet_router.get('/results/{job_id}/messages', response={200: ReturnSchema[PaginatedOutSchema[str]], 409: ReturnSchema})
+@endpoint()
+def get_spreadsheet_result_messages(
+    request: CustomRequest,
+    job_id: str,
+    query: Query[SpreadsheetMessagesQuery],
+    ):
+    """
+    Uma página dos erros ou dos avisos do processamento. As páginas de
+    pagadores trazem só as contagens.
+    """
+    return ReturnSchema(
+        code=200,
+        data=SpreadsheetResultsController.load_messages(_results_path(job_id), query)
+    )
+
+
+@spreadsheet_router.get('/results/{job_id}/download', response={409: ReturnSchema})
+def download_spreadsheet_results(request: CustomRequest, job_id: str) -> HttpResponse:
+    """
+    Devolve os pagadores processados como NDJSON, um pagador por linha. Se o
+    cliente aceita gzip, os bytes já comprimidos do disco são enviados como
+    estão; senão, o arquivo é descomprimido enquanto é enviado.
+    """
+    job = SpreadsheetJobController.get_by_uuid(job_id)
+    if job.status != SpreadsheetJob.Status.DONE.value:
+        raise HttpFriendlyException(409, f'O processamento ainda não foi concluído (status: {job.status}).')
+
+    operation_path = SpreadsheetController.operation_path(job.uuid)
+    results_file = SpreadsheetResultsController.results_file(operation_path)
+    if not results_file.exists():
+        raise HttpFriendlyException(404, 'Resultados não encontrados para o job_id fornecido.')
+
+    if _accepts_gzip(request.headers.get('Accept-Encoding', '')):
+        response: HttpResponse = FileResponse(results_file.open('rb'), content_type='application/x-ndjson')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(
+            SpreadsheetResultsController.iter_lines(operation_path),
+            content_type='application/x-ndjson'
+        )
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+@spreadsheet_router.post('/save_results/{job_id}', response={200: ReturnSchema[str], 409: ReturnSchema})
 @endpoint("Salvar no banco os dados processados")
 def save_results(
     request: CustomRequest,
@@ -121,11 +318,15 @@ def save_results(
     data: SaveSpreadsheetSchema
 ):
     try:
-        SpreadsheetController.save_results_to_database(job_id, data)
+        # A pasta da operação fica reservada até o fim da gravação (ver SpreadsheetJobController.approving)
+        with SpreadsheetJobController.approving(job_id):
+            SpreadsheetController.save_results_to_database(job_id, data)
         return ReturnSchema(
             code=200,
             data='Resultados salvos com sucesso no banco de dados.'
         )
+    except HttpFriendlyException:
+        raise
     except Exception as e:
         lgr.exception(format_exc())
         lgr.error(f"Erro ao salvar resultados no banco: {str(e)}")
@@ -133,3 +334,25 @@ def save_results(
             code=500,
             message=f'Erro ao salvar resultados no banco: {str(e)}'
 )
+
+
+@spreadsheet_router.post('/save_results/{job_id}/removals', response={200: ReturnSchema[str], 409: ReturnSchema})
+@endpoint("Salvar no banco os dados processados")
+def save_results_with_removals(
+    request: CustomRequest,
+    job_id: str,
+    removals: SpreadsheetRemovalsSchema
+    ):
+    """
+    Aprova os resultados gravados no servidor, menos os itens removidos pelo
+    administrador. O painel só precisa enviar o que removeu, sem ter
+    carregado todas as páginas de pagadores.
+    """
+    results_path = _results_path(job_id)
+    with SpreadsheetJobController.approving(job_id):
+        data = SpreadsheetResultsController.approved(results_path, removals)
+        SpreadsheetController.save_results_to_database(job_id, data)
+    return ReturnSchema(
+        code=200,
+        data='Resultados salvos com sucesso no banco de dados.'
+    )
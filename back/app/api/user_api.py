@@ -6,12 +6,12 @@ from ninja import Query
 
 from app.api import CustomRouter, endpoint
 from app.controllers.login_code_controller import LoginCodeController
+from app.controllers.sms_controller import SmsController
 from app.controllers.user_controller import UserController
 from app.exceptions import ShouldWaitToGenerateAnotherCode
-from app.models import LoginCode, User
+from app.models import LoginCode, SmsMessage, User
 from app.schemas import ReturnSchema
 from app.schemas.user_schemas import UserGetCodeSchema, UserWaitToGetCodeSchema
-from app.sms_api import send_sms
 from config import SHOW_SMS_CODE
 
 lgr = logging.getLogger(__name__)
@@ -41,9 +41,13 @@ def get_code(request: WSGIRequest, data: Query[UserGetCodeSchema]):
             data={"wait_time_seconds": e.data["wait_time_seconds"]})
 
     return_data = {}
-    sent = send_sms(data.phone, f"Seu codigo de acesso para a plataforma Peralta Cobranças: {code.code}.")
-    if not sent:
-        return ReturnSchema(code=500, message="Não foi possível enviar o SMS. Peça o código para o suporte.")
+    # O envio fica com o comando `dispatch_sms`; a resposta não espera o provedor
+    SmsController.enqueue(
+        data.phone,
+        f"Seu codigo de acesso para a plataforma Peralta Cobranças: {code.code}.",
+        expires_at=code.expiration_date,
+        priority=SmsMessage.Priority.HIGH,
+    )
 
     if SHOW_SMS_CODE:
         print(f"Generated code: {code.code}")
@@ -11,4 +11,6 @@ class AppConfig(AppConfig):
         from app.schemas.boleto_schemas import BoletoOutSchema
         
         BoletoOutSchema.model_rebuild()
-        InstallmentOutSchema.model_rebuild()
\ No newline at end of file
+        InstallmentOutSchema.model_rebuild()
+
+        import app.signals  # noqa: F401
\ No newline at end of file
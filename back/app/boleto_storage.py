@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from pathlib import PurePosixPath
+from typing import IO, Callable, List, Optional, Sequence, Tuple
+
+from django.core.files import File
+from django.core.files.storage import Storage, default_storage
+
+from config import BOLETO_UPLOAD_CONCURRENCY
+
+lgr = logging.getLogger(__name__)
+
+# Abre o conteúdo de um PDF para leitura: um arquivo local ou um membro do ZIP de boletos
+BoletoSource = Callable[[], IO[bytes]]
+
+DIGEST_BLOCK_SIZE = 64 * 1024
+
+
+class BoletoUploader:
+    """
+    Envia PDFs de boletos para o storage usando um pool limitado de threads.
+
+    Com USING_AWS cada envio é uma ida e volta ao S3, então enviar um arquivo
+    após o outro deixa a importação parada esperando a rede. As threads só
+    falam com o storage: nada de banco aqui, quem cria os registros é quem
+    chamou, depois que todos os envios deram certo.
+
+    Cada thread envia por uma instância própria do storage. O S3Boto3Storage
+    guarda o cliente por thread, mas o recurso `bucket` é um só por instância
+    e os recursos do boto3 não podem ser usados por várias threads.
+    """
+
+    def __init__(self, max_workers: int = BOLETO_UPLOAD_CONCURRENCY, storage: Optional[Storage] = None):
+        self.max_workers = max(1, max_workers)
+        self.storage = storage or default_storage
+        self._local = threading.local()
+
+    def upload(self, uploads: Sequence[Tuple[str, BoletoSource]]) -> List[str]:
+        """
+        Grava todos os arquivos no storage.
+
+        Parâmetros:
+            - uploads: Pares (caminho de destino no storage, função que abre o conteúdo).
+
+        Retorna:
+            - List[str]: Caminhos efetivamente gravados, na mesma ordem de `uploads`.
+
+        Se algum envio falhar, os arquivos que já foram gravados são removidos e
+        a primeira exceção é relançada.
+        """
+        if not uploads:
+            return []
+
+        saved: List[Optional[str]] = [None] * len(uploads)
+        error: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(uploads)), thread_name_prefix='boleto-upload') as executor:
+            futures = {
+                executor.submit(self._save, destination, source): index
+                for index, (destination, source) in enumerate(uploads)
+            }
+            for future in as_completed(futures):
+                try:
+                    saved[futures[future]] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                        # Não adianta começar envios novos se a importação vai falhar
+                        for pending in futures:
+                            pending.cancel()
+
+        if error is not None:
+            self.discard([path for path in saved if path])
+            raise error
+
+        lgr.debug(f"{len(uploads)} boletos enviados ao storage com até {self.max_workers} envios simultâneos")
+        return saved  # type: ignore[return-value]
+
+    def digest(self, sources: Sequence[BoletoSource]) -> List[Tuple[str, int]]:
+        """
+        Calcula o SHA-256 e o tamanho de cada conteúdo, lendo-os em paralelo.
+
+        Retorna:
+            - List[Tuple[str, int]]: Hash em hexadecimal e tamanho em bytes, na mesma ordem de `sources`.
+        """
+        if not sources:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sources)), thread_name_prefix='boleto-digest') as executor:
+            return list(executor.map(self._digest, sources))
+
+    def discard(self, paths: Sequence[str]) -> None:
+        """
+        Remove do storage arquivos gravados por uma importação que não foi concluída.
+        """
+        for path in paths:
+            try:
+                self.storage.delete(path)
+            except Exception as e:
+                lgr.error(f"Não foi possível remover o arquivo {path} após falha na importação: {e}")
+
+    def _save(self, destination: str, source: BoletoSource) -> str:
+        with source() as f:
+            return self._thread_storage().save(destination, File(f, name=PurePosixPath(destination).name))
+
+    def _thread_storage(self) -> Storage:
+        storage = getattr(self._local, 'storage', None)
+        if storage is None:
+            # Mesma classe e mesmas opções do storage configurado
+            _, args, kwargs = self.storage.deconstruct()
+            storage = self._local.storage = self.storage.__class__(*args, **kwargs)
+        return storage
+
+    @staticmethod
+    def _digest(source: BoletoSource) -> Tuple[str, int]:
+        sha256 = hashlib.sha256()
+        size = 0
+        with source() as f:
+            for block in iter(partial(f.read, DIGEST_BLOCK_SIZE), b''):
+                sha256.update(block)
+                size += len(block)
+        return sha256.hexdigest(), size
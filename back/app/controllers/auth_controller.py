@@ -1,7 +1,7 @@
 import logging
 from typing import Dict, Tuple, Union
+from django.db import transaction
 from django.utils import timezone
-from app.controllers.payer_controller import PayerController
 from app.repositories.past_number_repository import PastNumberRepository
 from ninja_jwt.tokens import RefreshToken, Token
 
@@ -10,7 +10,6 @@ from app.models import ApiConsumer, LoginCode, Payer, User
 from app.repositories.login_code_repository import LoginCodeRepository
 from app.repositories.user_repository import UserRepository
 from app.schemas.auth_schemas import AdminLoginSchema, LoginSchema, RefreshInputSchema
-from app.schemas.payer_schemas import PayerPatchInSchema
 from app.repositories.login_history_repository import LoginHistoryRepository
 
 lgr = logging.getLogger(__name__)
@@ -27,6 +26,7 @@ class AuthController:
             raise HttpFriendlyException(401, "Usuário não é administrador.")
 
         if user.check_password(schema.password):
+            # O token de administrador não leva a claim user_id de RefreshToken.for_user
             token = cls.get_token(user.id, "admin")
             return token
         else:
@@ -34,21 +34,30 @@ class AuthController:
 
     @classmethod
     def login(cls, schema: LoginSchema) -> Tuple[RefreshToken | Token, str]:
+        """
+        Login do pagador com o código recebido por SMS.
+
+        Usuário, pagador e código vêm numa única consulta; as gravações (uso
+        do código, troca de telefone e histórico) acontecem numa única
+        transação, e o token é gerado a partir do usuário já carregado.
+        """
+        login_code: LoginCode = (
+            LoginCodeRepository.filter(include_rels=['user__payer'], code=schema.code, user__cpf_cnpj=schema.cpf_cnpj)
+            .order_by('-id')
+            .first()
+        )
+        if login_code is None:
+            # Só no caminho de erro: distingue CPF/CNPJ inválido de código inválido
+            if not UserRepository.exists(cpf_cnpj=schema.cpf_cnpj):
+                raise HttpFriendlyException(401, "CPF/CNPJ inválido.")
+            raise HttpFriendlyException(401, "Código inválido.")
+
+        user: User = login_code.user
         try:
-            user: User = UserRepository.get(cpf_cnpj=schema.cpf_cnpj, friendly=False)
             payer: Payer = user.payer
-
-            login_code = LoginCodeRepository.get(
-                code=schema.code,
-                user=user,
-                friendly=False)
-        except User.DoesNotExist:
-            raise HttpFriendlyException(401, "CPF/CNPJ inválido.")
         except Payer.DoesNotExist:
             lgr.error("Existe usuário sem payer no banco: %s", schema.cpf_cnpj)
             raise HttpFriendlyException(500, "Problema interno. Entre em contato com o suporte")
-        except LoginCode.DoesNotExist:
-            raise HttpFriendlyException(401, "Código inválido.")
 
         if login_code.used:
             raise HttpFriendlyException(401, "Código já usado") 
@@ -56,24 +65,27 @@ class AuthController:
         if login_code.expiration_date < timezone.now():
             raise HttpFriendlyException(401, "Código expirou") 
 
-        if payer.phone != schema.phone and not PastNumberRepository.exists(number=schema.phone):
-            PastNumberRepository.create({
-                "number":schema.phone,
-                "payer":payer
-            })
+        with transaction.atomic():
+            # A troca é condicional: de dois logins simultâneos com o mesmo código, só um passa
+            if not LoginCodeRepository.filter(id=login_code.id, used=False).update(used=True):
+                raise HttpFriendlyException(401, "Código já usado")
+
+            if payer.phone != schema.phone and not PastNumberRepository.exists(number=schema.phone):
+                PastNumberRepository.create({
+                    "number":schema.phone,
+                    "payer":payer
+                })
 
-            PayerController.update(payer.id, PayerPatchInSchema(phone=schema.phone))
+                payer.phone = schema.phone
+                payer.save(update_fields=['phone', 'updated_at'])
 
-        token = cls.get_token(user.id, "user")
-        LoginCodeRepository.update(login_code, used=True)
-        
-        LoginHistoryRepository.create({
-            "user": user,
-            "timestamp": timezone.now(),
-            "phone_used": schema.phone
-        })
-        
-        return token, payer.name
+            LoginHistoryRepository.create({
+                "user": user,
+                "timestamp": timezone.now(),
+                "phone_used": schema.phone
+            })
+
+        return cls.token_for_user(user, "user"), payer.name
 
     @classmethod
     def refresh_pair(cls, schema: RefreshInputSchema) -> Dict:
@@ -102,14 +114,22 @@ class AuthController:
             lgr.error(f"Erro ao atualizar token: {str(e)}")
             raise HttpFriendlyException(401, f"Token inválido ou expirado: {str(e)}")
     
-    @staticmethod
-    def get_token(entity_id: Union[int, str], type: str) -> Union[RefreshToken, Token]:
+    @classmethod
+    def get_token(cls, entity_id: Union[int, str], type: str) -> Union[RefreshToken, Token]:
         if type == "user":
-            user = UserRepository.get(id=entity_id)
-            token = RefreshToken.for_user(user)
-        else:
-            token = RefreshToken()
+            return cls.token_for_user(UserRepository.get(id=entity_id), type)
 
+        token = RefreshToken()
         token.payload["type"] = type
         token.payload["entity_id"] = str(entity_id)
         return token
+
+    @staticmethod
+    def token_for_user(user: User, type: str) -> Union[RefreshToken, Token]:
+        """
+        Gera o token de um usuário já carregado, sem buscá-lo de novo.
+        """
+        token = RefreshToken.for_user(user)
+        token.payload["type"] = type
+        token.payload["entity_id"] = str(user.id)
+        return token
@@ -1,5 +1,5 @@
 import logging
-from typing import IO
+from typing import IO, Any, Dict
 
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
@@ -7,9 +7,11 @@ from django.core.files.storage import default_storage
 from app.controllers import BaseController
 from app.controllers.agreement_controller import AgreementController
 from app.controllers.installment_controller import InstallmentController
+from app.controllers.stored_blob_controller import StoredBlobController
 from app.models import Agreement, Boleto, Creditor, Installment
 from app.repositories.boleto_repository import BoletoRepository
 from app.schemas.boleto_schemas import BoletoInSchema, BoletoPatchInSchema
+from config import BOLETO_CONTENT_ADDRESSED
 
 lgr =  logging.getLogger(__name__)
 
@@ -30,17 +32,16 @@ class BoletoController(BaseController[BoletoRepository, Boleto]):
             - Boleto: Acordo criado.
         """
         installment: Installment = InstallmentController.get(id=schema.installment)
-        if hasattr(installment, 'boleto') and installment.boleto:
-            installment.boleto.delete()
-
         agreement: Agreement = installment.agreement
         creditor: Creditor = agreement.creditor
 
-        path = cls.save_boleto_pdf(schema.pdf, creditor.slug_name, agreement.slug_name, installment.slug_name) # type: ignore
-
         data = schema.model_dump()
-        lgr.debug(f"Criando boleto em {path}")
-        data['pdf'] = path
+        data.update(cls._store_pdf(schema.pdf, creditor, agreement, installment)) # type: ignore
+
+        # O boleto anterior só sai depois do novo PDF gravado, para que um arquivo idêntico seja reaproveitado
+        if hasattr(installment, 'boleto') and installment.boleto:
+            installment.boleto.delete()
+        lgr.debug(f"Criando boleto em {data['pdf']}")
         data['installment'] = installment
 
         return cls.REPOSITORY.create(data)
@@ -54,20 +55,37 @@ class BoletoController(BaseController[BoletoRepository, Boleto]):
         if schema.installment:
             data['installment'] = InstallmentController.get(id=schema.installment)
 
+        previous_blob_id = None
         if schema.pdf:
-            instance.pdf.delete(save=False)
+            # Um arquivo compartilhado pode ser usado por outros boletos: só a referência é devolvida
+            if instance.blob_id:
+                previous_blob_id = instance.blob_id
+            else:
+                instance.pdf.delete(save=False)
             installment: Installment = instance.installment
             agreement: Agreement = installment.agreement
             creditor: Creditor = agreement.creditor
 
-            path = cls.save_boleto_pdf(schema.pdf, creditor.slug_name, agreement.slug_name, installment.slug_name)
-            data['pdf'] = path
+            data.update(cls._store_pdf(schema.pdf, creditor, agreement, installment))
 
         updated: Boleto = cls.REPOSITORY.update(instance, **data)
+        if previous_blob_id:
+            StoredBlobController.release(previous_blob_id)
         AgreementController.check_agreement_status(updated.installment.agreement)
         
         return updated
 
+    @classmethod
+    def _store_pdf(cls, pdf: IO[bytes], creditor: Creditor, agreement: Agreement, installment: Installment) -> Dict[str, Any]:
+        """
+        Grava o PDF no layout configurado e retorna os campos `pdf` e `blob` do boleto.
+        """
+        if BOLETO_CONTENT_ADDRESSED:
+            blob = StoredBlobController.store(pdf)
+            return {'pdf': blob.path, 'blob': blob}
+
+        return {'pdf': cls.save_boleto_pdf(pdf, creditor.slug_name, agreement.slug_name, installment.slug_name), 'blob': None}
+
     @classmethod
     def save_boleto_pdf(cls, pdf: IO[bytes], creditor_name: str, agreement_name: str, installment_name: str) -> str:
         """
@@ -82,6 +100,13 @@ class BoletoController(BaseController[BoletoRepository, Boleto]):
         Retorna:
             - str: O caminho do arquivo salvo.
         """
-        path = f"boletos/{creditor_name}/{agreement_name}_{installment_name}.pdf"
+        path = cls.boleto_pdf_path(creditor_name, agreement_name, installment_name)
         path = default_storage.save(path, ContentFile(pdf.read()))
-        return path
\ No newline at end of file
+        return path
+
+    @classmethod
+    def boleto_pdf_path(cls, creditor_name: str, agreement_name: str, installment_name: str) -> str:
+        """
+        Monta o caminho, dentro do storage, onde o PDF do boleto de uma parcela é gravado.
+        """
+        return f"boletos/{creditor_name}/{agreement_name}_{installment_name}.pdf"
\ No newline at end of file
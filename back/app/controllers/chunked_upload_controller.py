@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.utils import timezone
+
+from app.controllers import BaseController
+from app.exceptions import HttpFriendlyException
+from app.models import ChunkedUpload
+from app.repositories.chunked_upload_repository import ChunkedUploadRepository
+from app.schemas.spreadsheet_schemas import CreateChunkedUploadSchema
+from config import CHUNKED_UPLOAD_MAX_BYTES, CHUNKED_UPLOAD_TTL_SECONDS
+
+lgr = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 2**20
+
+
+class ChunkedUploadController(BaseController[ChunkedUploadRepository, ChunkedUpload]):
+    """
+    Envio de arquivos grandes em partes: o cliente cria o envio, manda as
+    partes com a posição de cada uma e finaliza. Se a conexão cair, o cliente
+    consulta quantos bytes já chegaram e continua dali.
+    """
+    REPOSITORY = ChunkedUploadRepository
+    MODEL = ChunkedUpload
+
+    @classmethod
+    def file_path(cls, upload: ChunkedUpload) -> Path:
+        """
+        Caminho do arquivo em montagem, dentro de UPLOADS_ROOT. O arquivo não
+        pode ficar em MEDIA_ROOT, que é servido publicamente.
+        """
+        return Path(settings.UPLOADS_ROOT) / f"{upload.uuid}.part"
+
+    @classmethod
+    def create(cls, schema: CreateChunkedUploadSchema) -> ChunkedUpload:
+        if schema.size <= 0:
+            raise HttpFriendlyException(400, "O tamanho do arquivo deve ser maior que zero.")
+        if schema.size > CHUNKED_UPLOAD_MAX_BYTES:
+            raise HttpFriendlyException(400, f"O arquivo excede o tamanho máximo de {CHUNKED_UPLOAD_MAX_BYTES} bytes.")
+
+        upload = cls.REPOSITORY.create({"filename": schema.filename, "size": schema.size})
+        path = cls.file_path(upload)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+        lgr.info(f"Envio em partes {upload.uuid} criado para {schema.filename} ({schema.size} bytes)")
+        return upload
+
+    @classmethod
+    def get_by_uuid(cls, upload_id: str) -> ChunkedUpload:
+        try:
+            upload_uuid = UUID(str(upload_id))
+        except ValueError:
+            raise HttpFriendlyException(404, f"{ChunkedUpload.READABLE_NAME} não encontrado")
+
+        return cls.REPOSITORY.get(uuid=upload_uuid)
+
+    @classmethod
+    def write_chunk(cls, upload: ChunkedUpload, offset: int, stream: IO[bytes], sha256: Optional[str] = None) -> ChunkedUpload:
+        """
+        Grava uma parte do arquivo a partir de `offset`, lendo o corpo da
+        requisição em blocos, sem carregá-lo inteiro na memória.
+
+        A parte pode começar em qualquer ponto já recebido (reenvio depois de
+        uma falha), mas não depois dele: o arquivo não pode ter buracos. Ela é
+        gravada primeiro em um arquivo temporário e só é copiada para o
+        arquivo do envio depois de conferida: um reenvio corrompido que
+        sobrepõe bytes já recebidos não pode estragá-los.
+
+        Parâmetros:
+            - upload: Envio que recebe a parte.
+            - offset: Posição, no arquivo, do primeiro byte da parte.
+            - stream: Corpo da parte.
+            - sha256: Se informado, o hash da parte precisa ser igual a ele;
+              senão a parte é descartada e o envio continua de onde estava.
+
+        Retorna:
+            - ChunkedUpload: Envio com a quantidade de bytes recebidos atualizada.
+        """
+        if upload.status != ChunkedUpload.Status.UPLOADING.value:
+            raise HttpFriendlyException(409, "O envio já foi finalizado.")
+        if offset < 0 or offset > upload.received:
+            raise HttpFriendlyException(409, f"Parte fora de ordem: o próximo byte esperado é o {upload.received}.")
+
+        limit = upload.size - offset
+        written = 0
+        digest = hashlib.sha256()
+        file_path = cls.file_path(upload)
+        with tempfile.TemporaryFile(dir=file_path.parent) as staged:
+            while block := stream.read(READ_BLOCK_SIZE):
+                if written + len(block) > limit:
+                    raise HttpFriendlyException(400, f"A parte ultrapassa o tamanho declarado de {upload.size} bytes.")
+                digest.update(block)
+                staged.write(block)
+                written += len(block)
+
+            if sha256 is not None and digest.hexdigest() != sha256.lower():
+                raise HttpFriendlyException(400, "O hash da parte não confere; envie-a novamente.")
+
+            staged.seek(0)
+            with file_path.open('r+b') as file:
+                file.seek(offset)
+                shutil.copyfileobj(staged, file, READ_BLOCK_SIZE)
+
+        # Outra requisição pode ter avançado o envio enquanto esta gravava
+        end = offset + written
+        cls.REPOSITORY.filter(id=upload.id, received__lt=end).update(received=end, updated_at=timezone.now())
+        upload.refresh_from_db()
+        return upload
+
+    @classmethod
+    def finalize(cls, upload: ChunkedUpload, sha256: Optional[str] = None) -> ChunkedUpload:
+        """
+        Confere se todas as partes chegaram e calcula o hash do arquivo
+        montado. O hash de cada parte já é conferido na chegada; o do arquivo
+        inteiro é calculado aqui, em uma leitura sequencial, porque o estado do
+        hash não sobrevive entre requisições atendidas por processos diferentes.
+        """
+        if upload.status == ChunkedUpload.Status.COMPLETE.value:
+            return upload
+        if upload.received != upload.size:
+            raise HttpFriendlyException(409, f"O envio está incompleto: {upload.received} de {upload.size} bytes recebidos.")
+
+        digest = hashlib.sha256()
+        with cls.file_path(upload).open('rb') as file:
+            while block := file.read(READ_BLOCK_SIZE):
+                digest.update(block)
+
+        if sha256 is not None and digest.hexdigest() != sha256.lower():
+            raise HttpFriendlyException(400, "O hash do arquivo não confere com o informado.")
+
+        lgr.info(f"Envio em partes {upload.uuid} finalizado ({upload.size} bytes, sha256 {digest.hexdigest()})")
+        return cls.REPOSITORY.update(upload, sha256=digest.hexdigest(), status=ChunkedUpload.Status.COMPLETE.value)
+
+    @classmethod
+    def get_complete(cls, upload_id: str) -> ChunkedUpload:
+        """
+        Busca um envio que já recebeu e conferiu todas as partes.
+        """
+        upload = cls.get_by_uuid(upload_id)
+        if upload.status != ChunkedUpload.Status.COMPLETE.value:
+            raise HttpFriendlyException(409, f"O envio {upload.uuid} ainda não foi finalizado.")
+        return upload
+
+    @classmethod
+    def take(cls, upload: ChunkedUpload, destination: Path) -> Path:
+        """
+        Move o arquivo de um envio finalizado para `destination` e remove o
+        envio; cada envio alimenta um único processamento. UPLOADS_ROOT e a
+        pasta da operação podem estar em volumes diferentes, quando o arquivo
+        é copiado.
+        """
+        shutil.move(cls.file_path(upload), destination)
+        upload.delete()
+        return destination
+
+    @classmethod
+    def reap(cls, max_age: Optional[timedelta] = None, now: Optional[datetime] = None) -> int:
+        """
+        Remove os envios sem atividade há mais de `max_age` (por padrão,
+        CHUNKED_UPLOAD_TTL_SECONDS), junto com seus arquivos.
+
+        Retorna:
+            - int: Quantidade de envios removidos.
+        """
+        max_age = max_age if max_age is not None else timedelta(seconds=CHUNKED_UPLOAD_TTL_SECONDS)
+        stale = list(cls.REPOSITORY.filter(updated_at__lt=(now or timezone.now()) - max_age))
+        for upload in stale:
+            cls.file_path(upload).unlink(missing_ok=True)
+            upload.delete()
+
+        if stale:
+            lgr.info(f"{len(stale)} envios em partes abandonados removidos")
+        return len(stale)
@@ -0,0 +1,179 @@
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from app.models import Agreement, Boleto, InstallmentReminder, SmsMessage
+from app.repositories.installment_repository import InstallmentRepository
+from app.repositories.installment_reminder_repository import InstallmentReminderRepository
+from app.repositories.sms_message_repository import SmsMessageRepository
+from app.sms_api import clean_phone
+from app.utils import chunked
+from config import DUE_REMINDER_BATCH_SIZE, DUE_REMINDER_DAYS
+
+lgr = logging.getLogger(__name__)
+
+FIELDS = ('id', 'number', 'due_date', 'agreement__number', 'agreement__payer__phone')
+
+
+class ReminderResult(NamedTuple):
+    messages: int
+    installments: int
+    # Parcelas que outra execução lembrou entre a seleção e a gravação
+    skipped: int = 0
+
+
+class DueReminderController:
+    """
+    Lembretes, por SMS, das parcelas que vencem nos próximos dias.
+
+    Os lembretes só são enfileirados na fila de SMS (ver SmsController); quem
+    envia é o comando `dispatch_sms`, com a concorrência e o limite de
+    chamadas configurados. Cada parcela lembrada ganha um InstallmentReminder,
+    então rodar de novo não repete lembretes.
+    """
+
+    @classmethod
+    def due_installments(cls, days: int, today: date):
+        """
+        Parcelas com boleto pendente, de acordos abertos, que vencem entre hoje
+        e daqui a `days` dias e ainda não foram lembradas, ordenadas por
+        vencimento. Uma única consulta, pelos índices de vencimento e de
+        status do boleto.
+        """
+        return (
+            InstallmentRepository.filter(
+                due_date__gte=today,
+                due_date__lte=today + timedelta(days=days),
+                boleto__status=Boleto.Status.PENDING.value,
+                agreement__status=Agreement.Status.OPEN.value,
+            )
+            .filter(~Exists(InstallmentReminderRepository.filter(installment=OuterRef('pk'))))
+            .order_by('due_date', 'id')
+            .values(*FIELDS)
+        )
+
+    @classmethod
+    def enqueue_reminders(
+        cls,
+        days: int = DUE_REMINDER_DAYS,
+        today: Optional[date] = None,
+        batch_size: int = DUE_REMINDER_BATCH_SIZE,
+        dry_run: bool = False,
+    ) -> ReminderResult:
+        """
+        Enfileira um SMS por telefone com as parcelas dele que vencem nos
+        próximos `days` dias. Pagadores com o mesmo telefone recebem uma
+        única mensagem.
+
+        Parâmetros:
+            - days: Quantos dias à frente olhar.
+            - today: Data de referência; por padrão, hoje.
+            - batch_size: Quantidade de telefones gravados por transação.
+            - dry_run: Só conta o que seria enfileirado.
+
+        Retorna:
+            - ReminderResult: Quantidade de mensagens e de parcelas lembradas.
+        """
+        today = today or timezone.localdate()
+        messages = installments = skipped = 0
+        for batch in chunked(cls._group_by_phone(cls.due_installments(days, today)).items(), batch_size):
+            groups = dict(batch)
+            if not dry_run:
+                result = cls._write_batch(groups)
+            else:
+                result = ReminderResult(len(groups), sum(len(rows) for rows in groups.values()))
+            messages += result.messages
+            installments += result.installments
+            skipped += result.skipped
+
+        lgr.info(
+            f"Lembretes de vencimento{' (simulação)' if dry_run else ''}: "
+            f"{messages} SMS para {installments} parcelas que vencem até {today + timedelta(days=days):%d/%m/%Y}"
+            + (f"; {skipped} parcelas já lembradas por outra execução" if skipped else "")
+        )
+        return ReminderResult(messages, installments, skipped)
+
+    @staticmethod
+    def build_message(rows: List[dict]) -> str:
+        first, last = rows[0]["due_date"], rows[-1]["due_date"]
+        if len(rows) == 1:
+            return (
+                f"Peralta Cobranças: a parcela {rows[0]['number']} do acordo "
+                f"{rows[0]['agreement__number']} vence em {first:%d/%m/%Y}. Acesse a plataforma para baixar o boleto."
+            )
+        if first == last:
+            period = f"em {first:%d/%m/%Y}"
+        else:
+            period = f"entre {first:%d/%m/%Y} e {last:%d/%m/%Y}"
+        return f"Peralta Cobranças: você tem {len(rows)} parcelas que vencem {period}. Acesse a plataforma para baixar os boletos."
+
+    @classmethod
+    def _group_by_phone(cls, rows) -> Dict[str, List[dict]]:
+        """
+        Agrupa as parcelas pelo telefone só com dígitos. O agrupamento é feito
+        sobre o resultado inteiro, não no banco: telefones gravados com
+        formatação diferente chegam aos mesmos dígitos e precisam cair na mesma
+        mensagem. As parcelas de cada telefone mantêm a ordem de vencimento.
+        """
+        groups: Dict[str, List[dict]] = {}
+        for row in rows.iterator(chunk_size=2000):
+            phone = clean_phone(row['agreement__payer__phone'] or '')
+            if phone:
+                groups.setdefault(phone, []).append(row)
+        return groups
+
+    @classmethod
+    def _write_batch(cls, groups: Dict[str, List[dict]]) -> ReminderResult:
+        """
+        Grava os lembretes de um lote numa única transação. Se outra execução
+        lembrou alguma das parcelas ao mesmo tempo, o lote é refeito telefone
+        a telefone, sem as parcelas já lembradas.
+        """
+        try:
+            with transaction.atomic():
+                cls._write_groups(groups)
+        except IntegrityError:
+            lgr.warning(f"Lote de {len(groups)} lembretes em conflito com outra execução; gravando por telefone")
+        else:
+            return ReminderResult(len(groups), sum(len(rows) for rows in groups.values()))
+
+        messages = installments = skipped = 0
+        for phone, rows in groups.items():
+            reminded = set(
+                InstallmentReminderRepository.filter(installment_id__in=[row["id"] for row in rows])
+                .values_list('installment_id', flat=True)
+            )
+            pending = [row for row in rows if row["id"] not in reminded]
+            try:
+                if pending:
+                    with transaction.atomic():
+                        cls._write_groups({phone: pending})
+            except IntegrityError:
+                pending = []
+            messages += int(bool(pending))
+            installments += len(pending)
+            skipped += len(rows) - len(pending)
+
+        lgr.warning(f"{skipped} parcelas do lote já tinham sido lembradas por outra execução")
+        return ReminderResult(messages, installments, skipped)
+
+    @classmethod
+    def _write_groups(cls, groups: Dict[str, List[dict]]) -> None:
+        messages = SmsMessageRepository.bulk_create([
+            SmsMessage(
+                phone=phone,
+                message=cls.build_message(rows),
+                # Depois do primeiro vencimento o lembrete perde o sentido
+                expires_at=timezone.make_aware(datetime.combine(rows[0]["due_date"] + timedelta(days=1), time.min)),
+            )
+            for phone, rows in groups.items()
+        ])
+        InstallmentReminderRepository.bulk_create([
+            InstallmentReminder(installment_id=row["id"], sms=sms)
+            for sms, rows in zip(messages, groups.values())
+            for row in rows
+        ])
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from django.db import transaction
+
+from app.models import ImportLedgerEntry
+from app.repositories.boleto_repository import BoletoRepository
+from app.repositories.import_ledger_repository import ImportLedgerRepository
+from app.spreadsheet_normalizer import RowData
+
+lgr = logging.getLogger(__name__)
+
+# Impressões digitais das linhas de um processamento, guardadas na pasta da
+# operação até o administrador aprovar a importação
+PENDING_FILE = 'ledger_pending.json'
+
+LedgerKey = Tuple[str, int]
+
+
+class LedgerRecord(NamedTuple):
+    fingerprint: str
+    boleto_crc: int
+
+
+class ImportLedgerController:
+    """
+    Mantém o registro das linhas de planilha já importadas.
+
+    Cada boleto gravado por uma importação guarda o hash da linha que o gerou
+    e o CRC do PDF no ZIP. Numa reimportação, a linha cujo hash e CRC batem com
+    o registro já está no banco exatamente como na planilha, então é pulada
+    antes de qualquer consulta ao grafo de pagadores, acordos e parcelas.
+    """
+
+    @classmethod
+    def fingerprint(cls, row: RowData) -> str:
+        """
+        Hash dos campos normalizados da linha. O vencimento entra já
+        interpretado, para que "1/2/2025" e "01/02/2025" não contem como mudança.
+        """
+        due_date = row["due_date"].isoformat() if row["due_date"] else row["due_date_str"]
+        fields = (
+            row["creditor_name"], row["payer_name"], row["cpf_cnpj"], row["phone"],
+            row["agreement_num"], str(row["installment_num"]), due_date,
+        )
+        return hashlib.blake2b('\x1f'.join(fields).encode('utf-8'), digest_size=16).hexdigest()
+
+    @classmethod
+    def load(cls, agreement_numbers: Iterable[str]) -> Dict[LedgerKey, LedgerRecord]:
+        """
+        Busca o registro das parcelas dos acordos fornecidos.
+        """
+        ledger: Dict[LedgerKey, LedgerRecord] = {}
+        for qs in ImportLedgerRepository.filter_in_batches('agreement_number', set(agreement_numbers)):
+            for row in qs.values('agreement_number', 'installment_number', 'fingerprint', 'boleto_crc'):
+                ledger[(row['agreement_number'], row['installment_number'])] = LedgerRecord(row['fingerprint'], row['boleto_crc'])
+        return ledger
+
+    @classmethod
+    def write_pending(cls, operation_path: Path, records: Dict[LedgerKey, LedgerRecord]) -> None:
+        """
+        Guarda na pasta da operação as linhas que podem entrar no registro
+        quando a importação for aprovada.
+        """
+        pending = [[agreement, installment, *record] for (agreement, installment), record in records.items()]
+        (operation_path / PENDING_FILE).write_text(json.dumps(pending, separators=(',', ':')), encoding='utf-8')
+
+    @classmethod
+    def record_pending(cls, operation_path: Path) -> int:
+        """
+        Grava no registro as linhas pendentes de uma importação aprovada.
+
+        Só entram as parcelas que de fato terminaram com boleto no banco; o
+        que o administrador removeu na revisão continua sendo processado nas
+        próximas importações.
+
+        Retorna:
+            - int: Quantidade de linhas registradas.
+        """
+        pending_file = operation_path / PENDING_FILE
+        if not pending_file.exists():
+            return 0
+
+        pending: Dict[LedgerKey, LedgerRecord] = {
+            (agreement, installment): LedgerRecord(fingerprint, boleto_crc)
+            for agreement, installment, fingerprint, boleto_crc in json.loads(pending_file.read_text(encoding='utf-8'))
+        }
+
+        entries = []
+        for qs in BoletoRepository.filter_in_batches('installment__agreement__number', {agreement for agreement, _ in pending}):
+            for row in qs.values('id', 'installment__agreement__number', 'installment__number'):
+                record: Optional[LedgerRecord] = pending.get((row['installment__agreement__number'], int(row['installment__number'])))
+                if record is None:
+                    continue
+
+                entries.append(ImportLedgerEntry(
+                    boleto_id=row['id'],
+                    agreement_number=row['installment__agreement__number'],
+                    installment_number=int(row['installment__number']),
+                    fingerprint=record.fingerprint,
+                    boleto_crc=record.boleto_crc,
+                ))
+
+        with transaction.atomic():
+            for qs in ImportLedgerRepository.filter_in_batches('boleto_id', [entry.boleto_id for entry in entries]):
+                qs.delete()
+            ImportLedgerRepository.bulk_create(entries)
+
+        lgr.info(f"{len(entries)} linhas registradas no registro de importações")
+        return len(entries)
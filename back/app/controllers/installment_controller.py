@@ -1,14 +1,28 @@
 from datetime import date
+from functools import partial
+from typing import List, NamedTuple, Optional
 import logging
 
+from django.core.files.storage import default_storage
+from django.db import transaction
+
 from app.controllers import BaseController
 from app.models import Agreement, Boleto, Installment
 from app.repositories.agreement_repository import AgreementRepository
+from app.repositories.boleto_repository import BoletoRepository
 from app.repositories.installment_repository import InstallmentRepository
 from app.schemas.installment_schemas import InstallmentInSchema, InstallmentPatchInSchema
+from config import OVERDUE_PURGE_BATCH_SIZE
 
 lgr =  logging.getLogger(__name__)
 
+
+class OverduePurgeResult(NamedTuple):
+    installments: int
+    boletos: int
+    files: int
+
+
 class InstallmentController(BaseController[InstallmentRepository, Installment]):
     REPOSITORY = InstallmentRepository
     MODEL = Installment
@@ -30,13 +44,53 @@ class InstallmentController(BaseController[InstallmentRepository, Installment]):
         return cls.REPOSITORY.update(instance, **data)
 
     @classmethod
-    def remove_overdue_installments(cls):
-        # Calculo a data de hoje
-        # Pego todas as parcelas com 'data de vencimento menor que hoje
-        # E que não foram pagas' e as removo
-        today = date.today()
-        overdue_installments = cls.REPOSITORY.filter(due_date__lt=today, boleto__status=Boleto.Status.PENDING)
-        lgr.debug(f"Encontradas {len(overdue_installments)} parcelas vencidas para remoção.")
-        for installment in overdue_installments:
-            lgr.debug(f'Removendo parcela vencida: {installment.agreement.number} -> Parcela {installment.id} - Vencimento: {installment.due_date}')
-            cls.REPOSITORY.delete(installment)
+    def remove_overdue_installments(cls, batch_size: Optional[int] = None, today: Optional[date] = None) -> OverduePurgeResult:
+        """
+        Remove as parcelas vencidas cujo boleto não foi pago, em lotes de no
+        máximo `batch_size` parcelas, cada lote em sua própria transação.
+
+        Boletos e entradas do registro de importações vão junto, em cascata. Os
+        PDFs que só esses boletos usavam são apagados do storage depois que o
+        lote é confirmado; os endereçados pelo conteúdo são liberados pelo sinal
+        de remoção do boleto (ver app/signals.py).
+
+        Parâmetros:
+            - batch_size: Parcelas removidas por lote. Por padrão, OVERDUE_PURGE_BATCH_SIZE.
+            - today: Data de referência para o vencimento. Por padrão, hoje.
+
+        Retorna:
+            - OverduePurgeResult: Quantidade de parcelas, boletos e PDFs removidos.
+        """
+        batch_size = batch_size or OVERDUE_PURGE_BATCH_SIZE
+        overdue = cls.REPOSITORY.filter(
+            due_date__lt=today or date.today(), boleto__status=Boleto.Status.PENDING.value
+        ).order_by('id')
+
+        installments = boletos = files = 0
+        while ids := list(overdue.values_list('id', flat=True)[:batch_size]):
+            with transaction.atomic():
+                paths = [
+                    path for path in BoletoRepository.filter(installment_id__in=ids, blob__isnull=True).values_list('pdf', flat=True)
+                    if path
+                ]
+                _, deleted = cls.REPOSITORY.filter(id__in=ids).delete()
+                transaction.on_commit(partial(cls._delete_files, paths))
+
+            removed = deleted.get(Installment._meta.label, 0)
+            if not removed:
+                break
+            installments += removed
+            boletos += deleted.get(Boleto._meta.label, 0)
+            files += len(paths)
+            lgr.debug(f"Lote de {removed} parcelas vencidas removido")
+
+        lgr.info(f"{installments} parcelas vencidas removidas, com {boletos} boletos e {files} PDFs")
+        return OverduePurgeResult(installments, boletos, files)
+
+    @staticmethod
+    def _delete_files(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                default_storage.delete(path)
+            except Exception as e:
+                lgr.error(f"Erro ao apagar o PDF {path} de boleto vencido: {str(e)}")
@@ -0,0 +1,56 @@
+import logging
+from datetime import datetime
+from traceback import format_exc
+from typing import List, Optional, Sequence
+
+from django.db.models import Q
+from django.utils import timezone
+
+from app.controllers import BaseController
+from app.models import PeriodicTaskRun
+from app.repositories.periodic_task_run_repository import PeriodicTaskRunRepository
+from app.tasks import PERIODIC_TASKS, PeriodicTask
+
+lgr = logging.getLogger(__name__)
+
+
+class PeriodicTaskController(BaseController[PeriodicTaskRunRepository, PeriodicTaskRun]):
+    REPOSITORY = PeriodicTaskRunRepository
+    MODEL = PeriodicTaskRun
+
+    @classmethod
+    def run_due(cls, tasks: Sequence[PeriodicTask] = PERIODIC_TASKS, now: Optional[datetime] = None) -> List[str]:
+        """
+        Executa as tarefas cujo intervalo já passou desde a última execução.
+        O erro de uma tarefa fica registrado nela e não impede as demais.
+
+        Retorna:
+            - List[str]: Nomes das tarefas executadas.
+        """
+        executed = []
+        for task in tasks:
+            if not cls._claim(task, now or timezone.now()):
+                continue
+
+            lgr.info(f"Executando tarefa periódica {task.name}")
+            try:
+                result = task.run()
+            except Exception as e:
+                lgr.error(format_exc())
+                lgr.error(f"Erro na tarefa periódica {task.name}: {str(e)}")
+                result = {"error": str(e)}
+
+            cls.REPOSITORY.filter(name=task.name).update(last_finished_at=timezone.now(), last_result=result)
+            executed.append(task.name)
+        return executed
+
+    @classmethod
+    def _claim(cls, task: PeriodicTask, now: datetime) -> bool:
+        """
+        Reserva a próxima execução da tarefa, se o intervalo dela já passou.
+        A troca é condicional, então só um worker consegue a reserva.
+        """
+        cls.MODEL.objects.get_or_create(name=task.name)
+        return bool(cls.REPOSITORY.filter(name=task.name).filter(
+            Q(last_started_at__isnull=True) | Q(last_started_at__lte=now - task.interval)
+        ).update(last_started_at=now, updated_at=now))
@@ -0,0 +1,209 @@
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.controllers import BaseController
+from app.models import SmsMessage
+from app.repositories.sms_message_repository import SmsMessageRepository
+from app.sms_api import SmsDeliveryError, clean_phone
+from config import (
+    SMS_DISPATCH_CONCURRENCY,
+    SMS_MAX_ATTEMPTS,
+    SMS_RATE_LIMIT_PER_SECOND,
+    SMS_REQUEST_TIMEOUT_SECONDS,
+    SMS_RETRY_BASE_SECONDS,
+)
+
+lgr = logging.getLogger(__name__)
+
+# Espera máxima entre duas tentativas de uma mesma mensagem
+MAX_RETRY_DELAY_SECONDS = 5 * 60
+# Folga somada ao tempo máximo de uma rodada na reserva das mensagens (ver
+# `SmsController.claim_lease`)
+CLAIM_LEASE_MARGIN_SECONDS = 3 * SMS_REQUEST_TIMEOUT_SECONDS
+EXPIRED_ERROR = 'Mensagem expirou antes de ser enviada'
+
+
+class DispatchResult(NamedTuple):
+    sent: int
+    retried: int
+    failed: int
+
+
+class SmsController(BaseController[SmsMessageRepository, SmsMessage]):
+    """
+    Fila de SMS. A API só enfileira as mensagens; o comando `dispatch_sms`
+    as envia, fora do ciclo da requisição HTTP, para que um provedor lento
+    não segure as threads do servidor.
+    """
+    REPOSITORY = SmsMessageRepository
+    MODEL = SmsMessage
+
+    @classmethod
+    def enqueue(
+        cls,
+        phone: str,
+        message: str,
+        expires_at: Optional[datetime] = None,
+        priority: int = SmsMessage.Priority.NORMAL,
+    ) -> SmsMessage:
+        """
+        Coloca um SMS na fila de envio.
+
+        Parâmetros:
+            - phone: Telefone de destino.
+            - message: Texto da mensagem.
+            - expires_at: Se informado, a mensagem não é enviada depois deste momento.
+            - priority: Mensagens de prioridade maior são enviadas antes.
+
+        Retorna:
+            - SmsMessage: Mensagem enfileirada.
+        """
+        sms = cls.REPOSITORY.create({
+            "phone": clean_phone(phone),
+            "message": message,
+            "expires_at": expires_at,
+            "priority": priority,
+        })
+        lgr.info(f"SMS {sms.id} para {sms.phone} enfileirado")
+        return sms
+
+    @staticmethod
+    def claim_lease(limit: int, concurrency: int = SMS_DISPATCH_CONCURRENCY, rate: float = SMS_RATE_LIMIT_PER_SECOND) -> timedelta:
+        """
+        Quanto tempo as mensagens de uma rodada ficam reservadas para o
+        dispatcher que as pegou; se ele morrer no meio do envio, outro as
+        assume depois disso. A reserva cobre a rodada inteira no pior caso:
+        `limit` envios, `concurrency` por vez, cada um esgotando o tempo
+        limite, mais a espera imposta pelo limite de chamadas por segundo.
+        Uma reserva mais curta que a rodada deixaria outro dispatcher enviar
+        de novo as mensagens que ainda estão na fila desta.
+
+        Parâmetros:
+            - limit: Máximo de mensagens da rodada.
+            - concurrency: Máximo de envios simultâneos.
+            - rate: Limite de chamadas por segundo ao provedor; 0 sem limite.
+
+        Retorna:
+            - timedelta: Duração da reserva.
+        """
+        seconds = math.ceil(limit / max(1, concurrency)) * SMS_REQUEST_TIMEOUT_SECONDS
+        if rate > 0:
+            seconds += limit / rate
+        return timedelta(seconds=seconds + CLAIM_LEASE_MARGIN_SECONDS)
+
+    @classmethod
+    def claim_due(cls, limit: int, now: Optional[datetime] = None, concurrency: int = SMS_DISPATCH_CONCURRENCY) -> List[SmsMessage]:
+        """
+        Reserva até `limit` mensagens prontas para envio: as da fila cuja
+        espera acabou e as que estavam sendo enviadas por um dispatcher que
+        não terminou dentro do prazo. A reserva é condicional, então dois
+        dispatchers nunca enviam a mesma mensagem, e dura o suficiente para
+        a rodada terminar (ver `claim_lease`).
+        """
+        now = now or timezone.now()
+        lease = cls.claim_lease(limit, concurrency)
+        pending = Q(status=SmsMessage.Status.QUEUED.value) | Q(status=SmsMessage.Status.SENDING.value)
+        due = cls.REPOSITORY.filter(next_attempt_at__lte=now).filter(pending).order_by('-priority', 'next_attempt_at', 'id')
+
+        claimed = []
+        # Uma transação por rodada, não uma por mensagem
+        with transaction.atomic():
+            for sms_id in due.values_list('id', flat=True)[:limit]:
+                updated = cls.REPOSITORY.filter(pending, id=sms_id, next_attempt_at__lte=now).update(
+                    status=SmsMessage.Status.SENDING.value,
+                    next_attempt_at=now + lease,
+                    updated_at=now,
+                )
+                if updated:
+                    claimed.append(sms_id)
+
+        return list(cls.REPOSITORY.filter(id__in=claimed).order_by('id'))
+
+    @classmethod
+    def dispatch_pending(cls, provider, limit: int = 100, concurrency: int = SMS_DISPATCH_CONCURRENCY, now: Optional[datetime] = None) -> DispatchResult:
+        """
+        Envia as mensagens prontas para envio, até `concurrency` ao mesmo
+        tempo, e grava o resultado de cada uma.
+
+        Parâmetros:
+            - provider: Provedor de SMS (ver app/sms_api.py), reaproveitado entre chamadas.
+            - limit: Máximo de mensagens desta rodada.
+            - concurrency: Máximo de envios simultâneos.
+
+        Retorna:
+            - DispatchResult: Quantidade de mensagens enviadas, reagendadas e descartadas.
+        """
+        now = now or timezone.now()
+        messages = cls.claim_due(limit, now, concurrency)
+        if not messages:
+            return DispatchResult(0, 0, 0)
+
+        expired = [sms for sms in messages if sms.expires_at and sms.expires_at <= now]
+        to_send = [sms for sms in messages if sms not in expired]
+        for sms in expired:
+            cls._fail(sms, EXPIRED_ERROR)
+
+        # As threads só falam com o provedor; o banco é atualizado nesta thread
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(to_send) or 1))) as executor:
+            outcomes = list(executor.map(lambda sms: cls._send(provider, sms), to_send))
+
+        sent = retried = 0
+        failed = len(expired)
+        with transaction.atomic():
+            for sms, error in zip(to_send, outcomes):
+                if error is None:
+                    cls.REPOSITORY.update(
+                        sms, status=SmsMessage.Status.SENT.value, attempts=sms.attempts + 1, sent_at=timezone.now(), last_error=''
+                    )
+                    sent += 1
+                elif error.permanent or sms.attempts + 1 >= SMS_MAX_ATTEMPTS:
+                    sms.attempts += 1
+                    cls._fail(sms, str(error))
+                    failed += 1
+                else:
+                    cls._retry(sms, str(error))
+                    retried += 1
+
+        return DispatchResult(sent, retried, failed)
+
+    @staticmethod
+    def retry_delay(attempts: int) -> timedelta:
+        """
+        Espera antes da próxima tentativa, dobrando a cada falha.
+        """
+        return timedelta(seconds=min(MAX_RETRY_DELAY_SECONDS, SMS_RETRY_BASE_SECONDS * 2 ** (attempts - 1)))
+
+    @classmethod
+    def _send(cls, provider, sms: SmsMessage) -> Optional[SmsDeliveryError]:
+        try:
+            provider.send(sms.phone, sms.message)
+        except SmsDeliveryError as e:
+            return e
+        except Exception as e:
+            lgr.exception(e)
+            return SmsDeliveryError(f"Erro inesperado ao enviar SMS: {e}")
+        return None
+
+    @classmethod
+    def _retry(cls, sms: SmsMessage, error: str) -> None:
+        attempts = sms.attempts + 1
+        lgr.warning(f"Falha ao enviar SMS {sms.id} (tentativa {attempts}): {error}")
+        cls.REPOSITORY.update(
+            sms,
+            status=SmsMessage.Status.QUEUED.value,
+            attempts=attempts,
+            next_attempt_at=timezone.now() + cls.retry_delay(attempts),
+            last_error=error,
+        )
+
+    @classmethod
+    def _fail(cls, sms: SmsMessage, error: str) -> None:
+        lgr.error(f"SMS {sms.id} para {sms.phone} descartado: {error}")
+        cls.REPOSITORY.update(sms, status=SmsMessage.Status.FAILED.value, last_error=error)
@@ -0,0 +1,401 @@
+import hashlib
+import logging
+import re
+from contextlib import nullcontext
+from datetime import date
+from functools import partial
+from pathlib import Path
+from typing import ContextManager, Dict, List, Optional, Set, Tuple, Union
+from zipfile import ZipFile
+
+from django.db import transaction
+from django.utils import timezone
+
+from app.boleto_storage import BoletoSource, BoletoUploader
+from app.controllers.boleto_controller import BoletoController
+from app.controllers.stored_blob_controller import StoredBlobController
+from app.exceptions import HttpFriendlyException
+from app.models import Agreement, Boleto, Creditor, Installment, Payer, SpreadsheetCommitCheckpoint, SpreadsheetJob, User
+from app.repositories.agreement_repository import AgreementRepository
+from app.repositories.boleto_repository import BoletoRepository
+from app.repositories.creditor_repository import CreditorRepository
+from app.repositories.installment_repository import InstallmentRepository
+from app.repositories.payer_repository import PayerRepository
+from app.repositories.spreadsheet_commit_checkpoint_repository import SpreadsheetCommitCheckpointRepository
+from app.repositories.user_repository import UserRepository
+from app.schemas.spreadsheet_schemas import BoletoSchema, CreditorSchema, PayerSchema, SaveSpreadsheetSchema
+from app.utils import chunked
+from config import BOLETO_CONTENT_ADDRESSED, SPREADSHEET_COMMIT_BATCH_SIZE
+
+lgr = logging.getLogger(__name__)
+
+
+class SpreadsheetCommitController:
+    """
+    Grava no banco o grafo de resultados aprovado pelo administrador.
+
+    Em vez de criar registro por registro através dos controllers, agrupa os
+    nós aprovados por modelo e insere cada grupo com um único bulk_create,
+    resolvendo as chaves estrangeiras a partir dos ids devolvidos pelo banco.
+
+    Quando a gravação é de um processamento (SpreadsheetJob), os pagadores são
+    gravados em lotes, cada um na sua transação, e cada lote confirmado deixa
+    checkpoints no processamento. Se algo falhar, só o lote em andamento é
+    desfeito, e uma nova tentativa continua do primeiro pagador ainda não
+    gravado. O checkpoint guarda o hash do item gravado: uma nova tentativa
+    que muda (ou remove) um credor ou pagador já gravado é recusada, já que a
+    diferença não seria gravada. Sem processamento, tudo acontece numa única
+    transação.
+    """
+
+    @classmethod
+    def commit(cls, data: SaveSpreadsheetSchema, boletos_zip: Optional[Path] = None, job: Optional[SpreadsheetJob] = None) -> None:
+        """
+        Grava credores, usuários, pagadores, acordos, parcelas e boletos novos.
+
+        Parâmetros:
+            - data: Grafo aprovado, já com os itens removidos marcados como deletados.
+            - boletos_zip: ZIP enviado na importação, de onde os PDFs aprovados são lidos.
+            - job: Processamento de origem, onde ficam os checkpoints da gravação.
+        """
+        committed = cls._committed(job)
+        approved = cls._approved_payers(data)
+        cls._check_unchanged(committed, data, approved)
+        payers = [
+            raw_payer for raw_payer in approved
+            if raw_payer.user.cpf_cnpj not in committed[SpreadsheetCommitCheckpoint.Kind.PAYER]
+        ]
+        if job is not None and committed[SpreadsheetCommitCheckpoint.Kind.PAYER]:
+            lgr.info(f"Retomando a gravação de {job.uuid}: {len(committed[SpreadsheetCommitCheckpoint.Kind.PAYER])} pagadores já gravados")
+
+        # Com checkpoints, cada etapa é confirmada sozinha; sem eles, uma transação cobre tudo
+        step = transaction.atomic if job is not None else nullcontext
+        batch_size = SPREADSHEET_COMMIT_BATCH_SIZE if job is not None else max(len(payers), 1)
+
+        with (nullcontext() if job is not None else transaction.atomic()), cls._open_archive(boletos_zip) as archive:
+            with step():
+                created = cls._save_creditors(data, committed[SpreadsheetCommitCheckpoint.Kind.CREDITOR])
+                cls._checkpoint(job, SpreadsheetCommitCheckpoint.Kind.CREDITOR, created)
+
+            for batch in chunked(payers, batch_size):
+                saved_files: List[str] = []
+                try:
+                    with step():
+                        creditors = cls._load_creditors(batch)
+                        saved_payers = cls._save_payers(batch)
+                        agreements = cls._save_agreements(batch, saved_payers, creditors)
+                        installments = cls._save_installments(batch, agreements)
+                        cls._save_boletos(batch, installments, archive, saved_files)
+                        cls._checkpoint(job, SpreadsheetCommitCheckpoint.Kind.PAYER, {
+                            raw_payer.user.cpf_cnpj: cls._digest(raw_payer) for raw_payer in batch
+                        })
+                except Exception:
+                    # Os arquivos não participam da transação, então são removidos à mão
+                    cls._discard_files(saved_files)
+                    raise
+
+    @classmethod
+    def _committed(cls, job: Optional[SpreadsheetJob]) -> Dict[SpreadsheetCommitCheckpoint.Kind, Dict[str, str]]:
+        committed: Dict[SpreadsheetCommitCheckpoint.Kind, Dict[str, str]] = {kind: {} for kind in SpreadsheetCommitCheckpoint.Kind}
+        if job is None:
+            return committed
+
+        for kind, key, digest in SpreadsheetCommitCheckpointRepository.filter(job=job).values_list('kind', 'key', 'digest'):
+            committed[SpreadsheetCommitCheckpoint.Kind(kind)][key] = digest
+        return committed
+
+    @classmethod
+    def _check_unchanged(cls, committed: Dict[SpreadsheetCommitCheckpoint.Kind, Dict[str, str]],
+                         data: SaveSpreadsheetSchema, approved: List[PayerSchema]) -> None:
+        """
+        Recusa uma nova tentativa que muda algo já gravado por uma anterior:
+        credores e pagadores com checkpoint são pulados, então uma parcela ou
+        um acordo acrescentado a eles seria descartado sem aviso.
+        """
+        current = {
+            SpreadsheetCommitCheckpoint.Kind.CREDITOR: {
+                raw_creditor.name: cls._digest(raw_creditor)
+                for raw_creditor in data.creditors
+                if not raw_creditor.deleted and not raw_creditor.readonly
+            },
+            SpreadsheetCommitCheckpoint.Kind.PAYER: {raw_payer.user.cpf_cnpj: cls._digest(raw_payer) for raw_payer in approved},
+        }
+
+        changed = sorted(
+            key
+            for kind, digests in committed.items()
+            # Checkpoints sem hash vieram de antes da conferência e não são comparados
+            for key, digest in digests.items() if digest and current[kind].get(key) != digest
+        )
+        if changed:
+            listed = ', '.join(changed[:5]) + (f' e mais {len(changed) - 5}' if len(changed) > 5 else '')
+            raise HttpFriendlyException(
+                409,
+                f"Itens já gravados por uma tentativa anterior foram alterados ou removidos ({listed}). "
+                f"Envie os resultados como estavam ou processe a planilha novamente."
+            )
+
+    @classmethod
+    def _digest(cls, item: Union[CreditorSchema, PayerSchema]) -> str:
+        return hashlib.sha256(item.model_dump_json().encode()).hexdigest()
+
+    @classmethod
+    def _checkpoint(cls, job: Optional[SpreadsheetJob], kind: SpreadsheetCommitCheckpoint.Kind, digests: Dict[str, str]) -> None:
+        if job is None:
+            return
+
+        SpreadsheetCommitCheckpointRepository.bulk_create([
+            SpreadsheetCommitCheckpoint(job=job, kind=kind.value, key=key, digest=digest) for key, digest in digests.items()
+        ])
+
+    @classmethod
+    def _open_archive(cls, boletos_zip: Optional[Path]) -> ContextManager[Optional[ZipFile]]:
+        if boletos_zip is None or not boletos_zip.exists():
+            return nullcontext()
+        return ZipFile(boletos_zip)
+
+    @classmethod
+    def _approved_payers(cls, data: SaveSpreadsheetSchema) -> List[PayerSchema]:
+        approved = []
+        for raw_payer in data.payers:
+            if raw_payer.deleted:
+                continue
+
+            if not any(not a.deleted for a in raw_payer.agreements):
+                lgr.debug("Nenhum acordo válido para o pagador, pulando...")
+                continue
+
+            approved.append(raw_payer)
+        return approved
+
+    @classmethod
+    def _save_creditors(cls, data: SaveSpreadsheetSchema, committed: Dict[str, str]) -> Dict[str, str]:
+        """
+        Cria os credores novos que ainda não foram gravados por uma tentativa anterior.
+
+        Retorna:
+            - Dict[str, str]: Hash de cada credor criado, pelo nome.
+        """
+        new_creditors = {
+            raw_creditor.name: raw_creditor
+            for raw_creditor in data.creditors
+            if not raw_creditor.deleted and not raw_creditor.readonly and raw_creditor.name not in committed
+        }
+        CreditorRepository.bulk_create([
+            Creditor(name=raw_creditor.name, reissue_margin=raw_creditor.reissue_margin)
+            for raw_creditor in new_creditors.values()
+        ])
+        lgr.debug(f"{len(new_creditors)} credores criados")
+        return {name: cls._digest(raw_creditor) for name, raw_creditor in new_creditors.items()}
+
+    @classmethod
+    def _load_creditors(cls, payers: List[PayerSchema]) -> Dict[str, Creditor]:
+        # Credores só precisam ser buscados se algum acordo novo os usa
+        needed = {
+            raw_agree.creditor_name
+            for raw_payer in payers
+            for raw_agree in raw_payer.agreements
+            if not raw_agree.deleted and not raw_agree.readonly
+        }
+
+        creditors: Dict[str, Creditor] = {}
+        for qs in CreditorRepository.filter_in_batches('name', needed):
+            for creditor in qs.order_by('id'):
+                creditors.setdefault(creditor.name, creditor)
+        return creditors
+
+    @classmethod
+    def _save_payers(cls, payers: List[PayerSchema]) -> Dict[str, Payer]:
+        new_payers = {
+            re.sub(r"\D", "", raw_payer.user.cpf_cnpj): raw_payer
+            for raw_payer in payers if not raw_payer.readonly
+        }
+        existing_documents = {
+            raw_payer.user.cpf_cnpj for raw_payer in payers if raw_payer.readonly
+        }
+
+        for qs in UserRepository.filter_in_batches('cpf_cnpj', new_payers.keys()):
+            if qs.exists():
+                raise HttpFriendlyException(400, "Um usuário com esse CPF/CNPJ já existe!")
+
+        users = []
+        for document in new_payers:
+            user = User(cpf_cnpj=document, is_active=True)
+            user.set_unusable_password()
+            users.append(user)
+        UserRepository.bulk_create(users)
+
+        created = PayerRepository.bulk_create([
+            Payer(user=user, name=new_payers[user.cpf_cnpj].name, phone=new_payers[user.cpf_cnpj].phone)
+            for user in users
+        ])
+        lgr.debug(f"{len(created)} pagadores criados")
+
+        saved: Dict[str, Payer] = {}
+        for qs in PayerRepository.filter_in_batches('user__cpf_cnpj', existing_documents):
+            for payer in qs.select_related('user'):
+                saved[payer.user.cpf_cnpj] = payer
+
+        if missing := existing_documents - saved.keys():
+            lgr.error(f"Pagadores não encontrados: {', '.join(sorted(missing))}")
+            raise HttpFriendlyException(404, f"{Payer.READABLE_NAME} não encontrado")
+
+        for payer in created:
+            saved[new_payers[payer.user.cpf_cnpj].user.cpf_cnpj] = payer
+        return saved
+
+    @classmethod
+    def _save_agreements(cls, payers: List[PayerSchema], saved_payers: Dict[str, Payer], creditors: Dict[str, Creditor]) -> Dict[str, Agreement]:
+        new_agreements: List[Agreement] = []
+        existing_numbers: Set[str] = set()
+
+        for raw_payer in payers:
+            payer = saved_payers[raw_payer.user.cpf_cnpj]
+            for raw_agree in raw_payer.agreements:
+                if raw_agree.deleted:
+                    continue
+
+                if raw_agree.readonly:
+                    existing_numbers.add(raw_agree.number)
+                    continue
+
+                creditor = creditors.get(raw_agree.creditor_name)
+                if not creditor:
+                    raise HttpFriendlyException(
+                        404,
+                        f"Credor {raw_agree.creditor_name} não encontrado ao criar acordo {raw_agree.number}"
+                    )
+                new_agreements.append(Agreement(number=raw_agree.number, payer=payer, creditor=creditor))
+
+        AgreementRepository.bulk_create(new_agreements)
+        lgr.debug(f"{len(new_agreements)} acordos criados")
+
+        agreements: Dict[str, Agreement] = {}
+        for qs in AgreementRepository.filter_in_batches('number', existing_numbers):
+            for agreement in qs.select_related('creditor').order_by('id'):
+                agreements.setdefault(agreement.number, agreement)
+
+        if existing_numbers - agreements.keys():
+            raise HttpFriendlyException(404, f"{Agreement.READABLE_NAME} não encontrado")
+
+        agreements.update({agreement.number: agreement for agreement in new_agreements})
+        return agreements
+
+    @classmethod
+    def _save_installments(cls, payers: List[PayerSchema], agreements: Dict[str, Agreement]) -> Dict[Tuple[str, int], Installment]:
+        new_installments: List[Installment] = []
+        existing_keys: Set[Tuple[str, int]] = set()
+        due_dates: Dict[Tuple[str, int], date] = {}
+
+        for raw_payer in payers:
+            for raw_agree in raw_payer.agreements:
+                if raw_agree.deleted:
+                    continue
+
+                agreement = agreements[raw_agree.number]
+                for raw_install in raw_agree.installments:
+                    if raw_install.deleted:
+                        continue
+
+                    if raw_install.readonly:
+                        existing_keys.add((agreement.number, raw_install.number))
+                        due_dates[(agreement.number, raw_install.number)] = raw_install.due_date
+                        continue
+
+                    new_installments.append(Installment(
+                        number=str(raw_install.number),
+                        due_date=raw_install.due_date,
+                        agreement=agreement,
+                    ))
+
+        InstallmentRepository.bulk_create(new_installments)
+        lgr.debug(f"{len(new_installments)} parcelas criadas")
+
+        installments: Dict[Tuple[str, int], Installment] = {}
+        agreements_by_id = {agreement.id: agreement for agreement in agreements.values()}
+        agreement_ids = {agreements[number].id for number, _ in existing_keys}
+        for qs in InstallmentRepository.filter_in_batches('agreement_id', agreement_ids):
+            for installment in qs:
+                installment.agreement = agreements_by_id[installment.agreement_id]
+                key = (installment.agreement.number, int(installment.number))
+                if key in existing_keys:
+                    installments.setdefault(key, installment)
+
+        if existing_keys - installments.keys():
+            raise HttpFriendlyException(404, f"{Installment.READABLE_NAME} não encontrada")
+
+        # Parcelas já existentes só voltam no resultado com boleto novo ou com
+        # o vencimento alterado na planilha
+        rescheduled: List[Installment] = []
+        for key, installment in installments.items():
+            if installment.due_date != due_dates[key]:
+                installment.due_date = due_dates[key]
+                installment.updated_at = timezone.now()
+                rescheduled.append(installment)
+        InstallmentRepository.bulk_update(rescheduled, ['due_date', 'updated_at'])
+        lgr.debug(f"{len(rescheduled)} vencimentos de parcelas atualizados")
+
+        installments.update({
+            (installment.agreement.number, int(installment.number)): installment
+            for installment in new_installments
+        })
+        return installments
+
+    @classmethod
+    def _save_boletos(cls, payers: List[PayerSchema], installments: Dict[Tuple[str, int], Installment], archive: Optional[ZipFile], saved_files: List[str]) -> None:
+        pending: List[Tuple[Installment, BoletoSchema]] = [
+            (installments[(raw_agree.number, raw_install.number)], raw_install.boleto)
+            for raw_payer in payers
+            for raw_agree in raw_payer.agreements if not raw_agree.deleted
+            for raw_install in raw_agree.installments
+            # O boleto já gravado só acompanha a parcela cujo vencimento mudou
+            if not raw_install.deleted and raw_install.boleto and not raw_install.boleto.readonly
+        ]
+
+        members = set(archive.namelist()) if archive else set()
+        uploads: List[Tuple[str, BoletoSource]] = []
+        for installment, boleto in pending:
+            agreement: Agreement = installment.agreement
+            if boleto.path in members:
+                # O PDF vai direto do ZIP para o storage, sem passar pelo disco
+                source: BoletoSource = partial(archive.open, boleto.path)  # type: ignore[union-attr]
+            else:
+                boleto_path = Path(boleto.path)
+                if not boleto_path.exists() or not boleto_path.is_file():
+                    lgr.error(f"Arquivo do boleto não encontrado: {boleto_path} (acordo={agreement.number} parcela={installment.number})")
+                    raise HttpFriendlyException(404, f"Arquivo do boleto não encontrado: {boleto_path}")
+                source = partial(open, boleto_path, 'rb')
+
+            uploads.append((
+                BoletoController.boleto_pdf_path(agreement.creditor.slug_name, agreement.slug_name, installment.slug_name),
+                source,
+            ))
+
+        # Os registros só são criados depois que todos os PDFs chegaram ao storage
+        if BOLETO_CONTENT_ADDRESSED:
+            blobs = StoredBlobController.store_many([source for _, source in uploads], saved_files)
+            boletos = [
+                Boleto(pdf=blob.path, blob=blob, installment=installment, status=Boleto.Status.PENDING.value)
+                for blob, (installment, _) in zip(blobs, pending)
+            ]
+        else:
+            paths = BoletoUploader().upload(uploads)
+            saved_files.extend(paths)
+            boletos = [
+                Boleto(pdf=path, installment=installment, status=Boleto.Status.PENDING.value)
+                for path, (installment, _) in zip(paths, pending)
+            ]
+        # Assim como BoletoController.create, um boleto novo substitui o anterior da parcela.
+        # A remoção vem depois do envio para que um PDF idêntico ao anterior reaproveite o arquivo
+        replaced_ids = [installment.id for installment, _ in pending if installment.id]
+        for qs in BoletoRepository.filter_in_batches('installment_id', replaced_ids):
+            qs.delete()
+
+        BoletoRepository.bulk_create(boletos)
+        lgr.debug(f"{len(boletos)} boletos criados")
+
+    @classmethod
+    def _discard_files(cls, paths: List[str]) -> None:
+        # Um PDF endereçado pelo conteúdo pode ser o mesmo arquivo de um blob
+        # gravado por outra importação; esses ficam
+        StoredBlobController.discard(paths)
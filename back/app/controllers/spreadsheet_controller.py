@@ -1,55 +1,50 @@
-from datetime import date, datetime
-from enum import Enum
+from datetime import date
 from io import TextIOWrapper
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from traceback import format_exc
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from typing_extensions import TypedDict
 from uuid import UUID
+from zipfile import ZipFile
 import csv
 import logging
-import os
 import re
 import shutil
 
-from app.controllers.boleto_controller import BoletoController
-from app.controllers.creditor_controller import CreditorController
-from app.controllers.payer_controller import PayerController
-from app.controllers.agreement_controller import AgreementController
-from app.controllers.installment_controller import InstallmentController
+from app.controllers.import_ledger_controller import ImportLedgerController, LedgerKey, LedgerRecord
+from app.controllers.spreadsheet_commit_controller import SpreadsheetCommitController
+from app.controllers.spreadsheet_staging_controller import SpreadsheetStagingController, StagedRow
 from app.dtos import AgreementDTO, BoletoDTO, CreditorDTO, InstallmentDTO, PayerDTO, SpreadsheetDTO, UserDTO
 from app.exceptions import HttpFriendlyException, InvalidCsvDelimiterException
-from app.models import Agreement, Boleto, Creditor, Installment, Payer
-from app.schemas.agreement_schemas import AgreementInSchema
-from app.schemas.boleto_schemas import BoletoInSchema
-from app.schemas.creditor_schemas import CreditorInSchema
-from app.schemas.installment_schemas import InstallmentInSchema
-from app.schemas.payer_schemas import PayerInSchema
-from app.schemas.spreadsheet_schemas import AgreementSchema, BoletoSchema, InstallmentSchema, SaveSpreadsheetSchema
-from app.controllers.boleto_controller import BoletoController
+from app.models import SpreadsheetJob
+from app.repositories.agreement_repository import AgreementRepository
+from app.repositories.creditor_repository import CreditorRepository
+from app.repositories.installment_repository import InstallmentRepository
+from app.repositories.payer_repository import PayerRepository
+from app.repositories.spreadsheet_job_repository import SpreadsheetJobRepository
+from app.schemas.spreadsheet_schemas import SaveSpreadsheetSchema
+from app.spreadsheet_normalizer import (
+    NormalizedRow, RowData, normalize_rows, only_digits, parse_due_date, parse_installment_number
+)
+from app.spreadsheet_parallel import iter_parallel
+from app.spreadsheet_progress import SpreadsheetProgress
+from app.utils import chunked
+from config import (
+    SPREADSHEET_CHUNK_SIZE, SPREADSHEET_DIFF_ENGINE, SPREADSHEET_PARALLEL_MIN_BYTES, SPREADSHEET_PARSE_WORKERS, SQL_DIFF_ENGINE
+)
 from core.settings import MEDIA_ROOT
 
 
 lgr = logging.getLogger(__name__)
 
 
-class ColumnOrder(Enum):
-    DUE_DATE = 0
-    CONTRACT = 1
-    CUSTOMER = 2
-    CREDITOR = 3
-    CPF_CNPJ = 4
-    INSTALL_NUM = 5
-    VALUE = 6
-    PAYMENT_DATE = 7
-    PAYMENT_VALUE = 8
-    INSTALLMENTS_QTY = 9
-
-
 class BoletoPdf(TypedDict):
-    filepath: str
+    # Nome do arquivo dentro do ZIP de boletos enviado
+    member: str
     agreement: str
     installment: int
+    # CRC32 do PDF, lido do diretório central do ZIP
+    crc: int
 
 
 class Cache(TypedDict):
@@ -59,49 +54,124 @@ class Cache(TypedDict):
     installments: Dict[Tuple[str, int], InstallmentDTO]
 
 
-class RowData(TypedDict):
-    creditor_name: str
-    payer_name: str
-    cpf_cnpj: str
-    phone: str
-    agreement_num: str
-    installment_num: int
-    due_date_str: str
+class SpreadsheetController:
 
+    @classmethod
+    def operation_path(cls, operation_uuid: UUID | str) -> Path:
+        """
+        Retorna a pasta, dentro de MEDIA_ROOT, onde ficam os arquivos de uma operação.
+        """
+        return Path(MEDIA_ROOT) / str(operation_uuid)
 
-class SpreadsheetController:
+    @classmethod
+    def operation_paths(cls) -> Iterator[Tuple[UUID, Path]]:
+        """
+        Percorre as pastas de operações existentes dentro de MEDIA_ROOT. As
+        demais pastas (boletos, blobs) não têm um UUID como nome e são ignoradas.
+        """
+        media_root = Path(MEDIA_ROOT)
+        if not media_root.is_dir():
+            return
+
+        for path in media_root.iterdir():
+            if not path.is_dir():
+                continue
+            try:
+                operation_uuid = UUID(path.name)
+            except ValueError:
+                continue
+            if str(operation_uuid) == path.name:
+                yield operation_uuid, path
 
     @classmethod
-    def process_spreadsheet(cls, operation_uuid: UUID) -> SpreadsheetDTO:
+    def boletos_zip_path(cls, operation_uuid: UUID | str) -> Path:
+        """
+        Retorna o caminho do ZIP de boletos enviado para uma operação.
+        """
+        return cls.operation_path(operation_uuid) / "boletos.zip"
+
+    @classmethod
+    def process_spreadsheet(cls, operation_uuid: UUID, progress: Optional[SpreadsheetProgress] = None) -> SpreadsheetDTO:
+        """
+        Lê a planilha e o ZIP de boletos da operação e monta o grafo do que
+        ainda não está no banco.
+
+        Parâmetros:
+            - operation_uuid: Operação cujos arquivos serão processados.
+            - progress: Recebe os contadores e o tempo de cada etapa; é
+              publicado ao fim de cada bloco de linhas.
+
+        Retorna:
+            - SpreadsheetDTO: Pagadores, credores, erros e avisos encontrados.
+        """
+        if progress is None:
+            progress = SpreadsheetProgress()
+
         result_data = SpreadsheetDTO(**{
             "payers": [], "errors": [], "warnings": []
         })
 
         try:
-            spreadsheet_path = Path(MEDIA_ROOT) / f"{operation_uuid}/spreadsheet.csv"
+            spreadsheet_path = cls.operation_path(operation_uuid) / "spreadsheet.csv"
 
             if not spreadsheet_path.exists():
                 result_data.errors.append(f"Planilha não encontrada: {spreadsheet_path}")
                 return result_data
 
-            boletos_pdfs = cls._read_boletos(operation_uuid)
+            with progress.stage("boletos"):
+                boletos_pdfs = cls._read_boletos(operation_uuid)
+            process_cache = cls._empty_cache()
+            ledger_pending: Dict[LedgerKey, LedgerRecord] = {}
 
             with open(spreadsheet_path, "r", encoding="latin-1") as file:
                 delimiter = cls._determine_csv_delimiter(file)
-                reader = csv.reader(file, delimiter=delimiter)
-                next(reader)
-                rows = list(reader)
-
-            process_cache = cls._build_cache(rows)
 
-            for line_num, row in enumerate(rows, start=2):
-                lgr.debug("Processando linha %d: %s", line_num, row)
-                try:
-                    cls._process_line(row, boletos_pdfs, result_data, line_num, process_cache)
-                except Exception as e:
-                    error_msg = f"Erro na linha {line_num}: {str(e)}"
-                    lgr.error(error_msg)
-                    result_data.errors.append(error_msg)
+                # A planilha é lida em blocos para que o consumo de memória não
+                # dependa do tamanho do arquivo: cada bloco pré-carrega apenas
+                # o que ainda não está no cache e é descartado após processado
+                chunks = cls._iter_chunks(spreadsheet_path, file, delimiter)
+                while True:
+                    with progress.stage("parse"):
+                        rows: Optional[List[NormalizedRow]] = next(chunks, None)
+                        if rows is None:
+                            break
+                    progress.add(rows_parsed=len(rows))
+
+                    # Linhas iguais às da última importação aprovada já estão no
+                    # banco como na planilha e saem antes de montar o cache
+                    with progress.stage("ledger"):
+                        ledger = ImportLedgerController.load(row.data["agreement_num"] for row in rows if row.data)
+                        changed: List[Tuple[NormalizedRow, Optional[LedgerRecord], Optional[LedgerRecord]]] = []
+                        for row in rows:
+                            if row.data is None:
+                                changed.append((row, None, None))
+                                continue
+
+                            key = (row.data["agreement_num"], row.data["installment_num"])
+                            boleto_pdf = boletos_pdfs.get(row.data["agreement_num"], {}).get(row.data["installment_num"])
+                            record = LedgerRecord(ImportLedgerController.fingerprint(row.data), boleto_pdf["crc"]) if boleto_pdf else None
+                            previous = ledger.get(key)
+                            if record is not None and record == previous:
+                                result_data.unchanged_rows += 1
+                                progress.add(rows_unchanged=1, rows_resolved=1, boletos_matched=1)
+                                continue
+                            changed.append((row, record, previous))
+
+                    with progress.stage("cache"):
+                        if SPREADSHEET_DIFF_ENGINE == SQL_DIFF_ENGINE:
+                            changed = cls._skip_settled_rows(operation_uuid, changed, process_cache, ledger_pending, progress)
+                        else:
+                            cls._build_cache([row.data for row, _, _ in changed if row.data], process_cache)
+
+                    with progress.stage("resolve"):
+                        cls._resolve_rows(changed, boletos_pdfs, result_data, process_cache, ledger_pending, progress)
+
+                    progress.counters["errors"] = len(result_data.errors)
+                    progress.publish()
+
+            ImportLedgerController.write_pending(cls.operation_path(operation_uuid), ledger_pending)
+            if result_data.unchanged_rows:
+                lgr.info(f"{result_data.unchanged_rows} linhas sem mudanças desde a última importação foram puladas")
 
         except HttpFriendlyException as hfe:
             error_msg = f"Erro ao processar planilha: {hfe.message}"
@@ -112,49 +182,164 @@ class SpreadsheetController:
             lgr.error(error_msg)
             result_data.errors.append(error_msg)
 
+        progress.counters["errors"] = len(result_data.errors)
         result_data.payers = sorted(result_data.payers, key=lambda x: x.name)
         return result_data
 
     @classmethod
-    def _build_cache(cls, rows: List[List[str]]) -> Cache:
+    def _resolve_rows(cls, changed: List[Tuple[NormalizedRow, Optional[LedgerRecord], Optional[LedgerRecord]]],
+                      boletos_pdfs: Dict[str, Dict[int, BoletoPdf]], result_data: SpreadsheetDTO, process_cache: Cache,
+                      ledger_pending: Dict[LedgerKey, LedgerRecord], progress: SpreadsheetProgress) -> None:
+        """
+        Resolve contra o cache as linhas de um bloco que não foram puladas pelo
+        registro de importações.
+        """
+        for row, record, previous in changed:
+            if row.data is None:
+                lgr.error(row.error)
+                result_data.errors.append(row.error)
+                continue
+
+            lgr.debug("Processando linha %d: %s", row.line_num, row.data)
+            errors = len(result_data.errors)
+            settled = False
+            try:
+                settled = cls._process_line(
+                    row.data, boletos_pdfs, result_data, row.line_num, process_cache,
+                    replace_boleto=cls._replaces_boleto(record, previous),
+                )
+            except Exception as e:
+                error_msg = f"Erro na linha {row.line_num}: {str(e)}"
+                lgr.error(error_msg)
+                result_data.errors.append(error_msg)
+
+            progress.add(rows_resolved=int(len(result_data.errors) == errors), boletos_matched=int(record is not None))
+
+            # Só entra no registro a linha que, uma vez aprovada, deixa o banco
+            # igual à planilha: com boleto no ZIP e sem erro pendente
+            if record is not None and settled and len(result_data.errors) == errors:
+                ledger_pending[(row.data["agreement_num"], row.data["installment_num"])] = record
+
+    @staticmethod
+    def _replaces_boleto(record: Optional[LedgerRecord], previous: Optional[LedgerRecord]) -> bool:
+        # O PDF do ZIP mudou desde a última importação aprovada da linha
+        return previous is not None and record is not None and previous.boleto_crc != record.boleto_crc
+
+    @classmethod
+    def _skip_settled_rows(cls, operation_uuid: UUID, changed: List[Tuple[NormalizedRow, Optional[LedgerRecord], Optional[LedgerRecord]]],
+                           process_cache: Cache, ledger_pending: Dict[LedgerKey, LedgerRecord],
+                           progress: SpreadsheetProgress) -> List[Tuple[NormalizedRow, Optional[LedgerRecord], Optional[LedgerRecord]]]:
+        """
+        Alternativa a `_build_cache` que deixa o banco calcular a diferença do
+        bloco (ver SpreadsheetStagingController). As linhas já resolvidas no
+        banco saem do bloco como se tivessem sido processadas; o cache recebe
+        só as entidades que as demais linhas referenciam.
+
+        Retorna:
+            - List: As linhas do bloco que ainda precisam ser resolvidas.
+        """
+        diff = SpreadsheetStagingController.diff(operation_uuid, (
+            StagedRow(row.line_num, row.data, record is not None, cls._replaces_boleto(record, previous))
+            for row, record, previous in changed if row.data
+        ))
+
+        # Entidades já no cache podem ter sido alteradas por blocos anteriores
+        for payer in diff.payers:
+            process_cache["payers"].setdefault(payer.user.cpf_cnpj, payer)
+        for creditor in diff.creditors:
+            process_cache["creditors"].setdefault(creditor.name, creditor)
+        for agreement in diff.agreements:
+            process_cache["agreements"].setdefault(agreement.number, agreement)
+        for installment in diff.installments:
+            process_cache["installments"].setdefault((installment.agreement_num, installment.number), installment)
+
+        remaining = []
+        for row, record, previous in changed:
+            if row.data is None or row.line_num not in diff.settled:
+                remaining.append((row, record, previous))
+                continue
+
+            progress.add(rows_resolved=1, boletos_matched=1)
+            ledger_pending[(row.data["agreement_num"], row.data["installment_num"])] = record
+        return remaining
+
+    @classmethod
+    def _iter_chunks(cls, spreadsheet_path: Path, file: TextIOWrapper, delimiter: str) -> Iterator[List[NormalizedRow]]:
+        """
+        Lê a planilha em blocos de registros normalizados.
+
+        Com SPREADSHEET_PARSE_WORKERS maior que 1, planilhas a partir de
+        SPREADSHEET_PARALLEL_MIN_BYTES são lidas em vários processos; nas
+        menores, subir os processos custa mais do que a leitura.
+        """
+        if SPREADSHEET_PARSE_WORKERS > 1 and spreadsheet_path.stat().st_size >= SPREADSHEET_PARALLEL_MIN_BYTES:
+            lgr.info(f"Lendo a planilha {spreadsheet_path} em {SPREADSHEET_PARSE_WORKERS} processos")
+            return iter_parallel(spreadsheet_path, delimiter, SPREADSHEET_PARSE_WORKERS, SPREADSHEET_CHUNK_SIZE)
+
+        return (normalize_rows(chunk) for chunk in chunked(cls._iter_rows(file, delimiter), SPREADSHEET_CHUNK_SIZE))
+
+    @classmethod
+    def _iter_rows(cls, file: TextIOWrapper, delimiter: str) -> Iterator[Tuple[int, List[str]]]:
+        """
+        Percorre a planilha linha a linha, pulando o cabeçalho.
+
+        Retorna:
+            - Iterator[Tuple[int, List[str]]]: Número da linha no arquivo e seus campos.
+        """
+        reader = csv.reader(file, delimiter=delimiter)
+        next(reader, None)
+        yield from enumerate(reader, start=2)
+
+    @staticmethod
+    def _empty_cache() -> Cache:
+        return {"payers": {}, "creditors": {}, "agreements": {}, "installments": {}}
+
+    @classmethod
+    def _build_cache(cls, rows: Iterable[RowData], cache: Optional[Cache] = None) -> Cache:
         """
-        Pré-carrega todos os dados relevantes do banco em 4 queries,
-        evitando N queries dentro do loop de processamento.
+        Pré-carrega do banco, em 4 queries por lote de chaves, os dados
+        referenciados pelas linhas fornecidas, evitando N queries dentro do
+        loop de processamento.
+
+        Quando um cache já existente é passado, ele é complementado: chaves
+        que já foram carregadas (ou criadas) por blocos anteriores não são
+        buscadas novamente.
         """
-        required_cols = max(m.value for m in ColumnOrder) + 1
+        if cache is None:
+            cache = cls._empty_cache()
+
         agreement_numbers = set()
         cpf_cnpjs = set()
         creditor_names = set()
 
         for row in rows:
-            if len(row) < required_cols:
-                continue
-            agreement_numbers.add(cls._sanitize_agreement_number(row[ColumnOrder.CONTRACT.value]))
-            cpf_cnpjs.add(cls._sanitize_cpf_cnpj(row[ColumnOrder.CPF_CNPJ.value]))
-            creditor_names.add(row[ColumnOrder.CREDITOR.value].strip())
+            agreement_numbers.add(row["agreement_num"])
+            cpf_cnpjs.add(row["cpf_cnpj"])
+            creditor_names.add(row["creditor_name"])
+
+        agreement_numbers.difference_update(cache["agreements"])
+        cpf_cnpjs.difference_update(cache["payers"])
+        creditor_names.difference_update(cache["creditors"])
 
         lgr.debug("Pré-carregando cache: %d acordos, %d CPF/CNPJs, %d credores", len(agreement_numbers), len(cpf_cnpjs), len(creditor_names))
 
-        cache: Cache = {
-            "payers": {
-                p.user.cpf_cnpj: PayerDTO.from_database(p)
-                for p in PayerController.filter(user__cpf_cnpj__in=cpf_cnpjs)
-            },
-            "creditors": {
-                c.name: CreditorDTO.from_database(c)
-                for c in CreditorController.filter(name__in=creditor_names)
-            },
-            "agreements": {
-                a.number: AgreementDTO.from_database(a)
-                for a in AgreementController.filter(number__in=agreement_numbers)
-            },
-            "installments": {
-                (i.agreement.number, int(i.number)): InstallmentDTO.from_database(i)
-                for i in InstallmentController.filter(
-                    agreement__number__in=agreement_numbers
-                ).select_related('agreement', 'boleto')
-            },
-        }
+        # Cada busca usa `.values()` com os joins necessários e é dividida em lotes
+        # que respeitam o limite de parâmetros do banco
+        for qs in PayerRepository.filter_in_batches('user__cpf_cnpj', cpf_cnpjs):
+            for row in qs.values(*PayerDTO.VALUES_FIELDS):
+                cache["payers"][row['user__cpf_cnpj']] = PayerDTO.from_values(row)
+
+        for qs in CreditorRepository.filter_in_batches('name', creditor_names):
+            for creditor in qs:
+                cache["creditors"][creditor.name] = CreditorDTO.from_database(creditor)
+
+        for qs in AgreementRepository.filter_in_batches('number', agreement_numbers):
+            for row in qs.values(*AgreementDTO.VALUES_FIELDS):
+                cache["agreements"][row['number']] = AgreementDTO.from_values(row)
+
+        for qs in InstallmentRepository.filter_in_batches('agreement__number', agreement_numbers):
+            for row in qs.values(*InstallmentDTO.VALUES_FIELDS):
+                cache["installments"][(row['agreement__number'], int(row['number']))] = InstallmentDTO.from_values(row)
 
         lgr.debug(
             "Cache pré-carregado: %d pagadores, %d credores, %d acordos, %d parcelas",
@@ -165,39 +350,30 @@ class SpreadsheetController:
 
     @classmethod
     def save_results_to_database(cls, job_id: str, data: SaveSpreadsheetSchema) -> None:
-        new_creditors: Dict[str, Creditor] = {}
-        for raw_creditor in data.creditors:
-            if raw_creditor.deleted:
-                continue
-            creditor_schema = CreditorInSchema(**raw_creditor.model_dump())
-            new_creditors[raw_creditor.name] = CreditorController.create(creditor_schema)
-
-        for raw_payer in data.payers:
-            if raw_payer.deleted:
-                continue
-
-            if list(filter(lambda a: not a.deleted, raw_payer.agreements)) == []:
-                lgr.debug("Nenhum acordo válido para o pagador, pulando...")
-                continue
-
-            if not raw_payer.readonly:
-                lgr.debug(f"Criando pagador {raw_payer.user.cpf_cnpj}")
-                payer_schema: PayerInSchema = PayerInSchema(
-                    **raw_payer.model_dump(),
-                    cpf_cnpj=raw_payer.user.cpf_cnpj
-                )
-                saved_payer = PayerController.create(payer_schema)
-            else:
-                lgr.debug(f"Buscando pagador {raw_payer.user.cpf_cnpj} existente")
-                saved_payer = PayerController.get(silent=False, user__cpf_cnpj=raw_payer.user.cpf_cnpj)
-
-            cls._save_agreements(saved_payer, new_creditors, raw_payer.agreements)
-        
+        """
+        Grava no banco os resultados aprovados. Se a gravação falhar, os
+        arquivos da operação continuam no lugar e uma nova chamada retoma a
+        partir do último lote confirmado.
+        """
+        SpreadsheetCommitController.commit(data, cls.boletos_zip_path(job_id), cls._find_job(job_id))
+        try:
+            ImportLedgerController.record_pending(cls.operation_path(job_id))
+        except Exception as e:
+            # A importação já foi gravada; sem o registro, a próxima só não pula essas linhas
+            lgr.error(f"Erro ao atualizar o registro de importações: {str(e)}")
         cls._cleanup_operation_files(job_id)
 
+    @classmethod
+    def _find_job(cls, job_id: str) -> Optional[SpreadsheetJob]:
+        try:
+            job_uuid = UUID(str(job_id))
+        except ValueError:
+            return None
+        return SpreadsheetJobRepository.get(uuid=job_uuid, silent=True)
+
     @classmethod
     def _cleanup_operation_files(cls, operation_uuid: str) -> None:
-        operation_path = Path(MEDIA_ROOT) / str(operation_uuid)
+        operation_path = cls.operation_path(operation_uuid)
         if operation_path.exists():
             shutil.rmtree(operation_path)
             lgr.info(f"Arquivos temporários removidos: {operation_path}")
@@ -220,35 +396,19 @@ class SpreadsheetController:
             raise InvalidCsvDelimiterException()
 
     @classmethod
-    def _process_line(cls, row: List[str], boletos: Dict[str, Dict[int, BoletoPdf]], result: SpreadsheetDTO, line_num: int, cache: Cache) -> None:
+    def _process_line(cls, row_data: RowData, boletos: Dict[str, Dict[int, BoletoPdf]], result: SpreadsheetDTO, line_num: int, cache: Cache,
+                      replace_boleto: bool = False) -> bool:
+        """
+        Resolve a linha contra o cache e acrescenta ao resultado o que ela traz
+        de novo. Com `replace_boleto`, o PDF do ZIP substitui o boleto que a
+        parcela já tem (o registro de importações indicou que o PDF mudou).
+        Um vencimento diferente do gravado entra no resultado e é aplicado à
+        parcela na aprovação.
+
+        Retorna:
+            - bool: Se a linha, uma vez aprovada, deixa o banco igual à planilha.
+        """
         try:
-            required_cols = max(m.value for m in ColumnOrder) + 1
-            if len(row) < required_cols:
-                missing_cols = [m.name for m in ColumnOrder if m.value >= len(row)]
-                msg = (
-                    f"Linha {line_num} possui colunas insuficientes: esperado {required_cols}, "
-                    f"encontrado {len(row)}; colunas faltando: {', '.join(missing_cols)}"
-                )
-                lgr.error(msg)
-                result.errors.append(msg)
-                return
-
-            document = cls._sanitize_cpf_cnpj(row[ColumnOrder.CPF_CNPJ.value])
-            row_data: RowData = {
-                "creditor_name": row[ColumnOrder.CREDITOR.value].strip(),
-                "payer_name": row[ColumnOrder.CUSTOMER.value].strip(),
-                "cpf_cnpj": document,
-                "phone": document[:11],
-                "agreement_num": cls._sanitize_agreement_number(row[ColumnOrder.CONTRACT.value]),
-                "installment_num": cls._extract_installment_number(row[ColumnOrder.INSTALL_NUM.value].strip()),
-                "due_date_str": row[ColumnOrder.DUE_DATE.value].strip(),
-            }
-
-            empties = any(v is None or (isinstance(v, str) and v.strip() == "") for v in row_data.values())
-            if empties:
-                result.errors.append(f"Linha {line_num} possui campos obrigatórios em branco ou apenas espaços")
-                return
-
             payer, is_new = cls._get_payer_from_line(cache, row_data)
             if is_new:
                 result.add_node(payer)
@@ -262,38 +422,48 @@ class SpreadsheetController:
                 result.add_node(payer, agreement)
 
             installment, is_new_installment = cls._get_installment_from_line(cache, row_data)
+            if not is_new_installment and row_data['due_date'] and installment.due_date != row_data['due_date']:
+                result.add_warning(
+                    f"Linha {line_num}: Vencimento da parcela {installment.number} do acordo {agreement.number} "
+                    f"mudou de {installment.due_date:%d/%m/%Y} para {row_data['due_date']:%d/%m/%Y}", payer
+                )
+                installment.due_date = row_data['due_date']
+                result.add_node(payer, agreement, installment)
 
             agreement_key = cls._sanitize_agreement_number(str(agreement.number))
             agreement_installments = boletos.get(agreement_key, {})
             if not agreement_installments:
-                result.warnings.append(
-                    f"Linha {line_num}: Acordo {agreement.number} não possui boletos no ZIP"
+                result.add_warning(
+                    f"Linha {line_num}: Acordo {agreement.number} não possui boletos no ZIP", payer
                 )
+                return False
             else:
                 boleto_data = agreement_installments.get(installment.number)
                 if not boleto_data:
-                    result.warnings.append(
-                        f"Linha {line_num}: Parcela {installment.number} do acordo {agreement.number} não possui boleto no ZIP"
+                    result.add_warning(
+                        f"Linha {line_num}: Parcela {installment.number} do acordo {agreement.number} não possui boleto no ZIP", payer
                     )
-                    lgr.debug(f"Parcela {installment.number} do acordo {agreement.number} não possui boleto no ZIP")
-                    return
+                    lgr.debug("Parcela %s do acordo %s não possui boleto no ZIP", installment.number, agreement.number)
+                    return False
 
-                if is_new_installment or not installment.boleto:
-                    boleto = BoletoDTO(path=boleto_data["filepath"])
+                if is_new_installment or not installment.boleto or replace_boleto:
+                    boleto = BoletoDTO(path=boleto_data["member"])
                     installment.boleto = boleto
                     result.add_node(payer, agreement, installment)
                     result.add_creditor(creditor)
+                return True
 
         except Exception as e:
             error_msg = f"Erro ao processar linha {line_num}: {str(e)}"
             lgr.exception(format_exc())
             result.errors.append(error_msg)
+            return False
 
     @classmethod
     def _get_payer_from_line(cls, cache: Cache, row_data: RowData) -> Tuple[PayerDTO, bool]:
         document = row_data['cpf_cnpj']
         if document in cache['payers']:
-            lgr.debug(f"Usando pagador em cache para CPF/CNPJ {document}")
+            lgr.debug("Usando pagador em cache para CPF/CNPJ %s", document)
             return cache['payers'][document], False
 
         is_new = True
@@ -304,26 +474,26 @@ class SpreadsheetController:
             agreements=[]
         )
         cache['payers'][document] = payer
-        lgr.debug(f"Pagador não encontrado no banco para CPF/CNPJ {document}, criando novo DTO")
+        lgr.debug("Pagador não encontrado no banco para CPF/CNPJ %s, criando novo DTO", document)
         return payer, is_new
 
     @classmethod
     def _get_creditor_from_line(cls, cache: Cache, row_data: RowData) -> Tuple[CreditorDTO, bool]:
         name = row_data['creditor_name']
         if name in cache['creditors']:
-            lgr.debug(f"Usando credor em cache para nome {name}")
+            lgr.debug("Usando credor em cache para nome %s", name)
             return cache['creditors'][name], False
 
         creditor = CreditorDTO(name=name, reissue_margin=0)
         cache['creditors'][name] = creditor
-        lgr.debug(f"Credor não encontrado no banco para nome {name}, criando novo DTO")
+        lgr.debug("Credor não encontrado no banco para nome %s, criando novo DTO", name)
         return creditor, True
 
     @classmethod
     def _get_agreement_from_line(cls, cache: Cache, row_data: RowData) -> Tuple[AgreementDTO, bool]:
         number = row_data['agreement_num']
         if number in cache["agreements"]:
-            lgr.debug(f"Usando acordo em cache para número {number}")
+            lgr.debug("Usando acordo em cache para número %s", number)
             return cache["agreements"][number], False
 
         agreement = AgreementDTO(
@@ -333,7 +503,7 @@ class SpreadsheetController:
             installments=[]
         )
         cache["agreements"][number] = agreement
-        lgr.debug(f"Acordo não encontrado no banco para número {number}, criando novo DTO")
+        lgr.debug("Acordo não encontrado no banco para número %s, criando novo DTO", number)
         return agreement, True
 
     @classmethod
@@ -344,139 +514,73 @@ class SpreadsheetController:
 
         if key in cache["installments"]:
             installment = cache["installments"][key]
-            lgr.debug(f"[CACHE HIT] acordo={agreement_num} parcela={installment_num} boleto={installment.boleto} readonly={installment.readonly}")
+            lgr.debug("[CACHE HIT] acordo=%s parcela=%s boleto=%s readonly=%s", agreement_num, installment_num, installment.boleto, installment.readonly)
             return installment, False
 
-        lgr.debug(f"[CACHE MISS] acordo={agreement_num} parcela={installment_num} | primeiras chaves: {list(cache['installments'].keys())[:3]}")
+        lgr.debug("[CACHE MISS] acordo=%s parcela=%s", agreement_num, installment_num)
+
+        due_date = row_data['due_date']
+        if due_date is None:
+            # Repete o parse só para levantar o erro com a mensagem original
+            due_date = cls._parse_due_date(row_data['due_date_str'])
 
         installment = InstallmentDTO(
             number=installment_num,
             agreement_num=agreement_num,
-            due_date=cls._parse_due_date(row_data['due_date_str'])
+            due_date=due_date
         )
         cache["installments"][key] = installment
         return installment, True
 
     @classmethod
     def _read_boletos(cls, operation_uuid: UUID) -> Dict[str, Dict[int, BoletoPdf]]:
-        boletos_path = Path(MEDIA_ROOT) / f"{operation_uuid}/boletos"
+        """
+        Monta o índice de boletos a partir do diretório central do ZIP, sem
+        extrair nada para o disco. Os PDFs só são lidos do arquivo quando o
+        administrador aprova a importação.
+        """
+        boletos_zip = cls.boletos_zip_path(operation_uuid)
 
-        if not boletos_path.exists():
-            lgr.warning(f"Diretório de boletos não encontrado: {boletos_path}")
+        if not boletos_zip.exists():
+            lgr.warning(f"ZIP de boletos não encontrado: {boletos_zip}")
             return {}
 
         data: Dict[str, Dict[int, BoletoPdf]] = {}
-        for bol in os.listdir(boletos_path):
-            match = re.match(r'(.*) PARC (\d+).*', bol)
-            if match:
-                agreement = cls._sanitize_agreement_number(match.group(1))
-                installment = int(match.group(2))
-                if agreement not in data:
-                    data[agreement] = {}
-                data[agreement][installment] = {
-                    "filepath": str(boletos_path / bol),
-                    "agreement": agreement,
-                    "installment": installment
-                }
-            else:
-                lgr.warning(f"Não foi possível extrair dados do arquivo: {bol}")
+        with ZipFile(boletos_zip) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+
+                bol = PurePosixPath(info.filename).name
+                match = re.match(r'(.*) PARC (\d+).*', bol)
+                if match:
+                    agreement = cls._sanitize_agreement_number(match.group(1))
+                    installment = int(match.group(2))
+                    if agreement not in data:
+                        data[agreement] = {}
+                    data[agreement][installment] = {
+                        "member": info.filename,
+                        "agreement": agreement,
+                        "installment": installment,
+                        "crc": info.CRC,
+                    }
+                else:
+                    lgr.warning(f"Não foi possível extrair dados do arquivo: {bol}")
 
         return data
 
     @staticmethod
     def _sanitize_agreement_number(raw_agr: str) -> str:
-        return re.sub(r'\D', '', raw_agr)
+        return only_digits(raw_agr)
 
     @staticmethod
     def _sanitize_cpf_cnpj(cpf_cnpj: str) -> str:
-        return re.sub(r'\D', '', cpf_cnpj)
+        return only_digits(cpf_cnpj)
 
     @staticmethod
     def _extract_installment_number(installment_str: str) -> int:
-        if '/' in installment_str:
-            return int(installment_str.split('/')[0])
-        return int(installment_str)
+        return parse_installment_number(installment_str)
 
     @staticmethod
     def _parse_due_date(due_date_str: str) -> date:
-        parts = due_date_str.split('/')
-        if len(parts) != 3:
-            raise ValueError(f"Formato de data inválido: {due_date_str}")
-        day, month, year = parts
-        return datetime(int(year), int(month), int(day)).date()
-
-    @classmethod
-    def _save_agreements(cls, payer: Payer, new_creditors: Dict[str, Creditor], raw_agreements: List[AgreementSchema]) -> None:
-        for raw_agree in raw_agreements:
-            if raw_agree.deleted:
-                continue
-
-            if not raw_agree.readonly:
-                lgr.debug(f"Criando acordo {raw_agree.number} para pagador {payer.user.cpf_cnpj}")
-                creditor = new_creditors.get(
-                    raw_agree.creditor_name,
-                    CreditorController.get(silent=False, name=raw_agree.creditor_name)
-                )
-                if not creditor:
-                    raise HttpFriendlyException(
-                        404,
-                        f"Credor {raw_agree.creditor_name} não encontrado ao criar acordo {raw_agree.number}"
-                    )
-                agreement_schema: AgreementInSchema = AgreementInSchema(
-                    **raw_agree.model_dump(),
-                    payer=payer.id,
-                    creditor=new_creditors[raw_agree.creditor_name].id
-                )
-                saved_agreement = AgreementController.create(agreement_schema)
-            else:
-                lgr.debug(f"Buscando acordo {raw_agree.number} existente")
-                saved_agreement = AgreementController.get(silent=False, number=raw_agree.number)
-
-            cls._save_installments(saved_agreement, raw_agree.installments)
-
-    @classmethod
-    def _save_installments(cls, agreement: Agreement, raw_installments: List[InstallmentSchema]):
-        for raw_install in raw_installments:
-            if raw_install.deleted:
-                continue
-
-            if not raw_install.readonly:
-                lgr.debug(f"Criando parcela {raw_install.number} para acordo {agreement.number}")
-                installment_schema = InstallmentInSchema(
-                    number=str(raw_install.number),
-                    due_date=raw_install.due_date,
-                    agreement=agreement.id
-                )
-                saved_installment = InstallmentController.create(installment_schema)
-            else:
-                lgr.debug(f"Buscando parcela {raw_install.number} existente para acordo {agreement.number}")
-                saved_installment = InstallmentController.get(
-                    silent=False,
-                    agreement__number=agreement.number,
-                    number=raw_install.number
-                )
-
-            if raw_install.boleto:
-                cls._save_boleto(saved_installment, raw_install.boleto)
-
-    @classmethod
-    def _save_boleto(cls, installment: Installment, boleto: BoletoSchema):
-        try:
-            boleto_path = Path(boleto.path)
-            if not boleto_path.exists() or not boleto_path.is_file():
-                lgr.error(f"Arquivo do boleto não encontrado: {boleto_path} (acordo={getattr(installment.agreement, 'number', None)} parcela={installment.number})")
-                raise HttpFriendlyException(404, f"Arquivo do boleto não encontrado: {boleto_path}")
-
-            lgr.debug(f"Salvando boleto: agreement={getattr(installment.agreement, 'number', None)} installment={installment.number} path={boleto_path}")
-            with open(boleto_path, 'rb') as boleto_file:
-                boleto_schema: BoletoInSchema = BoletoInSchema(
-                    pdf=boleto_file,
-                    installment=installment.id,
-                    status=Boleto.Status.PENDING
-                )
-                BoletoController.create(boleto_schema)
-        except HttpFriendlyException:
-            raise
-        except Exception as e:
-            lgr.exception(f"Erro ao salvar boleto (acordo={getattr(installment.agreement, 'number', None)} parcela={getattr(installment, 'number', None)} path={getattr(boleto, 'path', None)}): {e}")
-            raise
\ No newline at end of file
+        return parse_due_date(due_date_str)
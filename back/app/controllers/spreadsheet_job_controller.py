@@ -0,0 +1,495 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from traceback import format_exc
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+from zipfile import is_zipfile
+
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.controllers import BaseController
+from app.controllers.chunked_upload_controller import ChunkedUploadController
+from app.controllers.import_ledger_controller import ImportLedgerController
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_results_controller import SpreadsheetResultsController
+from app.exceptions import HttpFriendlyException
+from app.models import SpreadsheetJob
+from app.repositories.spreadsheet_job_repository import SpreadsheetJobRepository
+from app.repositories.spreadsheet_staging_repository import SpreadsheetStagingRepository
+from app.spreadsheet_progress import SpreadsheetProgress
+from config import (
+    PROGRESS_STREAM_MAX_SECONDS,
+    SPREADSHEET_JOB_LEASE_SECONDS,
+    SPREADSHEET_JOB_MAX_ATTEMPTS,
+    SPREADSHEET_OPERATION_TTL_SECONDS,
+    SPREADSHEET_OPERATIONS_MAX_BYTES,
+)
+
+lgr = logging.getLogger(__name__)
+
+NO_NEW_DATA_MESSAGE = 'Não existem novas informações a serem processadas!'
+# Segundos entre duas leituras do andamento por quem acompanha o processamento pelo stream
+PROGRESS_WATCH_INTERVAL = 1.0
+FINISHED_STATUSES = (SpreadsheetJob.Status.DONE.value, SpreadsheetJob.Status.FAILED.value)
+ACTIVE_STATUSES = (SpreadsheetJob.Status.QUEUED.value, SpreadsheetJob.Status.RUNNING.value)
+# Uma pasta sem processamento pode ser um upload em andamento: o processamento
+# só é criado depois que os arquivos são gravados
+ORPHAN_GRACE_SECONDS = 60 * 60
+APPROVING_MESSAGE = 'Os resultados deste processamento já estão sendo gravados.'
+ABANDONED_MESSAGE = 'O processamento foi interrompido repetidas vezes e não foi concluído. Envie a planilha novamente.'
+EXPIRED_MESSAGE = 'Os arquivos deste processamento expiraram e foram removidos. Envie a planilha novamente.'
+
+
+class ReapResult(NamedTuple):
+    directories: int
+    bytes: int
+
+
+class SpreadsheetJobController(BaseController[SpreadsheetJobRepository, SpreadsheetJob]):
+    """
+    Fila de processamentos de planilha. A API apenas enfileira o trabalho;
+    quem executa é o comando `run_spreadsheet_worker`, fora do ciclo da
+    requisição HTTP.
+    """
+    REPOSITORY = SpreadsheetJobRepository
+    MODEL = SpreadsheetJob
+
+    @classmethod
+    def enqueue(
+        cls,
+        spreadsheet: Optional[UploadedFile],
+        boletos: Optional[UploadedFile],
+        spreadsheet_upload_id: Optional[str] = None,
+        boletos_upload_id: Optional[str] = None,
+    ) -> SpreadsheetJob:
+        """
+        Grava os arquivos enviados na pasta da operação e coloca o
+        processamento na fila. Cada arquivo pode vir na própria requisição ou
+        de um envio em partes já finalizado.
+
+        Parâmetros:
+            - spreadsheet: Planilha CSV enviada.
+            - boletos: ZIP com os PDFs dos boletos.
+            - spreadsheet_upload_id: Envio em partes com a planilha, no lugar de `spreadsheet`.
+            - boletos_upload_id: Envio em partes com o ZIP, no lugar de `boletos`.
+
+        Retorna:
+            - SpreadsheetJob: Processamento enfileirado.
+        """
+        if (spreadsheet is None) == (spreadsheet_upload_id is None):
+            raise HttpFriendlyException(422, "Envie a planilha ou o identificador do envio em partes dela.")
+        if (boletos is None) == (boletos_upload_id is None):
+            raise HttpFriendlyException(422, "Envie o ZIP de boletos ou o identificador do envio em partes dele.")
+
+        # Os envios são conferidos antes de qualquer arquivo ser movido, para
+        # que um envio inválido não consuma o outro
+        spreadsheet_upload = boletos_upload = None
+        if spreadsheet_upload_id is not None:
+            spreadsheet_upload = ChunkedUploadController.get_complete(spreadsheet_upload_id)
+        if boletos_upload_id is not None:
+            boletos_upload = ChunkedUploadController.get_complete(boletos_upload_id)
+
+        boletos_file = boletos.file if boletos is not None else ChunkedUploadController.file_path(boletos_upload)
+        if not is_zipfile(boletos_file):
+            raise HttpFriendlyException(400, "O arquivo de boletos não é um ZIP válido.")
+        if boletos is not None:
+            boletos.file.seek(0)
+
+        job = SpreadsheetJob()
+        operation_path = SpreadsheetController.operation_path(job.uuid)
+        operation_path.mkdir(parents=True, exist_ok=True)
+
+        lgr.debug(f"Salvando arquivos da operação {job.uuid}")
+        if spreadsheet is not None:
+            cls._write_upload(spreadsheet, operation_path / 'spreadsheet.csv')
+        else:
+            ChunkedUploadController.take(spreadsheet_upload, operation_path / 'spreadsheet.csv')
+
+        if boletos is not None:
+            cls._write_upload(boletos, SpreadsheetController.boletos_zip_path(job.uuid))
+        else:
+            ChunkedUploadController.take(boletos_upload, SpreadsheetController.boletos_zip_path(job.uuid))
+
+        job.save()
+        lgr.info(f"Processamento de planilha {job.uuid} enfileirado")
+        return job
+
+    @classmethod
+    def get_by_uuid(cls, job_id: str) -> SpreadsheetJob:
+        """
+        Busca um processamento pelo identificador público.
+
+        Parâmetros:
+            - job_id: UUID do processamento, em texto.
+
+        Retorna:
+            - SpreadsheetJob: Processamento encontrado.
+        """
+        try:
+            job_uuid = UUID(job_id)
+        except ValueError:
+            raise HttpFriendlyException(404, f"{SpreadsheetJob.READABLE_NAME} não encontrado")
+
+        return cls.REPOSITORY.get(uuid=job_uuid)
+
+    @classmethod
+    def claim_next(cls) -> Optional[SpreadsheetJob]:
+        """
+        Reserva o processamento mais antigo da fila para este worker.
+        A troca de status é condicional, então dois workers nunca pegam o
+        mesmo processamento. Antes, os processamentos abandonados por um
+        worker que caiu voltam para a fila (ver `recover_stale`).
+
+        Retorna:
+            - SpreadsheetJob | None: Processamento reservado, ou None se a fila estiver vazia.
+        """
+        cls.recover_stale()
+
+        queued = cls.REPOSITORY.filter(status=SpreadsheetJob.Status.QUEUED.value).order_by('id')
+        for job_id in queued.values_list('id', flat=True)[:10]:
+            now = timezone.now()
+            claimed = cls.REPOSITORY.filter(id=job_id, status=SpreadsheetJob.Status.QUEUED.value).update(
+                status=SpreadsheetJob.Status.RUNNING.value,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=F('attempts') + 1,
+                updated_at=now,
+            )
+            if claimed:
+                return cls.REPOSITORY.get(id=job_id)
+
+        return None
+
+    @classmethod
+    def recover_stale(cls, now: Optional[datetime] = None) -> int:
+        """
+        Trata os processamentos em execução cujo worker não dá sinal de vida
+        há mais que SPREADSHEET_JOB_LEASE_SECONDS: o worker caiu ou foi
+        reiniciado no meio do processamento. Eles voltam para a fila, ou são
+        marcados como falhos depois de SPREADSHEET_JOB_MAX_ATTEMPTS reservas,
+        para que um processamento que derruba o worker não o derrube de novo
+        para sempre.
+
+        Processamentos anteriores ao sinal de vida usam a última atualização.
+
+        Parâmetros:
+            - now: Momento de referência. Por padrão, agora.
+
+        Retorna:
+            - int: Quantidade de processamentos recuperados ou marcados como falhos.
+        """
+        now = now or timezone.now()
+        cutoff = now - timedelta(seconds=SPREADSHEET_JOB_LEASE_SECONDS)
+        stale = cls.REPOSITORY.filter(status=SpreadsheetJob.Status.RUNNING.value).filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, updated_at__lt=cutoff)
+        )
+
+        failed = stale.filter(attempts__gte=SPREADSHEET_JOB_MAX_ATTEMPTS).update(
+            status=SpreadsheetJob.Status.FAILED.value,
+            message=ABANDONED_MESSAGE,
+            finished_at=now,
+            updated_at=now,
+        )
+        requeued = stale.filter(attempts__lt=SPREADSHEET_JOB_MAX_ATTEMPTS).update(
+            status=SpreadsheetJob.Status.QUEUED.value,
+            updated_at=now,
+        )
+
+        if failed or requeued:
+            lgr.warning(f"Processamentos de planilha abandonados: {requeued} de volta à fila, {failed} marcados como falhos")
+        return failed + requeued
+
+    @classmethod
+    def run(cls, job: SpreadsheetJob) -> SpreadsheetJob:
+        """
+        Executa o pipeline completo de um processamento já reservado:
+        processa a planilha e grava os resultados para revisão. Os boletos
+        continuam dentro do ZIP até a aprovação. A remoção das parcelas
+        vencidas é uma tarefa periódica do worker (ver app/tasks.py).
+
+        Parâmetros:
+            - job: Processamento reservado por `claim_next`.
+
+        Retorna:
+            - SpreadsheetJob: Processamento com o status final.
+        """
+        operation_path = SpreadsheetController.operation_path(job.uuid)
+        progress = SpreadsheetProgress(publisher=lambda snapshot: cls._publish_progress(job, snapshot))
+
+        try:
+            with cls._heartbeat(job):
+                results = SpreadsheetController.process_spreadsheet(job.uuid, progress)
+            lgr.debug(f"Resultados do processamento da planilha para operação {job.uuid}: {len(results.payers)} pagadores, {len(results.creditors)} credores")
+
+            if len(results.payers) == 0 and len(results.creditors) == 0:
+                # Sem nada para aprovar, o banco já está como a planilha
+                ImportLedgerController.record_pending(operation_path)
+                return cls._finish(job, SpreadsheetJob.Status.DONE, NO_NEW_DATA_MESSAGE, progress=progress)
+
+            with cls._heartbeat(job), progress.stage("write_results"):
+                SpreadsheetResultsController.write(operation_path, results)
+            return cls._finish(job, SpreadsheetJob.Status.DONE, has_results=True, progress=progress)
+        except HttpFriendlyException as e:
+            lgr.error(f"Erro ao processar planilha {job.uuid}: {e.message}")
+            return cls._finish(job, SpreadsheetJob.Status.FAILED, f'Erro ao processar planilha: {e.message}', progress=progress)
+        except Exception as e:
+            lgr.error(format_exc())
+            lgr.error(f"Erro ao processar planilha {job.uuid}: {str(e)}")
+            return cls._finish(job, SpreadsheetJob.Status.FAILED, f'Erro ao processar planilha: {str(e)}', progress=progress)
+
+    @classmethod
+    def watch(cls, job: SpreadsheetJob, interval: float = PROGRESS_WATCH_INTERVAL,
+              max_seconds: float = PROGRESS_STREAM_MAX_SECONDS) -> Iterator[SpreadsheetJob]:
+        """
+        Acompanha um processamento, devolvendo-o de novo a cada mudança de
+        status ou de andamento, até ele terminar ou até passarem `max_seconds`.
+        O limite garante que quem acompanha um processamento parado (um
+        worker que caiu, por exemplo) não fique preso para sempre.
+
+        Parâmetros:
+            - job: Processamento acompanhado.
+            - interval: Segundos entre duas leituras do banco.
+            - max_seconds: Tempo máximo acompanhando o processamento.
+
+        Retorna:
+            - Iterator[SpreadsheetJob]: O processamento, a cada mudança; o último
+              já finalizado, se ele terminou dentro do limite.
+        """
+        deadline = time.monotonic() + max_seconds
+        last = None
+        while True:
+            current = (job.status, job.progress)
+            if current != last:
+                last = current
+                yield job
+
+            if job.status in FINISHED_STATUSES or time.monotonic() + interval > deadline:
+                return
+
+            time.sleep(interval)
+            job = cls.REPOSITORY.get(id=job.id)
+
+    @classmethod
+    def run_pending(cls) -> int:
+        """
+        Executa todos os processamentos da fila, um após o outro.
+
+        Retorna:
+            - int: Quantidade de processamentos executados.
+        """
+        executed = 0
+        while job := cls.claim_next():
+            cls.run(job)
+            executed += 1
+        return executed
+
+    @classmethod
+    @contextmanager
+    def approving(cls, job_id: str) -> Iterator[None]:
+        """
+        Reserva um processamento enquanto seus resultados são aprovados e
+        gravados no banco: a aprovação lê o ZIP e os resultados da pasta da
+        operação, e o limpador (ver `reap_operations`) não pode removê-la no
+        meio. A reserva é renovada enquanto o bloco executa e liberada no fim.
+
+        Uma aprovação já em andamento, ou uma operação cujos arquivos já
+        expiraram, resulta em erro 409. Identificadores sem processamento não
+        são reservados.
+
+        Parâmetros:
+            - job_id: UUID do processamento, em texto.
+        """
+        try:
+            job = cls.REPOSITORY.get(uuid=UUID(str(job_id)), silent=True)
+        except ValueError:
+            job = None
+        if job is None:
+            yield
+            return
+
+        now = timezone.now()
+        claimed = cls.REPOSITORY.filter(id=job.id, has_results=True).filter(cls._not_approving(now)).update(approving_at=now)
+        if not claimed:
+            job.refresh_from_db()
+            raise HttpFriendlyException(409, APPROVING_MESSAGE if job.has_results else (job.message or EXPIRED_MESSAGE))
+
+        try:
+            with cls._heartbeat(job, 'approving_at'):
+                yield
+        finally:
+            cls.REPOSITORY.filter(id=job.id).update(approving_at=None)
+
+    @staticmethod
+    def _not_approving(now: datetime) -> Q:
+        # Uma aprovação sem sinal de vida há mais que a reserva foi interrompida
+        return Q(approving_at__isnull=True) | Q(approving_at__lt=now - timedelta(seconds=SPREADSHEET_JOB_LEASE_SECONDS))
+
+    @classmethod
+    def reap_operations(cls, max_age: Optional[timedelta] = None, max_bytes: Optional[int] = None,
+                        now: Optional[datetime] = None, dry_run: bool = False) -> ReapResult:
+        """
+        Remove as pastas de operações abandonadas: processamentos que nunca
+        foram aprovados ou que falharam deixam a planilha, o ZIP e os
+        resultados em MEDIA_ROOT/<uuid> indefinidamente.
+
+        Primeiro saem as pastas sem atividade há mais de `max_age`; depois, se
+        as pastas restantes ainda ocuparem mais de `max_bytes`, as mais antigas
+        até caber. Pastas de processamentos na fila ou em execução nunca são
+        removidas, nem as de processamentos sendo aprovados (ver `approving`),
+        nem pastas recentes ainda sem processamento (upload em andamento).
+        Resultados que aguardam aprovação só saem por idade, nunca pelo
+        limite de espaço.
+
+        Parâmetros:
+            - max_age: Idade máxima. Por padrão, SPREADSHEET_OPERATION_TTL_SECONDS.
+            - max_bytes: Espaço máximo ocupado pelas pastas. Por padrão,
+              SPREADSHEET_OPERATIONS_MAX_BYTES; 0 desliga o limite.
+            - now: Momento de referência. Por padrão, agora.
+            - dry_run: Só calcula o que seria removido.
+
+        Retorna:
+            - ReapResult: Quantidade de pastas removidas e de bytes liberados.
+        """
+        max_age = max_age if max_age is not None else timedelta(seconds=SPREADSHEET_OPERATION_TTL_SECONDS)
+        max_bytes = max_bytes if max_bytes is not None else SPREADSHEET_OPERATIONS_MAX_BYTES
+        # Um processamento abandonado deixaria de ser "em execução" só quando
+        # um worker fosse buscar o próximo da fila; aqui ele não protege a pasta
+        if not dry_run:
+            cls.recover_stale(now)
+        now = now or timezone.now()
+        now_ts = now.timestamp()
+
+        operations = [(operation_uuid, path, *cls._disk_usage(path)) for operation_uuid, path in SpreadsheetController.operation_paths()]
+        lease_cutoff = now - timedelta(seconds=SPREADSHEET_JOB_LEASE_SECONDS)
+        jobs: Dict[UUID, Tuple[str, bool, bool]] = {}
+        for qs in cls.REPOSITORY.filter_in_batches('uuid', [operation[0] for operation in operations]):
+            for operation_uuid, status, has_results, approving_at in qs.values_list('uuid', 'status', 'has_results', 'approving_at'):
+                jobs[operation_uuid] = (status, has_results, approving_at is not None and approving_at >= lease_cutoff)
+
+        total = sum(size for _, _, size, _ in operations)
+        candidates = []
+        for operation_uuid, path, size, modified in operations:
+            status, has_results, approving = jobs.get(operation_uuid, (None, False, False))
+            if status in ACTIVE_STATUSES or approving or (status is None and now_ts - modified < ORPHAN_GRACE_SECONDS):
+                continue
+            candidates.append((modified, operation_uuid, path, size, has_results))
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        reaped: List[UUID] = []
+        reclaimed = 0
+        for modified, operation_uuid, path, size, has_results in candidates:
+            expired = now_ts - modified > max_age.total_seconds()
+            # Resultados aguardando aprovação só expiram pela idade
+            if not expired and (has_results or not (max_bytes and total > max_bytes)):
+                continue
+
+            # A troca de has_results é condicional: uma aprovação que começou
+            # depois da leitura acima ganha a corrida e a pasta fica
+            if has_results and not dry_run and not cls._expire_results(operation_uuid, now):
+                continue
+
+            lgr.debug(f"Removendo pasta da operação {operation_uuid} ({size} bytes, {'expirada' if expired else 'acima do limite de espaço'})")
+            if not dry_run:
+                shutil.rmtree(path, ignore_errors=True)
+            reaped.append(operation_uuid)
+            reclaimed += size
+            total -= size
+
+        if reaped and not dry_run:
+            # Linhas de staging deixadas por um worker que caiu no meio de um bloco
+            for qs in SpreadsheetStagingRepository.filter_in_batches('operation', reaped):
+                qs.delete()
+
+        lgr.info(
+            f"{'Simulação: ' if dry_run else ''}{len(reaped)} pastas de operações removidas, "
+            f"{reclaimed} bytes ({reclaimed / 2**20:.1f} MiB) liberados"
+        )
+        return ReapResult(len(reaped), reclaimed)
+
+    @classmethod
+    def _expire_results(cls, operation_uuid: UUID, now: datetime) -> bool:
+        return bool(cls.REPOSITORY.filter(uuid=operation_uuid, has_results=True).filter(cls._not_approving(now)).update(
+            has_results=False, message=EXPIRED_MESSAGE, updated_at=now,
+        ))
+
+    @staticmethod
+    def _disk_usage(path: Path) -> Tuple[int, float]:
+        """
+        Tamanho total dos arquivos da pasta e o momento da última modificação
+        nela ou em qualquer um dos seus arquivos.
+        """
+        size = 0
+        modified = path.stat().st_mtime
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                size += stat.st_size
+                modified = max(modified, stat.st_mtime)
+        return size, modified
+
+    @classmethod
+    def _finish(cls, job: SpreadsheetJob, status: SpreadsheetJob.Status, message: str = '', has_results: bool = False,
+                progress: Optional[SpreadsheetProgress] = None) -> SpreadsheetJob:
+        lgr.info(f"Processamento de planilha {job.uuid} finalizado com status {status.value}")
+        if progress is not None:
+            progress.current_stage = None
+            job.progress = progress.snapshot()
+        return cls.REPOSITORY.update(
+            job,
+            status=status.value,
+            message=message,
+            has_results=has_results,
+            finished_at=timezone.now(),
+        )
+
+    @classmethod
+    def _publish_progress(cls, job: SpreadsheetJob, snapshot: Dict[str, Any]) -> None:
+        # Só o campo do andamento é gravado, sem tocar no restante do processamento
+        job.progress = snapshot
+        now = timezone.now()
+        cls.REPOSITORY.filter(id=job.id).update(progress=snapshot, heartbeat_at=now, updated_at=now)
+
+    @classmethod
+    @contextmanager
+    def _heartbeat(cls, job: SpreadsheetJob, field: str = 'heartbeat_at'):
+        """
+        Renova o sinal de vida do processamento (`heartbeat_at` durante a
+        execução, `approving_at` durante a aprovação) a cada um terço de
+        SPREADSHEET_JOB_LEASE_SECONDS enquanto o bloco executa, mesmo que
+        uma etapa longa não publique andamento.
+        """
+        stop = threading.Event()
+
+        def beat():
+            try:
+                while not stop.wait(SPREADSHEET_JOB_LEASE_SECONDS / 3):
+                    cls.REPOSITORY.filter(id=job.id, status=job.status).update(**{field: timezone.now()})
+            finally:
+                # A thread tem a própria conexão com o banco
+                connection.close()
+
+        thread = threading.Thread(target=beat, name=f'spreadsheet-job-{job.id}-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    @staticmethod
+    def _write_upload(upload: UploadedFile, destination) -> None:
+        with open(destination, 'wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
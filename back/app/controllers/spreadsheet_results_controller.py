@@ -0,0 +1,285 @@
+import gzip
+import json
+import logging
+from itertools import groupby
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from django.core.paginator import Paginator
+
+from app.dtos import CreditorDTO, PayerDTO, SpreadsheetDTO
+from app.schemas import PageSchema, PaginatedOutSchema, PaginatorSchema
+from app.schemas.spreadsheet_schemas import (
+    PayerKind, ResultMessageKind, SaveSpreadsheetSchema, SpreadsheetMessagesQuery, SpreadsheetRemovalsSchema,
+    SpreadsheetResultsPageSchema, SpreadsheetResultsQuery, SpreadsheetResultsSummarySchema
+)
+
+lgr = logging.getLogger(__name__)
+
+RESULTS_FILE = 'results.jsonl.gz'
+INDEX_FILE = 'results_index.json'
+MESSAGES_FILE = 'results_messages.json'
+# Pagadores por bloco gzip. Blocos maiores comprimem melhor; menores deixam
+# a leitura de uma página descomprimir menos dados que ela não usa
+RESULTS_BLOCK_SIZE = 64
+# Maior página de pagadores ou de mensagens devolvida de uma vez
+MAX_RESULTS_PAGE_SIZE = 200
+
+
+class _BlockWriter:
+    """
+    Grava linhas NDJSON em blocos gzip independentes. Blocos gzip concatenados
+    formam um arquivo gzip válido, então o arquivo inteiro continua legível
+    por qualquer leitor de gzip, e cada bloco pode ser lido sozinho.
+    """
+
+    def __init__(self, f: IO[bytes]):
+        self.f = f
+        self.blocks: List[List[int]] = []
+        self.offset = 0
+        self.pending: List[bytes] = []
+
+    def add(self, line: bytes) -> List[int]:
+        """Adiciona uma linha e retorna (bloco, posição da linha no bloco)."""
+        position = [len(self.blocks), len(self.pending)]
+        self.pending.append(line)
+        if len(self.pending) >= RESULTS_BLOCK_SIZE:
+            self.flush()
+        return position
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+
+        block = gzip.compress(b'\n'.join(self.pending) + b'\n', mtime=0)
+        self.f.write(block)
+        self.blocks.append([self.offset, len(block)])
+        self.offset += len(block)
+        self.pending = []
+
+
+class SpreadsheetResultsController:
+    """
+    Guarda os resultados de um processamento de planilha para revisão.
+
+    Cada pagador vira uma linha JSON compacta de `results.jsonl.gz`, gravada em
+    blocos gzip, e `results_index.json` guarda, para cada pagador, em que bloco
+    ele está e os campos usados nos filtros. Assim uma página de resultados só
+    descomprime e desserializa os blocos e pagadores que vai devolver. Os
+    erros e avisos ficam em `results_messages.json`, lido só por quem pede as
+    mensagens.
+    """
+
+    @classmethod
+    def write(cls, operation_path: Path, results: SpreadsheetDTO) -> None:
+        """
+        Grava os resultados do processamento e o índice por pagador. Os
+        pagadores são serializados um a um, direto para o arquivo, sem montar
+        o JSON do grafo inteiro em memória.
+
+        Parâmetros:
+            - operation_path: Pasta da operação.
+            - results: Resultado do processamento da planilha.
+        """
+        entries: List[Dict[str, Any]] = []
+        with cls.results_file(operation_path).open('wb') as f:
+            writer = _BlockWriter(f)
+            for payer in results.payers:
+                block, line = writer.add(payer.model_dump_json().encode('utf-8'))
+                entries.append({
+                    "block": block,
+                    "line": line,
+                    "readonly": payer.readonly,
+                    "warnings": len(payer.warnings),
+                    "creditors": sorted({agreement.creditor_name for agreement in payer.agreements}),
+                })
+            writer.flush()
+
+        summary = SpreadsheetResultsSummarySchema(
+            payers=len(entries),
+            new_payers=sum(1 for entry in entries if not entry["readonly"]),
+            readonly_payers=sum(1 for entry in entries if entry["readonly"]),
+            payers_with_warnings=sum(1 for entry in entries if entry["warnings"]),
+            creditors=len(results.creditors),
+            new_creditors=sum(1 for creditor in results.creditors if not creditor.readonly),
+            errors=len(results.errors),
+            warnings=len(results.warnings),
+            unchanged_rows=results.unchanged_rows,
+        )
+        index = {
+            "summary": summary.model_dump(),
+            "creditors": [creditor.model_dump(mode='json') for creditor in results.creditors],
+            "blocks": writer.blocks,
+            "payers": entries,
+        }
+        messages = {
+            ResultMessageKind.ERRORS.value: results.errors,
+            ResultMessageKind.WARNINGS.value: results.warnings,
+        }
+        (operation_path / MESSAGES_FILE).write_text(
+            json.dumps(messages, ensure_ascii=False, separators=(',', ':')),
+            encoding='utf-8'
+        )
+        # O índice é gravado por último: a existência dele marca os resultados como completos
+        (operation_path / INDEX_FILE).write_text(
+            json.dumps(index, ensure_ascii=False, separators=(',', ':')),
+            encoding='utf-8'
+        )
+        lgr.debug(f"Resultados gravados em {operation_path}: {len(entries)} pagadores em {len(writer.blocks)} blocos")
+
+    @classmethod
+    def results_file(cls, operation_path: Path) -> Path:
+        return operation_path / RESULTS_FILE
+
+    @classmethod
+    def iter_lines(cls, operation_path: Path) -> Iterator[bytes]:
+        """
+        Percorre as linhas NDJSON (um pagador por linha) já descomprimidas.
+        """
+        with gzip.open(cls.results_file(operation_path), 'rb') as f:
+            yield from f
+
+    @classmethod
+    def exists(cls, operation_path: Path) -> bool:
+        return (operation_path / INDEX_FILE).exists()
+
+    @classmethod
+    def load_all(cls, operation_path: Path) -> SpreadsheetDTO:
+        """
+        Carrega o resultado completo, no formato devolvido antes da paginação.
+        """
+        index = cls._load_index(operation_path)
+        messages = cls._load_messages(operation_path, index)
+        payers = [json.loads(line) for line in cls.iter_lines(operation_path)]
+
+        return SpreadsheetDTO.from_json({
+            "payers": payers,
+            "creditors": index["creditors"],
+            "errors": messages[ResultMessageKind.ERRORS.value],
+            "warnings": messages[ResultMessageKind.WARNINGS.value],
+            "unchanged_rows": index["summary"].get("unchanged_rows", 0),
+        })
+
+    @classmethod
+    def load_page(cls, operation_path: Path, query: SpreadsheetResultsQuery) -> SpreadsheetResultsPageSchema:
+        """
+        Carrega uma página de pagadores, aplicando os filtros pelo índice.
+
+        Parâmetros:
+            - operation_path: Pasta da operação.
+            - query: Página, tamanho da página e filtros.
+
+        Retorna:
+            - SpreadsheetResultsPageSchema: Pagadores da página, resumo e credores.
+        """
+        index = cls._load_index(operation_path)
+
+        entries = index["payers"]
+        if query.creditor:
+            entries = [entry for entry in entries if query.creditor in entry["creditors"]]
+        if query.kind is not None:
+            readonly = query.kind == PayerKind.READONLY
+            entries = [entry for entry in entries if entry["readonly"] == readonly]
+        if query.with_warnings is not None:
+            entries = [entry for entry in entries if bool(entry["warnings"]) == query.with_warnings]
+
+        paginator = Paginator(entries, cls._page_size(query.page_size))
+        page = paginator.get_page(query.page)
+
+        payers: List[PayerDTO] = []
+        with cls.results_file(operation_path).open('rb') as f:
+            # Entradas da página vêm em ordem, então cada bloco é descomprimido uma vez só
+            for block, block_entries in groupby(page.object_list, key=lambda entry: entry["block"]):
+                offset, length = index["blocks"][block]
+                f.seek(offset)
+                lines = gzip.decompress(f.read(length)).split(b'\n')
+                for entry in block_entries:
+                    payers.append(PayerDTO.model_validate_json(lines[entry["line"]]))
+
+        return SpreadsheetResultsPageSchema(
+            paginator=PaginatorSchema(
+                page_size=paginator.per_page,
+                total_pages=paginator.num_pages,
+                total_items=paginator.count,
+            ),
+            page=PageSchema(page=page.number, items=payers),
+            summary=SpreadsheetResultsSummarySchema(**index["summary"]),
+            creditors=[CreditorDTO(**creditor) for creditor in index["creditors"]],
+        )
+
+    @classmethod
+    def load_messages(cls, operation_path: Path, query: SpreadsheetMessagesQuery) -> PaginatedOutSchema[str]:
+        """
+        Carrega uma página dos erros ou dos avisos do processamento.
+
+        Parâmetros:
+            - operation_path: Pasta da operação.
+            - query: Tipo das mensagens, página e tamanho da página.
+
+        Retorna:
+            - PaginatedOutSchema[str]: Mensagens da página.
+        """
+        messages = cls._load_messages(operation_path)[query.kind.value]
+
+        paginator = Paginator(messages, cls._page_size(query.page_size))
+        page = paginator.get_page(query.page)
+        return PaginatedOutSchema(
+            paginator=PaginatorSchema(
+                page_size=paginator.per_page,
+                total_pages=paginator.num_pages,
+                total_items=paginator.count,
+            ),
+            page=PageSchema(page=page.number, items=list(page.object_list)),
+        )
+
+    @classmethod
+    def approved(cls, operation_path: Path, removals: SpreadsheetRemovalsSchema) -> SaveSpreadsheetSchema:
+        """
+        Monta o grafo aprovado a partir dos resultados gravados, marcando como
+        removidos os itens indicados pelo administrador.
+
+        Parâmetros:
+            - operation_path: Pasta da operação.
+            - removals: Credores, pagadores, acordos e parcelas removidos.
+
+        Retorna:
+            - SaveSpreadsheetSchema: Grafo no formato esperado pela gravação.
+        """
+        index = cls._load_index(operation_path)
+        creditors, payers = set(removals.creditors), set(removals.payers)
+        agreements, installments = set(removals.agreements), set(removals.installments)
+
+        approved_payers = []
+        for line in cls.iter_lines(operation_path):
+            payer = json.loads(line)
+            payer["deleted"] = payer["user"]["cpf_cnpj"] in payers
+            for agreement in payer["agreements"]:
+                agreement["deleted"] = agreement["number"] in agreements
+                for installment in agreement["installments"]:
+                    installment["deleted"] = f'{installment["agreement_num"]}-{installment["number"]}' in installments
+            approved_payers.append(payer)
+
+        return SaveSpreadsheetSchema.model_validate({
+            "payers": approved_payers,
+            "creditors": [{**creditor, "deleted": creditor["name"] in creditors} for creditor in index["creditors"]],
+        })
+
+    @classmethod
+    def _page_size(cls, page_size: int) -> int:
+        return min(max(page_size, 1), MAX_RESULTS_PAGE_SIZE)
+
+    @classmethod
+    def _load_index(cls, operation_path: Path) -> Dict[str, Any]:
+        with (operation_path / INDEX_FILE).open('r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @classmethod
+    def _load_messages(cls, operation_path: Path, index: Optional[Dict[str, Any]] = None) -> Dict[str, List[str]]:
+        messages_file = operation_path / MESSAGES_FILE
+        if messages_file.exists():
+            with messages_file.open('r', encoding='utf-8') as f:
+                return json.load(f)
+
+        # Resultados gravados antes das mensagens irem para um arquivo próprio
+        index = index or cls._load_index(operation_path)
+        return {kind.value: index.get(kind.value, []) for kind in ResultMessageKind}
@@ -0,0 +1,164 @@
+import logging
+from typing import Iterable, List, NamedTuple, Set
+from uuid import UUID
+
+from django.db.models import Exists, OuterRef, Subquery
+
+from app.dtos import AgreementDTO, CreditorDTO, InstallmentDTO, PayerDTO
+from app.models import SpreadsheetStagingRow
+from app.repositories.agreement_repository import AgreementRepository
+from app.repositories.creditor_repository import CreditorRepository
+from app.repositories.installment_repository import InstallmentRepository
+from app.repositories.payer_repository import PayerRepository
+from app.repositories.spreadsheet_staging_repository import SpreadsheetStagingRepository
+from app.spreadsheet_normalizer import RowData
+
+lgr = logging.getLogger(__name__)
+
+
+class StagedRow(NamedTuple):
+    line_num: int
+    data: RowData
+    has_boleto: bool
+    replace_boleto: bool
+
+
+class StagingDiff(NamedTuple):
+    # Linhas que já estão no banco exatamente como na planilha
+    settled: Set[int]
+    # O que a aprovação do bloco vai inserir, calculado com anti-joins
+    new_payers: Set[str]
+    new_creditors: Set[str]
+    new_agreements: Set[str]
+    # Linhas com parcela ainda não gravada e linhas sem o PDF no ZIP
+    new_installments: Set[int]
+    missing_boletos: Set[int]
+    # Entidades já gravadas que as demais linhas referenciam
+    payers: List[PayerDTO]
+    creditors: List[CreditorDTO]
+    agreements: List[AgreementDTO]
+    installments: List[InstallmentDTO]
+
+
+class SpreadsheetStagingController:
+    """
+    Calcula no banco a diferença entre um bloco da planilha e o que já está gravado.
+
+    As linhas do bloco vão para a tabela de staging e, com joins contra
+    pagadores, credores e parcelas, o banco separa as linhas já resolvidas
+    (pagador e credor existentes, parcela com boleto e mesmo vencimento, PDF no
+    ZIP) das que trazem algo novo, e calcula com anti-joins os conjuntos a
+    inserir: pagadores, credores, acordos e parcelas novos e linhas sem boleto.
+    Só as entidades referenciadas pelas linhas novas voltam para o Python, que
+    monta com elas o grafo de revisão dessas linhas, sem consultar o banco.
+
+    A tabela de staging é uma tabela comum, com as linhas marcadas pela
+    operação, e não uma tabela temporária: as subconsultas do ORM precisam de
+    um model, e uma tabela temporária só existe na conexão que a criou. As
+    linhas de cada bloco saem assim que ele é resolvido; as de um worker que
+    caiu no meio saem com a pasta da operação (ver
+    SpreadsheetJobController.reap_operations).
+    """
+
+    @classmethod
+    def diff(cls, operation_uuid: UUID, rows: Iterable[StagedRow]) -> StagingDiff:
+        """
+        Carrega as linhas na tabela de staging, calcula a diferença e remove as
+        linhas carregadas.
+
+        Parâmetros:
+            - operation_uuid: Operação dona das linhas.
+            - rows: Linhas válidas do bloco, com o que se sabe do ZIP sobre cada uma.
+
+        Retorna:
+            - StagingDiff: Linhas resolvidas e entidades referenciadas pelas demais.
+        """
+        SpreadsheetStagingRepository.filter(operation=operation_uuid).delete()
+        try:
+            SpreadsheetStagingRepository.bulk_create([
+                SpreadsheetStagingRow(
+                    operation=operation_uuid,
+                    line=row.line_num,
+                    cpf_cnpj=row.data["cpf_cnpj"],
+                    creditor_name=row.data["creditor_name"],
+                    agreement_number=row.data["agreement_num"],
+                    installment_number=str(row.data["installment_num"]),
+                    due_date=row.data["due_date"],
+                    has_boleto=row.has_boleto,
+                    replace_boleto=row.replace_boleto,
+                )
+                for row in rows
+            ])
+            return cls._compute(operation_uuid)
+        finally:
+            SpreadsheetStagingRepository.filter(operation=operation_uuid).delete()
+
+    @classmethod
+    def _compute(cls, operation_uuid: UUID) -> StagingDiff:
+        staged = SpreadsheetStagingRepository.filter(operation=operation_uuid)
+
+        settled_rows = staged.filter(
+            Exists(InstallmentRepository.filter(
+                agreement__number=OuterRef('agreement_number'),
+                number=OuterRef('installment_number'),
+                due_date=OuterRef('due_date'),
+                boleto__isnull=False,
+            )),
+            Exists(PayerRepository.filter(user__cpf_cnpj=OuterRef('cpf_cnpj'))),
+            Exists(CreditorRepository.filter(name=OuterRef('creditor_name'))),
+            has_boleto=True,
+            replace_boleto=False,
+        )
+        settled = set(settled_rows.values_list('line', flat=True))
+
+        pending = staged.exclude(id__in=settled_rows.values('id'))
+        new_installments = pending.filter(~Exists(InstallmentRepository.filter(
+            agreement__number=OuterRef('agreement_number'),
+            number=OuterRef('installment_number'),
+        )))
+        diff = StagingDiff(
+            settled=settled,
+            new_payers=set(
+                pending.filter(~Exists(PayerRepository.filter(user__cpf_cnpj=OuterRef('cpf_cnpj'))))
+                .values_list('cpf_cnpj', flat=True).distinct()
+            ),
+            new_creditors=set(
+                pending.filter(~Exists(CreditorRepository.filter(name=OuterRef('creditor_name'))))
+                .values_list('creditor_name', flat=True).distinct()
+            ),
+            new_agreements=set(
+                pending.filter(~Exists(AgreementRepository.filter(number=OuterRef('agreement_number'))))
+                .values_list('agreement_number', flat=True).distinct()
+            ),
+            new_installments=set(new_installments.values_list('line', flat=True)),
+            missing_boletos=set(pending.filter(has_boleto=False).values_list('line', flat=True)),
+            payers=[
+                PayerDTO.from_values(row) for row in
+                PayerRepository.filter(user__cpf_cnpj__in=pending.values('cpf_cnpj')).values(*PayerDTO.VALUES_FIELDS)
+            ],
+            creditors=[
+                CreditorDTO.from_database(creditor) for creditor in
+                CreditorRepository.filter(name__in=pending.values('creditor_name'))
+            ],
+            agreements=[
+                AgreementDTO.from_values(row) for row in
+                AgreementRepository.filter(number__in=pending.values('agreement_number')).values(*AgreementDTO.VALUES_FIELDS)
+            ],
+            # Só as parcelas já gravadas das linhas pendentes, e não todas as dos acordos delas
+            installments=[
+                InstallmentDTO.from_values(row) for row in
+                InstallmentRepository.filter(id__in=pending.annotate(installment_id=Subquery(
+                    InstallmentRepository.filter(
+                        agreement__number=OuterRef('agreement_number'),
+                        number=OuterRef('installment_number'),
+                    ).values('id')[:1]
+                )).values('installment_id')).values(*InstallmentDTO.VALUES_FIELDS)
+            ],
+        )
+
+        lgr.debug(
+            "Staging: %d linhas já resolvidas; a inserir %d pagadores, %d credores, %d acordos e %d parcelas; %d linhas sem boleto",
+            len(diff.settled), len(diff.new_payers), len(diff.new_creditors), len(diff.new_agreements),
+            len(diff.new_installments), len(diff.missing_boletos)
+        )
+        return diff
@@ -0,0 +1,155 @@
+import logging
+from collections import Counter, defaultdict
+from functools import partial
+from io import BytesIO
+from typing import IO, Dict, List, Optional, Sequence
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, ProtectedError
+
+from app.boleto_storage import BoletoSource, BoletoUploader
+from app.controllers import BaseController
+from app.models import StoredBlob
+from app.repositories.stored_blob_repository import StoredBlobRepository
+
+lgr = logging.getLogger(__name__)
+
+BLOB_PREFIX = 'blobs'
+
+
+class StoredBlobController(BaseController[StoredBlobRepository, StoredBlob]):
+    """
+    Armazena arquivos endereçados pelo SHA-256 do conteúdo.
+
+    Um conteúdo já conhecido não é enviado de novo ao storage: o registro
+    existente ganha mais uma referência. Quem cria um boleto com um blob conta
+    a referência aqui; a remoção do boleto devolve a referência pelo sinal
+    `post_delete` (ver app/signals.py).
+    """
+    REPOSITORY = StoredBlobRepository
+    MODEL = StoredBlob
+
+    @classmethod
+    def blob_path(cls, sha256: str) -> str:
+        """
+        Monta o caminho, dentro do storage, do arquivo com o hash fornecido.
+        """
+        return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256}.pdf"
+
+    @classmethod
+    def store(cls, pdf: IO[bytes]) -> StoredBlob:
+        """
+        Armazena um único arquivo e conta uma referência para ele.
+        """
+        content = pdf.read()
+        return cls.store_many([partial(BytesIO, content)])[0]
+
+    @classmethod
+    def store_many(cls, sources: Sequence[BoletoSource], saved_files: Optional[List[str]] = None,
+                   uploader: Optional[BoletoUploader] = None) -> List[StoredBlob]:
+        """
+        Armazena vários arquivos, enviando ao storage só os conteúdos que ainda
+        não existem, e conta uma referência por arquivo fornecido.
+
+        Parâmetros:
+            - sources: Funções que abrem o conteúdo de cada arquivo.
+            - saved_files: Se fornecida, recebe os caminhos efetivamente enviados
+              ao storage, para que quem chamou possa removê-los se a transação falhar.
+            - uploader: Uploader usado para calcular os hashes e enviar os arquivos.
+
+        Retorna:
+            - List[StoredBlob]: Blob de cada arquivo, na mesma ordem de `sources`.
+        """
+        uploader = uploader or BoletoUploader()
+        digests = uploader.digest(sources)
+
+        blobs: Dict[str, StoredBlob] = {}
+        for qs in cls.REPOSITORY.filter_in_batches('sha256', {sha256 for sha256, _ in digests}):
+            for blob in qs:
+                blobs[blob.sha256] = blob
+
+        # Conteúdos repetidos dentro do mesmo lote também só são enviados uma vez
+        missing: Dict[str, int] = {}
+        for index, (sha256, _) in enumerate(digests):
+            if sha256 not in blobs:
+                missing.setdefault(sha256, index)
+
+        paths = uploader.upload([(cls.blob_path(sha256), sources[index]) for sha256, index in missing.items()])
+        uploaded = dict(zip(missing, paths))
+
+        try:
+            # Outra importação pode ter gravado o mesmo conteúdo depois da busca
+            # acima: o registro dela vence e o envio desta fica sobrando
+            cls.REPOSITORY.bulk_create([
+                StoredBlob(sha256=sha256, path=path, size=digests[missing[sha256]][1])
+                for sha256, path in uploaded.items()
+            ], ignore_conflicts=True)
+            for qs in cls.REPOSITORY.filter_in_batches('sha256', list(uploaded)):
+                for blob in qs:
+                    blobs[blob.sha256] = blob
+
+            redundant = [path for sha256, path in uploaded.items() if blobs[sha256].path != path]
+            kept = [path for sha256, path in uploaded.items() if blobs[sha256].path == path]
+            if saved_files is not None:
+                saved_files.extend(kept)
+            cls.discard(redundant, uploader)
+
+            shas_by_count: Dict[int, List[str]] = defaultdict(list)
+            for sha256, count in Counter(sha256 for sha256, _ in digests).items():
+                shas_by_count[count].append(sha256)
+            for count, shas in shas_by_count.items():
+                for qs in cls.REPOSITORY.filter_in_batches('sha256', shas):
+                    qs.update(refcount=F('refcount') + count)
+        except Exception:
+            if saved_files is None:
+                cls.discard(paths, uploader)
+            raise
+
+        lgr.debug(f"{len(digests)} arquivos armazenados, {len(paths)} enviados ao storage e {len(digests) - len(paths)} reaproveitados")
+        return [blobs[sha256] for sha256, _ in digests]
+
+    @classmethod
+    def discard(cls, paths: Sequence[str], uploader: Optional[BoletoUploader] = None) -> None:
+        """
+        Remove do storage arquivos enviados por uma operação que não foi
+        concluída, mantendo os que algum blob gravado referencia. Com o
+        storage sobrescrevendo arquivos, o envio de um conteúdo repetido cai
+        no mesmo caminho do blob de outra importação, e apagá-lo tiraria o PDF
+        dela.
+
+        Parâmetros:
+            - paths: Caminhos enviados ao storage.
+            - uploader: Uploader usado para remover os arquivos.
+        """
+        if not paths:
+            return
+
+        referenced = set()
+        for qs in cls.REPOSITORY.filter_in_batches('path', list(paths)):
+            referenced.update(qs.values_list('path', flat=True))
+        if referenced:
+            lgr.debug(f"{len(referenced)} arquivos enviados mantidos por serem usados por blobs gravados")
+
+        (uploader or BoletoUploader()).discard([path for path in paths if path not in referenced])
+
+    @classmethod
+    def release(cls, blob_id: int) -> None:
+        """
+        Devolve uma referência ao blob. Sem referências, o registro é removido
+        e o arquivo é apagado do storage depois que a transação for confirmada.
+        """
+        cls.REPOSITORY.filter(id=blob_id, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+        blob: Optional[StoredBlob] = cls.REPOSITORY.get(id=blob_id, refcount=0, silent=True)
+        if blob is None:
+            return
+
+        try:
+            blob.delete()
+        except ProtectedError:
+            lgr.error(f"Arquivo {blob.path} sem referências contadas ainda é usado por boletos; mantendo-o")
+            return
+
+        transaction.on_commit(partial(default_storage.delete, blob.path))
+        lgr.debug(f"Arquivo {blob.path} sem referências removido")
@@ -1,6 +1,6 @@
 from datetime import date
 import logging
-from typing import Dict, List, Optional
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
 from pydantic import BaseModel, PrivateAttr, computed_field
 
 from app.models import Creditor, Installment, User
@@ -15,8 +15,9 @@ class BoletoDTO(BaseModel):
 
     @classmethod
     def from_database(cls, boleto) -> "BoletoDTO":
+        # O nome salvo no FileField basta; `.path` consultaria o storage (e falha no S3)
         return cls(
-            path=boleto.pdf.path,
+            path=boleto.pdf.name,
             readonly=False,
         )
 
@@ -45,6 +46,19 @@ class InstallmentDTO(BaseModel):
             readonly=True,
         )
 
+    # Campos buscados com `.values()` pelo pré-carregamento da planilha
+    VALUES_FIELDS: ClassVar[Tuple[str, ...]] = ('agreement__number', 'number', 'due_date', 'boleto__pdf')
+
+    @classmethod
+    def from_values(cls, row: Dict[str, Any]) -> "InstallmentDTO":
+        return cls(
+            agreement_num=row['agreement__number'],
+            number=int(row['number']),
+            due_date=row['due_date'],
+            boleto=BoletoDTO(path=row['boleto__pdf'], readonly=True) if row['boleto__pdf'] else None,
+            readonly=True,
+        )
+
 
 class AgreementDTO(BaseModel):
     number: str
@@ -64,6 +78,18 @@ class AgreementDTO(BaseModel):
             readonly=True,
         )
 
+    VALUES_FIELDS: ClassVar[Tuple[str, ...]] = ('number', 'payer__user__cpf_cnpj', 'creditor__name')
+
+    @classmethod
+    def from_values(cls, row: Dict[str, Any]) -> "AgreementDTO":
+        return cls(
+            number=row['number'],
+            payer_cpf_cnpj=row['payer__user__cpf_cnpj'],
+            creditor_name=row['creditor__name'],
+            installments=[],
+            readonly=True,
+        )
+
 
 class UserDTO(BaseModel):
     cpf_cnpj: str
@@ -82,6 +108,8 @@ class PayerDTO(BaseModel):
     user: UserDTO
     phone: str
     agreements: List[AgreementDTO]
+    # Avisos do processamento referentes às linhas deste pagador
+    warnings: List[str] = []
 
     readonly: bool = False
 
@@ -95,6 +123,18 @@ class PayerDTO(BaseModel):
             readonly=True,
         )
 
+    VALUES_FIELDS: ClassVar[Tuple[str, ...]] = ('name', 'phone', 'user__cpf_cnpj')
+
+    @classmethod
+    def from_values(cls, row: Dict[str, Any]) -> "PayerDTO":
+        return cls(
+            name=row['name'],
+            user=UserDTO(cpf_cnpj=row['user__cpf_cnpj'], readonly=True),
+            phone=row['phone'],
+            agreements=[],
+            readonly=True,
+        )
+
 
 
 class CreditorDTO(BaseModel):
@@ -114,36 +154,75 @@ class CreditorDTO(BaseModel):
 class SpreadsheetDTO(BaseModel):
     payers: List[PayerDTO]
     _creditor_cache: Dict[str, CreditorDTO] = PrivateAttr(default_factory=dict)
+    # Índices do grafo de resultados, para que add_node não precise varrer listas.
+    # Acordos e parcelas são procurados só dentro do pagador, como nas listas:
+    # dois pagadores podem ter acordos com o mesmo número
+    _payer_index: Dict[str, PayerDTO] = PrivateAttr(default_factory=dict)
+    _agreement_index: Dict[Tuple[str, str], AgreementDTO] = PrivateAttr(default_factory=dict)
+    _installment_index: Dict[Tuple[str, str, int], InstallmentDTO] = PrivateAttr(default_factory=dict)
     errors: List[str]
     warnings: List[str]
+    # Linhas puladas por não terem mudado desde a última importação aprovada
+    unchanged_rows: int = 0
+
+    def model_post_init(self, __context) -> None:
+        self._reindex()
 
     @computed_field
     @property
     def creditors(self) -> List[CreditorDTO]:
         return list(self._creditor_cache.values())
 
+    def _reindex(self) -> None:
+        """
+        Reconstrói os índices a partir da lista de pagadores. Os índices não
+        são serializados, então precisam ser refeitos sempre que o grafo é
+        carregado de novo.
+        """
+        self._payer_index = {}
+        self._agreement_index = {}
+        self._installment_index = {}
+
+        for payer in self.payers:
+            document = payer.user.cpf_cnpj
+            self._payer_index.setdefault(document, payer)
+            for agreement in payer.agreements:
+                self._agreement_index.setdefault((document, agreement.number), agreement)
+                for installment in agreement.installments:
+                    self._installment_index.setdefault((document, agreement.number, installment.number), installment)
+
     def add_node(self, payer: PayerDTO, agreement: Optional[AgreementDTO] = None, installment: Optional[InstallmentDTO] = None):
         # Adiciona o pagador se não existir
-        existing_payer = next((p for p in self.payers if p.user.cpf_cnpj == payer.user.cpf_cnpj), None)
+        existing_payer = self._payer_index.get(payer.user.cpf_cnpj)
         if not existing_payer:
             self.payers.append(payer)
+            self._payer_index[payer.user.cpf_cnpj] = payer
             existing_payer = payer
 
         if agreement:
             # Adiciona o acordo se não existir
-            existing_agreement = next((a for a in existing_payer.agreements if a.number == agreement.number), None)
+            document = existing_payer.user.cpf_cnpj
+            existing_agreement = self._agreement_index.get((document, agreement.number))
             if not existing_agreement:
                 existing_payer.agreements.append(agreement)
+                self._agreement_index[(document, agreement.number)] = agreement
                 existing_agreement = agreement
 
             if installment:
                 # Adiciona a parcela se não existir
-                existing_installment = next((i for i in existing_agreement.installments if i.number == installment.number), None)
+                key = (document, existing_agreement.number, installment.number)
+                existing_installment = self._installment_index.get(key)
                 if not existing_installment:
                     existing_agreement.installments.append(installment)
+                    self._installment_index[key] = installment
                 elif installment.boleto:
                     existing_installment.boleto = installment.boleto  # Atualiza o boleto se a parcela já existir
 
+    def add_warning(self, message: str, payer: Optional[PayerDTO] = None):
+        self.warnings.append(message)
+        if payer is not None:
+            payer.warnings.append(message)
+
     def add_creditor(self, creditor: CreditorDTO):
         if creditor.name not in self._creditor_cache:
             self._creditor_cache[creditor.name] = creditor
@@ -153,11 +232,13 @@ class SpreadsheetDTO(BaseModel):
 
     @classmethod
     def from_json(cls, data: Dict) -> 'SpreadsheetDTO':
-        # Reconstrói o DTO a partir dos dados JSON
+        # Reconstrói o DTO a partir dos dados JSON. Os índices são refeitos
+        # em model_post_init, numa única passada pelo grafo
         dto = cls(
             payers=[PayerDTO(**payer) for payer in data.get('payers', [])],
             errors=data.get('errors', []),
             warnings=data.get('warnings', []),
+            unchanged_rows=data.get('unchanged_rows', 0),
         )
 
         # Reconstrói o cache de credores
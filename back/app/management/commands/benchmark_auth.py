@@ -0,0 +1,101 @@
+#  coding: utf-8
+import time
+from typing import Callable, Dict
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from app.controllers.auth_controller import AuthController
+from app.models import Payer, User
+from core.actor_cache import actor_cache
+from core.auth import AllowHumansAuth, token_cache
+
+DEFAULT_REQUESTS = 2000
+
+
+def measure(requests: int, authenticate: Callable[[], None], before_each: Callable[[], None] = lambda: None) -> Dict[str, float]:
+    """
+    Mede o tempo médio e as consultas ao banco de `requests` autenticações.
+    `before_each` roda antes de cada uma, fora da medição.
+    """
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    elapsed = 0.0
+    with connection.execute_wrapper(count_queries):
+        for _ in range(requests):
+            before_each()
+            start = time.perf_counter()
+            authenticate()
+            elapsed += time.perf_counter() - start
+
+    return {
+        "us_per_request": round(elapsed / requests * 1_000_000, 1),
+        "queries_per_request": round(queries / requests, 2),
+    }
+
+
+def run_benchmark(requests: int) -> Dict[str, Dict[str, float]]:
+    """
+    Autentica o mesmo token de um pagador `requests` vezes, como o portal faz
+    a cada chamada: sem caches (cada requisição verifica o token e busca o
+    usuário) e com os caches aquecidos.
+    """
+    user = User.objects.create(cpf_cnpj='00000000191')
+    Payer.objects.create(user=user, name='Pagador benchmark', phone='11999999999')
+    token = str(AuthController.get_token(user.id, 'user').access_token)
+
+    auth = AllowHumansAuth()
+    factory = RequestFactory()
+
+    def authenticate():
+        auth.authenticate(factory.get('/api/boleto/'), token)
+
+    def clear_caches():
+        actor_cache.clear()
+        token_cache.clear()
+
+    clear_caches()
+    results = {"sem cache": measure(requests, authenticate, before_each=clear_caches)}
+    clear_caches()
+    authenticate()
+    results["com cache"] = measure(requests, authenticate)
+    results["com cache"]["token_hit_rate"] = token_cache.stats()["hit_rate"]
+    results["com cache"]["actor_hit_rate"] = actor_cache.stats()["hit_rate"]
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o custo por requisição da autenticação JWT (verificação do token e busca do usuário), '
+        'sem e com os caches, num banco de teste descartável'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=DEFAULT_REQUESTS,
+            help='Quantidade de autenticações medidas em cada cenário',
+        )
+
+    def handle(self, *app_labels, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = run_benchmark(options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for scenario, metrics in results.items():
+            self.stdout.write(
+                f'{scenario:<10}  {metrics["us_per_request"]:>8.1f} µs/requisição  '
+                f'{metrics["queries_per_request"]:.2f} consultas/requisição'
+            )
+
+        before, after = results["sem cache"]["us_per_request"], results["com cache"]["us_per_request"]
+        self.stdout.write(self.style.SUCCESS(f'Autenticação {before / after:.1f}x mais rápida com os caches'))
@@ -0,0 +1,280 @@
+#  coding: utf-8
+import json
+import platform
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_results_controller import SpreadsheetResultsController
+from app.dtos import SpreadsheetDTO
+from app.models import Boleto, StoredBlob
+from app.schemas.spreadsheet_schemas import SaveSpreadsheetSchema
+from app.spreadsheet_progress import SpreadsheetProgress
+from app.spreadsheet_synthetic import synthetic_installments, write_boletos_zip, write_spreadsheet
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_TOLERANCE = 0.25
+
+# Abaixo destes valores a diferença entre duas execuções é ruído, não regressão
+MIN_SECONDS_DELTA = 0.05
+MIN_RSS_DELTA_MIB = 5.0
+
+Report = Dict[str, Dict[str, Any]]
+
+
+def _reset_peak_rss() -> None:
+    # No Linux, escrever "5" em clear_refs zera o pico de RSS (VmHWM) do processo
+    try:
+        Path('/proc/self/clear_refs').write_text('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mib() -> float:
+    try:
+        for line in Path('/proc/self/status').read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # Fora do Linux só há o pico do processo inteiro, que não pode ser zerado
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def measure_stage(report: Report, name: str) -> Iterator[None]:
+    """
+    Mede tempo, pico de RSS e quantidade de consultas ao banco do bloco `with`.
+    """
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    _reset_peak_rss()
+    start = time.perf_counter()
+    with connection.execute_wrapper(count_queries):
+        yield
+    report[name] = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mib": round(_peak_rss_mib(), 1),
+        "queries": queries,
+    }
+
+
+@contextmanager
+def scratch_storage() -> Iterator[Path]:
+    """
+    Troca o storage padrão por uma pasta temporária durante o bloco `with`:
+    os PDFs das importações sintéticas nunca vão para o storage configurado
+    (o bucket de produção, com USING_AWS). A pasta é apagada no fim.
+    """
+    with tempfile.TemporaryDirectory(prefix='benchmark-storage-') as location:
+        storages = {
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": location}},
+        }
+        with override_settings(STORAGES=storages):
+            yield Path(location)
+
+
+def approve_all(results: SpreadsheetDTO) -> SaveSpreadsheetSchema:
+    """
+    Monta o payload de aprovação que o painel enviaria sem remover nada.
+    """
+    data = results.model_dump(mode='json')
+    for creditor in data["creditors"]:
+        creditor["deleted"] = False
+    for payer in data["payers"]:
+        payer["deleted"] = False
+        for agreement in payer["agreements"]:
+            agreement["deleted"] = False
+            for installment in agreement["installments"]:
+                installment["deleted"] = False
+    return SaveSpreadsheetSchema.model_validate(data)
+
+
+def run_pipeline(rows: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Gera uma planilha sintética de `rows` linhas e passa por todas as etapas da
+    importação: processamento, gravação dos resultados para revisão e
+    gravação no banco.
+
+    Retorna:
+        - Dict[str, Any]: Métricas de cada etapa em "stages" e o tempo das
+          etapas internas do processamento em "process_stages".
+    """
+    operation_uuid = uuid4()
+    operation_path = SpreadsheetController.operation_path(operation_uuid)
+    operation_path.mkdir(parents=True)
+
+    stages: Report = {}
+    progress = SpreadsheetProgress()
+    try:
+        with measure_stage(stages, "generate"):
+            write_spreadsheet(operation_path / "spreadsheet.csv", synthetic_installments(rows, seed))
+            write_boletos_zip(SpreadsheetController.boletos_zip_path(operation_uuid), synthetic_installments(rows, seed))
+
+        with measure_stage(stages, "process"):
+            results = SpreadsheetController.process_spreadsheet(operation_uuid, progress)
+
+        with measure_stage(stages, "write_results"):
+            SpreadsheetResultsController.write(operation_path, results)
+
+        with measure_stage(stages, "save"):
+            SpreadsheetController.save_results_to_database(str(operation_uuid), approve_all(results))
+    finally:
+        shutil.rmtree(operation_path, ignore_errors=True)
+
+    return {
+        "stages": stages,
+        "process_stages": {name: round(seconds, 3) for name, seconds in progress.stages.items()},
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Compara duas execuções e descreve as regressões encontradas.
+
+    Tempo e memória só contam como regressão acima da tolerância relativa e
+    de um mínimo absoluto; a quantidade de consultas é determinística, então
+    qualquer aumento conta.
+    """
+    regressions = []
+    for rows, run in current["runs"].items():
+        base_run = baseline.get("runs", {}).get(rows)
+        if base_run is None:
+            continue
+
+        for stage, metrics in run["stages"].items():
+            base = base_run["stages"].get(stage)
+            if base is None:
+                continue
+
+            checks = (
+                ("seconds", "s", MIN_SECONDS_DELTA, tolerance),
+                ("peak_rss_mib", " MiB", MIN_RSS_DELTA_MIB, tolerance),
+                ("queries", " consultas", 0, 0.0),
+            )
+            for metric, unit, min_delta, relative in checks:
+                before, after = base[metric], metrics[metric]
+                if after - before > max(min_delta, before * relative):
+                    regressions.append(f"{rows} linhas, etapa {stage}: {metric} foi de {before}{unit} para {after}{unit}")
+
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede tempo, pico de memória e consultas de cada etapa da importação de planilhas '
+        'com planilhas sintéticas, num banco de teste descartável'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=DEFAULT_ROWS,
+            help='Tamanhos das planilhas sintéticas, em linhas',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Semente do gerador de planilhas',
+        )
+        parser.add_argument(
+            '--save',
+            type=Path,
+            help='Grava as medições neste arquivo JSON, para servir de base em execuções futuras',
+        )
+        parser.add_argument(
+            '--baseline',
+            type=Path,
+            help='Compara as medições com este arquivo JSON e falha se houver regressão',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=DEFAULT_TOLERANCE,
+            help='Aumento relativo de tempo ou memória tolerado em relação à base',
+        )
+
+    def handle(self, *app_labels, **options):
+        baseline = None
+        if options['baseline']:
+            baseline = json.loads(options['baseline'].read_text(encoding='utf-8'))
+
+        current = {
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "database": connection.vendor,
+            "seed": options['seed'],
+            "runs": {},
+        }
+
+        # As importações sintéticas vão para um banco de teste e um storage
+        # temporário, nunca para os configurados
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with scratch_storage():
+                for rows in options['rows']:
+                    self.stdout.write(f'\n{rows} linhas')
+                    run = run_pipeline(rows, options['seed'])
+                    current["runs"][str(rows)] = run
+                    self._write_run(run)
+                    self._reset_database()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['save']:
+            options['save'].write_text(json.dumps(current, indent=2), encoding='utf-8')
+            self.stdout.write(f'\nMedições gravadas em {options["save"]}')
+
+        if baseline is not None:
+            regressions = compare(baseline, current, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressões em relação à base:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'\nSem regressões em relação a {options["baseline"]}'))
+
+    def _write_run(self, run: Dict[str, Any]) -> None:
+        table = [('etapa', 'tempo', 'pico RSS', 'consultas')]
+        for stage, metrics in run["stages"].items():
+            table.append((stage, f'{metrics["seconds"]:.3f}s', f'{metrics["peak_rss_mib"]:.1f} MiB', str(metrics["queries"])))
+        for stage, seconds in run["process_stages"].items():
+            table.append((f'  process/{stage}', f'{seconds:.3f}s', '', ''))
+
+        widths = [max(len(row[i]) for row in table) for i in range(4)]
+        for label, *values in table:
+            self.stdout.write(f'{label:<{widths[0]}}  ' + '  '.join(f'{value:>{width}}' for value, width in zip(values, widths[1:])))
+
+    def _reset_database(self) -> None:
+        # Os PDFs gravados pela etapa "save" ficariam no storage temporário até o
+        # fim do comando; apagá-los a cada tamanho limita o espaço ocupado
+        for qs in (Boleto.objects.values_list('pdf', flat=True), StoredBlob.objects.values_list('path', flat=True)):
+            for name in qs.iterator():
+                if name:
+                    default_storage.delete(name)
+
+        # Cada tamanho começa do banco vazio; senão o registro de importações
+        # pularia as linhas que a execução anterior já gravou
+        call_command('flush', interactive=False, verbosity=0)
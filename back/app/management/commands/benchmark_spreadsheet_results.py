@@ -0,0 +1,139 @@
+#  coding: utf-8
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Tuple, TypeVar
+
+from django.core.management.base import BaseCommand
+
+from app.controllers.spreadsheet_results_controller import INDEX_FILE, MESSAGES_FILE, SpreadsheetResultsController
+from app.dtos import AgreementDTO, BoletoDTO, CreditorDTO, InstallmentDTO, PayerDTO, SpreadsheetDTO, UserDTO
+from app.schemas.spreadsheet_schemas import SpreadsheetResultsQuery
+
+T = TypeVar('T')
+
+INSTALLMENTS_PER_AGREEMENT = 4
+CREDITORS = 10
+LEGACY_FILE = 'results.json'
+
+
+def timed(func: Callable[[], T]) -> Tuple[T, float]:
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def synthetic_results(rows: int) -> SpreadsheetDTO:
+    """
+    Monta um resultado de processamento com `rows` parcelas, no formato que uma
+    planilha real gera: um acordo por pagador e algumas parcelas por acordo.
+    """
+    creditors = [CreditorDTO(name=f'Credor {i}', reissue_margin=5) for i in range(CREDITORS)]
+    first_due_date = date(2025, 1, 10)
+
+    payers = []
+    for p in range(-(-rows // INSTALLMENTS_PER_AGREEMENT)):
+        cpf_cnpj = f'{p:011d}'
+        creditor = creditors[p % CREDITORS].name
+        agreement_num = f'{p:08d}'
+        installments = [
+            InstallmentDTO(
+                agreement_num=agreement_num,
+                number=n,
+                due_date=first_due_date + timedelta(days=30 * (n - 1)),
+                boleto=BoletoDTO(path=f'boletos/{creditor}/{agreement_num}_{n}.pdf'),
+            )
+            for n in range(1, min(INSTALLMENTS_PER_AGREEMENT, rows - p * INSTALLMENTS_PER_AGREEMENT) + 1)
+        ]
+        payers.append(PayerDTO(
+            name=f'Pagador {p}',
+            user=UserDTO(cpf_cnpj=cpf_cnpj),
+            phone=cpf_cnpj,
+            agreements=[AgreementDTO(
+                number=agreement_num,
+                payer_cpf_cnpj=cpf_cnpj,
+                creditor_name=creditor,
+                installments=installments,
+            )],
+            warnings=['Boleto não encontrado'] if p % 50 == 0 else [],
+            readonly=p % 3 == 0,
+        ))
+
+    return SpreadsheetDTO(payers=payers, creditors=creditors, errors=[], warnings=[])
+
+
+class Command(BaseCommand):
+    help = 'Compara o formato antigo (results.json) e o atual dos resultados de planilha em tempo e tamanho'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100_000,
+            help='Quantidade de linhas (parcelas) da planilha sintética',
+        )
+        parser.add_argument(
+            '--memory',
+            action='store_true',
+            help='Mede também o pico de memória da gravação (mais lento, roda a gravação de novo com tracemalloc)',
+        )
+
+    def handle(self, *app_labels, **options):
+        rows = options['rows']
+        results, build_time = timed(lambda: synthetic_results(rows))
+        self.stdout.write(f'{rows} linhas, {len(results.payers)} pagadores (montados em {build_time:.2f}s)\n')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_path = Path(tmp) / 'legado'
+            current_path = Path(tmp) / 'atual'
+            legacy_path.mkdir()
+            current_path.mkdir()
+
+            def write_legacy():
+                results_json = results.model_dump(mode='json')
+                (legacy_path / LEGACY_FILE).write_bytes(json.dumps(results_json, ensure_ascii=False, indent=2).encode('utf-8'))
+
+            def load_legacy():
+                with (legacy_path / LEGACY_FILE).open('r', encoding='utf-8') as f:
+                    return SpreadsheetDTO.from_json(json.load(f))
+
+            _, legacy_write = timed(write_legacy)
+            _, legacy_load = timed(load_legacy)
+            legacy_size = (legacy_path / LEGACY_FILE).stat().st_size
+
+            _, current_write = timed(lambda: SpreadsheetResultsController.write(current_path, results))
+            _, current_load = timed(lambda: SpreadsheetResultsController.load_all(current_path))
+            _, current_page = timed(lambda: SpreadsheetResultsController.load_page(current_path, SpreadsheetResultsQuery(page=1)))
+            current_size = (
+                SpreadsheetResultsController.results_file(current_path).stat().st_size
+                + (current_path / INDEX_FILE).stat().st_size
+                + (current_path / MESSAGES_FILE).stat().st_size
+            )
+
+            table = [
+                ('', LEGACY_FILE, 'atual'),
+                ('gravação', f'{legacy_write:.2f}s', f'{current_write:.2f}s'),
+                ('carga completa', f'{legacy_load:.2f}s', f'{current_load:.2f}s'),
+                ('carga de uma página', f'{legacy_load:.2f}s', f'{current_page:.3f}s'),
+                ('tamanho', f'{legacy_size / 2**20:.1f} MiB', f'{current_size / 2**20:.1f} MiB'),
+            ]
+            if options['memory']:
+                legacy_peak = peak_memory(write_legacy)
+                current_peak = peak_memory(lambda: SpreadsheetResultsController.write(current_path, results))
+                table.append(('pico de memória na gravação', f'{legacy_peak / 2**20:.1f} MiB', f'{current_peak / 2**20:.1f} MiB'))
+
+            width = max(len(label) for label, _, _ in table)
+            for label, legacy, current in table:
+                self.stdout.write(f'{label:<{width}}  {legacy:>12}  {current:>12}')
@@ -0,0 +1,60 @@
+#  coding: utf-8
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.controllers.sms_controller import SmsController
+from app.sms_api import get_provider
+from config import SMS_DISPATCH_CONCURRENCY
+
+
+lgr = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Envia os SMS enfileirados pela API, tentando de novo os que falharem'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Envia o que estiver na fila e encerra, em vez de ficar aguardando novas mensagens',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=0.5,
+            help='Segundos de espera entre consultas à fila quando ela está vazia',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=SMS_DISPATCH_CONCURRENCY,
+            help='Quantidade máxima de SMS enviados ao mesmo tempo',
+        )
+
+    def handle(self, *app_labels, **options):
+        once = options['once']
+        poll_interval = options['poll_interval']
+        concurrency = options['concurrency']
+
+        # Um só provedor (e sessão HTTP) para todo o tempo de vida do comando
+        provider = get_provider(concurrency)
+        lgr.info("Dispatcher de SMS iniciado")
+        try:
+            while True:
+                result = SmsController.dispatch_pending(provider, concurrency=concurrency)
+                if any(result):
+                    self.stdout.write(
+                        f'{result.sent} SMS enviado(s), {result.retried} reagendado(s), {result.failed} descartado(s)'
+                    )
+
+                if once:
+                    return
+
+                # Com a fila cheia, a próxima rodada começa logo
+                if not any(result):
+                    time.sleep(poll_interval)
+        finally:
+            provider.close()
@@ -0,0 +1,21 @@
+#  coding: utf-8
+from django.core.management.base import BaseCommand
+
+from app.controllers.installment_controller import InstallmentController
+
+
+class Command(BaseCommand):
+    help = 'Remove as parcelas vencidas com boleto não pago, junto com seus boletos e PDFs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Parcelas removidas por transação (padrão: OVERDUE_PURGE_BATCH_SIZE)',
+        )
+
+    def handle(self, *app_labels, **options):
+        result = InstallmentController.remove_overdue_installments(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.installments} parcelas vencidas removidas, com {result.boletos} boletos e {result.files} PDFs'
+        ))
@@ -0,0 +1,36 @@
+#  coding: utf-8
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from app.controllers.spreadsheet_job_controller import SpreadsheetJobController
+
+
+class Command(BaseCommand):
+    help = 'Remove as pastas de operações de planilha abandonadas, das mais antigas para as mais novas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours',
+            type=float,
+            help='Idade máxima, em horas, de uma pasta sem atividade (padrão: SPREADSHEET_OPERATION_TTL_SECONDS)',
+        )
+        parser.add_argument(
+            '--max-bytes',
+            type=int,
+            help='Espaço máximo ocupado pelas pastas de operações; 0 desliga o limite (padrão: SPREADSHEET_OPERATIONS_MAX_BYTES)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Só mostra quanto seria removido',
+        )
+
+    def handle(self, *app_labels, **options):
+        max_age = timedelta(hours=options['max_age_hours']) if options['max_age_hours'] is not None else None
+        result = SpreadsheetJobController.reap_operations(max_age=max_age, max_bytes=options['max_bytes'], dry_run=options['dry_run'])
+
+        verb = 'seriam removidas' if options['dry_run'] else 'removidas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.directories} pastas de operações {verb}, {result.bytes / 2**20:.1f} MiB'
+        ))
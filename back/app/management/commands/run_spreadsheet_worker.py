@@ -0,0 +1,46 @@
+#  coding: utf-8
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.controllers.periodic_task_controller import PeriodicTaskController
+from app.controllers.spreadsheet_job_controller import SpreadsheetJobController
+
+
+lgr = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Executa os processamentos de planilha enfileirados pela API e as tarefas periódicas de manutenção'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Executa o que estiver na fila e encerra, em vez de ficar aguardando novos processamentos',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Segundos de espera entre consultas à fila quando ela está vazia',
+        )
+
+    def handle(self, *app_labels, **options):
+        once = options['once']
+        poll_interval = options['poll_interval']
+
+        lgr.info("Worker de planilhas iniciado")
+        while True:
+            # Tarefas de manutenção (ver app/tasks.py) rodam aqui, fora das importações
+            PeriodicTaskController.run_due()
+
+            executed = SpreadsheetJobController.run_pending()
+            if executed:
+                self.stdout.write(self.style.SUCCESS(f'{executed} processamento(s) de planilha executado(s)'))
+
+            if once:
+                return
+
+            time.sleep(poll_interval)
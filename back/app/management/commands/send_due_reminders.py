@@ -0,0 +1,47 @@
+#  coding: utf-8
+from django.core.management.base import BaseCommand
+
+from app.controllers.due_reminder_controller import DueReminderController
+from config import DUE_REMINDER_BATCH_SIZE, DUE_REMINDER_DAYS
+
+
+class Command(BaseCommand):
+    help = (
+        'Enfileira SMS de lembrete para os pagadores com parcelas que vencem nos próximos dias. '
+        'Parcelas já lembradas não são lembradas de novo; o envio é feito pelo comando dispatch_sms'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=DUE_REMINDER_DAYS,
+            help='Lembra as parcelas que vencem de hoje até daqui a esta quantidade de dias',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DUE_REMINDER_BATCH_SIZE,
+            help='Quantidade de telefones gravados por transação',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Só mostra quantos lembretes seriam enfileirados',
+        )
+
+    def handle(self, *app_labels, **options):
+        result = DueReminderController.enqueue_reminders(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+
+        verb = 'seriam enfileirados' if options['dry_run'] else 'enfileirados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.messages} lembrete(s) {verb} para {result.installments} parcela(s)'
+        ))
+        if result.skipped:
+            self.stdout.write(self.style.WARNING(
+                f'{result.skipped} parcela(s) já lembrada(s) por outra execução'
+            ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_spreadsheet_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportLedgerEntry',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agreement_number', models.CharField(db_index=True, max_length=255)),
+                ('installment_number', models.IntegerField()),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('boleto_crc', models.BigIntegerField()),
+                ('boleto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entry', to='app.boleto')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_stored_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spreadsheetjob',
+            name='progress',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_spreadsheet_job_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpreadsheetCommitCheckpoint',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('creditor', 'Creditor'), ('payer', 'Payer')], max_length=10)),
+                ('key', models.CharField(max_length=255)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commit_checkpoints', to='app.spreadsheetjob')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job', 'kind', 'key'), name='unique_spreadsheet_commit_checkpoint')],
+            },
+        ),
+    ]
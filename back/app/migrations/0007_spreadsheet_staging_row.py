@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_spreadsheet_commit_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpreadsheetStagingRow',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('operation', models.UUIDField(db_index=True)),
+                ('line', models.IntegerField()),
+                ('cpf_cnpj', models.CharField(max_length=255)),
+                ('creditor_name', models.CharField(max_length=255)),
+                ('agreement_number', models.CharField(max_length=255)),
+                ('installment_number', models.CharField(max_length=255)),
+                ('due_date', models.DateField(null=True)),
+                ('has_boleto', models.BooleanField()),
+                ('replace_boleto', models.BooleanField(default=False)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-18 16:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_sms_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstallmentReminder',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='smsmessage',
+            name='sms_pending_idx',
+        ),
+        migrations.AddField(
+            model_name='smsmessage',
+            name='priority',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='boleto',
+            index=models.Index(fields=['status', 'installment'], name='boleto_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='installment',
+            index=models.Index(fields=['due_date'], name='installment_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['status', '-priority', 'next_attempt_at'], name='sms_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='installmentreminder',
+            name='installment',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reminder', to='app.installment'),
+        ),
+        migrations.AddField(
+            model_name='installmentreminder',
+            name='sms',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminders', to='app.smsmessage'),
+        ),
+    ]
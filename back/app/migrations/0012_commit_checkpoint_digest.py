@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_due_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spreadsheetcommitcheckpoint',
+            name='digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
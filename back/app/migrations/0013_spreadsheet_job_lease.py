@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_commit_checkpoint_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spreadsheetjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='spreadsheetjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_spreadsheet_job_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spreadsheetjob',
+            name='approving_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
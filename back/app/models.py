@@ -5,6 +5,7 @@ import unidecode
 
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
+from django.utils import timezone
 
 
 class BaseModel(models.Model):
@@ -227,6 +228,11 @@ class Installment(BaseModel):
     agreement = models.ForeignKey(Agreement, on_delete=models.CASCADE, related_name='installments')
     due_date = models.DateField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['due_date'], name='installment_due_date_idx'),
+        ]
+
     @property
     def slug_name(self):
         """
@@ -242,6 +248,28 @@ class Installment(BaseModel):
         ...
 
 
+class StoredBlob(BaseModel):
+    """
+        Representa um arquivo gravado no storage pelo SHA-256 do seu conteúdo,
+        usado quando BOLETO_CONTENT_ADDRESSED está ligado.
+
+        Atributos:
+            - sha256: Hash do conteúdo, em hexadecimal.
+            - path: Caminho do arquivo no storage.
+            - size: Tamanho do arquivo, em bytes.
+            - refcount: Quantidade de boletos que usam o arquivo. Quando chega
+            a zero, o registro e o arquivo são removidos.
+    """
+    READABLE_NAME = 'Arquivo armazenado'
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.path
+
+
 class Boleto(BaseModel):
     """
         Representa um Boleto.
@@ -250,6 +278,8 @@ class Boleto(BaseModel):
             - pdf: Caminho do PDF do boleto no sistema.
             - installment: Parcela atrelada ao boleto.
             - status: Status do boleto (Pendente, Pago).
+            - blob: Arquivo compartilhado que guarda o PDF, quando ele foi
+            gravado endereçado pelo conteúdo.
     """
     READABLE_NAME = 'Boleto'
     class Status(str, Enum):
@@ -264,6 +294,12 @@ class Boleto(BaseModel):
         choices=[(status.value, status.name.capitalize()) for status in Status],
         default=Status.PENDING.value,
     )
+    blob = models.ForeignKey(StoredBlob, null=True, blank=True, on_delete=models.PROTECT, related_name='boletos')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'installment'], name='boleto_status_idx'),
+        ]
 
     def dict(self, *args, **kwargs):
         """
@@ -352,3 +388,258 @@ class LoginHistory(BaseModel):
             return f"{self.user.payer.name} - {self.timestamp}"
         else:
             return f"{self.user} - {self.timestamp}"
+
+
+class SpreadsheetJob(BaseModel):
+    """
+        Representa o processamento de uma planilha, executado em segundo plano
+        pelo comando `run_spreadsheet_worker`.
+
+        Atributos:
+            - uuid: Identificador da operação. Também nomeia a pasta da
+            operação dentro de MEDIA_ROOT.
+            - status: Situação do processamento (na fila, executando,
+            concluído, falhou).
+            - message: Mensagem final do processamento ou o erro ocorrido.
+            - has_results: Se o processamento gerou resultados para revisão.
+            - started_at: Quando um worker começou a executar o processamento.
+            - heartbeat_at: Último sinal de vida do worker que executa o
+            processamento. Um processamento em execução sem sinal de vida há
+            mais que SPREADSHEET_JOB_LEASE_SECONDS é de um worker que caiu.
+            - attempts: Quantas vezes o processamento já foi reservado por um worker.
+            - approving_at: Enquanto os resultados são aprovados e gravados no
+            banco, último sinal de vida da aprovação. A pasta da operação não é
+            removida durante a aprovação.
+            - finished_at: Quando o processamento terminou.
+            - progress: Último retrato do andamento publicado pelo worker:
+            etapa atual, contadores de linhas e tempo gasto por etapa.
+    """
+    class Status(str, Enum):
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    READABLE_NAME = 'Processamento de planilha'
+    uuid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(
+        max_length=10,
+        choices=[(status.value, status.name.capitalize()) for status in Status],
+        default=Status.QUEUED.value,
+        db_index=True,
+    )
+    message = models.TextField(blank=True, default='')
+    has_results = models.BooleanField(default=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    approving_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.uuid} ({self.status})"
+
+
+class ImportLedgerEntry(BaseModel):
+    """
+        Registra como estava, na última importação aprovada, a linha da
+        planilha que gerou um boleto. Reimportações comparam cada linha com o
+        registro e pulam as que não mudaram.
+
+        Atributos:
+            - boleto: Boleto gravado a partir da linha. Se o boleto for
+            removido ou substituído, o registro vai junto e a linha volta a
+            ser processada normalmente.
+            - agreement_number: Número do acordo da linha.
+            - installment_number: Número da parcela da linha.
+            - fingerprint: Hash dos campos normalizados da linha.
+            - boleto_crc: CRC32 do PDF do boleto dentro do ZIP enviado.
+    """
+    READABLE_NAME = 'Registro de importação'
+    boleto = models.OneToOneField(Boleto, on_delete=models.CASCADE, related_name='ledger_entry')
+    agreement_number = models.CharField(max_length=255, db_index=True)
+    installment_number = models.IntegerField()
+    fingerprint = models.CharField(max_length=32)
+    boleto_crc = models.BigIntegerField()
+
+
+class SpreadsheetCommitCheckpoint(BaseModel):
+    """
+        Marca um item do resultado de um processamento que já foi gravado no
+        banco. A gravação dos resultados acontece em lotes; se ela falhar no
+        meio, a próxima tentativa pula o que já tem checkpoint.
+
+        Atributos:
+            - job: Processamento cujos resultados estão sendo gravados.
+            - kind: Tipo do item (credor ou pagador).
+            - key: Nome do credor ou CPF/CNPJ do pagador, como veio no resultado.
+            - digest: SHA-256 do item aprovado, como foi gravado. Uma nova
+              tentativa com o item diferente é recusada, em vez de pular a
+              diferença.
+    """
+    class Kind(str, Enum):
+        CREDITOR = 'creditor'
+        PAYER = 'payer'
+
+    READABLE_NAME = 'Checkpoint de gravação'
+    job = models.ForeignKey(SpreadsheetJob, on_delete=models.CASCADE, related_name='commit_checkpoints')
+    kind = models.CharField(
+        max_length=10,
+        choices=[(kind.value, kind.name.capitalize()) for kind in Kind],
+    )
+    key = models.CharField(max_length=255)
+    digest = models.CharField(max_length=64, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'kind', 'key'], name='unique_spreadsheet_commit_checkpoint'),
+        ]
+
+
+
+class SpreadsheetStagingRow(BaseModel):
+    """
+        Linha de um bloco da planilha carregada temporariamente no banco, para
+        que a diferença entre o bloco e o que já está gravado seja calculada
+        com joins. As linhas de um bloco são removidas assim que ele é resolvido.
+
+        Atributos:
+            - operation: Operação cuja planilha está sendo processada.
+            - line: Número da linha na planilha.
+            - cpf_cnpj: CPF/CNPJ do pagador da linha.
+            - creditor_name: Nome do credor da linha.
+            - agreement_number: Número do acordo da linha.
+            - installment_number: Número da parcela da linha, como texto, para
+            comparar com o número gravado na parcela.
+            - due_date: Vencimento da linha, se estiver em um formato válido.
+            - has_boleto: Se o ZIP enviado tem o PDF da parcela.
+            - replace_boleto: Se o PDF do ZIP deve substituir o boleto gravado.
+    """
+    READABLE_NAME = 'Linha de planilha em staging'
+    operation = models.UUIDField(db_index=True)
+    line = models.IntegerField()
+    cpf_cnpj = models.CharField(max_length=255)
+    creditor_name = models.CharField(max_length=255)
+    agreement_number = models.CharField(max_length=255)
+    installment_number = models.CharField(max_length=255)
+    due_date = models.DateField(null=True)
+    has_boleto = models.BooleanField()
+    replace_boleto = models.BooleanField(default=False)
+
+
+class PeriodicTaskRun(BaseModel):
+    """
+        Última execução de uma tarefa periódica do worker (ver app/tasks.py).
+        A reserva de uma execução é uma troca condicional de `last_started_at`,
+        então vários workers não executam a mesma tarefa ao mesmo tempo.
+
+        Atributos:
+            - name: Nome da tarefa no registro.
+            - last_started_at: Quando a última execução começou.
+            - last_finished_at: Quando a última execução terminou.
+            - last_result: Retorno da última execução, ou o erro ocorrido.
+    """
+    READABLE_NAME = 'Execução de tarefa periódica'
+    name = models.CharField(max_length=255, unique=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_result = models.JSONField(default=dict, blank=True)
+
+
+class ChunkedUpload(BaseModel):
+    """
+        Arquivo grande enviado em partes (o ZIP de boletos, por exemplo). As
+        partes são gravadas direto no arquivo em disco, na posição indicada
+        pelo cliente, então uma conexão que cai só perde a parte em andamento.
+
+        Atributos:
+            - uuid: Identificador público do envio.
+            - filename: Nome original do arquivo.
+            - size: Tamanho total declarado na criação, em bytes.
+            - received: Quantidade de bytes já gravados a partir do início do arquivo.
+            - sha256: Hash do arquivo completo, calculado na finalização.
+            - status: Situação do envio (recebendo partes, completo).
+    """
+    class Status(str, Enum):
+        UPLOADING = 'uploading'
+        COMPLETE = 'complete'
+
+    READABLE_NAME = 'Envio em partes'
+    uuid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(
+        max_length=10,
+        choices=[(status.value, status.name.capitalize()) for status in Status],
+        default=Status.UPLOADING.value,
+    )
+
+
+class SmsMessage(BaseModel):
+    """
+        SMS na fila de envio. A API só grava a mensagem; quem envia é o comando
+        `dispatch_sms`, que tenta de novo, com espera crescente, as que falharem.
+
+        Atributos:
+            - phone: Telefone de destino, só com dígitos.
+            - message: Texto da mensagem.
+            - status: Situação do envio (na fila, enviando, enviada, falhou).
+            - priority: Mensagens de prioridade maior saem antes, para que um
+            código de login não espere atrás de um lote de lembretes.
+            - attempts: Quantidade de tentativas de envio já feitas.
+            - next_attempt_at: A partir de quando a mensagem pode ser enviada.
+            Enquanto ela está sendo enviada, é o prazo depois do qual outro
+            dispatcher pode assumi-la.
+            - expires_at: Depois deste momento a mensagem perde o sentido (o
+            código de login expirou) e não é mais enviada.
+            - sent_at: Momento em que o provedor aceitou a mensagem.
+            - last_error: Erro da última tentativa que falhou.
+    """
+    class Status(str, Enum):
+        QUEUED = 'queued'
+        SENDING = 'sending'
+        SENT = 'sent'
+        FAILED = 'failed'
+
+    class Priority:
+        NORMAL = 0
+        HIGH = 10
+
+    READABLE_NAME = 'SMS'
+    phone = models.CharField(max_length=20)
+    message = models.TextField()
+    status = models.CharField(
+        max_length=10,
+        choices=[(status.value, status.name.capitalize()) for status in Status],
+        default=Status.QUEUED.value,
+    )
+    priority = models.SmallIntegerField(default=Priority.NORMAL)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'next_attempt_at'], name='sms_pending_idx'),
+        ]
+
+
+class InstallmentReminder(BaseModel):
+    """
+        Registro de que o pagador já foi lembrado do vencimento de uma parcela.
+        Impede que o lembrete seja enviado de novo quando o comando
+        `send_due_reminders` roda mais de uma vez.
+
+        Atributos:
+            - installment: Parcela lembrada.
+            - sms: Mensagem que levou o lembrete; uma mensagem pode cobrir
+            várias parcelas do mesmo telefone.
+    """
+    READABLE_NAME = 'Lembrete de vencimento'
+    installment = models.OneToOneField(Installment, on_delete=models.CASCADE, related_name='reminder')
+    sms = models.ForeignKey(SmsMessage, null=True, on_delete=models.SET_NULL, related_name='reminders')
@@ -1,15 +1,21 @@
 import logging
+from django.db import connection
 from django.db.models.query import QuerySet
 from django.core.exceptions import FieldError
 
-from typing import Dict, Generic, List, Optional, Type, TypeVar
+from typing import Dict, Generic, Iterable, Iterator, List, Optional, Type, TypeVar
 from app.exceptions import HttpFriendlyException
 from app.models import BaseModel, SoftDeleteModel
+from app.utils import chunked
 
 
 lgr = logging.getLogger(__name__)
 T = TypeVar("T", bound=BaseModel)
 
+# Folga para os demais parâmetros da query quando o lote de um `__in` é
+# limitado pelo máximo de variáveis do banco
+RESERVED_QUERY_PARAMS = 50
+
 class BaseRepository(Generic[T]):
     """
     Classe base para repositórios.
@@ -166,3 +172,57 @@ class BaseRepository(Generic[T]):
             - bool: Verdadeiro se a instância existir, falso caso contrário.
         """
         return cls.model.objects.filter(**kwargs).exists()
+
+    @classmethod
+    def bulk_create(cls, instances: List[T], ignore_conflicts: bool = False) -> List[T]:
+        """
+        Insere várias instâncias do modelo em lote. As instâncias retornadas
+        já possuem as chaves primárias preenchidas, exceto com `ignore_conflicts`.
+
+        Parâmetros:
+            - instances: Instâncias do modelo ainda não salvas.
+            - ignore_conflicts: Se verdadeiro, as instâncias que violariam uma
+              restrição de unicidade são ignoradas em vez de gerar erro.
+
+        Retorna:
+            - Lista com as instâncias criadas.
+        """
+        if not instances:
+            return []
+        return cls.model.objects.bulk_create(instances, ignore_conflicts=ignore_conflicts)
+
+    @classmethod
+    def bulk_update(cls, instances: List[T], fields: List[str]) -> int:
+        """
+        Grava em lote os campos informados de várias instâncias já salvas.
+
+        Parâmetros:
+            - instances: Instâncias do modelo com os novos valores.
+            - fields: Campos que devem ser gravados.
+
+        Retorna:
+            - int: Quantidade de registros atualizados.
+        """
+        if not instances:
+            return 0
+        return cls.model.objects.bulk_update(instances, fields)
+
+    @classmethod
+    def filter_in_batches(cls, field: str, values: Iterable, **kwargs) -> Iterator[QuerySet[T]]:
+        """
+        Divide um filtro `field__in=values` em lotes que respeitam o limite de
+        parâmetros por query do banco (o SQLite, por exemplo, aceita poucos).
+
+        Parâmetros:
+            - field: Campo (ou caminho de relacionamento) a ser filtrado.
+            - values: Valores aceitos para o campo.
+            - kwargs: Filtros adicionais aplicados a todos os lotes.
+
+        Retorna:
+            - Iterator com um QuerySet por lote.
+        """
+        max_params = connection.features.max_query_params
+        batch_size = max(max_params - RESERVED_QUERY_PARAMS, 1) if max_params else 10000
+
+        for batch in chunked(values, batch_size):
+            yield cls.model.objects.filter(**{f"{field}__in": batch}, **kwargs)
@@ -0,0 +1,6 @@
+from app.models import ChunkedUpload
+from app.repositories import BaseRepository
+
+
+class ChunkedUploadRepository(BaseRepository[ChunkedUpload]):
+    model = ChunkedUpload
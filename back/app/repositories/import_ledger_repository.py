@@ -0,0 +1,6 @@
+from app.models import ImportLedgerEntry
+from app.repositories import BaseRepository
+
+
+class ImportLedgerRepository(BaseRepository[ImportLedgerEntry]):
+    model = ImportLedgerEntry
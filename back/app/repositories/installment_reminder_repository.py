@@ -0,0 +1,6 @@
+from app.models import InstallmentReminder
+from app.repositories import BaseRepository
+
+
+class InstallmentReminderRepository(BaseRepository[InstallmentReminder]):
+    model = InstallmentReminder
\ No newline at end of file
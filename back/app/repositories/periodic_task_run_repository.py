@@ -0,0 +1,6 @@
+from app.models import PeriodicTaskRun
+from app.repositories import BaseRepository
+
+
+class PeriodicTaskRunRepository(BaseRepository[PeriodicTaskRun]):
+    model = PeriodicTaskRun
@@ -0,0 +1,6 @@
+from app.models import SmsMessage
+from app.repositories import BaseRepository
+
+
+class SmsMessageRepository(BaseRepository[SmsMessage]):
+    model = SmsMessage
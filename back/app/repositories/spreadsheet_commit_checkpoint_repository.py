@@ -0,0 +1,6 @@
+from app.models import SpreadsheetCommitCheckpoint
+from app.repositories import BaseRepository
+
+
+class SpreadsheetCommitCheckpointRepository(BaseRepository[SpreadsheetCommitCheckpoint]):
+    model = SpreadsheetCommitCheckpoint
@@ -0,0 +1,6 @@
+from app.models import SpreadsheetJob
+from app.repositories import BaseRepository
+
+
+class SpreadsheetJobRepository(BaseRepository[SpreadsheetJob]):
+    model = SpreadsheetJob
@@ -0,0 +1,6 @@
+from app.models import SpreadsheetStagingRow
+from app.repositories import BaseRepository
+
+
+class SpreadsheetStagingRepository(BaseRepository[SpreadsheetStagingRow]):
+    model = SpreadsheetStagingRow
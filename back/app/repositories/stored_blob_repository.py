@@ -0,0 +1,6 @@
+from app.models import StoredBlob
+from app.repositories import BaseRepository
+
+
+class StoredBlobRepository(BaseRepository[StoredBlob]):
+    model = StoredBlob
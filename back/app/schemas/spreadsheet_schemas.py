@@ -1,13 +1,148 @@
 
-from datetime import date
-from typing import List, Optional
-from app.schemas import BaseSchema
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, List, Optional
+from app.dtos import CreditorDTO, PayerDTO
+from app.models import ChunkedUpload, SpreadsheetJob
+from app.schemas import BaseSchema, PageSchema, PaginatorSchema
 
 
 class ProcessSpreadsheetResponse(BaseSchema):
     job_id: str
 
 
+class SpreadsheetJobStatusSchema(BaseSchema):
+    job_id: str
+    status: SpreadsheetJob.Status
+    message: Optional[str] = None
+    has_results: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @classmethod
+    def from_job(cls, job: SpreadsheetJob) -> "SpreadsheetJobStatusSchema":
+        return cls(
+            job_id=str(job.uuid),
+            status=job.status,
+            message=job.message or None,
+            has_results=job.has_results,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+
+
+class SpreadsheetProgressCountersSchema(BaseSchema):
+    rows_parsed: int = 0
+    rows_resolved: int = 0
+    rows_unchanged: int = 0
+    boletos_matched: int = 0
+    errors: int = 0
+
+
+class SpreadsheetJobProgressSchema(BaseSchema):
+    job_id: str
+    status: SpreadsheetJob.Status
+    message: Optional[str] = None
+    has_results: bool
+    # Etapa em execução; None antes de começar e depois de terminar
+    stage: Optional[str] = None
+    counters: SpreadsheetProgressCountersSchema
+    # Segundos gastos em cada etapa até agora
+    stages: Dict[str, float] = {}
+
+    @classmethod
+    def from_job(cls, job: SpreadsheetJob) -> "SpreadsheetJobProgressSchema":
+        progress = job.progress or {}
+        return cls(
+            job_id=str(job.uuid),
+            status=job.status,
+            message=job.message or None,
+            has_results=job.has_results,
+            stage=progress.get("stage"),
+            counters=SpreadsheetProgressCountersSchema(**progress.get("counters", {})),
+            stages=progress.get("stages", {}),
+        )
+
+
+class CreateChunkedUploadSchema(BaseSchema):
+    filename: str
+    # Tamanho total do arquivo, em bytes
+    size: int
+
+
+class FinalizeChunkedUploadSchema(BaseSchema):
+    # Se informado, o hash do arquivo montado precisa ser igual a ele
+    sha256: Optional[str] = None
+
+
+class ChunkedUploadSchema(BaseSchema):
+    upload_id: str
+    filename: str
+    size: int
+    received: int
+    status: ChunkedUpload.Status
+    sha256: Optional[str] = None
+
+    @classmethod
+    def from_upload(cls, upload: ChunkedUpload) -> "ChunkedUploadSchema":
+        return cls(
+            upload_id=str(upload.uuid),
+            filename=upload.filename,
+            size=upload.size,
+            received=upload.received,
+            status=upload.status,
+            sha256=upload.sha256 or None,
+        )
+
+
+class PayerKind(str, Enum):
+    NEW = 'new'
+    READONLY = 'readonly'
+
+
+class SpreadsheetResultsQuery(BaseSchema):
+    # Sem `page`, a rota devolve o resultado completo, como antes da paginação
+    page: Optional[int] = None
+    # Limitado a MAX_RESULTS_PAGE_SIZE (ver SpreadsheetResultsController)
+    page_size: int = 50
+    creditor: Optional[str] = None
+    kind: Optional[PayerKind] = None
+    with_warnings: Optional[bool] = None
+
+
+class SpreadsheetResultsSummarySchema(BaseSchema):
+    payers: int
+    new_payers: int
+    readonly_payers: int
+    payers_with_warnings: int
+    creditors: int
+    new_creditors: int
+    errors: int
+    warnings: int
+    unchanged_rows: int = 0
+
+
+class SpreadsheetResultsPageSchema(BaseSchema):
+    # Erros e avisos só entram como contagens no resumo; as mensagens têm rota própria
+    paginator: PaginatorSchema
+    page: PageSchema[PayerDTO]
+    summary: SpreadsheetResultsSummarySchema
+    creditors: List[CreditorDTO]
+
+
+class ResultMessageKind(str, Enum):
+    ERRORS = 'errors'
+    WARNINGS = 'warnings'
+
+
+class SpreadsheetMessagesQuery(BaseSchema):
+    kind: ResultMessageKind
+    page: int = 1
+    page_size: int = 50
+
+
 class BoletoSchema(BaseSchema):
     path: str
     readonly: bool = False
@@ -57,4 +192,18 @@ class CreditorSchema(BaseSchema):
 
 class SaveSpreadsheetSchema(BaseSchema):
     payers: List[PayerSchema]
-    creditors: List[CreditorSchema]
\ No newline at end of file
+    creditors: List[CreditorSchema]
+
+class SpreadsheetRemovalsSchema(BaseSchema):
+    """
+    Itens do resultado removidos pelo administrador. O restante do grafo é
+    lido dos resultados gravados no servidor, então o painel não precisa ter
+    carregado todas as páginas para aprovar a importação.
+    """
+    creditors: List[str] = []
+    # CPF/CNPJ dos pagadores
+    payers: List[str] = []
+    # Números dos acordos
+    agreements: List[str] = []
+    # "<número do acordo>-<número da parcela>"
+    installments: List[str] = []
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.controllers.stored_blob_controller import StoredBlobController
+from app.models import ApiConsumer, Boleto, Payer, User
+from core.actor_cache import invalidate_actor
+
+
+@receiver(post_delete, sender=Boleto)
+def release_boleto_blob(sender, instance: Boleto, **kwargs):
+    """
+    Devolve a referência do boleto ao arquivo compartilhado. Cobre remoções
+    diretas, em lote (QuerySet.delete) e em cascata a partir da parcela.
+    """
+    if instance.blob_id:
+        StoredBlobController.release(instance.blob_id)
+
+
+def _invalidate_actor(kind: str, pk: int) -> None:
+    # Invalida já e de novo no commit: entre os dois, outra thread pode ter
+    # guardado a versão anterior, ainda lida do banco
+    invalidate_actor(kind, pk)
+    transaction.on_commit(lambda: invalidate_actor(kind, pk))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance: User, **kwargs):
+    _invalidate_actor('user', instance.pk)
+
+
+@receiver(post_save, sender=Payer)
+@receiver(post_delete, sender=Payer)
+def invalidate_cached_payer(sender, instance: Payer, **kwargs):
+    """
+    O usuário fica no cache com o pagador carregado.
+    """
+    _invalidate_actor('user', instance.user_id)
+
+
+@receiver(post_save, sender=ApiConsumer)
+@receiver(post_delete, sender=ApiConsumer)
+def invalidate_cached_api_consumer(sender, instance: ApiConsumer, **kwargs):
+    _invalidate_actor('system', instance.pk)
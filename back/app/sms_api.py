@@ -1,44 +1,132 @@
 import logging
-from django.conf import settings
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
-from config import SMS_API_ENDPOINT, SMS_API_KEY
+from config import SMS_API_ENDPOINT, SMS_API_KEY, SMS_DISPATCH_CONCURRENCY, SMS_RATE_LIMIT_PER_SECOND, SMS_REQUEST_TIMEOUT_SECONDS
 
 
 lgr = logging.getLogger(__name__)
 
 
+class SmsDeliveryError(Exception):
+    """
+    Falha ao entregar um SMS ao provedor. `permanent` indica que tentar de
+    novo não adianta (a requisição foi recusada pelo provedor).
+    """
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
 def clean_phone(phone: str) -> str:
     """
     Remove non-numeric characters from the phone number.
     """
     return ''.join(filter(str.isdigit, phone))
 
-def send_sms(phone: str, message: str) -> bool:
+
+class RateLimiter:
+    """
+    Limita as chamadas ao provedor a `rate` por segundo, somando todas as
+    threads. Cada chamada reserva o próximo horário livre e espera por ele.
+    Com `rate` igual a 0 não há limite.
+    """
+
+    def __init__(self, rate: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            self._sleep(slot - now)
+
+
+class HttpSmsProvider:
+    """
+    Envia SMS pela API HTTP configurada em SMS_API_ENDPOINT. A sessão é
+    reaproveitada entre os envios, então as conexões (inclusive o túnel pelo
+    proxy) ficam abertas em vez de serem refeitas a cada mensagem.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = SMS_DISPATCH_CONCURRENCY,
+        timeout: float = SMS_REQUEST_TIMEOUT_SECONDS,
+        rate: float = SMS_RATE_LIMIT_PER_SECOND,
+    ):
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.session = requests.Session()
+        self.session.headers.update({"APIKEY": SMS_API_KEY})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def send(self, phone: str, message: str) -> None:
+        payload = {
+            "celular": clean_phone(phone),
+            "mensagem": message
+        }
+
+        self.limiter.acquire()
+        try:
+            response = self.session.post(SMS_API_ENDPOINT, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SmsDeliveryError(f"Erro de comunicação com a API de SMS: {e}") from e
+
+        if response.status_code >= 400:
+            # Limite de requisições e erros do provedor passam; o resto é recusa
+            permanent = response.status_code < 500 and response.status_code not in (408, 429)
+            raise SmsDeliveryError(f"API de SMS respondeu {response.status_code}: {response.text[:200]}", permanent)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class StubSmsProvider:
+    """
+    Provedor local, usado quando SEND_SMS está desligado (desenvolvimento e
+    testes): não chama a API, só registra as mensagens. `fail_next` faz as
+    próximas chamadas falharem, para simular o provedor fora do ar.
+    """
+
+    def __init__(self):
+        self.sent: List[Tuple[str, str]] = []
+        self.fail_next = 0
+        self.permanent_failure = False
+
+    def send(self, phone: str, message: str) -> None:
+        if self.fail_next:
+            self.fail_next -= 1
+            raise SmsDeliveryError("Falha simulada", self.permanent_failure)
+
+        lgr.info(f"Envio de SMS desativado (SEND_SMS=False). SMS para {clean_phone(phone)}: {message}")
+        self.sent.append((clean_phone(phone), message))
+
+    def close(self) -> None:
+        pass
+
+
+def get_provider(pool_size: Optional[int] = None):
+    """
+    Provedor de SMS conforme a configuração SEND_SMS.
+    """
     if not settings.SEND_SMS:
-        lgr.info("Envio de SMS desativado. Configuração SEND_SMS está como False.")
-        return True
-
-    url = SMS_API_ENDPOINT
-    phone = clean_phone(phone)
-    headers = {
-        "APIKEY": SMS_API_KEY,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "celular": phone,
-        "mensagem": message
-    }
-
-    lgr.info(f"Enviando SMS para {phone}: {message}")
-    try:
-        lgr.debug(f"Url sms: {url}")
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        lgr.info(f"SMS enviado com sucesso para {phone}")
-    except requests.RequestException as e:
-        lgr.error(f"Erro ao enviar SMS para {phone}")
-        lgr.exception(e)
-        return False
-
-    return True
+        return StubSmsProvider()
+    return HttpSmsProvider(pool_size or SMS_DISPATCH_CONCURRENCY)
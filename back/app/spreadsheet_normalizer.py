@@ -0,0 +1,157 @@
+import re
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from typing_extensions import TypedDict
+
+# Quantidade máxima de valores distintos memorizados por coluna. Planilhas repetem
+# datas, CPFs e contratos uma vez por parcela, então poucos valores cobrem quase tudo
+PARSE_CACHE_SIZE = 65536
+
+NON_DIGITS = re.compile(r'\D')
+
+
+class ColumnOrder(Enum):
+    DUE_DATE = 0
+    CONTRACT = 1
+    CUSTOMER = 2
+    CREDITOR = 3
+    CPF_CNPJ = 4
+    INSTALL_NUM = 5
+    VALUE = 6
+    PAYMENT_DATE = 7
+    PAYMENT_VALUE = 8
+    INSTALLMENTS_QTY = 9
+
+
+REQUIRED_COLUMNS = max(m.value for m in ColumnOrder) + 1
+
+
+class RowData(TypedDict):
+    creditor_name: str
+    payer_name: str
+    cpf_cnpj: str
+    phone: str
+    agreement_num: str
+    installment_num: int
+    due_date_str: str
+    # None quando a data não está no formato DD/MM/AAAA
+    due_date: Optional[date]
+
+
+class NormalizedRow(NamedTuple):
+    line_num: int
+    data: Optional[RowData]
+    error: Optional[str]
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def only_digits(value: str) -> str:
+    return NON_DIGITS.sub('', value)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def strip(value: str) -> str:
+    return value.strip()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_installment_number(installment_str: str) -> int:
+    installment_str = installment_str.strip()
+    if '/' in installment_str:
+        return int(installment_str.split('/')[0])
+    return int(installment_str)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_due_date(due_date_str: str) -> date:
+    parts = due_date_str.split('/')
+    if len(parts) != 3:
+        raise ValueError(f"Formato de data inválido: {due_date_str}")
+    day, month, year = parts
+    return datetime(int(year), int(month), int(day)).date()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_due_date_or_none(due_date_str: str) -> Optional[date]:
+    try:
+        return parse_due_date(due_date_str)
+    except ValueError:
+        return None
+
+
+def _parse_installments(column: Sequence[str]) -> List[Tuple[Optional[int], Optional[str]]]:
+    parsed = []
+    for value in column:
+        try:
+            parsed.append((parse_installment_number(value), None))
+        except ValueError as e:
+            parsed.append((None, str(e)))
+    return parsed
+
+
+def normalize_rows(lines: Sequence[Tuple[int, List[str]]]) -> List[NormalizedRow]:
+    """
+    Converte um bloco de linhas cruas da planilha em registros tipados.
+
+    O bloco é transposto em colunas e cada coluna passa uma única vez pelo seu
+    sanitizador; como os sanitizadores são memorizados, um mesmo CPF, contrato
+    ou data que se repete em várias linhas só é interpretado uma vez.
+
+    Parâmetros:
+        - lines: Pares (número da linha no arquivo, campos da linha).
+
+    Retorna:
+        - List[NormalizedRow]: Um registro por linha, na mesma ordem, com os dados
+          tipados ou a mensagem de erro que impede o processamento da linha.
+    """
+    normalized: List[Optional[NormalizedRow]] = [None] * len(lines)
+
+    complete: List[Tuple[int, int, List[str]]] = []
+    for index, (line_num, row) in enumerate(lines):
+        if len(row) < REQUIRED_COLUMNS:
+            missing_cols = [m.name for m in ColumnOrder if m.value >= len(row)]
+            normalized[index] = NormalizedRow(line_num, None, (
+                f"Linha {line_num} possui colunas insuficientes: esperado {REQUIRED_COLUMNS}, "
+                f"encontrado {len(row)}; colunas faltando: {', '.join(missing_cols)}"
+            ))
+        else:
+            complete.append((index, line_num, row))
+
+    if not complete:
+        return normalized  # type: ignore[return-value]
+
+    columns = list(zip(*(row[:REQUIRED_COLUMNS] for _, _, row in complete)))
+    creditors = [strip(v) for v in columns[ColumnOrder.CREDITOR.value]]
+    customers = [strip(v) for v in columns[ColumnOrder.CUSTOMER.value]]
+    documents = [only_digits(v) for v in columns[ColumnOrder.CPF_CNPJ.value]]
+    agreements = [only_digits(v) for v in columns[ColumnOrder.CONTRACT.value]]
+    installments = _parse_installments(columns[ColumnOrder.INSTALL_NUM.value])
+    due_dates_str = [strip(v) for v in columns[ColumnOrder.DUE_DATE.value]]
+    due_dates = [parse_due_date_or_none(v) for v in due_dates_str]
+
+    for position, (index, line_num, _) in enumerate(complete):
+        installment_num, installment_error = installments[position]
+        if installment_error is not None:
+            normalized[index] = NormalizedRow(line_num, None, f"Erro ao processar linha {line_num}: {installment_error}")
+            continue
+
+        data: RowData = {
+            "creditor_name": creditors[position],
+            "payer_name": customers[position],
+            "cpf_cnpj": documents[position],
+            "phone": documents[position][:11],
+            "agreement_num": agreements[position],
+            "installment_num": installment_num,  # type: ignore[typeddict-item]
+            "due_date_str": due_dates_str[position],
+            "due_date": due_dates[position],
+        }
+        if any(not data[field] for field in ("creditor_name", "payer_name", "cpf_cnpj", "agreement_num", "due_date_str")):
+            normalized[index] = NormalizedRow(line_num, None, f"Linha {line_num} possui campos obrigatórios em branco ou apenas espaços")
+            continue
+
+        normalized[index] = NormalizedRow(line_num, data, None)
+
+    return normalized  # type: ignore[return-value]
@@ -0,0 +1,154 @@
+import csv
+import io
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Iterator, List, NamedTuple, Tuple
+
+from app.spreadsheet_normalizer import NormalizedRow, normalize_rows
+from app.utils import chunked
+
+lgr = logging.getLogger(__name__)
+
+# A planilha é dividida em mais trechos do que processos, para que um trecho
+# mais lento não deixe os outros processos parados no fim
+RANGES_PER_WORKER = 4
+
+# Trechos enviados aos processos e ainda não consumidos, por processo. Limita
+# quantas linhas normalizadas ficam em memória esperando a gravação no banco
+IN_FLIGHT_PER_WORKER = 2
+
+READ_BLOCK_SIZE = 2**20
+
+ENCODING = "latin-1"
+
+
+class ByteRange(NamedTuple):
+    start: int
+    end: int
+    # Número, no arquivo, da primeira linha do trecho
+    first_line_num: int
+
+
+class RangeResult(NamedTuple):
+    rows: List[NormalizedRow]
+    # Falso quando o trecho não pode ser lido uma linha por registro: um campo
+    # entre aspas com quebra de linha ou uma quebra de linha só com "\r"
+    aligned: bool
+
+
+def split_ranges(path: Path, start: int, parts: int) -> List[ByteRange]:
+    """
+    Divide o arquivo, a partir do byte `start`, em até `parts` trechos que
+    terminam em fim de linha, contando as linhas para numerar cada trecho.
+    """
+    size = path.stat().st_size
+    target = max(1, -(-(size - start) // parts))
+
+    ranges: List[ByteRange] = []
+    line_num = 2
+    with path.open('rb') as file:
+        while start < size:
+            file.seek(min(start + target, size))
+            file.readline()
+            end = min(file.tell(), size)
+
+            ranges.append(ByteRange(start, end, line_num))
+
+            file.seek(start)
+            remaining = end - start
+            while remaining:
+                block = file.read(min(READ_BLOCK_SIZE, remaining))
+                line_num += block.count(b'\n')
+                remaining -= len(block)
+            start = end
+
+    return ranges
+
+
+def normalize_range(path: str, byte_range: ByteRange, delimiter: str) -> RangeResult:
+    """
+    Lê e normaliza um trecho da planilha. Roda nos processos auxiliares, então
+    só depende do arquivo e do normalizador.
+    """
+    with open(path, 'rb') as file:
+        file.seek(byte_range.start)
+        data = file.read(byte_range.end - byte_range.start)
+
+    # Mesma leitura do caminho serial: latin-1 com quebras de linha universais.
+    # Com strict, um trecho que termina dentro de um campo entre aspas (a
+    # divisão caiu no meio de um registro em várias linhas) é um erro, em vez
+    # de um registro fechado no fim do trecho
+    reader = csv.reader(io.TextIOWrapper(io.BytesIO(data), encoding=ENCODING), delimiter=delimiter, strict=True)
+    try:
+        lines = list(enumerate(reader, start=byte_range.first_line_num))
+    except csv.Error:
+        return RangeResult([], False)
+
+    expected = data.count(b'\n') + (0 if data.endswith(b'\n') else 1)
+    if len(lines) != expected or reader.line_num != expected:
+        return RangeResult([], False)
+
+    return RangeResult(normalize_rows(lines), True)
+
+
+def iter_serial(path: Path, start: int, first_line_num: int, delimiter: str, chunk_size: int) -> Iterator[NormalizedRow]:
+    """
+    Lê e normaliza a planilha no processo atual, a partir do byte `start`.
+    """
+    with path.open('rb') as raw:
+        raw.seek(start)
+        reader = csv.reader(io.TextIOWrapper(raw, encoding=ENCODING), delimiter=delimiter)
+        for chunk in chunked(enumerate(reader, start=first_line_num), chunk_size):
+            yield from normalize_rows(chunk)
+
+
+def iter_parallel(path: Path, delimiter: str, workers: int, chunk_size: int) -> Iterator[List[NormalizedRow]]:
+    """
+    Lê e normaliza a planilha em `workers` processos, devolvendo os registros
+    na ordem do arquivo e nos mesmos blocos de `chunk_size` linhas que a
+    leitura serial devolveria.
+
+    Cada processo recebe um trecho de linhas inteiras. Se um trecho não puder
+    ser lido uma linha por registro, a planilha é lida serialmente a partir
+    dele; os trechos anteriores já foram conferidos e continuam valendo.
+    """
+    return chunked(_iter_parallel_rows(path, delimiter, workers, chunk_size), chunk_size)
+
+
+def _iter_parallel_rows(path: Path, delimiter: str, workers: int, chunk_size: int) -> Iterator[NormalizedRow]:
+    with path.open('rb') as file:
+        header_end = len(file.readline())
+    ranges = split_ranges(path, header_end, workers * RANGES_PER_WORKER)
+
+    # "spawn" não herda conexões com o banco nem threads do processo atual
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        remaining = iter(ranges)
+        pending: Deque[Tuple[ByteRange, Future]] = deque()
+
+        def submit_next() -> None:
+            byte_range = next(remaining, None)
+            if byte_range is not None:
+                pending.append((byte_range, executor.submit(normalize_range, str(path), byte_range, delimiter)))
+
+        for _ in range(workers * IN_FLIGHT_PER_WORKER):
+            submit_next()
+
+        while pending:
+            byte_range, future = pending.popleft()
+            result: RangeResult = future.result()
+            if not result.aligned:
+                lgr.warning(
+                    f"Trecho da planilha a partir da linha {byte_range.first_line_num} tem registros em mais de uma linha; "
+                    f"lendo o restante serialmente"
+                )
+                for _, other in pending:
+                    other.cancel()
+                yield from iter_serial(path, byte_range.start, byte_range.first_line_num, delimiter, chunk_size)
+                return
+
+            submit_next()
+            yield from result.rows
@@ -0,0 +1,67 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Intervalo mínimo, em segundos, entre duas publicações do andamento. Cada
+# publicação é um UPDATE no processamento, então não vale a pena fazer uma por linha
+PROGRESS_PUBLISH_INTERVAL = 1.0
+
+COUNTERS = ("rows_parsed", "rows_resolved", "rows_unchanged", "boletos_matched", "errors")
+
+
+class SpreadsheetProgress:
+    """
+    Contadores e tempo gasto por etapa de um processamento de planilha.
+
+    O pipeline chama `add` e `stage` conforme avança e `publish` ao fim de
+    cada bloco de linhas; quem criou o objeto decide, pela função `publisher`,
+    para onde o retrato do andamento vai (no worker, para o próprio
+    SpreadsheetJob).
+    """
+
+    def __init__(self, publisher: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 interval: Optional[float] = None):
+        self.publisher = publisher
+        self.interval = PROGRESS_PUBLISH_INTERVAL if interval is None else interval
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.stages: Dict[str, float] = {}
+        self.current_stage: Optional[str] = None
+        self._last_publish = 0.0
+
+    def add(self, **counters: int) -> None:
+        for name, value in counters.items():
+            self.counters[name] += value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Soma ao tempo da etapa `name` o tempo gasto dentro do bloco `with`.
+        """
+        self.current_stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "stage": self.current_stage,
+            "counters": dict(self.counters),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+        }
+
+    def publish(self, force: bool = False) -> None:
+        """
+        Entrega o retrato atual ao `publisher`, no máximo uma vez por
+        `interval` segundos, a não ser que `force` seja passado.
+        """
+        if self.publisher is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_publish < self.interval:
+            return
+
+        self._last_publish = now
+        self.publisher(self.snapshot())
@@ -0,0 +1,134 @@
+import csv
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+from zipfile import ZIP_STORED, ZipFile
+
+from app.spreadsheet_normalizer import ColumnOrder
+
+# Cabeçalho da planilha que o sistema de cobrança exporta, na ordem de ColumnOrder
+HEADER = {
+    ColumnOrder.DUE_DATE: "Data Vencimento",
+    ColumnOrder.CONTRACT: "Contrato",
+    ColumnOrder.CUSTOMER: "Cliente",
+    ColumnOrder.CREDITOR: "Credor",
+    ColumnOrder.CPF_CNPJ: "CPF/CNPJ",
+    ColumnOrder.INSTALL_NUM: "Parcela",
+    ColumnOrder.VALUE: "Valor",
+    ColumnOrder.PAYMENT_DATE: "Data Pagamento",
+    ColumnOrder.PAYMENT_VALUE: "Valor Pago",
+    ColumnOrder.INSTALLMENTS_QTY: "Qtd Parcelas",
+}
+
+CREDITORS = 20
+MAX_INSTALLMENTS = 6
+
+
+class SyntheticInstallment(NamedTuple):
+    agreement_num: str
+    installment_num: int
+    installments_qty: int
+    payer_name: str
+    cpf_cnpj: str
+    creditor_name: str
+    due_date: date
+    value: str
+
+
+def synthetic_installments(rows: int, seed: int = 0, first_due_date: Optional[date] = None) -> Iterator[SyntheticInstallment]:
+    """
+    Gera `rows` parcelas no formato de uma exportação real: cada pagador tem um
+    acordo com algumas parcelas mensais, e os pagadores se repetem entre
+    credores. A mesma semente gera sempre as mesmas parcelas.
+
+    Parâmetros:
+        - rows: Quantidade de parcelas (linhas da planilha).
+        - seed: Semente dos valores aleatórios.
+        - first_due_date: Vencimento da primeira parcela; por padrão, daqui a um mês,
+          para que nada seja tratado como vencido.
+    """
+    rng = random.Random(seed)
+    first_due_date = first_due_date or date.today() + timedelta(days=30)
+
+    generated = 0
+    agreement = 0
+    while generated < rows:
+        agreement += 1
+        # Um pagador a cada três acordos aparece com mais de um credor
+        payer = agreement - agreement // 3
+        installments_qty = min(rng.randint(1, MAX_INSTALLMENTS), rows - generated)
+        value = f"{rng.randint(5_000, 500_000) / 100:.2f}"
+
+        for number in range(1, installments_qty + 1):
+            yield SyntheticInstallment(
+                agreement_num=f"{agreement:09d}",
+                installment_num=number,
+                installments_qty=installments_qty,
+                payer_name=f"Pagador {payer}",
+                cpf_cnpj=f"{payer:011d}",
+                creditor_name=f"Credor {agreement % CREDITORS}",
+                due_date=first_due_date + timedelta(days=30 * (number - 1)),
+                value=value,
+            )
+        generated += installments_qty
+
+
+def boleto_name(installment: SyntheticInstallment) -> str:
+    return f"{installment.agreement_num} PARC {installment.installment_num}.pdf"
+
+
+def boleto_pdf(installment: SyntheticInstallment) -> bytes:
+    """
+    Conteúdo de um PDF mínimo, diferente para cada parcela.
+    """
+    return (
+        b"%PDF-1.4\n"
+        + f"% Boleto da parcela {installment.installment_num} do acordo {installment.agreement_num}\n".encode('ascii')
+        + b"%%EOF\n"
+    )
+
+
+def write_spreadsheet(path: Path, installments: Iterator[SyntheticInstallment], delimiter: str = ',') -> int:
+    """
+    Grava as parcelas em um CSV no layout de ColumnOrder, linha a linha.
+
+    Retorna:
+        - int: Quantidade de linhas gravadas, sem contar o cabeçalho.
+    """
+    written = 0
+    with path.open('w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter=delimiter)
+        writer.writerow([HEADER[column] for column in ColumnOrder])
+
+        row: List[str] = [''] * len(ColumnOrder)
+        for installment in installments:
+            row[ColumnOrder.DUE_DATE.value] = installment.due_date.strftime('%d/%m/%Y')
+            row[ColumnOrder.CONTRACT.value] = installment.agreement_num
+            row[ColumnOrder.CUSTOMER.value] = installment.payer_name
+            row[ColumnOrder.CREDITOR.value] = installment.creditor_name
+            row[ColumnOrder.CPF_CNPJ.value] = installment.cpf_cnpj
+            row[ColumnOrder.INSTALL_NUM.value] = f"{installment.installment_num}/{installment.installments_qty}"
+            row[ColumnOrder.VALUE.value] = installment.value
+            row[ColumnOrder.INSTALLMENTS_QTY.value] = str(installment.installments_qty)
+            writer.writerow(row)
+            written += 1
+
+    return written
+
+
+def write_boletos_zip(path: Path, installments: Iterator[SyntheticInstallment]) -> int:
+    """
+    Grava um ZIP com um PDF por parcela, com os nomes que a importação procura.
+    Os PDFs vão sem compressão, como nas exportações reais.
+
+    Retorna:
+        - int: Quantidade de PDFs gravados.
+    """
+    written = 0
+    with ZipFile(path, 'w', compression=ZIP_STORED) as zip_file:
+        for installment in installments:
+            zip_file.writestr(boleto_name(installment), boleto_pdf(installment))
+            written += 1
+
+    return written
@@ -0,0 +1,35 @@
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from app.controllers.chunked_upload_controller import ChunkedUploadController
+from app.controllers.installment_controller import InstallmentController
+from app.controllers.spreadsheet_job_controller import SpreadsheetJobController
+from config import OVERDUE_PURGE_INTERVAL_SECONDS, SPREADSHEET_REAP_INTERVAL_SECONDS
+
+
+class PeriodicTask(NamedTuple):
+    name: str
+    interval: timedelta
+    # Retorno gravado em PeriodicTaskRun.last_result
+    run: Callable[[], Dict[str, Any]]
+
+
+# Tarefas de manutenção executadas pelo worker (`run_spreadsheet_worker`) entre
+# um processamento de planilha e outro, cada uma no máximo uma vez por intervalo
+PERIODIC_TASKS: List[PeriodicTask] = [
+    PeriodicTask(
+        name='purge_overdue_installments',
+        interval=timedelta(seconds=OVERDUE_PURGE_INTERVAL_SECONDS),
+        run=lambda: InstallmentController.remove_overdue_installments()._asdict(),
+    ),
+    PeriodicTask(
+        name='reap_spreadsheet_operations',
+        interval=timedelta(seconds=SPREADSHEET_REAP_INTERVAL_SECONDS),
+        run=lambda: SpreadsheetJobController.reap_operations()._asdict(),
+    ),
+    PeriodicTask(
+        name='reap_chunked_uploads',
+        interval=timedelta(seconds=SPREADSHEET_REAP_INTERVAL_SECONDS),
+        run=lambda: {"uploads": ChunkedUploadController.reap()},
+    ),
+]
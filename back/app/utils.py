@@ -1,4 +1,9 @@
 from datetime import timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar('T')
+
 
 def beautify_timedelta(delta: timedelta) -> str:
     total_seconds = int(delta.total_seconds())
@@ -14,3 +19,13 @@ def beautify_timedelta(delta: timedelta) -> str:
         parts.append(f"{seconds} segundo{'s' if seconds != 1 else ''}")
 
     return " e ".join(parts)
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Agrupa os itens de um iterável em listas de no máximo `size` itens,
+    consumindo o iterável sob demanda.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
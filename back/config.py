@@ -11,6 +11,15 @@ REFRESH_TOKEN_EXPIRATION_SECONDS = int(os.getenv('REFRESH_TOKEN_EXPIRATION_SECON
 SMS_CODE_EXPIRATION_SECONDS = int(os.getenv('SMS_CODE_EXPIRATION_SECONDS', 15))
 SMS_API_ENDPOINT = os.getenv('SMS_API_ENDPOINT', "API-ENDPOINT-HERE")
 SMS_API_KEY =  os.getenv('SMS_API_KEY', "API-KEY-HERE")
+# Envio dos SMS pelo comando `dispatch_sms`: quantos ao mesmo tempo, tempo
+# limite de cada chamada à API e tentativas, com espera crescente a partir de
+# SMS_RETRY_BASE_SECONDS, antes de desistir de uma mensagem
+SMS_DISPATCH_CONCURRENCY = int(os.getenv('SMS_DISPATCH_CONCURRENCY', 4))
+SMS_REQUEST_TIMEOUT_SECONDS = float(os.getenv('SMS_REQUEST_TIMEOUT_SECONDS', 10))
+SMS_MAX_ATTEMPTS = int(os.getenv('SMS_MAX_ATTEMPTS', 5))
+SMS_RETRY_BASE_SECONDS = float(os.getenv('SMS_RETRY_BASE_SECONDS', 2))
+# Máximo de chamadas por segundo à API de SMS (0 desliga o limite)
+SMS_RATE_LIMIT_PER_SECOND = float(os.getenv('SMS_RATE_LIMIT_PER_SECOND', 0))
 
 USING_AWS = os.getenv('USING_AWS', '').strip().lower() in ('1', 'true', 'yes')
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', '')
@@ -26,6 +35,79 @@ AWS_DEFAULT_ACL = os.getenv('AWS_DEFAULT_ACL', None)
 
 SHOW_SMS_CODE = os.getenv('SHOW_CODE', 'False').strip().lower() in ('1', 'true', 'yes')
 
+# Quantidade de linhas da planilha lidas e resolvidas contra o banco por vez
+SPREADSHEET_CHUNK_SIZE = int(os.getenv('SPREADSHEET_CHUNK_SIZE', 5000))
+# Processos usados para ler planilhas grandes; 1 lê tudo no próprio processo
+SPREADSHEET_PARSE_WORKERS = int(os.getenv('SPREADSHEET_PARSE_WORKERS', 1))
+SPREADSHEET_PARALLEL_MIN_BYTES = int(os.getenv('SPREADSHEET_PARALLEL_MIN_BYTES', 16 * 2**20))
+
+# Onde é calculada a diferença entre cada bloco da planilha e o banco: "python"
+# carrega as entidades referenciadas e compara em memória; "sql" carrega o bloco
+# numa tabela de staging e deixa o banco fazer a comparação
+PYTHON_DIFF_ENGINE = 'python'
+SQL_DIFF_ENGINE = 'sql'
+SPREADSHEET_DIFF_ENGINE = os.getenv('SPREADSHEET_DIFF_ENGINE', PYTHON_DIFF_ENGINE).strip().lower()
+if SPREADSHEET_DIFF_ENGINE not in (PYTHON_DIFF_ENGINE, SQL_DIFF_ENGINE):
+    raise Exception(f"SPREADSHEET_DIFF_ENGINE deve ser '{PYTHON_DIFF_ENGINE}' ou '{SQL_DIFF_ENGINE}'")
+
+# Quantidade de pagadores gravados por transação ao salvar os resultados de uma planilha.
+# Se a gravação falhar, a próxima tentativa retoma do primeiro lote não confirmado
+SPREADSHEET_COMMIT_BATCH_SIZE = int(os.getenv('SPREADSHEET_COMMIT_BATCH_SIZE', 500))
+
+# Quantidade de PDFs de boletos enviados ao storage ao mesmo tempo durante a importação
+BOLETO_UPLOAD_CONCURRENCY = int(os.getenv('BOLETO_UPLOAD_CONCURRENCY', 8))
+
+# Grava os PDFs de boletos endereçados pelo SHA-256 do conteúdo: PDFs idênticos
+# são armazenados uma única vez e não são enviados de novo ao storage
+BOLETO_CONTENT_ADDRESSED = os.getenv('BOLETO_CONTENT_ADDRESSED', '').strip().lower() in ('1', 'true', 'yes')
+
+# Parcelas vencidas removidas por transação, e de quanto em quanto tempo o worker faz a limpeza
+OVERDUE_PURGE_BATCH_SIZE = int(os.getenv('OVERDUE_PURGE_BATCH_SIZE', 500))
+OVERDUE_PURGE_INTERVAL_SECONDS = int(os.getenv('OVERDUE_PURGE_INTERVAL_SECONDS', 60 * 60))
+
+# Pastas de operações (planilha, ZIP e resultados) sem atividade há mais que este
+# tempo são removidas pelo worker; com um limite de espaço, as mais antigas saem
+# até as pastas restantes caberem nele (0 desliga o limite)
+SPREADSHEET_OPERATION_TTL_SECONDS = int(os.getenv('SPREADSHEET_OPERATION_TTL_SECONDS', 60 * 60 * 24 * 7))
+SPREADSHEET_OPERATIONS_MAX_BYTES = int(os.getenv('SPREADSHEET_OPERATIONS_MAX_BYTES', 0))
+SPREADSHEET_REAP_INTERVAL_SECONDS = int(os.getenv('SPREADSHEET_REAP_INTERVAL_SECONDS', 60 * 60))
+
+# Um processamento em execução cujo worker não dá sinal de vida há mais que este
+# tempo é dado como abandonado: volta para a fila, ou falha depois de
+# SPREADSHEET_JOB_MAX_ATTEMPTS reservas
+SPREADSHEET_JOB_LEASE_SECONDS = int(os.getenv('SPREADSHEET_JOB_LEASE_SECONDS', 5 * 60))
+SPREADSHEET_JOB_MAX_ATTEMPTS = int(os.getenv('SPREADSHEET_JOB_MAX_ATTEMPTS', 2))
+
+# Duração máxima de um stream de andamento de planilha; ao atingi-la o stream
+# termina e o painel se reconecta, para que nenhuma conexão segure uma thread
+# do servidor indefinidamente
+PROGRESS_STREAM_MAX_SECONDS = float(os.getenv('PROGRESS_STREAM_MAX_SECONDS', 25))
+
+# Tamanho máximo de um arquivo enviado em partes, e por quanto tempo um envio
+# sem atividade é mantido antes de ser removido pelo worker
+CHUNKED_UPLOAD_MAX_BYTES = int(os.getenv('CHUNKED_UPLOAD_MAX_BYTES', 4 * 2**30))
+CHUNKED_UPLOAD_TTL_SECONDS = int(os.getenv('CHUNKED_UPLOAD_TTL_SECONDS', 60 * 60 * 24))
+
+# Cache, por processo, dos usuários e sistemas autenticados. ACTOR_CACHE_SIZE
+# igual a 0 desliga o cache. A cada ACTOR_CACHE_STATS_EVERY consultas a taxa de
+# acerto vai para o log (0 desliga)
+ACTOR_CACHE_SIZE = int(os.getenv('ACTOR_CACHE_SIZE', 1024))
+ACTOR_CACHE_TTL_SECONDS = float(os.getenv('ACTOR_CACHE_TTL_SECONDS', 60))
+ACTOR_CACHE_STATS_EVERY = int(os.getenv('ACTOR_CACHE_STATS_EVERY', 10000))
+
+# Tokens de acesso já verificados guardados por processo. 0 desliga o cache
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+
+# Lembretes de vencimento (`send_due_reminders`): com quantos dias de
+# antecedência avisar e quantos telefones gravar por transação
+DUE_REMINDER_DAYS = int(os.getenv('DUE_REMINDER_DAYS', 3))
+DUE_REMINDER_BATCH_SIZE = int(os.getenv('DUE_REMINDER_BATCH_SIZE', 1000))
+
+# Quanto tempo, em segundos, uma escrita espera o SQLite liberar o arquivo
+# antes de falhar com "database is locked". web, worker e sms gravam no mesmo
+# arquivo ao mesmo tempo
+SQLITE_TIMEOUT_SECONDS = float(os.getenv('SQLITE_TIMEOUT_SECONDS', 20))
+
 print("Está usando AWS?" , USING_AWS)
 if USING_AWS and (not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY or not AWS_STORAGE_BUCKET_NAME):
     raise Exception("Se for usar AWS, precisa configurar AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY e AWS_STORAGE_BUCKET_NAME")
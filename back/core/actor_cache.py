@@ -0,0 +1,28 @@
+from typing import Any, Optional
+
+from config import ACTOR_CACHE_SIZE, ACTOR_CACHE_STATS_EVERY, ACTOR_CACHE_TTL_SECONDS
+from core.ttl_cache import TTLCache
+
+# Atores autenticados (usuários, com o pagador já carregado, e sistemas
+# externos), para que cada requisição não precise ir ao banco antes de chegar
+# ao endpoint. Os sinais de save/delete (app/signals.py) só invalidam o cache
+# do processo que fez a alteração, então o TTL é o atraso máximo para os
+# demais workers enxergarem a mudança.
+actor_cache = TTLCache('de atores', ACTOR_CACHE_SIZE, ACTOR_CACHE_TTL_SECONDS, ACTOR_CACHE_STATS_EVERY)
+
+
+def user_key(user_id: Any) -> tuple:
+    return ('user', str(user_id))
+
+
+def system_key(name: str) -> tuple:
+    return ('system', name)
+
+
+def invalidate_actor(kind: str, pk: Optional[int]) -> None:
+    """
+        Remove do cache o ator de tipo `kind` ('user' ou 'system') com a chave
+        primária `pk`. Os sistemas são guardados pelo nome, que pode ter
+        mudado, por isso a busca é pelo ator e não pela chave.
+    """
+    actor_cache.invalidate(lambda key, actor: key[0] == kind and actor.pk == pk)
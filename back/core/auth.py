@@ -1,4 +1,6 @@
+import hashlib
 import logging
+import time
 
 from django.contrib.auth.models import AbstractUser
 from jwt.exceptions import ExpiredSignatureError
@@ -10,10 +12,32 @@ from app.exceptions import HttpFriendlyException
 from app.models import ApiConsumer, User
 from app.repositories.api_consumer_repository import ApiConsumerRepository
 from app.repositories.user_repository import UserRepository
+from config import ACCESS_TOKEN_EXPIRATION_SECONDS, TOKEN_CACHE_SIZE
+from core.actor_cache import actor_cache, system_key, user_key
+from core.ttl_cache import TTLCache
 
 
 lgr = logging.getLogger(__name__)
 
+# Tokens de acesso já verificados (assinatura e claims). O mesmo token é usado
+# em muitas requisições até expirar; com o cache, só a primeira paga a
+# verificação. Cada token sai do cache no seu `exp`. Os tokens não são
+# alterados depois de verificados, então não precisam ser copiados.
+token_cache = TTLCache('de tokens', TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRATION_SECONDS, copy_values=False)
+
+
+def verify_access_token(token: str) -> AccessToken:
+    """
+        Verifica o token de acesso, ou devolve a verificação guardada no cache
+        se o mesmo token já tiver sido verificado e ainda não tiver expirado.
+        Tokens inválidos não são guardados.
+    """
+    return token_cache.get_or_load(
+        hashlib.sha256(token.encode()).digest(),
+        lambda: AccessToken(token),
+        ttl_for=lambda validated: validated["exp"] - time.time(),
+    )
+
 
 class CustomJWTAuth(JWTAuth):
     """
@@ -22,7 +46,7 @@ class CustomJWTAuth(JWTAuth):
     """
     def authenticate(self, request, token):
         try:
-            validated_token = AccessToken(token)
+            validated_token = verify_access_token(token)
             token_type = validated_token.get("type")
             entity_id = validated_token.get("entity_id")
 
@@ -56,7 +80,7 @@ class CustomJWTAuth(JWTAuth):
 
     def get_user(self, entity_id: str, request, validated_token: AccessToken, *args, **kwargs) -> User:  # type: ignore[override]
         try:
-            user: User = UserRepository.get(id=entity_id)
+            user: User = actor_cache.get_or_load(user_key(entity_id), lambda: self._load_user(entity_id))
             request.auth = validated_token
             request.actor = user
             if not self.allow_user(user):
@@ -69,7 +93,7 @@ class CustomJWTAuth(JWTAuth):
 
     def get_api_consumer(self, name: str, request, validated_token: AccessToken):
         try:
-            system = ApiConsumerRepository.get(name=name)
+            system = actor_cache.get_or_load(system_key(name), lambda: ApiConsumerRepository.get(name=name))
             request.auth = validated_token
             request.actor = system
             return system
@@ -77,6 +101,16 @@ class CustomJWTAuth(JWTAuth):
             lgr.error(f"Sistema externo com nome {name} não encontrado")
             raise HttpFriendlyException(403, "Sistema externo não encontrado")
 
+    @staticmethod
+    def _load_user(entity_id: str) -> User:
+        """
+            Busca o usuário já com o pagador, usado no log de autenticação.
+        """
+        user = UserRepository.filter(include_rels=['payer'], id=entity_id).first()
+        if user is None:
+            raise HttpFriendlyException(404, f"{User.READABLE_NAME} não encontrado")
+        return user
+
     def allow_user(self, user: User) -> bool:
         """
             Retorna se é possível User acessar a rota.
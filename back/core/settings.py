@@ -15,7 +15,11 @@ import logging
 import os
 from pathlib import Path
 
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
 from config import ACCESS_TOKEN_EXPIRATION_SECONDS, REFRESH_TOKEN_EXPIRATION_SECONDS, SMS_CODE_EXPIRATION_SECONDS
+from config import SQLITE_TIMEOUT_SECONDS
 from config import AWS_ACCESS_KEY_ID as AAKI, AWS_SECRET_ACCESS_KEY as ASAK, \
     AWS_STORAGE_BUCKET_NAME as ASBN, AWS_S3_FILE_OVERWRITE as ASFO, \
     AWS_S3_ENDPOINT_URL as ASEU, AWS_S3_REGION_NAME as ASRN, \
@@ -96,6 +100,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'data/db.sqlite3',
+        # Os contêineres web (com várias threads), worker e sms gravam no mesmo
+        # arquivo. Com WAL as leituras não esperam as escritas; as transações
+        # já começam reservando a escrita, então uma escrita concorrente espera
+        # até `timeout` em vez de falhar na hora com "database is locked"
+        'OPTIONS': {
+            'timeout': SQLITE_TIMEOUT_SECONDS,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
     }
 }
 
@@ -202,6 +215,9 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Arquivos enviados em partes (ver ChunkedUploadController). Ficam fora de
+# MEDIA_ROOT, que é servido publicamente em /media/
+UPLOADS_ROOT = data_path / 'uploads'
 
 SEND_SMS = not ENV == DEV
 
@@ -217,6 +233,12 @@ AWS_S3_FILE_OVERWRITE = ASFO
 AWS_DEFAULT_ACL = ADA
 AWS_QUERYSTRING_AUTH = False
 
+# Cada thread de upload de boletos tem seu próprio cliente S3 (ver BoletoUploader),
+# então o pool padrão de conexões de cada cliente basta
+AWS_S3_CLIENT_CONFIG = Config(signature_version=ASSV)
+# Os boletos são pequenos; o paralelismo fica por conta do uploader, não de cada envio
+AWS_S3_TRANSFER_CONFIG = TransferConfig(use_threads=False)
+
 STORAGES = {
     "default": {
         "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
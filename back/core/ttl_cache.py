@@ -0,0 +1,132 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+lgr = logging.getLogger(__name__)
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+
+
+class TTLCache:
+    """
+        Cache em memória, por processo, limitado em tamanho (sai o menos usado)
+        e em tempo. Pode ser usado por várias threads ao mesmo tempo.
+
+        Com `copy_values`, quem lê recebe uma cópia rasa do valor guardado,
+        então alterações feitas durante uma requisição não vazam para as
+        seguintes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        ttl: float,
+        stats_every: int = 0,
+        copy_values: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats_every = stats_every
+        self.copy_values = copy_values
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Muda a cada invalidação; uma carga que começou antes dela não é guardada
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any], ttl_for: Optional[Callable[[Any], float]] = None) -> Any:
+        """
+            Devolve o valor guardado em `key` ou, se não houver (ou tiver
+            expirado), chama `load` e guarda o resultado. Exceções de `load`
+            não são guardadas.
+
+            `ttl_for`, se informado, diz por quantos segundos o valor carregado
+            pode ser guardado (limitado ao TTL do cache); com 0 ou menos, o
+            valor não é guardado.
+        """
+        if not self.enabled:
+            return load()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._report()
+                return self._copy(entry.value)
+
+            self.misses += 1
+            self._report()
+            generation = self._generation
+
+        # A carga acontece fora do lock, para não serializar as threads
+        value = load()
+        ttl = self.ttl if ttl_for is None else min(self.ttl, ttl_for(value))
+
+        with self._lock:
+            if generation == self._generation and ttl > 0:
+                self._entries[key] = _Entry(value, self._clock() + ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return self._copy(value)
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]) -> None:
+        """
+            Remove as entradas para as quais `predicate(chave, valor)` é verdadeiro.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, entry in self._entries.items() if predicate(key, entry.value)]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def _copy(self, value: Any) -> Any:
+        return copy.copy(value) if self.copy_values else value
+
+    def _report(self) -> None:
+        # Chamado com o lock adquirido
+        lookups = self.hits + self.misses
+        if self.stats_every and lookups % self.stats_every == 0:
+            lgr.info(
+                f"Cache {self.name}: {self.hits} acertos, {self.misses} faltas "
+                f"({self.hits / lookups:.1%} de acerto), {len(self._entries)} entradas, "
+                f"{self.evictions} descartes, {self.invalidations} invalidações"
+            )
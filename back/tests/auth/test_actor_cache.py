@@ -0,0 +1,176 @@
+import threading
+
+import pytest
+from django.test import RequestFactory
+
+from app.controllers.auth_controller import AuthController
+from app.exceptions import HttpFriendlyException
+from core.actor_cache import actor_cache
+from core.auth import AllowAdminAuth, AllowHumansAuth
+from core.ttl_cache import TTLCache
+from tests.factories import ApiConsumerFactory, PayerFactory, UserFactory
+
+
+def token_for(entity_id, token_type="user") -> str:
+    return str(AuthController.get_token(entity_id, token_type).access_token)
+
+
+def authenticate(auth, entity_id, token_type="user", token=None):
+    request = RequestFactory().get('/api/boleto/')
+    return auth.authenticate(request, token or token_for(entity_id, token_type)), request
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cached_payer_skips_database(django_assert_num_queries):
+    payer = PayerFactory.create()
+    auth = AllowHumansAuth()
+    token = token_for(payer.user.id)
+
+    with django_assert_num_queries(1):
+        authenticate(auth, payer.user.id, token=token)
+    with django_assert_num_queries(0):
+        user, request = authenticate(auth, payer.user.id, token=token)
+
+    assert request.actor.id == payer.user.id
+    assert user.payer.name == payer.name
+    assert actor_cache.stats()["hits"] == 1
+
+
+def test_cached_api_consumer_skips_database(django_assert_num_queries):
+    system = ApiConsumerFactory.create()
+
+    authenticate(AllowHumansAuth(), system.name, "system")
+    with django_assert_num_queries(0):
+        consumer, _ = authenticate(AllowHumansAuth(), system.name, "system")
+
+    assert consumer.id == system.id
+
+
+def test_cache_respects_each_route_permissions():
+    payer = PayerFactory.create()
+    authenticate(AllowHumansAuth(), payer.user.id)
+
+    with pytest.raises(HttpFriendlyException) as exc:
+        authenticate(AllowAdminAuth(), payer.user.id)
+    assert exc.value.code == 403
+
+
+def test_saving_payer_invalidates_user():
+    payer = PayerFactory.create(name="Nome antigo")
+    authenticate(AllowHumansAuth(), payer.user.id)
+
+    payer.name = "Nome novo"
+    payer.save()
+
+    user, _ = authenticate(AllowHumansAuth(), payer.user.id)
+    assert user.payer.name == "Nome novo"
+
+
+def test_saving_user_invalidates_user():
+    user = UserFactory.create(staff_level='admin')
+    authenticate(AllowAdminAuth(), user.id)
+
+    user.staff_level = 'customer'
+    user.save()
+
+    with pytest.raises(HttpFriendlyException) as exc:
+        authenticate(AllowAdminAuth(), user.id)
+    assert exc.value.code == 403
+
+
+def test_renamed_api_consumer_is_invalidated():
+    system = ApiConsumerFactory.create(name="antigo")
+    authenticate(AllowHumansAuth(), "antigo", "system")
+
+    system.name = "novo"
+    system.save()
+
+    with pytest.raises(HttpFriendlyException):
+        authenticate(AllowHumansAuth(), "antigo", "system")
+
+
+def test_returned_actor_is_a_copy():
+    payer = PayerFactory.create()
+    first, _ = authenticate(AllowHumansAuth(), payer.user.id)
+    first.cpf_cnpj = "alterado"
+
+    second, _ = authenticate(AllowHumansAuth(), payer.user.id)
+    assert second.cpf_cnpj == payer.user.cpf_cnpj
+
+
+class TestTTLCache:
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = TTLCache('teste', max_size=10, ttl=60, clock=clock)
+        loads = []
+
+        cache.get_or_load('a', lambda: loads.append(1) or 'valor')
+        clock.now = 59
+        cache.get_or_load('a', lambda: loads.append(1) or 'valor')
+        clock.now = 61
+        cache.get_or_load('a', lambda: loads.append(1) or 'valor')
+
+        assert len(loads) == 2
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache('teste', max_size=2, ttl=60)
+        cache.get_or_load('a', lambda: 'a')
+        cache.get_or_load('b', lambda: 'b')
+        cache.get_or_load('a', lambda: 'a')
+        cache.get_or_load('c', lambda: 'c')
+
+        assert cache.stats()["evictions"] == 1
+        assert cache.get_or_load('a', lambda: 'recarregado') == 'a'
+        assert cache.get_or_load('b', lambda: 'recarregado') == 'recarregado'
+
+    def test_load_started_before_invalidation_is_not_stored(self):
+        cache = TTLCache('teste', max_size=10, ttl=60)
+
+        def load_while_invalidated():
+            cache.invalidate(lambda key, value: True)
+            return 'antigo'
+
+        assert cache.get_or_load('a', load_while_invalidated) == 'antigo'
+        assert cache.get_or_load('a', lambda: 'novo') == 'novo'
+
+    def test_failed_load_is_not_cached(self):
+        cache = TTLCache('teste', max_size=10, ttl=60)
+
+        def fail():
+            raise HttpFriendlyException(404, "Não encontrado")
+
+        with pytest.raises(HttpFriendlyException):
+            cache.get_or_load('a', fail)
+        assert cache.stats()["size"] == 0
+
+    def test_disabled_cache_always_loads(self):
+        cache = TTLCache('teste', max_size=0, ttl=60)
+        cache.get_or_load('a', lambda: 'a')
+
+        assert cache.stats() == {"size": 0, "hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "hit_rate": None}
+
+    def test_concurrent_lookups(self):
+        cache = TTLCache('teste', max_size=50, ttl=60)
+
+        def worker(offset):
+            for i in range(500):
+                key = (i + offset) % 100
+                assert cache.get_or_load(key, lambda: key) == key
+
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats()
+        assert stats["hits"] + stats["misses"] == 8 * 500
+        assert stats["size"] <= 50
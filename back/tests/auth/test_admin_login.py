@@ -1,4 +1,5 @@
 from django.test import Client
+from ninja_jwt.tokens import RefreshToken
 
 from app.models import User
 
@@ -18,6 +19,11 @@ def test_admin_login(client: Client, admin_user: User):
     assert response.status_code == 200, response.json()
     assert 'access' in data
 
+    refresh = RefreshToken(data['refresh'])
+    assert refresh['type'] == 'admin'
+    assert refresh['entity_id'] == str(admin_user.id)
+    assert 'user_id' not in refresh.payload
+
 
 def test_customer_cant_login_as_admin(client: Client, user: User):
     payload={
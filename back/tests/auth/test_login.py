@@ -149,3 +149,52 @@ def test_login_is_registered_on_database(client: Client, payer: Payer):
     assert response.status_code == 200, response.json()
     # Verifica se o login foi registrado no histórico
     assert LoginHistoryRepository.exists(user=payer.user, phone_used=payer.phone), "Login não foi registrado no histórico."
+
+
+def test_login_query_count(client: Client, payer: Payer, django_assert_max_num_queries):
+    code = "123456"
+    LoginCodeFactory.create(user=payer.user, code=code, used=False)
+
+    payload = {
+        "cpf_cnpj": payer.user.cpf_cnpj,
+        "phone": payer.phone,
+        "code": code
+    }
+
+    # Leitura única de usuário, pagador e código; uso do código e histórico,
+    # mais o savepoint da transação
+    with django_assert_max_num_queries(5):
+        response = client.post('/api/auth/token', data=payload, content_type='application/json')
+    assert response.status_code == 200, response.json()
+
+
+def test_login_with_new_phone_query_count(client: Client, payer: Payer, django_assert_max_num_queries):
+    code = "123456"
+    LoginCodeFactory.create(user=payer.user, code=code, used=False)
+
+    payload = {
+        "cpf_cnpj": payer.user.cpf_cnpj,
+        "phone": "77777777777",
+        "code": code
+    }
+
+    # Além do login comum: checagem e registro do número e troca do telefone
+    with django_assert_max_num_queries(8):
+        response = client.post('/api/auth/token', data=payload, content_type='application/json')
+    assert response.status_code == 200, response.json()
+
+
+def test_login_code_cannot_be_used_twice(client: Client, payer: Payer):
+    code = "123456"
+    LoginCodeFactory.create(user=payer.user, code=code, used=False)
+
+    payload = {
+        "cpf_cnpj": payer.user.cpf_cnpj,
+        "phone": payer.phone,
+        "code": code
+    }
+
+    assert client.post('/api/auth/token', data=payload, content_type='application/json').status_code == 200
+    response = client.post('/api/auth/token', data=payload, content_type='application/json')
+    assert response.status_code == 401
+    assert LoginHistoryRepository.filter(user=payer.user).count() == 1
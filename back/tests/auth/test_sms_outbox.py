@@ -0,0 +1,178 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+import requests
+from django.core.management import call_command
+from django.test import Client
+from django.utils import timezone
+
+from app.controllers.sms_controller import EXPIRED_ERROR, SmsController
+from app.models import Payer, SmsMessage
+from app.sms_api import HttpSmsProvider, SmsDeliveryError, StubSmsProvider
+from config import SMS_MAX_ATTEMPTS
+
+
+def test_get_code_enqueues_sms_without_sending(client: Client, payer: Payer):
+    with patch.object(StubSmsProvider, 'send') as send:
+        response = client.get('/api/user/get_code', {"cpf_cnpj": payer.user.cpf_cnpj, "phone": payer.phone})
+
+    assert response.status_code == 201, response.json()
+    send.assert_not_called()
+    sms = SmsMessage.objects.get()
+    assert sms.status == SmsMessage.Status.QUEUED.value
+    assert sms.phone == payer.phone
+    assert sms.expires_at is not None
+
+
+def test_dispatch_sends_queued_messages():
+    provider = StubSmsProvider()
+    first = SmsController.enqueue("(11) 99999-0001", "primeira")
+    second = SmsController.enqueue("11999990002", "segunda")
+
+    result = SmsController.dispatch_pending(provider)
+
+    assert result.sent == 2
+    assert sorted(provider.sent) == [("11999990001", "primeira"), ("11999990002", "segunda")]
+    for sms in (first, second):
+        sms.refresh_from_db()
+        assert sms.status == SmsMessage.Status.SENT.value
+        assert sms.attempts == 1
+        assert sms.sent_at is not None
+
+
+def test_failed_send_is_retried_with_backoff():
+    provider = StubSmsProvider()
+    provider.fail_next = 1
+    sms = SmsController.enqueue("11999990001", "mensagem")
+
+    assert SmsController.dispatch_pending(provider).retried == 1
+    sms.refresh_from_db()
+    assert sms.status == SmsMessage.Status.QUEUED.value
+    assert sms.attempts == 1
+    assert sms.next_attempt_at > timezone.now()
+    assert sms.last_error
+
+    # Antes do fim da espera a mensagem não é tentada de novo
+    assert SmsController.dispatch_pending(provider) == (0, 0, 0)
+
+    result = SmsController.dispatch_pending(provider, now=sms.next_attempt_at)
+    assert result.sent == 1
+    sms.refresh_from_db()
+    assert sms.status == SmsMessage.Status.SENT.value
+    assert sms.attempts == 2
+
+
+def test_backoff_doubles():
+    assert SmsController.retry_delay(2) == 2 * SmsController.retry_delay(1)
+    assert SmsController.retry_delay(3) == 4 * SmsController.retry_delay(1)
+
+
+def test_message_fails_after_max_attempts():
+    provider = StubSmsProvider()
+    provider.fail_next = SMS_MAX_ATTEMPTS
+    sms = SmsController.enqueue("11999990001", "mensagem")
+
+    now = timezone.now()
+    for _ in range(SMS_MAX_ATTEMPTS):
+        SmsController.dispatch_pending(provider, now=now)
+        now += timedelta(hours=1)
+
+    sms.refresh_from_db()
+    assert sms.status == SmsMessage.Status.FAILED.value
+    assert sms.attempts == SMS_MAX_ATTEMPTS
+    assert provider.sent == []
+
+
+def test_permanent_failure_is_not_retried():
+    provider = StubSmsProvider()
+    provider.fail_next = 1
+    provider.permanent_failure = True
+    sms = SmsController.enqueue("11999990001", "mensagem")
+
+    assert SmsController.dispatch_pending(provider).failed == 1
+    sms.refresh_from_db()
+    assert sms.status == SmsMessage.Status.FAILED.value
+
+
+def test_expired_message_is_not_sent():
+    provider = StubSmsProvider()
+    sms = SmsController.enqueue("11999990001", "código", expires_at=timezone.now() - timedelta(seconds=1))
+
+    assert SmsController.dispatch_pending(provider).failed == 1
+    sms.refresh_from_db()
+    assert sms.status == SmsMessage.Status.FAILED.value
+    assert sms.last_error == EXPIRED_ERROR
+    assert provider.sent == []
+
+
+def test_claimed_message_is_not_claimed_twice():
+    sms = SmsController.enqueue("11999990001", "mensagem")
+
+    assert SmsController.claim_due(10) == [sms]
+    assert SmsController.claim_due(10) == []
+    # Dispatcher que reservou a mensagem morreu: depois do prazo ela volta
+    later = timezone.now() + SmsController.claim_lease(10) + timedelta(seconds=1)
+    assert SmsController.claim_due(10, now=later) == [sms]
+
+
+def test_claim_lease_covers_a_whole_round():
+    # 100 mensagens, 4 por vez, cada uma podendo levar o tempo limite inteiro,
+    # e no máximo 2 chamadas por segundo: a rodada pode levar 25 timeouts mais 50s
+    with patch('app.controllers.sms_controller.SMS_REQUEST_TIMEOUT_SECONDS', 10), \
+         patch('app.controllers.sms_controller.CLAIM_LEASE_MARGIN_SECONDS', 30):
+        assert SmsController.claim_lease(100, concurrency=4, rate=2) == timedelta(seconds=25 * 10 + 50 + 30)
+        assert SmsController.claim_lease(100, concurrency=4, rate=0) == timedelta(seconds=25 * 10 + 30)
+
+    sms = SmsController.enqueue("11999990001", "mensagem")
+    SmsController.claim_due(100, concurrency=4)
+    sms.refresh_from_db()
+    assert sms.next_attempt_at >= timezone.now() + SmsController.claim_lease(100, concurrency=4) - timedelta(seconds=5)
+
+
+def test_dispatch_command_once():
+    SmsController.enqueue("11999990001", "mensagem")
+    out = StringIO()
+
+    call_command('dispatch_sms', '--once', stdout=out)
+
+    assert '1 SMS enviado(s)' in out.getvalue()
+    assert SmsMessage.objects.get().status == SmsMessage.Status.SENT.value
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ''
+
+
+def test_http_provider_reuses_session():
+    provider = HttpSmsProvider(pool_size=2)
+    with patch.object(provider.session, 'post', return_value=FakeResponse(200)) as post:
+        provider.send("(11) 99999-0001", "um")
+        provider.send("11999990002", "dois")
+
+    assert post.call_count == 2
+    assert post.call_args.kwargs["json"] == {"celular": "11999990002", "mensagem": "dois"}
+
+
+@pytest.mark.parametrize("status_code, permanent", [(400, True), (429, False), (503, False)])
+def test_http_provider_classifies_errors(status_code, permanent):
+    provider = HttpSmsProvider()
+
+    with patch.object(provider.session, 'post', return_value=FakeResponse(status_code)):
+        with pytest.raises(SmsDeliveryError) as exc:
+            provider.send("11999990001", "mensagem")
+
+    assert exc.value.permanent is permanent
+
+
+def test_http_provider_connection_error_is_retried():
+    provider = HttpSmsProvider()
+
+    with patch.object(provider.session, 'post', side_effect=requests.ConnectionError("fora do ar")):
+        with pytest.raises(SmsDeliveryError) as exc:
+            provider.send("11999990001", "mensagem")
+
+    assert not exc.value.permanent
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+import pytest
+from django.test import RequestFactory
+from ninja_jwt.tokens import AccessToken
+
+from app.controllers.auth_controller import AuthController
+from app.exceptions import HttpFriendlyException
+from app.management.commands.benchmark_auth import run_benchmark
+from core.auth import AllowHumansAuth, token_cache, verify_access_token
+from core.ttl_cache import TTLCache
+from tests.factories import PayerFactory
+from tests.utils import login_client_as
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def access_token_for(user) -> str:
+    return str(AuthController.get_token(user.id, "user").access_token)
+
+
+def test_repeated_token_is_verified_once():
+    token = access_token_for(PayerFactory.create().user)
+
+    with patch('core.auth.AccessToken', wraps=AccessToken) as verify:
+        first = verify_access_token(token)
+        second = verify_access_token(token)
+
+    assert verify.call_count == 1
+    assert second is first
+
+
+def test_invalid_token_is_not_cached():
+    token = access_token_for(PayerFactory.create().user)
+    tampered = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+
+    for _ in range(2):
+        with pytest.raises(HttpFriendlyException):
+            AllowHumansAuth().authenticate(RequestFactory().get('/'), tampered)
+
+    assert token_cache.stats()["size"] == 0
+
+
+def test_cached_token_still_authenticates_through_api(client):
+    payer = PayerFactory.create()
+    client = login_client_as(client, payer.user)
+
+    assert client.get('/api/agreement/').status_code == 200
+    assert client.get('/api/agreement/').status_code == 200
+    assert token_cache.stats()["hits"] == 1
+
+
+def test_entry_ttl_follows_value():
+    clock = FakeClock()
+    cache = TTLCache('teste', max_size=10, ttl=3600, clock=clock)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return 30
+
+    cache.get_or_load('token', load, ttl_for=lambda expires_in: expires_in)
+    clock.now = 29
+    cache.get_or_load('token', load, ttl_for=lambda expires_in: expires_in)
+    clock.now = 31
+    cache.get_or_load('token', load, ttl_for=lambda expires_in: expires_in)
+
+    assert len(loads) == 2
+
+
+def test_already_expired_value_is_not_stored():
+    cache = TTLCache('teste', max_size=10, ttl=3600)
+
+    cache.get_or_load('token', lambda: 'valor', ttl_for=lambda value: -1)
+
+    assert cache.stats()["size"] == 0
+
+
+def test_benchmark_reports_both_scenarios():
+    results = run_benchmark(20)
+
+    assert results["sem cache"]["queries_per_request"] == 1
+    assert results["com cache"]["queries_per_request"] == 0
+    # Só a autenticação de aquecimento vai ao banco e verifica a assinatura
+    assert results["com cache"]["token_hit_rate"] == round(20 / 21, 4)
@@ -0,0 +1,99 @@
+import threading
+import time
+from functools import partial
+
+import pytest
+from django.core.files.storage import FileSystemStorage
+
+from app.boleto_storage import BoletoUploader
+
+UPLOAD_LATENCY = 0.05
+BOLETOS = 16
+
+
+class SlowStorage(FileSystemStorage):
+    """Storage local que simula a latência de cada envio ao S3."""
+
+    def _save(self, name, content):
+        time.sleep(UPLOAD_LATENCY)
+        return super()._save(name, content)
+
+
+class RecordingStorage(FileSystemStorage):
+    """Registra qual instância atendeu cada thread."""
+    used = []
+
+    def _save(self, name, content):
+        self.used.append((threading.get_ident(), id(self)))
+        time.sleep(UPLOAD_LATENCY)
+        return super()._save(name, content)
+
+
+class FailingStorage(FileSystemStorage):
+    def _save(self, name, content):
+        if name.endswith('_3.pdf'):
+            raise IOError("Falha no envio")
+        return super()._save(name, content)
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    source = tmp_path / 'extraidos'
+    source.mkdir()
+    uploads = []
+    for i in range(BOLETOS):
+        pdf = source / f'{i}.pdf'
+        pdf.write_bytes(b'%PDF-1.4 boleto ' + str(i).encode())
+        uploads.append((f'boletos/credor/acordo_{i}.pdf', partial(open, pdf, 'rb')))
+    return uploads
+
+
+def test_upload_keeps_order_and_content(tmp_path, pdfs):
+    storage = FileSystemStorage(location=tmp_path / 'storage')
+
+    paths = BoletoUploader(max_workers=4, storage=storage).upload(pdfs)
+
+    assert paths == [destination for destination, _ in pdfs]
+    for path, (_, source) in zip(paths, pdfs):
+        with storage.open(path) as f, source() as expected:
+            assert f.read() == expected.read()
+
+
+def test_concurrent_upload_is_faster_than_sequential(tmp_path, pdfs):
+    sequential_storage = SlowStorage(location=tmp_path / 'sequencial')
+    start = time.perf_counter()
+    BoletoUploader(max_workers=1, storage=sequential_storage).upload(pdfs)
+    sequential = time.perf_counter() - start
+
+    concurrent_storage = SlowStorage(location=tmp_path / 'concorrente')
+    start = time.perf_counter()
+    BoletoUploader(max_workers=8, storage=concurrent_storage).upload(pdfs)
+    concurrent = time.perf_counter() - start
+
+    assert sequential >= BOLETOS * UPLOAD_LATENCY
+    assert concurrent < sequential / 3
+
+
+def test_failed_upload_discards_saved_files(tmp_path, pdfs):
+    storage = FailingStorage(location=tmp_path / 'storage')
+
+    with pytest.raises(IOError):
+        BoletoUploader(max_workers=4, storage=storage).upload(pdfs)
+
+    assert not any(storage.exists(destination) for destination, _ in pdfs)
+
+
+def test_each_thread_uploads_through_its_own_storage(tmp_path, pdfs):
+    storage = RecordingStorage(location=tmp_path / 'storage')
+    RecordingStorage.used = []
+
+    BoletoUploader(max_workers=4, storage=storage).upload(pdfs)
+
+    instances_by_thread = {}
+    for thread, instance in RecordingStorage.used:
+        instances_by_thread.setdefault(thread, set()).add(instance)
+    assert len(instances_by_thread) > 1
+    assert all(len(instances) == 1 for instances in instances_by_thread.values())
+    instances = set.union(*instances_by_thread.values())
+    assert id(storage) not in instances and len(instances) == len(instances_by_thread)
+    assert all(storage.exists(destination) for destination, _ in pdfs)
@@ -0,0 +1,126 @@
+import hashlib
+from functools import partial
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+
+from app.boleto_storage import BoletoUploader
+from app.controllers.stored_blob_controller import StoredBlobController
+from app.models import Boleto, Installment, StoredBlob
+from tests.factories import InstallmentFactory
+
+
+class CountingStorage(FileSystemStorage):
+    """Storage local que conta os envios, somando os de todas as threads."""
+
+    saves = 0
+
+    def _save(self, name, content):
+        CountingStorage.saves += 1
+        return super()._save(name, content)
+
+
+def sources(*contents):
+    return [partial(BytesIO, content) for content in contents]
+
+
+@pytest.mark.django_db
+class TestStoredBlobController:
+
+    def test_identical_contents_are_uploaded_once(self, tmp_path):
+        CountingStorage.saves = 0
+        uploader = BoletoUploader(storage=CountingStorage(location=tmp_path))
+
+        blobs = StoredBlobController.store_many(sources(b'%PDF a', b'%PDF b', b'%PDF a'), uploader=uploader)
+
+        assert CountingStorage.saves == 2
+        assert blobs[0].id == blobs[2].id != blobs[1].id
+        assert blobs[0].path == StoredBlobController.blob_path(hashlib.sha256(b'%PDF a').hexdigest())
+        assert {blob.sha256: blob.refcount for blob in StoredBlob.objects.all()} == {
+            hashlib.sha256(b'%PDF a').hexdigest(): 2,
+            hashlib.sha256(b'%PDF b').hexdigest(): 1,
+        }
+
+    def test_known_content_skips_the_upload(self, tmp_path):
+        CountingStorage.saves = 0
+        uploader = BoletoUploader(storage=CountingStorage(location=tmp_path))
+        [first] = StoredBlobController.store_many(sources(b'%PDF a'), uploader=uploader)
+
+        [again] = StoredBlobController.store_many(sources(b'%PDF a'), uploader=uploader)
+
+        assert CountingStorage.saves == 1
+        assert again.id == first.id
+        assert StoredBlob.objects.get(id=first.id).refcount == 2
+
+    def test_concurrent_import_of_the_same_content_keeps_the_winner(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        uploader = BoletoUploader(storage=storage)
+        sha256 = hashlib.sha256(b'%PDF a').hexdigest()
+        upload = uploader.upload
+
+        def other_import_wins(uploads):
+            # Outra importação grava o mesmo conteúdo entre a busca e a criação do registro
+            path = storage.save(StoredBlobController.blob_path(sha256), BytesIO(b'%PDF a'))
+            StoredBlob.objects.create(sha256=sha256, path=path, size=6, refcount=1)
+            return upload(uploads)
+
+        saved_files = []
+        with patch.object(uploader, 'upload', side_effect=other_import_wins):
+            [blob] = StoredBlobController.store_many(sources(b'%PDF a'), saved_files, uploader=uploader)
+
+        winner = StoredBlob.objects.get()
+        assert blob.id == winner.id and winner.refcount == 2
+        assert saved_files == []
+        assert storage.listdir(f'blobs/{sha256[:2]}')[1] == [f'{sha256}.pdf']
+
+    def test_discard_keeps_files_used_by_blobs(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        used = storage.save('blobs/ab/usado.pdf', BytesIO(b'%PDF usado'))
+        orphan = storage.save('blobs/ab/sobra.pdf', BytesIO(b'%PDF sobra'))
+        StoredBlob.objects.create(sha256='ab' * 32, path=used, size=10, refcount=1)
+
+        StoredBlobController.discard([used, orphan], BoletoUploader(storage=storage))
+
+        assert storage.exists(used)
+        assert not storage.exists(orphan)
+
+    def test_last_boleto_deleted_removes_the_file(self, django_capture_on_commit_callbacks):
+        blob = StoredBlobController.store(BytesIO(b'%PDF compartilhado'))
+        StoredBlobController.store(BytesIO(b'%PDF compartilhado'))
+        first, second = (
+            Boleto.objects.create(pdf=blob.path, blob=blob, installment=InstallmentFactory.create())
+            for _ in range(2)
+        )
+
+        first.delete()
+        assert StoredBlob.objects.get(id=blob.id).refcount == 1
+
+        # Remoção em cascata, a partir da parcela, também devolve a referência
+        with django_capture_on_commit_callbacks(execute=True):
+            second.installment.delete()
+
+        assert not StoredBlob.objects.filter(id=blob.id).exists()
+        assert not default_storage.exists(blob.path)
+
+
+@pytest.mark.django_db
+def test_create_boleto_reuses_identical_pdf(system_client: Client):
+    installments = [InstallmentFactory.create(), InstallmentFactory.create()]
+
+    with patch('app.controllers.boleto_controller.BOLETO_CONTENT_ADDRESSED', True):
+        for installment in installments:
+            response = system_client.post('/api/boleto/', data={
+                'pdf': SimpleUploadedFile("boleto.pdf", b'%PDF-1.4 mesmo boleto', content_type="application/pdf"),
+                'status': Boleto.Status.PENDING.value,
+                'installment': installment.id,
+            })
+            assert response.status_code == 201, response.json()
+
+    blob = StoredBlob.objects.get()
+    assert blob.refcount == 2
+    assert set(Boleto.objects.values_list('pdf', flat=True)) == {blob.path}
+    assert Installment.objects.filter(boleto__blob=blob).count() == 2
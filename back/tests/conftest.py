@@ -9,6 +9,8 @@ from unittest.mock import patch
 from app.controllers.auth_controller import AuthController
 from app.models import ApiConsumer
 from tests.factories import AgreementFactory, ApiConsumerFactory, BoletoFactory, CreditorFactory, InstallmentFactory, LoginCodeFactory, LoginHistoryFactory, PayerFactory, UserFactory
+from core.actor_cache import actor_cache
+from core.auth import token_cache
 from tests.utils import login_client_as
 
 
@@ -20,6 +22,19 @@ def enable_db_access_for_all_tests(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    """
+    O rollback do banco entre os testes não dispara sinais, então o cache de
+    atores guardaria usuários que não existem mais.
+    """
+    actor_cache.clear()
+    token_cache.clear()
+    yield
+    actor_cache.clear()
+    token_cache.clear()
+
+
 @pytest.fixture(autouse=True)
 def disable_sms(settings):
     settings.SEND_SMS = False
@@ -9,7 +9,7 @@ from faker import Faker
 import factory
 
 from app.controllers.boleto_controller import BoletoController
-from app.models import Agreement, ApiConsumer, Boleto, Creditor, Installment, LoginCode, LoginHistory, Payer, User
+from app.models import Agreement, ApiConsumer, Boleto, Creditor, Installment, LoginCode, LoginHistory, Payer, SpreadsheetJob, User
 
 fake = Faker()
 
@@ -113,3 +113,10 @@ class LoginHistoryFactory(TimestampedModelFactory):
     user = factory.SubFactory(UserFactory)
     timestamp = factory.LazyFunction(timezone.now)
     phone_used = factory.Faker('numerify', text='###########')
+
+
+class SpreadsheetJobFactory(TimestampedModelFactory):
+    class Meta:
+        model = SpreadsheetJob
+
+    status = SpreadsheetJob.Status.QUEUED.value
@@ -0,0 +1,153 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+
+from app.controllers.due_reminder_controller import DueReminderController
+from app.controllers.sms_controller import SmsController
+from app.models import Agreement, Boleto, InstallmentReminder, SmsMessage
+from app.sms_api import RateLimiter, StubSmsProvider
+from tests.factories import AgreementFactory, BoletoFactory, InstallmentFactory, PayerFactory
+
+TODAY = date(2030, 3, 10)
+
+
+def pending_boleto(agreement, due_date, number='1', status=Boleto.Status.PENDING.value):
+    installment = InstallmentFactory.create(agreement=agreement, due_date=due_date, number=number)
+    return BoletoFactory.create(installment=installment, status=status)
+
+
+def test_one_message_per_phone_with_all_due_installments():
+    payer = PayerFactory.create(phone='11999990001')
+    first = AgreementFactory.create(payer=payer, number='A1')
+    second = AgreementFactory.create(payer=payer, number='A2')
+    pending_boleto(first, TODAY + timedelta(days=1))
+    pending_boleto(second, TODAY + timedelta(days=3), number='2')
+    other = pending_boleto(AgreementFactory.create(number='B1'), TODAY)
+
+    result = DueReminderController.enqueue_reminders(days=3, today=TODAY)
+
+    assert result == (2, 3, 0)
+    grouped = SmsMessage.objects.get(phone='11999990001')
+    assert '2 parcelas' in grouped.message
+    assert '11/03/2030 e 13/03/2030' in grouped.message
+    single = SmsMessage.objects.get(phone=other.installment.agreement.payer.phone)
+    assert 'parcela 1 do acordo B1 vence em 10/03/2030' in single.message
+    assert InstallmentReminder.objects.count() == 3
+
+
+def test_payers_sharing_a_phone_get_one_message():
+    for phone in ('11999990001', '(11) 99999-0001'):
+        pending_boleto(AgreementFactory.create(payer=PayerFactory.create(phone=phone)), TODAY + timedelta(days=1))
+
+    assert DueReminderController.enqueue_reminders(days=3, today=TODAY) == (1, 2, 0)
+
+
+def test_phones_with_same_digits_are_merged_across_batches():
+    # Na ordem do telefone gravado, outros pagadores ficam entre as duas formatações
+    for phone in ('(11) 99999-0001', '11 98888-0000', '11 97777-0000', '11999990001'):
+        pending_boleto(AgreementFactory.create(payer=PayerFactory.create(phone=phone)), TODAY + timedelta(days=1))
+
+    assert DueReminderController.enqueue_reminders(days=3, today=TODAY, batch_size=1) == (3, 4, 0)
+    assert SmsMessage.objects.filter(phone='11999990001').count() == 1
+
+
+def test_only_pending_open_installments_in_window():
+    agreement = AgreementFactory.create()
+    pending_boleto(agreement, TODAY - timedelta(days=1))
+    pending_boleto(agreement, TODAY + timedelta(days=4))
+    pending_boleto(agreement, TODAY + timedelta(days=1), status=Boleto.Status.PAID.value)
+    closed = AgreementFactory.create(status=Agreement.Status.CLOSED.value)
+    pending_boleto(closed, TODAY + timedelta(days=1))
+    InstallmentFactory.create(agreement=agreement, due_date=TODAY + timedelta(days=1))
+
+    assert DueReminderController.enqueue_reminders(days=3, today=TODAY) == (0, 0, 0)
+
+
+def test_rerun_does_not_repeat_reminders():
+    agreement = AgreementFactory.create()
+    pending_boleto(agreement, TODAY + timedelta(days=1))
+    DueReminderController.enqueue_reminders(days=3, today=TODAY)
+
+    # Uma parcela nova no mesmo dia só gera lembrete dela
+    pending_boleto(agreement, TODAY + timedelta(days=2), number='2')
+    assert DueReminderController.enqueue_reminders(days=3, today=TODAY) == (1, 1, 0)
+    assert DueReminderController.enqueue_reminders(days=3, today=TODAY) == (0, 0, 0)
+    assert SmsMessage.objects.count() == 2
+
+
+def test_conflicting_batch_falls_back_to_each_phone():
+    payer = PayerFactory.create(phone='11999990001')
+    agreement = AgreementFactory.create(payer=payer, number='A1')
+    first = pending_boleto(agreement, TODAY + timedelta(days=1))
+    pending_boleto(agreement, TODAY + timedelta(days=2), number='2')
+    other = pending_boleto(AgreementFactory.create(number='B1'), TODAY + timedelta(days=1))
+    groups = DueReminderController._group_by_phone(DueReminderController.due_installments(3, TODAY))
+
+    # Outra execução lembra a primeira parcela entre a seleção e a gravação
+    InstallmentReminder.objects.create(installment=first.installment)
+
+    assert DueReminderController._write_batch(groups) == (2, 2, 1)
+    grouped = SmsMessage.objects.get(phone='11999990001')
+    assert 'parcela 2 do acordo A1' in grouped.message
+    assert SmsMessage.objects.filter(phone=other.installment.agreement.payer.phone).exists()
+    assert InstallmentReminder.objects.get(installment=first.installment).sms is None
+
+
+def test_selection_is_a_single_query(django_assert_num_queries):
+    for _ in range(5):
+        pending_boleto(AgreementFactory.create(), TODAY + timedelta(days=1))
+
+    with django_assert_num_queries(1):
+        rows = list(DueReminderController.due_installments(3, TODAY))
+
+    assert len(rows) == 5
+
+
+def test_writes_are_batched(django_assert_max_num_queries):
+    for _ in range(6):
+        pending_boleto(AgreementFactory.create(), TODAY + timedelta(days=1))
+
+    # Seleção, e por lote de 3 telefones: savepoint, SMS, registros, release
+    with django_assert_max_num_queries(1 + 2 * 4):
+        assert DueReminderController.enqueue_reminders(days=3, today=TODAY, batch_size=3) == (6, 6, 0)
+
+
+def test_dry_run_writes_nothing():
+    pending_boleto(AgreementFactory.create(), TODAY + timedelta(days=1))
+
+    assert DueReminderController.enqueue_reminders(days=3, today=TODAY, dry_run=True) == (1, 1, 0)
+    assert not SmsMessage.objects.exists()
+    assert not InstallmentReminder.objects.exists()
+
+
+def test_login_codes_are_sent_before_reminders():
+    for _ in range(3):
+        pending_boleto(AgreementFactory.create(), TODAY + timedelta(days=1))
+    DueReminderController.enqueue_reminders(days=3, today=TODAY)
+    code = SmsController.enqueue('11999990009', 'código', priority=SmsMessage.Priority.HIGH)
+
+    provider = StubSmsProvider()
+    SmsController.dispatch_pending(provider, limit=1)
+
+    assert provider.sent == [(code.phone, code.message)]
+
+
+def test_command():
+    pending_boleto(AgreementFactory.create(), date.today() + timedelta(days=1))
+    out = StringIO()
+
+    call_command('send_due_reminders', '--days', '2', stdout=out)
+
+    assert '1 lembrete(s) enfileirados para 1 parcela(s)' in out.getvalue()
+
+
+def test_rate_limiter_spaces_calls():
+    now = [0.0]
+    waits = []
+    limiter = RateLimiter(rate=10, clock=lambda: now[0], sleep=waits.append)
+
+    for _ in range(3):
+        limiter.acquire()
+
+    assert waits == [0.1, 0.2]
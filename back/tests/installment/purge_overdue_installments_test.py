@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+
+from app.controllers.installment_controller import InstallmentController
+from app.controllers.periodic_task_controller import PeriodicTaskController
+from app.controllers.stored_blob_controller import StoredBlobController
+from app.models import Boleto, Installment, PeriodicTaskRun, StoredBlob
+from app.tasks import PeriodicTask
+from tests.factories import BoletoFactory, InstallmentFactory
+
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+def boleto(due_date, status=Boleto.Status.PENDING.value):
+    path = default_storage.save('boletos/vencidos/boleto.pdf', ContentFile(b'%PDF vencido'))
+    return BoletoFactory.create(installment=InstallmentFactory.create(due_date=due_date), status=status, pdf=path)
+
+
+def test_purge_removes_overdue_pending_installments_in_batches(django_capture_on_commit_callbacks):
+    overdue = [boleto(YESTERDAY) for _ in range(5)]
+    paid = boleto(YESTERDAY, status=Boleto.Status.PAID.value)
+    upcoming = boleto(date.today())
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        result = InstallmentController.remove_overdue_installments(batch_size=2)
+
+    assert result == (5, 5, 5)
+    assert len(callbacks) == 3
+    assert set(Installment.objects.values_list('id', flat=True)) == {paid.installment_id, upcoming.installment_id}
+    assert not any(default_storage.exists(b.pdf.name) for b in overdue)
+    assert default_storage.exists(paid.pdf.name)
+
+
+def test_purge_releases_content_addressed_pdfs(django_capture_on_commit_callbacks):
+    blob = StoredBlobController.store(BytesIO(b'%PDF compartilhado'))
+    Boleto.objects.create(pdf=blob.path, blob=blob, installment=InstallmentFactory.create(due_date=YESTERDAY))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        result = InstallmentController.remove_overdue_installments()
+
+    # O PDF é apagado pela liberação do blob, não pela limpeza
+    assert result.files == 0
+    assert not StoredBlob.objects.exists()
+    assert not default_storage.exists(blob.path)
+
+
+def test_purge_command_reports_counts():
+    boleto(YESTERDAY)
+    out = StringIO()
+
+    call_command('purge_overdue_installments', '--batch-size', '10', stdout=out)
+
+    assert '1 parcelas vencidas removidas, com 1 boletos e 1 PDFs' in out.getvalue()
+
+
+def test_periodic_task_runs_once_per_interval():
+    calls = []
+    task = PeriodicTask('teste', timedelta(hours=1), lambda: calls.append(1) or {"ok": len(calls)})
+    now = timezone.now()
+    assert PeriodicTaskController.run_due([task], now) == ['teste']
+    assert PeriodicTaskController.run_due([task], now + timedelta(minutes=59)) == []
+    assert PeriodicTaskController.run_due([task], now + timedelta(hours=1)) == ['teste']
+
+    run = PeriodicTaskRun.objects.get(name='teste')
+    assert run.last_result == {"ok": 2}
+    assert run.last_finished_at is not None
+
+
+def test_periodic_task_error_is_recorded():
+    def fail():
+        raise RuntimeError("storage fora do ar")
+
+    assert PeriodicTaskController.run_due([PeriodicTask('falha', timedelta(hours=1), fail)]) == ['falha']
+    assert PeriodicTaskRun.objects.get(name='falha').last_result == {"error": "storage fora do ar"}
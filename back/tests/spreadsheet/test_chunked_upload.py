@@ -0,0 +1,191 @@
+import hashlib
+import io
+import json
+import shutil
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+
+from app.controllers.chunked_upload_controller import ChunkedUploadController
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.models import ChunkedUpload, SpreadsheetJob
+
+UPLOADS = '/api/admin/spreadsheet/uploads'
+CSV_CONTENT = (
+    "Data Vencimento,Contrato,Cliente,Credor,CPF/CNPJ,Parcela,Valor,Data Pagamento,Valor Pago,Qtd Parcelas\n"
+    "31/12/2030,123456,João Silva,Banco ABC,12345678901,1/1,1000.00,,,1\n"
+)
+
+
+def boletos_zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        zip_file.writestr("123456 PARC 1.pdf", b"fake pdf content " * 100)
+    return buffer.getvalue()
+
+
+def create(client, content: bytes, filename='boletos.zip') -> dict:
+    response = client.post(UPLOADS, json.dumps({"filename": filename, "size": len(content)}), content_type='application/json')
+    assert response.status_code == 201
+    return response.json()['data']
+
+
+def put_chunk(client, upload_id: str, offset: int, chunk: bytes, **headers):
+    return client.put(
+        f'{UPLOADS}/{upload_id}/chunks?offset={offset}', chunk,
+        content_type='application/octet-stream', headers=headers,
+    )
+
+
+def finalize(client, upload_id: str, sha256=None):
+    return client.post(f'{UPLOADS}/{upload_id}/finalize', json.dumps({"sha256": sha256}), content_type='application/json')
+
+
+def send(client, content: bytes, chunk_size=500) -> str:
+    upload_id = create(client, content)['upload_id']
+    for offset in range(0, len(content), chunk_size):
+        assert put_chunk(client, upload_id, offset, content[offset:offset + chunk_size]).status_code == 200
+    assert finalize(client, upload_id, hashlib.sha256(content).hexdigest()).status_code == 200
+    return upload_id
+
+
+@pytest.fixture(autouse=True)
+def clean_media(settings, tmp_path):
+    settings.UPLOADS_ROOT = tmp_path / 'uploads'
+    yield
+    for _, path in SpreadsheetController.operation_paths():
+        shutil.rmtree(path)
+
+
+class TestChunkedUpload:
+
+    def test_chunks_are_assembled_in_order(self, system_client):
+        content = boletos_zip()
+        upload_id = send(system_client, content)
+
+        upload = ChunkedUpload.objects.get(uuid=upload_id)
+        assert upload.status == ChunkedUpload.Status.COMPLETE.value
+        assert upload.sha256 == hashlib.sha256(content).hexdigest()
+        assert ChunkedUploadController.file_path(upload).read_bytes() == content
+
+    def test_upload_is_kept_out_of_media_root(self, system_client):
+        # MEDIA_ROOT é servido publicamente em /media/
+        content = b"a" * 1000
+        upload_id = create(system_client, content)['upload_id']
+        put_chunk(system_client, upload_id, 0, content)
+
+        path = ChunkedUploadController.file_path(ChunkedUpload.objects.get(uuid=upload_id))
+        assert path.read_bytes() == content
+        assert Path(settings.MEDIA_ROOT) not in path.parents
+
+    def test_chunk_past_received_bytes_is_rejected(self, system_client):
+        content = b"a" * 1000
+        upload_id = create(system_client, content)['upload_id']
+
+        response = put_chunk(system_client, upload_id, 500, content[500:])
+
+        assert response.status_code == 409
+        assert ChunkedUpload.objects.get(uuid=upload_id).received == 0
+
+    def test_upload_resumes_from_received_after_failure(self, system_client):
+        content = bytes(range(256)) * 8
+        upload_id = create(system_client, content)['upload_id']
+        put_chunk(system_client, upload_id, 0, content[:700])
+
+        # A parte seguinte chegou corrompida e foi descartada
+        response = put_chunk(system_client, upload_id, 700, content[700:1400], X_Chunk_SHA256="0" * 64)
+        assert response.status_code == 400
+
+        received = system_client.get(f'{UPLOADS}/{upload_id}').json()['data']['received']
+        assert received == 700
+        # Reenvio parcialmente sobreposto ao que já chegou
+        put_chunk(system_client, upload_id, 600, content[600:], X_Chunk_SHA256=hashlib.sha256(content[600:]).hexdigest())
+
+        assert finalize(system_client, upload_id, hashlib.sha256(content).hexdigest()).status_code == 200
+
+    def test_corrupted_resend_keeps_received_bytes(self, system_client):
+        content = bytes(range(256)) * 4
+        upload_id = create(system_client, content)['upload_id']
+        put_chunk(system_client, upload_id, 0, content[:700])
+
+        # Reenvio sobreposto ao que já chegou, corrompido no caminho
+        corrupted = b"\x00" * 300
+        response = put_chunk(system_client, upload_id, 500, corrupted, X_Chunk_SHA256=hashlib.sha256(content[500:800]).hexdigest())
+        assert response.status_code == 400
+
+        upload = ChunkedUpload.objects.get(uuid=upload_id)
+        assert upload.received == 700
+        assert ChunkedUploadController.file_path(upload).read_bytes()[:700] == content[:700]
+        put_chunk(system_client, upload_id, 700, content[700:])
+        assert finalize(system_client, upload_id, hashlib.sha256(content).hexdigest()).status_code == 200
+
+    def test_chunk_beyond_declared_size_is_rejected(self, system_client):
+        upload_id = create(system_client, b"a" * 10)['upload_id']
+
+        assert put_chunk(system_client, upload_id, 0, b"a" * 11).status_code == 400
+
+    def test_finalize_requires_every_byte(self, system_client):
+        content = b"a" * 1000
+        upload_id = create(system_client, content)['upload_id']
+        put_chunk(system_client, upload_id, 0, content[:999])
+
+        assert finalize(system_client, upload_id).status_code == 409
+
+    def test_finalize_checks_file_hash(self, system_client):
+        content = b"a" * 1000
+        upload_id = create(system_client, content)['upload_id']
+        put_chunk(system_client, upload_id, 0, content)
+
+        assert finalize(system_client, upload_id, hashlib.sha256(b"outro").hexdigest()).status_code == 400
+        assert ChunkedUpload.objects.get(uuid=upload_id).status == ChunkedUpload.Status.UPLOADING.value
+
+    def test_unknown_upload(self, system_client):
+        assert system_client.get(f'{UPLOADS}/nao-e-uuid').status_code == 404
+
+    def test_stale_uploads_are_reaped(self, system_client):
+        upload_id = create(system_client, b"a" * 10)['upload_id']
+        upload = ChunkedUpload.objects.get(uuid=upload_id)
+
+        assert ChunkedUploadController.reap(now=timezone.now() + timedelta(days=2)) == 1
+        assert not ChunkedUpload.objects.exists()
+        assert not ChunkedUploadController.file_path(upload).exists()
+
+
+class TestProcessWithChunkedUpload:
+
+    def test_process_uses_assembled_zip(self, system_client):
+        content = boletos_zip()
+        upload_id = send(system_client, content)
+
+        response = system_client.post('/api/admin/spreadsheet/process', {
+            'spreadsheet': SimpleUploadedFile("spreadsheet.csv", CSV_CONTENT.encode('utf-8'), content_type="text/csv"),
+            'boletos_upload_id': upload_id,
+        }, format='multipart')
+
+        assert response.status_code == 201
+        job = SpreadsheetJob.objects.get(uuid=response.json()['data']['job_id'])
+        assert SpreadsheetController.boletos_zip_path(job.uuid).read_bytes() == content
+        assert not ChunkedUpload.objects.exists()
+
+    def test_process_rejects_unfinished_upload(self, system_client):
+        upload_id = create(system_client, boletos_zip())['upload_id']
+
+        response = system_client.post('/api/admin/spreadsheet/process', {
+            'spreadsheet': SimpleUploadedFile("spreadsheet.csv", CSV_CONTENT.encode('utf-8'), content_type="text/csv"),
+            'boletos_upload_id': upload_id,
+        }, format='multipart')
+
+        assert response.status_code == 409
+        assert not SpreadsheetJob.objects.exists()
+
+    def test_process_requires_each_file(self, system_client):
+        response = system_client.post('/api/admin/spreadsheet/process', {
+            'spreadsheet': SimpleUploadedFile("spreadsheet.csv", CSV_CONTENT.encode('utf-8'), content_type="text/csv"),
+        }, format='multipart')
+
+        assert response.status_code == 422
@@ -0,0 +1,123 @@
+import zipfile
+from datetime import date
+from uuid import uuid4
+
+import pytest
+
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.models import Boleto, ImportLedgerEntry, Installment
+from app.schemas.spreadsheet_schemas import SaveSpreadsheetSchema
+
+HEADER = "Data Vencimento,Contrato,Cliente,Credor,CPF/CNPJ,Parcela,Valor,Data Pagamento,Valor Pago,Qtd Parcelas"
+
+
+def upload(rows, pdfs):
+    """Cria a pasta de uma operação com a planilha e o ZIP de boletos."""
+    operation_uuid = uuid4()
+    operation_path = SpreadsheetController.operation_path(operation_uuid)
+    operation_path.mkdir(parents=True)
+    (operation_path / "spreadsheet.csv").write_text('\n'.join([HEADER, *rows]), encoding='utf-8')
+    with zipfile.ZipFile(SpreadsheetController.boletos_zip_path(operation_uuid), 'w') as zip_file:
+        for name, content in pdfs.items():
+            zip_file.writestr(name, content)
+    return operation_uuid
+
+
+def approve(operation_uuid):
+    """Processa a operação e aprova tudo o que ela trouxe, sem remover nada."""
+    results = SpreadsheetController.process_spreadsheet(operation_uuid)
+    data = results.model_dump(mode='json')
+    for creditor in data["creditors"]:
+        creditor["deleted"] = False
+    for payer in data["payers"]:
+        payer["deleted"] = False
+        for agreement in payer["agreements"]:
+            agreement["deleted"] = False
+            for installment in agreement["installments"]:
+                installment["deleted"] = False
+
+    SpreadsheetController.save_results_to_database(str(operation_uuid), SaveSpreadsheetSchema.model_validate(data))
+    return results
+
+
+ROWS = [
+    "31/12/2030,123456,João Silva,Banco ABC,12345678901,1/2,1000.00,,,2",
+    "31/01/2031,123456,João Silva,Banco ABC,12345678901,2/2,1000.00,,,2",
+]
+PDFS = {"123456 PARC 1.pdf": b"%PDF boleto 1", "123456 PARC 2.pdf": b"%PDF boleto 2"}
+
+
+@pytest.mark.django_db
+class TestImportLedger:
+    """Testes do registro de importações usado para pular linhas sem mudanças"""
+
+    def test_approved_import_is_recorded(self):
+        approve(upload(ROWS, PDFS))
+
+        entries = ImportLedgerEntry.objects.order_by('installment_number')
+        assert [(e.agreement_number, e.installment_number) for e in entries] == [("123456", 1), ("123456", 2)]
+        assert all(e.boleto_id for e in entries)
+
+    def test_unchanged_reimport_skips_every_row(self, django_assert_max_num_queries):
+        approve(upload(ROWS, PDFS))
+        operation_uuid = upload(ROWS, PDFS)
+
+        # Só a consulta ao registro: nada de pagadores, acordos ou parcelas
+        with django_assert_max_num_queries(1):
+            results = SpreadsheetController.process_spreadsheet(operation_uuid)
+
+        assert results.unchanged_rows == 2
+        assert results.payers == []
+        assert results.warnings == []
+
+    def test_new_boleto_replaces_the_previous_one(self):
+        approve(upload(ROWS, PDFS))
+        old_boleto = Boleto.objects.get(installment__number="2")
+
+        results = approve(upload(ROWS, {**PDFS, "123456 PARC 2.pdf": b"%PDF boleto 2 reemitido"}))
+
+        assert results.unchanged_rows == 1
+        [installment] = results.payers[0].agreements[0].installments
+        assert installment.number == 2 and installment.readonly
+        new_boleto = Boleto.objects.get(installment__number="2")
+        assert new_boleto.id != old_boleto.id
+        assert new_boleto.ledger_entry.boleto_crc == zipfile.crc32(b"%PDF boleto 2 reemitido")
+
+    def test_changed_due_date_is_surfaced(self):
+        approve(upload(ROWS, PDFS))
+
+        results = SpreadsheetController.process_spreadsheet(upload([ROWS[0].replace("31/12/2030", "15/12/2030"), ROWS[1]], PDFS))
+
+        assert results.unchanged_rows == 1
+        assert results.warnings == [
+            "Linha 2: Vencimento da parcela 1 do acordo 123456 mudou de 31/12/2030 para 15/12/2030"
+        ]
+        assert Installment.objects.get(number="1").due_date == date(2030, 12, 31)
+        [installment] = results.payers[0].agreements[0].installments
+        assert installment.readonly and installment.due_date == date(2030, 12, 15)
+
+    def test_changed_due_date_is_applied_on_approval(self):
+        approve(upload(ROWS, PDFS))
+        boleto = Boleto.objects.get(installment__number="1")
+        rows = [ROWS[0].replace("31/12/2030", "15/12/2030"), ROWS[1]]
+
+        approve(upload(rows, PDFS))
+
+        assert Installment.objects.get(number="1").due_date == date(2030, 12, 15)
+        # O boleto já gravado fica como estava
+        assert Boleto.objects.get(installment__number="1").id == boleto.id
+
+        results = SpreadsheetController.process_spreadsheet(upload(rows, PDFS))
+        assert results.unchanged_rows == 2
+        assert results.warnings == []
+
+    def test_deleted_boleto_is_processed_again(self):
+        approve(upload(ROWS, PDFS))
+        Boleto.objects.filter(installment__number="1").delete()
+
+        results = SpreadsheetController.process_spreadsheet(upload(ROWS, PDFS))
+
+        assert results.unchanged_rows == 1
+        [installment] = results.payers[0].agreements[0].installments
+        assert installment.number == 1
+        assert installment.boleto.path == "123456 PARC 1.pdf"
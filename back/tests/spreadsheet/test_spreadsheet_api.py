@@ -1,13 +1,43 @@
+import gzip
 import io
 import json
 import zipfile
-from unittest.mock import Mock, patch
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_job_controller import SpreadsheetJobController
+from app.controllers.spreadsheet_results_controller import MAX_RESULTS_PAGE_SIZE, SpreadsheetResultsController
 from app.dtos import SpreadsheetDTO, PayerDTO, CreditorDTO, UserDTO
-from app.models import User, Creditor, Payer, Agreement, Installment
+from app.models import SpreadsheetJob, User, Creditor, Payer, Agreement, Installment
+from tests.factories import SpreadsheetJobFactory
+
+def write_results(job: SpreadsheetJob, results: dict) -> None:
+    operation_path = SpreadsheetController.operation_path(job.uuid)
+    operation_path.mkdir(parents=True, exist_ok=True)
+    SpreadsheetResultsController.write(operation_path, SpreadsheetDTO.from_json(results))
+
+
+def payer_result(cpf_cnpj: str, creditor: str, readonly: bool = False, warnings: list = None) -> dict:
+    return {
+        "name": f"Pagador {cpf_cnpj}",
+        "user": {"cpf_cnpj": cpf_cnpj, "readonly": readonly},
+        "phone": cpf_cnpj,
+        "agreements": [{
+            "number": cpf_cnpj[-3:],
+            "payer_cpf_cnpj": cpf_cnpj,
+            "creditor_name": creditor,
+            "installments": [],
+            "readonly": readonly,
+        }],
+        "warnings": warnings or [],
+        "readonly": readonly,
+    }
+
 
 class TestProcessSpreadsheetEndpoint:
     """Testes para o endpoint POST /api/admin/spreadsheet/process"""
@@ -52,15 +82,14 @@ class TestProcessSpreadsheetEndpoint:
             warnings=[]
         )
         
-        with patch.object(SpreadsheetController, 'process_spreadsheet', return_value=mock_result):
-            response = system_client.post(
-                '/api/admin/spreadsheet/process',
-                {
-                    'spreadsheet': spreadsheet_file,
-                    'boletos': boletos_file
-                },
-                format='multipart'
-            )
+        response = system_client.post(
+            '/api/admin/spreadsheet/process',
+            {
+                'spreadsheet': spreadsheet_file,
+                'boletos': boletos_file
+            },
+            format='multipart'
+        )
 
         assert response.status_code == 201
         data = response.json()
@@ -68,6 +97,21 @@ class TestProcessSpreadsheetEndpoint:
         assert 'job_id' in data['data']
         assert len(data['data']['job_id']) == 36  # UUID length
 
+        # O processamento só acontece quando o worker executa a fila
+        job_id = data['data']['job_id']
+        status = system_client.get(f'/api/admin/spreadsheet/status/{job_id}').json()
+        assert status['data']['status'] == 'queued'
+
+        with patch.object(SpreadsheetController, 'process_spreadsheet', return_value=mock_result):
+            assert SpreadsheetJobController.run_pending() == 1
+
+        status = system_client.get(f'/api/admin/spreadsheet/status/{job_id}').json()
+        assert status['data']['status'] == 'done'
+        assert status['data']['has_results'] is True
+
+        results = system_client.get(f'/api/admin/spreadsheet/results/{job_id}').json()
+        assert results['data']['payers'][0]['name'] == "João Silva"
+
     def test_process_spreadsheet_no_new_data(self, system_client):
         """Teste quando não há novos dados para processar"""
         csv_content = (
@@ -99,20 +143,26 @@ class TestProcessSpreadsheetEndpoint:
             warnings=[]
         )
         
+        response = system_client.post(
+            '/api/admin/spreadsheet/process',
+            {
+                'spreadsheet': spreadsheet_file,
+                'boletos': boletos_file
+            },
+            format='multipart'
+        )
+        assert response.status_code == 201
+        job_id = response.json()['data']['job_id']
+
         with patch.object(SpreadsheetController, 'process_spreadsheet', return_value=mock_result):
-            response = system_client.post(
-                '/api/admin/spreadsheet/process',
-                {
-                    'spreadsheet': spreadsheet_file,
-                    'boletos': boletos_file
-                },
-                format='multipart'
-            )
+            SpreadsheetJobController.run_pending()
 
+        response = system_client.get(f'/api/admin/spreadsheet/status/{job_id}')
         assert response.status_code == 200
         data = response.json()
-        assert data['code'] == 200
-        assert data['message'] == 'Não existem novas informações a serem processadas!'
+        assert data['data']['status'] == 'done'
+        assert data['data']['has_results'] is False
+        assert data['data']['message'] == 'Não existem novas informações a serem processadas!'
 
     def test_process_spreadsheet_with_errors(self, system_client):
         """Teste quando o processamento retorna erros"""
@@ -123,26 +173,33 @@ class TestProcessSpreadsheetEndpoint:
             content_type="text/csv"
         )
 
+        boletos_zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(boletos_zip_buffer, 'w') as zip_file:
+            zip_file.writestr("test.pdf", b"fake pdf content")
+
         boletos_file = SimpleUploadedFile(
             "boletos.zip",
-            b"invalid zip content",
+            boletos_zip_buffer.getvalue(),
             content_type="application/zip"
         )
 
+        response = system_client.post(
+            '/api/admin/spreadsheet/process',
+            {
+                'spreadsheet': spreadsheet_file,
+                'boletos': boletos_file
+            },
+            format='multipart'
+        )
+        job_id = response.json()['data']['job_id']
+
         with patch.object(SpreadsheetController, 'process_spreadsheet', side_effect=Exception("Processing error")):
-            response = system_client.post(
-                '/api/admin/spreadsheet/process',
-                {
-                    'spreadsheet': spreadsheet_file,
-                    'boletos': boletos_file
-                },
-                format='multipart'
-            )
+            SpreadsheetJobController.run_pending()
 
-        assert response.status_code == 500
-        data = response.json()
-        assert data['code'] == 500
-        assert "Erro ao processar planilha" in data['message']
+        data = system_client.get(f'/api/admin/spreadsheet/status/{job_id}').json()
+        assert data['data']['status'] == 'failed'
+        assert "Erro ao processar planilha" in data['data']['message']
+        assert "Processing error" in data['data']['message']
 
     def test_process_spreadsheet_missing_files(self, system_client):
         """Teste quando arquivos obrigatórios não são enviados"""
@@ -155,29 +212,104 @@ class TestProcessSpreadsheetEndpoint:
         assert response.status_code == 422  # Validation error
 
 
+class TestSpreadsheetStatusEndpoint:
+    """Testes para o endpoint GET /api/admin/spreadsheet/status/{job_id}"""
+
+    def test_get_status(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value)
+
+        response = system_client.get(f'/api/admin/spreadsheet/status/{job.uuid}')
+
+        assert response.status_code == 200
+        data = response.json()['data']
+        assert data['job_id'] == str(job.uuid)
+        assert data['status'] == 'running'
+
+    def test_get_status_not_found(self, system_client):
+        response = system_client.get('/api/admin/spreadsheet/status/nonexistent-job-id')
+        assert response.status_code == 404
+
+
+class TestSpreadsheetProgressEndpoints:
+    """Testes de GET /api/admin/spreadsheet/progress/{job_id} e do seu stream"""
+
+    PROGRESS = {
+        "stage": "resolve",
+        "counters": {"rows_parsed": 5000, "rows_resolved": 4990, "rows_unchanged": 0, "boletos_matched": 4800, "errors": 10},
+        "stages": {"parse": 0.2, "resolve": 1.5},
+    }
+
+    def test_get_progress(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value, progress=self.PROGRESS)
+
+        response = system_client.get(f'/api/admin/spreadsheet/progress/{job.uuid}')
+
+        assert response.status_code == 200
+        data = response.json()['data']
+        assert data['status'] == 'running'
+        assert data['stage'] == 'resolve'
+        assert data['counters'] == self.PROGRESS['counters']
+        assert data['stages'] == self.PROGRESS['stages']
+
+    def test_get_progress_before_start(self, system_client):
+        job = SpreadsheetJobFactory.create()
+
+        data = system_client.get(f'/api/admin/spreadsheet/progress/{job.uuid}').json()['data']
+
+        assert data['stage'] is None
+        assert data['counters']['rows_parsed'] == 0
+
+    def test_stream_sends_changes_until_the_job_finishes(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value, progress=self.PROGRESS)
+        finished = {**self.PROGRESS, "stage": None}
+
+        def finish(seconds):
+            SpreadsheetJob.objects.filter(id=job.id).update(status=SpreadsheetJob.Status.DONE.value, progress=finished)
+
+        with patch('app.controllers.spreadsheet_job_controller.time.sleep', side_effect=finish):
+            response = system_client.get(f'/api/admin/spreadsheet/progress/{job.uuid}/stream')
+            body = b''.join(response.streaming_content).decode()
+
+        assert response['Content-Type'] == 'text/event-stream'
+        events = body.strip().split('\n\n')
+        assert len(events) == 3
+        assert json.loads(events[0].removeprefix('data: '))['stage'] == 'resolve'
+        assert json.loads(events[1].removeprefix('data: '))['status'] == 'done'
+        assert events[2] == 'event: end\ndata: {"finished": true}'
+
+    def test_stream_ends_when_the_time_limit_is_reached(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value, progress=self.PROGRESS)
+        clock = iter(range(0, 1000, 10))
+
+        # Um processamento que nunca termina (worker fora do ar) não prende o stream
+        with patch('app.controllers.spreadsheet_job_controller.time.sleep'), \
+                patch('app.controllers.spreadsheet_job_controller.time.monotonic', side_effect=lambda: next(clock)):
+            response = system_client.get(f'/api/admin/spreadsheet/progress/{job.uuid}/stream')
+            body = b''.join(response.streaming_content).decode()
+
+        events = body.strip().split('\n\n')
+        assert json.loads(events[0].removeprefix('data: '))['status'] == 'running'
+        assert events[-1] == 'event: end\ndata: {"finished": false}'
+
+    def test_stream_not_found(self, system_client):
+        response = system_client.get('/api/admin/spreadsheet/progress/nonexistent-job-id/stream')
+        assert response.status_code == 404
+
+
 class TestGetSpreadsheetResultsEndpoint:
     """Testes para o endpoint GET /api/admin/spreadsheet/results/{job_id}"""
 
     def test_get_results_success(self, system_client):
         """Teste de busca bem-sucedida de resultados"""
-        job_id = "test-job-id-123"
-        
-        # Mock dos resultados salvos
-        mock_results = {
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        write_results(job, {
             "payers": [],
             "creditors": [],
             "errors": [],
             "warnings": []
-        }
+        })
 
-        with patch('pathlib.Path.exists', return_value=True), \
-             patch('pathlib.Path.open') as mock_open, \
-             patch('json.load', return_value=mock_results):
-            
-            mock_file = Mock()
-            mock_open.return_value.__enter__.return_value = mock_file
-
-            response = system_client.get(f'/api/admin/spreadsheet/results/{job_id}')
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}')
 
         assert response.status_code == 200
         data = response.json()
@@ -190,24 +322,38 @@ class TestGetSpreadsheetResultsEndpoint:
 
     def test_get_results_not_found(self, system_client):
         """Teste quando o job_id não é encontrado"""
-        job_id = "nonexistent-job-id"
-        
-        with patch('pathlib.Path.exists', return_value=False):
-            response = system_client.get(f'/api/admin/spreadsheet/results/{job_id}')
+        response = system_client.get(f'/api/admin/spreadsheet/results/{uuid4()}')
 
         assert response.status_code == 404
         data = response.json()
         assert data['code'] == 404
-        assert 'não encontrados' in data['message']
+        assert 'não encontrado' in data['message']
+
+    def test_get_results_job_not_done(self, system_client):
+        """Teste quando o processamento ainda não terminou"""
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value)
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}')
+
+        assert response.status_code == 409
+        assert 'running' in response.json()['message']
+
+    def test_get_results_without_results_file(self, system_client):
+        """Teste quando o processamento terminou sem gerar resultados"""
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value)
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}')
+
+        assert response.status_code == 404
+        assert 'não encontrados' in response.json()['message']
 
     def test_get_results_file_read_error(self, system_client):
         """Teste quando há erro ao ler o arquivo de resultados"""
-        job_id = "error-job-id"
-        
-        with patch('pathlib.Path.exists', return_value=True), \
-             patch('pathlib.Path.open', side_effect=Exception("File read error")):
-            
-            response = system_client.get(f'/api/admin/spreadsheet/results/{job_id}')
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        write_results(job, {})
+
+        with patch('pathlib.Path.open', side_effect=Exception("File read error")):
+            response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}')
 
         assert response.status_code == 500
         data = response.json()
@@ -216,16 +362,12 @@ class TestGetSpreadsheetResultsEndpoint:
 
     def test_get_results_invalid_json(self, system_client):
         """Teste quando o arquivo JSON está corrompido"""
-        job_id = "invalid-json-job-id"
-        
-        with patch('pathlib.Path.exists', return_value=True), \
-             patch('pathlib.Path.open') as mock_open, \
-             patch('json.load', side_effect=json.JSONDecodeError("Invalid JSON", "", 0)):
-            
-            mock_file = Mock()
-            mock_open.return_value.__enter__.return_value = mock_file
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        operation_path = SpreadsheetController.operation_path(job.uuid)
+        operation_path.mkdir(parents=True, exist_ok=True)
+        (operation_path / 'results_index.json').write_text("{invalid json", encoding='utf-8')
 
-            response = system_client.get(f'/api/admin/spreadsheet/results/{job_id}')
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}')
 
         assert response.status_code == 500
         data = response.json()
@@ -233,6 +375,204 @@ class TestGetSpreadsheetResultsEndpoint:
         assert "Erro ao carregar resultados" in data['message']
 
 
+class TestPaginatedSpreadsheetResults:
+    """Testes da paginação e dos filtros de GET /api/admin/spreadsheet/results/{job_id}"""
+
+    def create_job(self):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        payers = [
+            payer_result(f"{i:011d}", "Banco A" if i % 2 else "Banco B", readonly=i % 3 == 0,
+                         warnings=["Linha sem boleto"] if i == 4 else None)
+            for i in range(1, 8)
+        ]
+        write_results(job, {
+            "payers": payers,
+            "creditors": [
+                {"name": "Banco A", "reissue_margin": 0, "readonly": True},
+                {"name": "Banco B", "reissue_margin": 0},
+            ],
+            "errors": ["Linha 9 possui campos obrigatórios em branco ou apenas espaços"],
+            "warnings": ["Linha sem boleto"],
+        })
+        return job
+
+    def test_get_results_page(self, system_client):
+        job = self.create_job()
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}?page=2&page_size=3')
+
+        assert response.status_code == 200
+        data = response.json()['data']
+        assert data['paginator'] == {'page_size': 3, 'total_pages': 3, 'total_items': 7}
+        assert data['page']['page'] == 2
+        assert [p['user']['cpf_cnpj'] for p in data['page']['items']] == ["00000000004", "00000000005", "00000000006"]
+        assert data['summary'] == {
+            'payers': 7, 'new_payers': 5, 'readonly_payers': 2, 'payers_with_warnings': 1,
+            'creditors': 2, 'new_creditors': 1, 'errors': 1, 'warnings': 1, 'unchanged_rows': 0,
+        }
+        assert len(data['creditors']) == 2
+
+    def test_get_results_filters(self, system_client):
+        job = self.create_job()
+        url = f'/api/admin/spreadsheet/results/{job.uuid}?page=1'
+
+        by_creditor = system_client.get(f'{url}&creditor=Banco B').json()['data']
+        assert [p['user']['cpf_cnpj'] for p in by_creditor['page']['items']] == ["00000000002", "00000000004", "00000000006"]
+
+        readonly = system_client.get(f'{url}&kind=readonly').json()['data']
+        assert [p['user']['cpf_cnpj'] for p in readonly['page']['items']] == ["00000000003", "00000000006"]
+
+        with_warnings = system_client.get(f'{url}&with_warnings=true').json()['data']
+        assert [p['warnings'] for p in with_warnings['page']['items']] == [["Linha sem boleto"]]
+
+    def test_page_only_reads_requested_payers(self, system_client):
+        job = self.create_job()
+
+        with patch('app.controllers.spreadsheet_results_controller.PayerDTO.model_validate_json',
+                   wraps=PayerDTO.model_validate_json) as validate:
+            system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}?page=1&page_size=2')
+
+        assert validate.call_count == 2
+
+    def test_get_results_without_page_returns_everything(self, system_client):
+        job = self.create_job()
+
+        data = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}').json()['data']
+
+        assert len(data['payers']) == 7
+        assert len(data['creditors']) == 2
+        assert data['errors'] == ["Linha 9 possui campos obrigatórios em branco ou apenas espaços"]
+
+
+    def test_page_spanning_gzip_blocks(self, system_client):
+        with patch('app.controllers.spreadsheet_results_controller.RESULTS_BLOCK_SIZE', 2):
+            job = self.create_job()
+
+        data = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}?page=2&page_size=3').json()['data']
+
+        assert [p['user']['cpf_cnpj'] for p in data['page']['items']] == ["00000000004", "00000000005", "00000000006"]
+
+
+    def test_page_size_is_capped(self, system_client):
+        job = self.create_job()
+
+        data = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}?page=1&page_size=100000').json()['data']
+
+        assert data['paginator']['page_size'] == MAX_RESULTS_PAGE_SIZE
+        assert 'errors' not in data and 'warnings' not in data
+
+    def test_get_messages_page(self, system_client):
+        job = self.create_job()
+        url = f'/api/admin/spreadsheet/results/{job.uuid}/messages'
+
+        errors = system_client.get(f'{url}?kind=errors').json()['data']
+        warnings = system_client.get(f'{url}?kind=warnings&page=1&page_size=1').json()['data']
+
+        assert errors['page']['items'] == ["Linha 9 possui campos obrigatórios em branco ou apenas espaços"]
+        assert warnings['page']['items'] == ["Linha sem boleto"]
+        assert warnings['paginator'] == {'page_size': 1, 'total_pages': 1, 'total_items': 1}
+
+    def test_get_messages_job_not_done(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value)
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}/messages?kind=errors')
+
+        assert response.status_code == 409
+
+
+class TestSaveResultsWithRemovals:
+    """Testes de POST /api/admin/spreadsheet/save_results/{job_id}/removals"""
+
+    def test_saves_stored_results_except_removed_items(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        payers = [payer_result(f"{i:011d}", "Banco B") for i in (1, 2)]
+        payers[0]["agreements"][0]["installments"] = [
+            {"agreement_num": "001", "number": number, "due_date": "2031-01-01", "boleto": None}
+            for number in (1, 2)
+        ]
+        write_results(job, {"payers": payers, "creditors": [{"name": "Banco B", "reissue_margin": 0}], "errors": [], "warnings": []})
+
+        response = system_client.post(
+            f'/api/admin/spreadsheet/save_results/{job.uuid}/removals',
+            data={"payers": ["00000000002"], "installments": ["001-2"]},
+            content_type='application/json',
+        )
+
+        assert response.status_code == 200, response.json()
+        assert list(Payer.objects.values_list('user__cpf_cnpj', flat=True)) == ["00000000001"]
+        assert list(Installment.objects.values_list('number', flat=True)) == ['1']
+        assert Creditor.objects.filter(name="Banco B").exists()
+
+    def test_results_not_found(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value)
+
+        response = system_client.post(f'/api/admin/spreadsheet/save_results/{job.uuid}/removals', data={}, content_type='application/json')
+
+        assert response.status_code == 404
+
+
+class TestDownloadSpreadsheetResults:
+    """Testes de GET /api/admin/spreadsheet/results/{job_id}/download"""
+
+    def create_job(self):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        write_results(job, {
+            "payers": [payer_result(f"{i:011d}", "Banco A") for i in range(1, 4)],
+            "creditors": [{"name": "Banco A", "reissue_margin": 0}],
+        })
+        return job
+
+    def test_gzip_client_receives_stored_bytes(self, system_client):
+        job = self.create_job()
+        results_file = SpreadsheetResultsController.results_file(SpreadsheetController.operation_path(job.uuid))
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}/download', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['Content-Type'] == 'application/x-ndjson'
+        body = b''.join(response.streaming_content)
+        assert body == results_file.read_bytes()
+        lines = gzip.decompress(body).splitlines()
+        assert [json.loads(line)['user']['cpf_cnpj'] for line in lines] == ["00000000001", "00000000002", "00000000003"]
+
+    @pytest.mark.parametrize('accept_encoding', ['gzip;q=0', 'identity, gzip;q=0', 'gzip;q=0.0, *;q=1', 'deflate'])
+    def test_refused_gzip_receives_decompressed_lines(self, system_client, accept_encoding):
+        job = self.create_job()
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}/download', HTTP_ACCEPT_ENCODING=accept_encoding)
+
+        assert response.status_code == 200
+        assert not response.has_header('Content-Encoding')
+        lines = b''.join(response.streaming_content).splitlines()
+        assert len(lines) == 3
+
+    @pytest.mark.parametrize('accept_encoding', ['GZIP;q=0.5', 'br, *', 'deflate;q=1, *;q=0.1'])
+    def test_weighted_gzip_receives_stored_bytes(self, system_client, accept_encoding):
+        job = self.create_job()
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}/download', HTTP_ACCEPT_ENCODING=accept_encoding)
+
+        assert response['Content-Encoding'] == 'gzip'
+
+    def test_plain_client_receives_decompressed_lines(self, system_client):
+        job = self.create_job()
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}/download')
+
+        assert response.status_code == 200
+        assert not response.has_header('Content-Encoding')
+        lines = b''.join(response.streaming_content).splitlines()
+        assert [json.loads(line)['name'] for line in lines] == ["Pagador 00000000001", "Pagador 00000000002", "Pagador 00000000003"]
+
+    def test_job_not_done(self, system_client):
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value)
+
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}/download')
+
+        assert response.status_code == 409
+
+
 class TestSaveResultsEndpoint:
     """Testes para o endpoint POST /api/admin/spreadsheet/save_results/{job_id}"""
 
@@ -638,54 +978,31 @@ class TestSpreadsheetAPIIntegration:
             warnings=[]
         )
 
-        with patch.object(SpreadsheetController, 'process_spreadsheet', return_value=mock_result):
-            process_response = system_client.post(
-                '/api/admin/spreadsheet/process',
-                {
-                    'spreadsheet': spreadsheet_file,
-                    'boletos': boletos_file
-                },
-                format='multipart'
-            )
+        process_response = system_client.post(
+            '/api/admin/spreadsheet/process',
+            {
+                'spreadsheet': spreadsheet_file,
+                'boletos': boletos_file
+            },
+            format='multipart'
+        )
 
         assert process_response.status_code == 201
         job_id = process_response.json()['data']['job_id']
 
-        # 2. Busca os resultados
-        results_data = {
-            "payers": [
-                {
-                    "name": "João Silva",
-                    "user": {"cpf_cnpj": "12345678901", "readonly": False},
-                    "phone": "12345678901",
-                    "agreements": [],
-                    "readonly": False,
-                    "deleted": False
-                }
-            ],
-            "creditors": [
-                {
-                    "name": "Banco ABC", 
-                    "reissue_margin": 5,
-                    "readonly": False,
-                    "deleted": False
-                }
-            ],
-            "errors": [],
-            "warnings": []
-        }
+        with patch.object(SpreadsheetController, 'process_spreadsheet', return_value=mock_result):
+            SpreadsheetJobController.run_pending()
 
-        with patch('pathlib.Path.exists', return_value=True), \
-             patch('pathlib.Path.open') as mock_open, \
-             patch('json.load', return_value=results_data):
-            
-            mock_file = Mock()
-            mock_open.return_value.__enter__.return_value = mock_file
-            
-            results_response = system_client.get(f'/api/admin/spreadsheet/results/{job_id}')
+        # 2. Busca os resultados
+        results_response = system_client.get(f'/api/admin/spreadsheet/results/{job_id}')
 
         assert results_response.status_code == 200
         assert 'data' in results_response.json()
+        results_data = results_response.json()['data']
+        for payer in results_data['payers']:
+            payer['deleted'] = False
+        for creditor in results_data['creditors']:
+            creditor['deleted'] = False
 
         # 3. Salva os resultados no banco
         with patch.object(SpreadsheetController, 'save_results_to_database') as mock_save:
@@ -711,9 +1028,8 @@ class TestSpreadsheetAPIIntegration:
         """Teste com formato inválido de job_id"""
         invalid_job_id = "invalid-format-123!"
         
-        with patch('pathlib.Path.exists', return_value=False):
-            response = system_client.get(f'/api/admin/spreadsheet/results/{invalid_job_id}')
+        response = system_client.get(f'/api/admin/spreadsheet/results/{invalid_job_id}')
 
         assert response.status_code == 404
         data = response.json()
-        assert data['code'] == 404
\ No newline at end of file
+        assert data['code'] == 404
@@ -0,0 +1,76 @@
+import copy
+from uuid import uuid4
+
+import pytest
+from django.core.files.storage import default_storage
+
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.management.commands.benchmark_spreadsheet import compare, run_pipeline, scratch_storage
+from app.models import Boleto, Installment
+from app.spreadsheet_synthetic import synthetic_installments, write_boletos_zip, write_spreadsheet
+
+
+def test_synthetic_installments_are_reproducible():
+    first = list(synthetic_installments(50, seed=7))
+
+    assert len(first) == 50
+    assert first == list(synthetic_installments(50, seed=7))
+    assert first != list(synthetic_installments(50, seed=8))
+
+
+@pytest.mark.django_db
+def test_synthetic_spreadsheet_is_fully_imported():
+    operation_uuid = uuid4()
+    operation_path = SpreadsheetController.operation_path(operation_uuid)
+    operation_path.mkdir(parents=True)
+    write_spreadsheet(operation_path / "spreadsheet.csv", synthetic_installments(30))
+    write_boletos_zip(SpreadsheetController.boletos_zip_path(operation_uuid), synthetic_installments(30))
+
+    results = SpreadsheetController.process_spreadsheet(operation_uuid)
+
+    assert results.errors == [] and results.warnings == []
+    installments = [i for p in results.payers for a in p.agreements for i in a.installments]
+    assert len(installments) == 30
+    assert all(installment.boleto is not None for installment in installments)
+
+
+@pytest.mark.django_db
+class TestBenchmarkSpreadsheet:
+
+    def test_run_pipeline_measures_every_stage(self):
+        with scratch_storage():
+            run = run_pipeline(40)
+
+        assert list(run["stages"]) == ["generate", "process", "write_results", "save"]
+        assert all(metrics["seconds"] >= 0 and metrics["peak_rss_mib"] > 0 for metrics in run["stages"].values())
+        assert run["stages"]["save"]["queries"] > 0
+        assert {"parse", "resolve"} <= set(run["process_stages"])
+        assert Installment.objects.count() == Boleto.objects.count() == 40
+
+    def test_boletos_go_to_scratch_storage(self):
+        # O comando nunca grava no storage configurado (o bucket, em produção)
+        with scratch_storage() as location:
+            run_pipeline(5)
+            pdfs = [boleto.pdf.name for boleto in Boleto.objects.all()]
+            assert len(pdfs) == 5
+            assert all((location / name).is_file() for name in pdfs)
+
+        assert not location.exists()
+        assert not any(default_storage.exists(name) for name in pdfs)
+
+    def test_compare_ignores_noise_and_flags_regressions(self):
+        baseline = {"runs": {"1000": {"stages": {
+            "process": {"seconds": 2.0, "peak_rss_mib": 100.0, "queries": 10},
+            "save": {"seconds": 0.01, "peak_rss_mib": 100.0, "queries": 50},
+        }}}}
+        current = copy.deepcopy(baseline)
+        current["runs"]["1000"]["stages"]["process"].update(seconds=2.3, peak_rss_mib=103.0)
+        current["runs"]["1000"]["stages"]["save"]["seconds"] = 0.03
+        assert compare(baseline, current) == []
+
+        current["runs"]["1000"]["stages"]["process"]["seconds"] = 3.0
+        current["runs"]["1000"]["stages"]["save"]["queries"] = 51
+        assert compare(baseline, current) == [
+            "1000 linhas, etapa process: seconds foi de 2.0s para 3.0s",
+            "1000 linhas, etapa save: queries foi de 50 consultas para 51 consultas",
+        ]
@@ -0,0 +1,266 @@
+import zipfile
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from django.core.files.storage import default_storage
+
+from app.controllers.spreadsheet_commit_controller import SpreadsheetCommitController
+from app.exceptions import HttpFriendlyException
+from app.models import Agreement, Boleto, Creditor, Installment, Payer, SpreadsheetCommitCheckpoint, StoredBlob, User
+from app.schemas.spreadsheet_schemas import InstallmentSchema, SaveSpreadsheetSchema
+from tests.factories import AgreementFactory, CreditorFactory, PayerFactory, SpreadsheetJobFactory, UserFactory
+
+
+def payer_payload(cpf_cnpj: str, agreements: list, readonly: bool = False) -> dict:
+    return {
+        "name": f"Pagador {cpf_cnpj}",
+        "user": {"cpf_cnpj": cpf_cnpj, "readonly": readonly},
+        "phone": cpf_cnpj,
+        "agreements": agreements,
+        "readonly": readonly,
+        "deleted": False,
+    }
+
+
+def agreement_payload(number: str, cpf_cnpj: str, creditor: str, installments: list, readonly: bool = False) -> dict:
+    return {
+        "number": number,
+        "payer_cpf_cnpj": cpf_cnpj,
+        "creditor_name": creditor,
+        "installments": installments,
+        "readonly": readonly,
+        "deleted": False,
+    }
+
+
+def installment_payload(agreement_num: str, number: int, boleto_path: str = None) -> dict:
+    return {
+        "agreement_num": agreement_num,
+        "number": number,
+        "due_date": date(2030, 1, number).isoformat(),
+        "boleto": {"path": boleto_path, "readonly": False} if boleto_path else None,
+        "readonly": False,
+        "deleted": False,
+    }
+
+
+class TestSpreadsheetCommitController:
+    """Testes da gravação em lote dos resultados da planilha"""
+
+    def test_commit_creates_graph_with_boletos(self, tmp_path: Path):
+        existing_creditor = CreditorFactory.create(name="Credor Existente")
+        existing_payer = PayerFactory.create(user=UserFactory.create(cpf_cnpj="11111111111"))
+        existing_agreement = AgreementFactory.create(number="999", payer=existing_payer, creditor=existing_creditor)
+
+        pdf = tmp_path / "999 PARC 1.pdf"
+        pdf.write_bytes(b"fake pdf")
+
+        data = SaveSpreadsheetSchema(
+            payers=[
+                payer_payload("11111111111", readonly=True, agreements=[
+                    agreement_payload("999", "11111111111", "Credor Existente", readonly=True, installments=[
+                        installment_payload("999", 1, str(pdf)),
+                    ]),
+                    agreement_payload("555", "11111111111", "Credor Existente", installments=[
+                        installment_payload("555", 1),
+                    ]),
+                ]),
+                payer_payload("22222222222", agreements=[
+                    agreement_payload("777", "22222222222", "Credor Novo", installments=[
+                        installment_payload("777", 1),
+                        installment_payload("777", 2),
+                    ]),
+                ]),
+            ],
+            creditors=[
+                {"name": "Credor Existente", "reissue_margin": 0, "readonly": True, "deleted": False},
+                {"name": "Credor Novo", "reissue_margin": 3, "readonly": False, "deleted": False},
+            ],
+        )
+
+        SpreadsheetCommitController.commit(data)
+
+        assert Creditor.objects.filter(name="Credor Existente").count() == 1
+        new_creditor = Creditor.objects.get(name="Credor Novo")
+        new_payer = Payer.objects.get(user__cpf_cnpj="22222222222")
+        assert new_payer.user.is_active is True
+        assert not new_payer.user.has_usable_password()
+
+        assert Agreement.objects.get(number="555").creditor == existing_creditor
+        assert Agreement.objects.get(number="777").creditor == new_creditor
+        assert Agreement.objects.get(number="777").payer == new_payer
+        assert set(Installment.objects.filter(agreement__number="777").values_list('number', flat=True)) == {"1", "2"}
+
+        installment = Installment.objects.get(agreement=existing_agreement, number="1")
+        assert Boleto.objects.get(installment=installment).status == Boleto.Status.PENDING.value
+
+    def test_commit_streams_approved_boletos_from_zip(self, tmp_path: Path):
+        CreditorFactory.create(name="Banco ABC")
+        boletos_zip = tmp_path / "boletos.zip"
+        with zipfile.ZipFile(boletos_zip, 'w') as zip_file:
+            zip_file.writestr("lote/321 PARC 1.pdf", b"pdf aprovado")
+            zip_file.writestr("321 PARC 2.pdf", b"pdf descartado")
+
+        rejected = installment_payload("321", 2, "321 PARC 2.pdf")
+        rejected["deleted"] = True
+        data = SaveSpreadsheetSchema(
+            payers=[
+                payer_payload("44444444444", agreements=[
+                    agreement_payload("321", "44444444444", "Banco ABC", installments=[
+                        installment_payload("321", 1, "lote/321 PARC 1.pdf"),
+                        rejected,
+                    ]),
+                ]),
+            ],
+            creditors=[],
+        )
+
+        SpreadsheetCommitController.commit(data, boletos_zip)
+
+        boleto = Boleto.objects.get()
+        assert boleto.installment.number == "1"
+        with default_storage.open(boleto.pdf.name) as f:
+            assert f.read() == b"pdf aprovado"
+        # Só o boleto aprovado foi gravado, e nada foi extraído ao lado do ZIP
+        assert list(tmp_path.iterdir()) == [boletos_zip]
+
+    def test_commit_stores_identical_boletos_once(self, tmp_path: Path):
+        CreditorFactory.create(name="Banco ABC")
+        boletos_zip = tmp_path / "boletos.zip"
+        with zipfile.ZipFile(boletos_zip, 'w') as zip_file:
+            zip_file.writestr("321 PARC 1.pdf", b"pdf repetido")
+            zip_file.writestr("321 PARC 2.pdf", b"pdf repetido")
+        data = SaveSpreadsheetSchema(
+            payers=[
+                payer_payload("44444444444", agreements=[
+                    agreement_payload("321", "44444444444", "Banco ABC", installments=[
+                        installment_payload("321", 1, "321 PARC 1.pdf"),
+                        installment_payload("321", 2, "321 PARC 2.pdf"),
+                    ]),
+                ]),
+            ],
+            creditors=[],
+        )
+
+        with patch('app.controllers.spreadsheet_commit_controller.BOLETO_CONTENT_ADDRESSED', True):
+            SpreadsheetCommitController.commit(data, boletos_zip)
+
+        blob = StoredBlob.objects.get()
+        assert blob.refcount == 2
+        assert list(Boleto.objects.values_list('blob_id', flat=True)) == [blob.id, blob.id]
+        with default_storage.open(blob.path) as f:
+            assert f.read() == b"pdf repetido"
+
+    def test_commit_query_count_does_not_grow_with_rows(self, django_assert_max_num_queries):
+        CreditorFactory.create(name="Banco ABC")
+        payers = [
+            payer_payload(f"{i:011d}", agreements=[
+                agreement_payload(f"{i}", f"{i:011d}", "Banco ABC", installments=[
+                    installment_payload(f"{i}", 1),
+                    installment_payload(f"{i}", 2),
+                ]),
+            ])
+            for i in range(1, 51)
+        ]
+        data = SaveSpreadsheetSchema(payers=payers, creditors=[])
+
+        with django_assert_max_num_queries(15):
+            SpreadsheetCommitController.commit(data)
+
+        assert Payer.objects.count() == 50
+        assert Installment.objects.count() == 100
+
+    def test_commit_rolls_back_on_failure(self):
+        data = SaveSpreadsheetSchema(
+            payers=[
+                payer_payload("33333333333", agreements=[
+                    agreement_payload("123", "33333333333", "Credor Inexistente", installments=[]),
+                ]),
+            ],
+            creditors=[],
+        )
+
+        with pytest.raises(HttpFriendlyException):
+            SpreadsheetCommitController.commit(data)
+
+        assert not User.objects.filter(cpf_cnpj="33333333333").exists()
+        assert not Payer.objects.exists()
+
+
+class TestResumableCommit:
+    """Testes da gravação em lotes com checkpoints por processamento"""
+
+    def payload(self, creditor_of_fourth: str) -> SaveSpreadsheetSchema:
+        return SaveSpreadsheetSchema(
+            payers=[
+                payer_payload(f"{i:011d}", agreements=[
+                    agreement_payload(f"{i}", f"{i:011d}", creditor_of_fourth if i == 4 else "Banco ABC", installments=[
+                        installment_payload(f"{i}", 1),
+                    ]),
+                ])
+                for i in range(1, 6)
+            ],
+            creditors=[{"name": "Banco ABC", "reissue_margin": 3, "readonly": False, "deleted": False}],
+        )
+
+    def test_failed_batch_keeps_previous_batches(self):
+        job = SpreadsheetJobFactory.create()
+
+        with patch('app.controllers.spreadsheet_commit_controller.SPREADSHEET_COMMIT_BATCH_SIZE', 2), \
+             pytest.raises(HttpFriendlyException):
+            SpreadsheetCommitController.commit(self.payload("Credor Inexistente"), job=job)
+
+        # O primeiro lote foi confirmado; o segundo, com o credor inexistente, foi desfeito
+        assert sorted(Payer.objects.values_list('user__cpf_cnpj', flat=True)) == ["00000000001", "00000000002"]
+        assert sorted(job.commit_checkpoints.values_list('kind', 'key')) == [
+            ("creditor", "Banco ABC"), ("payer", "00000000001"), ("payer", "00000000002"),
+        ]
+
+    def test_retry_resumes_after_last_committed_batch(self):
+        job = SpreadsheetJobFactory.create()
+        with patch('app.controllers.spreadsheet_commit_controller.SPREADSHEET_COMMIT_BATCH_SIZE', 2), \
+             pytest.raises(HttpFriendlyException):
+            SpreadsheetCommitController.commit(self.payload("Credor Inexistente"), job=job)
+
+        CreditorFactory.create(name="Credor Corrigido")
+        with patch('app.controllers.spreadsheet_commit_controller.SPREADSHEET_COMMIT_BATCH_SIZE', 2):
+            SpreadsheetCommitController.commit(self.payload("Credor Corrigido"), job=job)
+
+        assert Payer.objects.count() == 5
+        assert Installment.objects.count() == 5
+        assert Creditor.objects.filter(name="Banco ABC").count() == 1
+        assert Agreement.objects.get(number="4").creditor.name == "Credor Corrigido"
+        assert job.commit_checkpoints.filter(kind=SpreadsheetCommitCheckpoint.Kind.PAYER.value).count() == 5
+
+    def test_retry_that_changes_a_committed_payer_is_rejected(self):
+        job = SpreadsheetJobFactory.create()
+        with patch('app.controllers.spreadsheet_commit_controller.SPREADSHEET_COMMIT_BATCH_SIZE', 2), \
+             pytest.raises(HttpFriendlyException):
+            SpreadsheetCommitController.commit(self.payload("Credor Inexistente"), job=job)
+
+        # O administrador acrescenta uma parcela a um pagador do lote já gravado
+        CreditorFactory.create(name="Credor Corrigido")
+        payload = self.payload("Credor Corrigido")
+        payload.payers[0].agreements[0].installments.append(
+            InstallmentSchema.model_validate(installment_payload("1", 2))
+        )
+        with patch('app.controllers.spreadsheet_commit_controller.SPREADSHEET_COMMIT_BATCH_SIZE', 2), \
+             pytest.raises(HttpFriendlyException) as error:
+            SpreadsheetCommitController.commit(payload, job=job)
+
+        assert error.value.code == 409
+        assert "00000000001" in error.value.message
+        assert Payer.objects.count() == 2
+        assert Installment.objects.count() == 2
+
+    def test_saving_twice_does_not_duplicate(self):
+        job = SpreadsheetJobFactory.create()
+
+        SpreadsheetCommitController.commit(self.payload("Banco ABC"), job=job)
+        SpreadsheetCommitController.commit(self.payload("Banco ABC"), job=job)
+
+        assert Payer.objects.count() == 5
+        assert Creditor.objects.count() == 1
+
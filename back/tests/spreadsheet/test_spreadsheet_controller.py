@@ -1,4 +1,5 @@
 import tempfile
+import zipfile
 from datetime import date
 from pathlib import Path
 from unittest.mock import patch
@@ -6,10 +7,14 @@ from uuid import uuid4
 
 import pytest
 
+from django.db import connection
+
 from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.spreadsheet_normalizer import normalize_rows
 from app.dtos import SpreadsheetDTO
 from app.schemas.spreadsheet_schemas import SaveSpreadsheetSchema
-from tests.factories import CreditorFactory
+from app.models import Creditor
+from tests.factories import BoletoFactory, InstallmentFactory, PayerFactory
 
 
 class TestSpreadsheetController:
@@ -34,11 +39,10 @@ class TestSpreadsheetController:
             with open(csv_path, 'w', encoding='utf-8') as f:
                 f.write('\n'.join(csv_content))
             
-            # Cria diretório de boletos
-            boletos_path = operation_path / "boletos"
-            boletos_path.mkdir()
-            (boletos_path / "123456 PARC 1.pdf").write_bytes(b"fake pdf 1")
-            (boletos_path / "123456 PARC 2.pdf").write_bytes(b"fake pdf 2")
+            # Cria o ZIP de boletos
+            with zipfile.ZipFile(operation_path / "boletos.zip", 'w') as zip_file:
+                zip_file.writestr("123456 PARC 1.pdf", b"fake pdf 1")
+                zip_file.writestr("123456 PARC 2.pdf", b"fake pdf 2")
             
             with patch('app.controllers.spreadsheet_controller.MEDIA_ROOT', temp_dir):
                 result = SpreadsheetController.process_spreadsheet(operation_uuid)
@@ -47,6 +51,39 @@ class TestSpreadsheetController:
             assert len(result.errors) == 0
             assert len(result.warnings) == 0
 
+    def test_process_spreadsheet_in_chunks(self):
+        """Teste do processamento em blocos: o resultado não depende do tamanho do bloco"""
+        operation_uuid = uuid4()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            operation_path = Path(temp_dir) / str(operation_uuid)
+            operation_path.mkdir()
+
+            csv_content = [
+                "Data Vencimento,Contrato,Cliente,Credor,CPF/CNPJ,Parcela,Valor,Data Pagamento,Valor Pago,Qtd Parcelas",
+                "31/12/2024,123456,João Silva,Banco ABC,12345678901,1/3,1000.00,,,3",
+                "31/01/2025,123456,João Silva,Banco ABC,12345678901,2/3,1000.00,,,3",
+                "28/02/2025,123456,João Silva,Banco ABC,12345678901,3/3,1000.00,,,3",
+                "31/01/2025,654321,Maria Souza,Banco ABC,10987654321,1/1,500.00,,,1",
+            ]
+            (operation_path / "spreadsheet.csv").write_text('\n'.join(csv_content), encoding='utf-8')
+
+            with zipfile.ZipFile(operation_path / "boletos.zip", 'w') as zip_file:
+                for name in ["123456 PARC 1.pdf", "123456 PARC 2.pdf", "123456 PARC 3.pdf", "654321 PARC 1.pdf"]:
+                    zip_file.writestr(name, b"fake pdf")
+
+            with patch('app.controllers.spreadsheet_controller.MEDIA_ROOT', temp_dir), \
+                 patch('app.controllers.spreadsheet_controller.SPREADSHEET_CHUNK_SIZE', 2), \
+                 patch.object(SpreadsheetController, '_build_cache', wraps=SpreadsheetController._build_cache) as build_cache:
+                result = SpreadsheetController.process_spreadsheet(operation_uuid)
+
+            assert build_cache.call_count == 2
+            assert result.errors == []
+            assert [p.user.cpf_cnpj for p in result.payers] == ["12345678901", "10987654321"]
+            assert len(result.payers[0].agreements) == 1
+            assert [i.number for i in result.payers[0].agreements[0].installments] == [1, 2, 3]
+            assert len(result.creditors) == 1
+
     def test_process_spreadsheet_file_not_found(self):
         """Teste quando arquivo de planilha não existe"""
         operation_uuid = uuid4()
@@ -89,13 +126,15 @@ class TestSpreadsheetController:
         operation_uuid = uuid4()
         
         with tempfile.TemporaryDirectory() as temp_dir:
-            boletos_path = Path(temp_dir) / str(operation_uuid) / "boletos"
-            boletos_path.mkdir(parents=True)
+            operation_path = Path(temp_dir) / str(operation_uuid)
+            operation_path.mkdir(parents=True)
             
-            # Cria arquivos de boleto
-            (boletos_path / "123456 PARC 1.pdf").write_bytes(b"fake pdf 1")
-            (boletos_path / "123456 PARC 2.pdf").write_bytes(b"fake pdf 2")
-            (boletos_path / "789012 PARC 1.pdf").write_bytes(b"fake pdf 3")
+            # Cria o ZIP de boletos, inclusive com um PDF dentro de uma pasta
+            with zipfile.ZipFile(operation_path / "boletos.zip", 'w') as zip_file:
+                zip_file.writestr("123456 PARC 1.pdf", b"fake pdf 1")
+                zip_file.writestr("123456 PARC 2.pdf", b"fake pdf 2")
+                zip_file.writestr("lote/789012 PARC 1.pdf", b"fake pdf 3")
+                zip_file.writestr("leiame.pdf", b"sem acordo")
             
             with patch('app.controllers.spreadsheet_controller.MEDIA_ROOT', temp_dir):
                 boletos = SpreadsheetController._read_boletos(operation_uuid)
@@ -105,9 +144,12 @@ class TestSpreadsheetController:
             assert 1 in boletos["123456"]
             assert 2 in boletos["123456"]
             assert 1 in boletos["789012"]
+            assert boletos["789012"][1]["member"] == "lote/789012 PARC 1.pdf"
+            # Nada é extraído para o disco
+            assert list(operation_path.iterdir()) == [operation_path / "boletos.zip"]
 
     def test_read_boletos_directory_not_found(self):
-        """Teste quando diretório de boletos não existe"""
+        """Teste quando o ZIP de boletos não existe"""
         operation_uuid = uuid4()
         
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -160,13 +202,54 @@ class TestSpreadsheetController:
             creditors=[creditor_to_save, creditor_to_delete]
         )
         
-        with patch('app.controllers.creditor_controller.CreditorController.create') as mock_create:
-            mock_create.return_value = CreditorFactory.build()
-            
-            SpreadsheetController.save_results_to_database(job_id, save_data)
-            
-            # Deve criar apenas 1 credor (o não deletado)
-            mock_create.assert_called_once()
+        SpreadsheetController.save_results_to_database(job_id, save_data)
+
+        # Deve criar apenas 1 credor (o não deletado)
+        assert list(Creditor.objects.values_list('name', flat=True)) == ["Banco ABC"]
+
+
+def normalized(*rows):
+    return [row.data for row in normalize_rows([(n, r) for n, r in enumerate(rows, start=2)])]
+
+
+def csv_row(contract, document, creditor):
+    return ["31/12/2030", contract, "Cliente", creditor, document, "1/1", "100.00", "", "", "1"]
+
+
+class TestSpreadsheetBuildCache:
+    """Testes do pré-carregamento do banco feito por _build_cache"""
+
+    def test_build_cache_uses_one_query_per_model(self, django_assert_num_queries):
+        rows = []
+        boletos = []
+        for i in range(3):
+            installment = InstallmentFactory.create(number="1")
+            boletos.append(BoletoFactory.create(installment=installment))
+            agreement = installment.agreement
+            rows.append(csv_row(agreement.number, agreement.payer.user.cpf_cnpj, agreement.creditor.name))
+
+        with django_assert_num_queries(4):
+            cache = SpreadsheetController._build_cache(normalized(*rows))
+
+        for boleto in boletos:
+            agreement = boleto.installment.agreement
+            assert cache["payers"][agreement.payer.user.cpf_cnpj].readonly is True
+            assert cache["agreements"][agreement.number].creditor_name == agreement.creditor.name
+            installment = cache["installments"][(agreement.number, 1)]
+            # O caminho vem do banco, sem consultar o storage
+            assert installment.boleto.path == boleto.pdf.name
+
+    def test_build_cache_splits_lookups_by_parameter_limit(self, django_assert_num_queries):
+        payers = PayerFactory.create_batch(5)
+        rows = [csv_row(f"{i}", payer.user.cpf_cnpj, "Credor") for i, payer in enumerate(payers)]
+
+        # Com folga de 50 parâmetros, sobram 2 por lote: 5 CPFs e 5 acordos viram
+        # 3 lotes cada (acordos e parcelas), e o único credor cabe em 1
+        with patch.object(connection.features, 'max_query_params', 52), \
+             django_assert_num_queries(10):
+            cache = SpreadsheetController._build_cache(normalized(*rows))
+
+        assert set(cache["payers"]) == {payer.user.cpf_cnpj for payer in payers}
 
 
 class TestSpreadsheetControllerErrorHandling:
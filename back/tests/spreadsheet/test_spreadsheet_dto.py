@@ -0,0 +1,74 @@
+from datetime import date
+
+from app.dtos import AgreementDTO, BoletoDTO, CreditorDTO, InstallmentDTO, PayerDTO, SpreadsheetDTO, UserDTO
+
+
+def build_payer(cpf_cnpj: str = "12345678901") -> PayerDTO:
+    return PayerDTO(name="João Silva", user=UserDTO(cpf_cnpj=cpf_cnpj), phone=cpf_cnpj, agreements=[])
+
+
+def build_agreement(number: str = "123456", cpf_cnpj: str = "12345678901") -> AgreementDTO:
+    return AgreementDTO(number=number, payer_cpf_cnpj=cpf_cnpj, creditor_name="Banco ABC", installments=[])
+
+
+def build_installment(number: int, agreement_num: str = "123456") -> InstallmentDTO:
+    return InstallmentDTO(agreement_num=agreement_num, number=number, due_date=date(2025, 1, number))
+
+
+class TestSpreadsheetDTOIndexes:
+    """Testes dos índices usados pelo SpreadsheetDTO.add_node"""
+
+    def test_add_node_does_not_duplicate_nodes(self):
+        result = SpreadsheetDTO(payers=[], errors=[], warnings=[])
+
+        result.add_node(build_payer())
+        result.add_node(build_payer(), build_agreement())
+        result.add_node(build_payer(), build_agreement(), build_installment(1))
+        result.add_node(build_payer(), build_agreement(), build_installment(1))
+        result.add_node(build_payer(), build_agreement(), build_installment(2))
+
+        assert len(result.payers) == 1
+        assert len(result.payers[0].agreements) == 1
+        assert [i.number for i in result.payers[0].agreements[0].installments] == [1, 2]
+
+    def test_agreement_numbers_are_scoped_to_the_payer(self):
+        # Dois pagadores com acordos de mesmo número: cada um fica com o seu
+        result = SpreadsheetDTO(payers=[], errors=[], warnings=[])
+        result.add_node(build_payer("111"), build_agreement(cpf_cnpj="111"), build_installment(1))
+        result.add_node(build_payer("222"), build_agreement(cpf_cnpj="222"), build_installment(1))
+        result.add_node(build_payer("222"), build_agreement(cpf_cnpj="222"), build_installment(2))
+
+        first, second = result.payers
+        assert [i.number for i in first.agreements[0].installments] == [1]
+        assert [i.number for i in second.agreements[0].installments] == [1, 2]
+
+        # O mesmo vale depois de os índices serem refeitos
+        reloaded = SpreadsheetDTO.from_json(result.model_dump(mode='json'))
+        reloaded.add_node(build_payer("111"), build_agreement(cpf_cnpj="111"), build_installment(3))
+        assert [i.number for i in reloaded.payers[0].agreements[0].installments] == [1, 3]
+        assert [i.number for i in reloaded.payers[1].agreements[0].installments] == [1, 2]
+
+    def test_add_node_updates_boleto_of_existing_installment(self):
+        result = SpreadsheetDTO(payers=[], errors=[], warnings=[])
+        result.add_node(build_payer(), build_agreement(), build_installment(1))
+
+        with_boleto = build_installment(1)
+        with_boleto.boleto = BoletoDTO(path="123456 PARC 1.pdf")
+        result.add_node(build_payer(), build_agreement(), with_boleto)
+
+        installment = result.payers[0].agreements[0].installments[0]
+        assert installment.boleto is not None
+        assert installment.boleto.path == "123456 PARC 1.pdf"
+
+    def test_indexes_survive_json_round_trip(self):
+        result = SpreadsheetDTO(payers=[], errors=[], warnings=[])
+        result.add_node(build_payer(), build_agreement(), build_installment(1))
+        result.add_creditor(CreditorDTO(name="Banco ABC", reissue_margin=0))
+
+        reloaded = SpreadsheetDTO.from_json(result.model_dump(mode='json'))
+        reloaded.add_node(build_payer(), build_agreement(), build_installment(1))
+        reloaded.add_node(build_payer(), build_agreement(), build_installment(2))
+
+        assert len(reloaded.payers) == 1
+        assert [i.number for i in reloaded.payers[0].agreements[0].installments] == [1, 2]
+        assert [c.name for c in reloaded.creditors] == ["Banco ABC"]
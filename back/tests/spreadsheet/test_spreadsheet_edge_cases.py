@@ -2,11 +2,21 @@ import io
 import json
 import pytest
 import zipfile
-from unittest.mock import Mock, patch
+from unittest.mock import patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_job_controller import SpreadsheetJobController
+from app.controllers.spreadsheet_results_controller import SpreadsheetResultsController
 from app.dtos import SpreadsheetDTO, PayerDTO, UserDTO
+from app.models import SpreadsheetJob
+from tests.factories import SpreadsheetJobFactory
+
+
+def job_status(client, process_response) -> dict:
+    job_id = process_response.json()['data']['job_id']
+    return client.get(f'/api/admin/spreadsheet/status/{job_id}').json()['data']
 
 
 class TestSpreadsheetProcessingEdgeCases:
@@ -60,6 +70,7 @@ class TestSpreadsheetProcessingEdgeCases:
                 },
                 format='multipart'
             )
+            SpreadsheetJobController.run_pending()
 
         assert response.status_code == 201
         data = response.json()
@@ -112,9 +123,12 @@ class TestSpreadsheetProcessingEdgeCases:
                 },
                 format='multipart'
             )
+            SpreadsheetJobController.run_pending()
 
-        assert response.status_code == 200  # No new data
-        assert 'Não existem novas informações' in response.json()['message']
+        assert response.status_code == 201
+        status = job_status(system_client, response)
+        assert status['status'] == 'done'
+        assert 'Não existem novas informações' in status['message']
 
     def test_process_spreadsheet_with_special_characters(self, system_client):
         """Teste com caracteres especiais nos dados"""
@@ -163,6 +177,7 @@ class TestSpreadsheetProcessingEdgeCases:
                 },
                 format='multipart'
             )
+            SpreadsheetJobController.run_pending()
 
         assert response.status_code == 201
 
@@ -194,9 +209,9 @@ class TestSpreadsheetProcessingEdgeCases:
             format='multipart'
         )
 
-        assert response.status_code == 500
+        assert response.status_code == 400
         data = response.json()
-        assert "Erro ao processar planilha" in data['message']
+        assert "não é um ZIP válido" in data['message']
 
     def test_process_spreadsheet_empty_csv(self, system_client):
         """Teste com CSV vazio"""
@@ -235,9 +250,12 @@ class TestSpreadsheetProcessingEdgeCases:
                 },
                 format='multipart'
             )
+            SpreadsheetJobController.run_pending()
 
-        assert response.status_code == 200
-        assert 'Não existem novas informações' in response.json()['message']
+        assert response.status_code == 201
+        status = job_status(system_client, response)
+        assert status['status'] == 'done'
+        assert 'Não existem novas informações' in status['message']
 
 
 class TestSpreadsheetResultsValidation:
@@ -245,8 +263,8 @@ class TestSpreadsheetResultsValidation:
 
     def test_get_results_with_complex_data(self, system_client):
         """Teste com dados complexos nos resultados"""
-        job_id = "complex-data-job"
-        
+        job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value, has_results=True)
+
         complex_results = {
             "payers": [
                 {
@@ -294,14 +312,11 @@ class TestSpreadsheetResultsValidation:
             "warnings": ["Warning de exemplo"]
         }
 
-        with patch('pathlib.Path.exists', return_value=True), \
-             patch('pathlib.Path.open') as mock_open, \
-             patch('json.load', return_value=complex_results):
-            
-            mock_file = Mock()
-            mock_open.return_value.__enter__.return_value = mock_file
+        operation_path = SpreadsheetController.operation_path(job.uuid)
+        operation_path.mkdir(parents=True, exist_ok=True)
+        SpreadsheetResultsController.write(operation_path, SpreadsheetDTO.from_json(complex_results))
 
-            response = system_client.get(f'/api/admin/spreadsheet/results/{job_id}')
+        response = system_client.get(f'/api/admin/spreadsheet/results/{job.uuid}')
 
         assert response.status_code == 200
         data = response.json()
@@ -445,9 +460,11 @@ class TestSpreadsheetAPIPerformance:
                 },
                 format='multipart'
             )
+            SpreadsheetJobController.run_pending()
 
         # Deve processar normalmente mesmo com arquivo grande
-        assert response.status_code in [200, 201]
+        assert response.status_code == 201
+        assert job_status(system_client, response)['status'] == 'done'
 
     @patch('app.controllers.spreadsheet_controller.SpreadsheetController.process_spreadsheet')
     def test_process_timeout_handling(self, mock_process, system_client):
@@ -484,7 +501,10 @@ class TestSpreadsheetAPIPerformance:
             },
             format='multipart'
         )
+        assert response.status_code == 201
 
-        assert response.status_code == 500
-        data = response.json()
-        assert "Erro ao processar planilha" in data['message']
\ No newline at end of file
+        SpreadsheetJobController.run_pending()
+
+        status = job_status(system_client, response)
+        assert status['status'] == 'failed'
+        assert "Erro ao processar planilha" in status['message']
\ No newline at end of file
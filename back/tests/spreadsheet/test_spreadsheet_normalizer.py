@@ -0,0 +1,55 @@
+from datetime import date
+
+from app.spreadsheet_normalizer import normalize_rows, only_digits, parse_due_date_or_none
+
+
+def row(due_date="31/12/2024", contract="123-456", customer=" João Silva ", creditor="Banco ABC",
+        document="123.456.789-01", installment="1/3"):
+    return [due_date, contract, customer, creditor, document, installment, "1000.00", "", "", "3"]
+
+
+class TestNormalizeRows:
+    """Testes da normalização em colunas das linhas da planilha"""
+
+    def test_rows_become_typed_records(self):
+        rows = normalize_rows([(2, row()), (3, row(due_date="31/01/2025", installment="2/3"))])
+
+        assert [r.line_num for r in rows] == [2, 3]
+        assert all(r.error is None for r in rows)
+        first = rows[0].data
+        assert first == {
+            "creditor_name": "Banco ABC",
+            "payer_name": "João Silva",
+            "cpf_cnpj": "12345678901",
+            "phone": "12345678901",
+            "agreement_num": "123456",
+            "installment_num": 1,
+            "due_date_str": "31/12/2024",
+            "due_date": date(2024, 12, 31),
+        }
+        assert rows[1].data["installment_num"] == 2
+
+    def test_invalid_rows_keep_their_position_and_message(self):
+        rows = normalize_rows([
+            (2, ["31/12/2024", "123"]),
+            (3, row(installment="x")),
+            (4, row(customer="   ")),
+            (5, row(due_date="2024-12-31")),
+        ])
+
+        assert rows[0].data is None
+        assert "Linha 2 possui colunas insuficientes" in rows[0].error
+        assert rows[1].error.startswith("Erro ao processar linha 3:")
+        assert rows[2].error == "Linha 4 possui campos obrigatórios em branco ou apenas espaços"
+        # Data inválida só vira erro se a parcela precisar ser criada
+        assert rows[3].error is None
+        assert rows[3].data["due_date"] is None
+
+    def test_repeated_values_are_parsed_once(self):
+        only_digits.cache_clear()
+        parse_due_date_or_none.cache_clear()
+
+        normalize_rows([(n, row(installment=f"{n}/500")) for n in range(500)])
+
+        assert only_digits.cache_info().misses == 2  # um CPF e um contrato
+        assert parse_due_date_or_none.cache_info().misses == 1
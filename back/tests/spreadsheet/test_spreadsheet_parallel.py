@@ -0,0 +1,145 @@
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.spreadsheet_parallel import ByteRange, IN_FLIGHT_PER_WORKER, iter_parallel, iter_serial, normalize_range, split_ranges
+from app.spreadsheet_synthetic import synthetic_installments, write_boletos_zip, write_spreadsheet
+
+
+def upload(extra_lines=()):
+    """Cria uma operação com uma planilha sintética e, ao fim, as linhas extras fornecidas."""
+    operation_uuid = uuid4()
+    operation_path = SpreadsheetController.operation_path(operation_uuid)
+    operation_path.mkdir(parents=True)
+    spreadsheet = operation_path / "spreadsheet.csv"
+    write_spreadsheet(spreadsheet, synthetic_installments(300))
+    with spreadsheet.open('ab') as file:
+        for line in extra_lines:
+            file.write(line)
+    write_boletos_zip(SpreadsheetController.boletos_zip_path(operation_uuid), synthetic_installments(300))
+    return operation_uuid
+
+
+@contextmanager
+def parallel(workers=2):
+    with patch('app.controllers.spreadsheet_controller.SPREADSHEET_PARSE_WORKERS', workers), \
+         patch('app.controllers.spreadsheet_controller.SPREADSHEET_PARALLEL_MIN_BYTES', 0), \
+         patch('app.controllers.spreadsheet_controller.SPREADSHEET_CHUNK_SIZE', 64):
+        yield
+
+
+def test_split_ranges_cover_the_file_on_line_boundaries(tmp_path: Path):
+    path = tmp_path / "planilha.csv"
+    path.write_bytes(b"cabecalho\n" + b"".join(f"linha {i}\n".encode() for i in range(100)))
+
+    ranges = split_ranges(path, len(b"cabecalho\n"), 7)
+
+    assert ranges[0].start == len(b"cabecalho\n") and ranges[-1].end == path.stat().st_size
+    assert all(a.end == b.start for a, b in zip(ranges, ranges[1:]))
+    content = path.read_bytes()
+    for byte_range in ranges:
+        first_line = content[byte_range.start:byte_range.end].split(b"\n")[0]
+        assert first_line == f"linha {byte_range.first_line_num - 2}".encode()
+
+
+def test_lone_carriage_return_is_not_aligned(tmp_path: Path):
+    path = tmp_path / "planilha.csv"
+    path.write_bytes(b"a,b\rc,d\n")
+
+    assert not normalize_range(str(path), ByteRange(0, path.stat().st_size, 2), ",").aligned
+
+
+class SyncExecutor:
+    """Executa as tarefas na hora, registrando quantas foram enviadas"""
+
+    def __init__(self, *args, **kwargs):
+        self.submitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_parallel_parsing_bounds_ranges_in_flight(tmp_path: Path):
+    path = tmp_path / "planilha.csv"
+    path.write_bytes(b"cabecalho\n" + b"".join(f'01/01/2031,{i},Nome,Credor 1,12345678901,1/1,10.00,,,1\n'.encode() for i in range(400)))
+    executor = SyncExecutor()
+
+    with patch('app.spreadsheet_parallel.ProcessPoolExecutor', return_value=executor):
+        rows = iter_parallel(path, ",", workers=2, chunk_size=1)
+        next(rows)
+        # Só os trechos que cabem na janela foram lidos, não a planilha toda
+        assert executor.submitted == 2 * IN_FLIGHT_PER_WORKER + 1
+        assert len(list(rows)) == 399
+
+    assert executor.submitted == 2 * 4
+
+
+def test_range_ending_inside_a_quoted_field_falls_back_to_serial(tmp_path: Path):
+    path = tmp_path / "planilha.csv"
+    records = [f'01/01/2031;{i};Nome {i};Credor 1;12345678901;1/1;10.00;;;1\n'.encode() for i in range(10)]
+    # Com a primeira linha do registro longa, a divisão cai logo depois dela,
+    # deixando cada metade com a contagem de linhas certa
+    records[4] = b'01/01/2031;4;"Nome ' + b'N' * 300 + b'\nem duas linhas";Credor 1;12345678901;1/1;10.00;;;1\n'
+    path.write_bytes(b"cabecalho\n" + b"".join(records))
+    serial = list(iter_serial(path, len(b"cabecalho\n"), 2, ";", 64))
+
+    # O trecho que termina no meio do registro em duas linhas não pode ser
+    # aceito: o registro seria lido pela metade e a outra metade viraria outro
+    for parts in range(2, 12):
+        with patch('app.spreadsheet_parallel.ProcessPoolExecutor', SyncExecutor), \
+             patch('app.spreadsheet_parallel.RANGES_PER_WORKER', 1):
+            rows = [row for chunk in iter_parallel(path, ";", workers=parts, chunk_size=64) for row in chunk]
+
+        assert rows == serial, f"{parts} trechos"
+
+
+@pytest.mark.django_db
+class TestParallelParsing:
+    """A leitura em vários processos deve devolver exatamente o mesmo que a serial"""
+
+    EXTRA_LINES = [
+        b"\n",
+        b"01/01/2031,999,Sem Colunas\n",
+        b"01/01/2031,998,Parcela Ruim,Credor 1,12345678901,x/2,10.00,,,2\n",
+        "01/01/2031,997,José Ção,Credor 1,12345678901,1/1,10.00,,,1\n".encode('latin-1'),
+    ]
+
+    def test_output_matches_serial(self):
+        serial = SpreadsheetController.process_spreadsheet(upload(self.EXTRA_LINES))
+
+        with parallel():
+            parallel_result = SpreadsheetController.process_spreadsheet(upload(self.EXTRA_LINES))
+
+        assert parallel_result.errors
+        assert parallel_result.model_dump() == serial.model_dump()
+
+    def test_multiline_record_falls_back_to_serial(self):
+        lines = [*self.EXTRA_LINES, b'01/01/2031,996,"Nome em\nduas linhas",Credor 1,12345678901,1/1,10.00,,,1\n', *self.EXTRA_LINES]
+        serial = SpreadsheetController.process_spreadsheet(upload(lines))
+
+        with parallel(), patch('app.spreadsheet_parallel.lgr') as lgr:
+            parallel_result = SpreadsheetController.process_spreadsheet(upload(lines))
+
+        lgr.warning.assert_called_once()
+        assert parallel_result.model_dump() == serial.model_dump()
+
+    def test_small_files_stay_serial(self):
+        with patch('app.controllers.spreadsheet_controller.SPREADSHEET_PARSE_WORKERS', 2), \
+             patch('app.controllers.spreadsheet_controller.iter_parallel') as iter_parallel:
+            SpreadsheetController.process_spreadsheet(upload())
+
+        iter_parallel.assert_not_called()
@@ -0,0 +1,158 @@
+import os
+import shutil
+import time
+from datetime import timedelta
+from io import StringIO
+from uuid import UUID, uuid4
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_job_controller import APPROVING_MESSAGE, EXPIRED_MESSAGE, SpreadsheetJobController
+from app.exceptions import HttpFriendlyException
+from app.models import SpreadsheetJob, SpreadsheetStagingRow
+from config import SPREADSHEET_JOB_MAX_ATTEMPTS
+from tests.factories import SpreadsheetJobFactory
+
+DAY = 60 * 60 * 24
+
+
+def operation(age_seconds, size=100, status=None, **job_fields):
+    """Cria a pasta de uma operação com um arquivo de `size` bytes modificado há `age_seconds`."""
+    operation_uuid = SpreadsheetJobFactory.create(status=status, **job_fields).uuid if status else uuid4()
+    path = SpreadsheetController.operation_path(operation_uuid)
+    path.mkdir(parents=True)
+    (path / "spreadsheet.csv").write_bytes(b"x" * size)
+    modified = time.time() - age_seconds
+    for target in (path / "spreadsheet.csv", path):
+        os.utime(target, (modified, modified))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clean_operations():
+    yield
+    for _, path in SpreadsheetController.operation_paths():
+        shutil.rmtree(path)
+
+
+class TestReapOperations:
+
+    def test_expired_operations_are_removed(self):
+        done = operation(10 * DAY, status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        failed = operation(10 * DAY, status=SpreadsheetJob.Status.FAILED.value)
+        orphan = operation(10 * DAY)
+        recent = operation(DAY, status=SpreadsheetJob.Status.DONE.value)
+
+        result = SpreadsheetJobController.reap_operations(max_age=timedelta(days=7), max_bytes=0)
+
+        assert result == (3, 300)
+        assert not done.exists() and not failed.exists() and not orphan.exists()
+        assert recent.exists()
+        job = SpreadsheetJob.objects.get(uuid=done.name)
+        assert not job.has_results and job.message == EXPIRED_MESSAGE
+
+    def test_active_jobs_and_fresh_uploads_are_kept(self):
+        queued = operation(10 * DAY, status=SpreadsheetJob.Status.QUEUED.value)
+        running = operation(10 * DAY, status=SpreadsheetJob.Status.RUNNING.value)
+        uploading = operation(60)
+
+        result = SpreadsheetJobController.reap_operations(max_age=timedelta(seconds=1), max_bytes=1)
+
+        assert result == (0, 0)
+        assert queued.exists() and running.exists() and uploading.exists()
+
+    def test_abandoned_running_job_is_removed(self):
+        # O worker caiu e o processamento já esgotou as reservas: ele falha e a pasta pode sair
+        abandoned = operation(
+            10 * DAY, status=SpreadsheetJob.Status.RUNNING.value,
+            attempts=SPREADSHEET_JOB_MAX_ATTEMPTS, heartbeat_at=timezone.now() - timedelta(days=10),
+        )
+
+        result = SpreadsheetJobController.reap_operations(max_age=timedelta(days=7), max_bytes=0)
+
+        assert result == (1, 100)
+        assert not abandoned.exists()
+        assert SpreadsheetJob.objects.get(uuid=abandoned.name).status == SpreadsheetJob.Status.FAILED.value
+
+    def test_leftover_staging_rows_are_removed(self):
+        failed = operation(10 * DAY, status=SpreadsheetJob.Status.FAILED.value)
+        running = operation(10 * DAY, status=SpreadsheetJob.Status.RUNNING.value)
+        for path in (failed, running):
+            SpreadsheetStagingRow.objects.create(
+                operation=path.name, line=2, cpf_cnpj="1", creditor_name="c", agreement_number="1",
+                installment_number="1", has_boleto=True,
+            )
+
+        SpreadsheetJobController.reap_operations(max_age=timedelta(days=7), max_bytes=0)
+
+        assert list(SpreadsheetStagingRow.objects.values_list('operation', flat=True)) == [UUID(running.name)]
+
+    def test_job_being_approved_is_kept(self):
+        approving = operation(
+            10 * DAY, status=SpreadsheetJob.Status.DONE.value, has_results=True, approving_at=timezone.now(),
+        )
+        # Uma aprovação que parou de renovar a reserva foi interrompida
+        interrupted = operation(
+            10 * DAY, status=SpreadsheetJob.Status.DONE.value, has_results=True,
+            approving_at=timezone.now() - timedelta(days=1),
+        )
+
+        result = SpreadsheetJobController.reap_operations(max_age=timedelta(days=7), max_bytes=0)
+
+        assert result == (1, 100)
+        assert approving.exists() and not interrupted.exists()
+        assert SpreadsheetJob.objects.get(uuid=approving.name).has_results
+
+    def test_disk_cap_keeps_results_awaiting_approval(self):
+        awaiting = operation(3 * DAY, status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        failed = operation(2 * DAY, status=SpreadsheetJob.Status.FAILED.value)
+
+        result = SpreadsheetJobController.reap_operations(max_age=timedelta(days=7), max_bytes=50)
+
+        assert result == (1, 100)
+        assert awaiting.exists() and not failed.exists()
+
+    def test_approval_of_expired_results_is_rejected(self):
+        expired = operation(10 * DAY, status=SpreadsheetJob.Status.DONE.value, has_results=True)
+        SpreadsheetJobController.reap_operations(max_age=timedelta(days=7), max_bytes=0)
+
+        with pytest.raises(HttpFriendlyException) as error:
+            with SpreadsheetJobController.approving(expired.name):
+                pass
+
+        assert error.value.code == 409
+        assert error.value.message == EXPIRED_MESSAGE
+
+    def test_approval_lease_is_exclusive_and_released(self):
+        path = operation(DAY, status=SpreadsheetJob.Status.DONE.value, has_results=True)
+
+        with SpreadsheetJobController.approving(path.name):
+            assert SpreadsheetJob.objects.get(uuid=path.name).approving_at is not None
+            with pytest.raises(HttpFriendlyException) as error:
+                with SpreadsheetJobController.approving(path.name):
+                    pass
+            assert error.value.message == APPROVING_MESSAGE
+
+        assert SpreadsheetJob.objects.get(uuid=path.name).approving_at is None
+
+    def test_disk_cap_removes_oldest_first(self):
+        oldest = operation(3 * DAY, status=SpreadsheetJob.Status.DONE.value)
+        middle = operation(2 * DAY, status=SpreadsheetJob.Status.DONE.value)
+        newest = operation(1 * DAY, status=SpreadsheetJob.Status.DONE.value)
+
+        result = SpreadsheetJobController.reap_operations(max_age=timedelta(days=7), max_bytes=150)
+
+        assert result == (2, 200)
+        assert not oldest.exists() and not middle.exists() and newest.exists()
+
+    def test_dry_run_keeps_everything(self):
+        path = operation(10 * DAY)
+        out = StringIO()
+
+        call_command('reap_spreadsheet_operations', '--max-age-hours', '24', '--dry-run', stdout=out)
+
+        assert path.exists()
+        assert '1 pastas de operações seriam removidas' in out.getvalue()
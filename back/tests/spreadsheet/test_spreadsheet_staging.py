@@ -0,0 +1,98 @@
+import json
+import zipfile
+from datetime import date
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from app.controllers.import_ledger_controller import PENDING_FILE
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_staging_controller import SpreadsheetStagingController
+from app.models import SpreadsheetStagingRow
+from tests.factories import AgreementFactory, BoletoFactory, CreditorFactory, InstallmentFactory, PayerFactory, UserFactory
+
+HEADER = "Data Vencimento,Contrato,Cliente,Credor,CPF/CNPJ,Parcela,Valor,Data Pagamento,Valor Pago,Qtd Parcelas"
+
+ROWS = [
+    # Já gravada, com boleto e mesmo vencimento
+    "31/12/2030,100,João Silva,Banco ABC,12345678901,1/4,100.00,,,4",
+    # Parcela gravada sem boleto
+    "31/01/2031,100,João Silva,Banco ABC,12345678901,2/4,100.00,,,4",
+    # Parcela gravada com outro vencimento
+    "15/03/2031,100,João Silva,Banco ABC,12345678901,3/4,100.00,,,4",
+    # Parcela nova de acordo existente
+    "30/04/2031,100,João Silva,Banco ABC,12345678901,4/4,100.00,,,4",
+    # Acordo, pagador e credor novos
+    "31/12/2030,200,Maria Souza,Banco Novo,98765432100,1/1,50.00,,,1",
+    # Parcela nova sem PDF no ZIP
+    "31/12/2030,300,Maria Souza,Banco Novo,98765432100,1/1,50.00,,,1",
+    # Linha inválida
+    "31/12/2030,400,Sem Colunas",
+]
+PDFS = ["100 PARC 1.pdf", "100 PARC 2.pdf", "100 PARC 3.pdf", "100 PARC 4.pdf", "200 PARC 1.pdf"]
+
+
+def upload():
+    operation_uuid = uuid4()
+    operation_path = SpreadsheetController.operation_path(operation_uuid)
+    operation_path.mkdir(parents=True)
+    (operation_path / "spreadsheet.csv").write_text('\n'.join([HEADER, *ROWS]), encoding='utf-8')
+    with zipfile.ZipFile(SpreadsheetController.boletos_zip_path(operation_uuid), 'w') as zip_file:
+        for name in PDFS:
+            zip_file.writestr(name, f"%PDF {name}".encode())
+    return operation_uuid
+
+
+def process(engine):
+    operation_uuid = upload()
+    with patch('app.controllers.spreadsheet_controller.SPREADSHEET_DIFF_ENGINE', engine):
+        results = SpreadsheetController.process_spreadsheet(operation_uuid)
+    pending = json.loads((SpreadsheetController.operation_path(operation_uuid) / PENDING_FILE).read_text())
+    return results, sorted(map(tuple, pending))
+
+
+@pytest.mark.django_db
+class TestSqlDiffEngine:
+    """O cálculo da diferença no banco deve chegar ao mesmo resultado que o feito em memória"""
+
+    @pytest.fixture(autouse=True)
+    def existing_data(self):
+        payer = PayerFactory.create(name="João Silva", user=UserFactory.create(cpf_cnpj="12345678901"))
+        agreement = AgreementFactory.create(number="100", payer=payer, creditor=CreditorFactory.create(name="Banco ABC"))
+        BoletoFactory.create(installment=InstallmentFactory.create(agreement=agreement, number="1", due_date=date(2030, 12, 31)))
+        InstallmentFactory.create(agreement=agreement, number="2", due_date=date(2031, 1, 31))
+        BoletoFactory.create(installment=InstallmentFactory.create(agreement=agreement, number="3", due_date=date(2031, 3, 31)))
+
+    def test_matches_python_engine(self):
+        python_results, python_pending = process("python")
+        sql_results, sql_pending = process("sql")
+
+        assert sql_results.model_dump() == python_results.model_dump()
+        assert sql_pending == python_pending
+        assert len(sql_results.errors) == 1 and sql_results.warnings
+        assert not SpreadsheetStagingRow.objects.exists()
+
+    def test_insert_sets_come_from_anti_joins(self):
+        diffs = []
+        compute = SpreadsheetStagingController._compute
+        with patch('app.controllers.spreadsheet_controller.SPREADSHEET_DIFF_ENGINE', 'sql'), \
+             patch.object(SpreadsheetStagingController, '_compute',
+                          side_effect=lambda operation_uuid: diffs.append(compute(operation_uuid)) or diffs[-1]):
+            SpreadsheetController.process_spreadsheet(upload())
+
+        diff, = diffs
+        assert diff.settled == {2}
+        assert diff.new_payers == {"98765432100"}
+        assert diff.new_creditors == {"Banco Novo"}
+        assert diff.new_agreements == {"200", "300"}
+        assert diff.new_installments == {5, 6, 7}
+        assert diff.missing_boletos == {7}
+        # Só as parcelas já gravadas das linhas pendentes voltam para o Python
+        assert sorted(installment.number for installment in diff.installments) == [2, 3]
+
+    def test_settled_rows_do_not_reach_python(self):
+        with patch('app.controllers.spreadsheet_controller.SpreadsheetController._process_line') as process_line:
+            process("sql")
+
+        assert sorted(call.args[3] for call in process_line.call_args_list) == [3, 4, 5, 6, 7]
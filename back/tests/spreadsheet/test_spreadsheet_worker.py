@@ -0,0 +1,119 @@
+import zipfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from app.controllers.spreadsheet_controller import SpreadsheetController
+from app.controllers.spreadsheet_job_controller import ABANDONED_MESSAGE, SpreadsheetJobController
+from app.models import SpreadsheetJob
+from tests.factories import SpreadsheetJobFactory
+
+
+def test_claim_next_takes_oldest_queued_job():
+    SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.DONE.value)
+    first = SpreadsheetJobFactory.create()
+    SpreadsheetJobFactory.create()
+
+    job = SpreadsheetJobController.claim_next()
+
+    assert job.id == first.id
+    assert job.status == SpreadsheetJob.Status.RUNNING.value
+    assert job.started_at is not None
+    assert job.heartbeat_at is not None
+    assert job.attempts == 1
+
+
+def test_claim_next_empty_queue():
+    SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value)
+
+    assert SpreadsheetJobController.claim_next() is None
+
+
+@patch('app.controllers.spreadsheet_job_controller.SPREADSHEET_JOB_LEASE_SECONDS', 60)
+@patch('app.controllers.spreadsheet_job_controller.SPREADSHEET_JOB_MAX_ATTEMPTS', 2)
+def test_claim_next_reclaims_job_of_crashed_worker():
+    # O worker caiu no meio do processamento e parou de renovar o sinal de vida
+    stale = SpreadsheetJobFactory.create(
+        status=SpreadsheetJob.Status.RUNNING.value, attempts=1, heartbeat_at=timezone.now() - timedelta(minutes=5),
+    )
+    alive = SpreadsheetJobFactory.create(
+        status=SpreadsheetJob.Status.RUNNING.value, attempts=1, heartbeat_at=timezone.now(),
+    )
+
+    job = SpreadsheetJobController.claim_next()
+
+    assert job.id == stale.id
+    assert job.status == SpreadsheetJob.Status.RUNNING.value
+    assert job.attempts == 2
+    alive.refresh_from_db()
+    assert alive.status == SpreadsheetJob.Status.RUNNING.value and alive.attempts == 1
+
+
+@patch('app.controllers.spreadsheet_job_controller.SPREADSHEET_JOB_LEASE_SECONDS', 60)
+@patch('app.controllers.spreadsheet_job_controller.SPREADSHEET_JOB_MAX_ATTEMPTS', 2)
+def test_recover_stale_fails_job_after_max_attempts():
+    # Um processamento que derrubou o worker nas duas reservas não volta mais para a fila
+    job = SpreadsheetJobFactory.create(
+        status=SpreadsheetJob.Status.RUNNING.value, attempts=2, heartbeat_at=timezone.now() - timedelta(minutes=5),
+    )
+
+    assert SpreadsheetJobController.recover_stale() == 1
+    assert SpreadsheetJobController.claim_next() is None
+
+    job.refresh_from_db()
+    assert job.status == SpreadsheetJob.Status.FAILED.value
+    assert job.message == ABANDONED_MESSAGE
+    assert job.finished_at is not None
+
+
+def test_worker_command_once_records_failure():
+    # Uma falha no processamento fica registrada no job, sem derrubar o worker
+    job = SpreadsheetJobFactory.create()
+    out = StringIO()
+
+    with patch.object(SpreadsheetController, 'process_spreadsheet', side_effect=OSError("Planilha ilegível")):
+        call_command('run_spreadsheet_worker', '--once', stdout=out)
+
+    job.refresh_from_db()
+    assert job.status == SpreadsheetJob.Status.FAILED.value
+    assert job.message == 'Erro ao processar planilha: Planilha ilegível'
+    assert job.finished_at is not None
+    assert '1 processamento(s)' in out.getvalue()
+
+
+def test_run_publishes_progress_while_processing():
+    job = SpreadsheetJobFactory.create(status=SpreadsheetJob.Status.RUNNING.value)
+    operation_path = SpreadsheetController.operation_path(job.uuid)
+    operation_path.mkdir(parents=True)
+    (operation_path / "spreadsheet.csv").write_text('\n'.join([
+        "Data Vencimento,Contrato,Cliente,Credor,CPF/CNPJ,Parcela,Valor,Data Pagamento,Valor Pago,Qtd Parcelas",
+        "31/12/2030,123456,João Silva,Banco ABC,12345678901,1/3,1000.00,,,3",
+        "31/01/2031,123456,João Silva,Banco ABC,12345678901,2/3,1000.00,,,3",
+        "28/02/2031,123456,João Silva,Banco ABC,12345678901,x/3,1000.00,,,3",
+    ]), encoding='utf-8')
+    with zipfile.ZipFile(SpreadsheetController.boletos_zip_path(job.uuid), 'w') as zip_file:
+        zip_file.writestr("123456 PARC 1.pdf", b"pdf 1")
+
+    published = []
+    publish = SpreadsheetJobController._publish_progress
+    with patch('app.controllers.spreadsheet_controller.SPREADSHEET_CHUNK_SIZE', 1), \
+         patch('app.spreadsheet_progress.PROGRESS_PUBLISH_INTERVAL', 0), \
+         patch.object(SpreadsheetJobController, '_publish_progress',
+                      side_effect=lambda job, snapshot: published.append(snapshot) or publish(job, snapshot)):
+        SpreadsheetJobController.run(job)
+
+    # Um retrato por bloco de linhas, com os contadores crescendo
+    assert [snapshot["counters"]["rows_parsed"] for snapshot in published] == [1, 2, 3]
+    assert published[0]["stage"] == "resolve"
+
+    job.refresh_from_db()
+    assert job.status == SpreadsheetJob.Status.DONE.value
+    assert job.progress["stage"] is None
+    assert job.progress["counters"] == {
+        "rows_parsed": 3, "rows_resolved": 2, "rows_unchanged": 0, "boletos_matched": 1, "errors": 1,
+    }
+    assert {"boletos", "parse", "ledger", "cache", "resolve", "write_results"} <= job.progress["stages"].keys()
+
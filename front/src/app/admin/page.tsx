@@ -3,15 +3,19 @@ import { useContext, useState } from "react";
 import { AuthContext } from "@/components/providers/authProvider";
 import { FileInput } from "@/components/fileInput";
 import { emitSnack } from "@/components/snackEmitter";
-import { callSendFiles } from "@/components/api/spreadsheetApi";
+import { callGetProgress, callSendFiles } from "@/components/api/spreadsheetApi";
+import { SpreadsheetProgressCounters } from "@/components/api/returns/spreadsheetSchemas";
 import { useRouter } from "next/navigation";
 import Loader from "@/components/loader";
 
+const STATUS_POLL_INTERVAL_MS = 2000;
+
 export default function AdminPage() {
     const { user } = useContext(AuthContext);
     const [spreadsheet, setSpreadsheet] = useState<File | null>(null);
     const [boletos, setBoletos] = useState<File | null>(null);
     const [sending, setSending] = useState<boolean>(false);
+    const [progress, setProgress] = useState<SpreadsheetProgressCounters | null>(null);
     const router = useRouter();
     
     async function sendFiles() {
@@ -22,14 +26,40 @@ export default function AdminPage() {
         setSending(true);
 
         let response = await callSendFiles(spreadsheet, boletos);
-        if (response.code == 201) {
-            emitSnack("Sucesso", "Planilha processada com sucesso.","info");
-            router.push("admin/spreadsheet_results/" + response.data?.job_id);
-        }else if(response.code == 200 && response.message) {
-            emitSnack("", response.message, "info");
-        } else {
-            emitSnack("Erro", "Erro ao processar planilha.","error");
+        if (response.code != 201 || !response.data?.job_id) {
+            emitSnack("Erro", response.message || "Erro ao processar planilha.","error");
+            setSending(false);
+            return;
+        }
+
+        // O processamento roda em segundo plano; consulta o andamento até terminar
+        const jobId = response.data.job_id;
+        while (true) {
+            await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+            let status = await callGetProgress(jobId);
+            if (status.code != 200 || !status.data) {
+                emitSnack("Erro", "Erro ao consultar o processamento da planilha.","error");
+                break;
+            }
+            setProgress(status.data.counters);
+
+            if (status.data.status == "done") {
+                if (status.data.has_results) {
+                    emitSnack("Sucesso", "Planilha processada com sucesso.","info");
+                    router.push("admin/spreadsheet_results/" + jobId);
+                    return;
+                }
+                emitSnack("", status.data.message, "info");
+                break;
+            }
+
+            if (status.data.status == "failed") {
+                emitSnack("Erro", status.data.message || "Erro ao processar planilha.","error");
+                break;
+            }
         }
+        setSending(false);
+        setProgress(null);
     }
 
     return (
@@ -51,6 +81,12 @@ export default function AdminPage() {
                 >
                     {sending ? <Loader /> : "Processar planilha"}
                 </button>
+                {sending && progress && (
+                    <p className="text-black text-sm">
+                        {progress.rows_parsed} linhas lidas, {progress.rows_resolved} resolvidas
+                        ({progress.rows_unchanged} sem mudanças), {progress.boletos_matched} boletos encontrados, {progress.errors} erros
+                    </p>
+                )}
             </div>
         </div>
     );
@@ -3,12 +3,13 @@
 import { useEffect, useMemo, useState } from "react";
 import { useParams, useRouter } from "next/navigation";
 
-import { callGetResults, callSaveSpreadsheetResults } from "@/components/api/spreadsheetApi";
-import { ApiResponse } from "@/components/types";
-import { SpreadsheetRetrieveResponse } from "@/components/api/returns/spreadsheetSchemas";
+import { callGetResultMessages, callGetResultsPage, callSaveSpreadsheetRemovals } from "@/components/api/spreadsheetApi";
+import { ApiResponse, Paginator } from "@/components/types";
+import { ResultMessageKind, SpreadsheetResultsPageResponse, SpreadsheetResultsSummary } from "@/components/api/returns/spreadsheetSchemas";
 
-import { SpreadsheetState } from "./state/types";
-import { normalizeSpreadsheet, denormalizeSpreadsheet } from "./state/adaptors";
+import { Id, SpreadsheetState } from "./state/types";
+import { mergePage } from "./state/adaptors";
+import { serializeForSubmit } from "./state/serialize";
 import { selectPayersView } from "./state/selectors";
 import {
   deletePayer,
@@ -27,44 +28,87 @@ import { FontAwesomeIcon } from "@fortawesome/react-fontawesome";
 import { faChevronDown, faChevronUp } from "@fortawesome/free-solid-svg-icons";
 import Loader from "@/components/loader";
 
+interface MessagesState {
+  items: string[];
+  page: number;
+  totalPages: number;
+}
+
+const NO_MESSAGES: MessagesState = { items: [], page: 0, totalPages: 1 };
+
 export default function SpreadsheetResultsPage() {
   const { id } = useParams<{ id: string }>();
   const [state, setState] = useState<SpreadsheetState | null>(null);
+  // Os resultados vêm do servidor uma página de pagadores por vez
+  const [page, setPage] = useState<number>(1);
+  const [pagePayerIds, setPagePayerIds] = useState<Id[]>([]);
+  const [paginator, setPaginator] = useState<Paginator | null>(null);
+  const [summary, setSummary] = useState<SpreadsheetResultsSummary | null>(null);
+  const [messages, setMessages] = useState<Record<ResultMessageKind, MessagesState>>({ errors: NO_MESSAGES, warnings: NO_MESSAGES });
   const [showPayers, setShowPayers] = useState<boolean>(false);
   const [showCreditors, setShowCreditors] = useState<boolean>(false);
+  const [showMessages, setShowMessages] = useState<boolean>(false);
   const [sending, setSending] = useState<boolean>(false);
   const router = useRouter();
 
   /* Load */
   useEffect(() => {
     async function load() {
-      const response: ApiResponse<SpreadsheetRetrieveResponse> =
-        await callGetResults(id);
+      const response: ApiResponse<SpreadsheetResultsPageResponse> =
+        await callGetResultsPage(id, page);
 
       if (!response.data) {
-        setState(null);
+        emitSnack("Erro", response.message ?? "Erro ao carregar resultados.", "error");
         return;
       }
-      setState(normalizeSpreadsheet(response.data));
+      setState((prev) => mergePage(prev, response.data));
+      setPagePayerIds(response.data.page.items.map((payer) => payer.user.cpf_cnpj));
+      setPaginator(response.data.paginator);
+      setSummary(response.data.summary);
     }
-    
+
     load();
-  }, [id]);
+  }, [id, page]);
+
+  async function loadMessages(kind: ResultMessageKind) {
+    const current = messages[kind];
+    const response = await callGetResultMessages(id, kind, current.page + 1);
+    if (!response.data) return;
+
+    setMessages((prev) => ({
+      ...prev,
+      [kind]: {
+        items: [...prev[kind].items, ...response.data.page.items],
+        page: response.data.page.page,
+        totalPages: response.data.paginator.total_pages,
+      },
+    }));
+  }
 
   async function sendData() {
     if (!state) return;
     setSending(true);
 
-    const response = await callSaveSpreadsheetResults(id, denormalizeSpreadsheet(state));
+    // Só o que foi removido vai para o servidor, que já tem o restante dos resultados
+    const response = await callSaveSpreadsheetRemovals(id, serializeForSubmit(state));
     if (response.code != 200) {
       console.error("Error updating results:", response.message);
       emitSnack("Erro", response.message ?? "Erro ao salvar dados.","error");
+      setSending(false);
       return;
     }
 
     router.push("/admin");
   }
 
+  function switchShowMessages() {
+    if (!showMessages && messages.errors.page == 0 && messages.warnings.page == 0) {
+      if (summary?.errors) loadMessages("errors");
+      if (summary?.warnings) loadMessages("warnings");
+    }
+    setShowMessages(!showMessages);
+  }
+
   function switchShowPayers() {
     setShowPayers(!showPayers);
   }
@@ -75,18 +119,22 @@ export default function SpreadsheetResultsPage() {
 
   /* Payers View model */
   const payers = useMemo(
-    () => (state ? selectPayersView(state) : []),
-    [state]
+    () => (state ? selectPayersView(state, pagePayerIds) : []),
+    [state, pagePayerIds]
   );
 
-  if (!state) {
+  if (!state || !summary || !paginator) {
     return <div>Loading...</div>;
   }
 
   return (
     <div className="h-[80vh] max-h-screen flex flex-col overflow-hidden">
       <div className="text-black flex flex-col items-center justify-center p-2 flex-1 min-h-0">
-        <h1 className="text-[35px] flex-shrink-0 mb-4">Confirmar dados</h1>
+        <h1 className="text-[35px] flex-shrink-0 mb-2">Confirmar dados</h1>
+        <p className="flex-shrink-0 mb-4 text-[15px]">
+          {summary.payers} pagadores ({summary.new_payers} novos), {summary.new_creditors} credores novos,
+          {" "}{summary.errors} erros e {summary.warnings} avisos
+        </p>
 
         <div id="payers-list" className={`flex flex-col gap-4 items-center w-full transition-all duration-300 ease-in-out ${showPayers ? 'flex-1 min-h-0' : 'flex-shrink-0'}`}>
           <div className="flex items-center justify-between w-full self-start" onClick={switchShowPayers}>
@@ -150,6 +198,19 @@ export default function SpreadsheetResultsPage() {
               ))}
             </div>
           )}
+          {showPayers && paginator.total_pages > 1 && (
+            <div className="flex items-center justify-center gap-4 flex-shrink-0">
+              <button className={`bg-white text-dark-blue border-2 border-dark-blue p-2 rounded-lg ${page <= 1 ? "opacity-50 cursor-not-allowed" : "cursor-pointer"}`}
+                onClick={() => setPage(page - 1)}
+                disabled={page <= 1}
+              >Anterior</button>
+              <span>Página {page} de {paginator.total_pages}</span>
+              <button className={`bg-white text-dark-blue border-2 border-dark-blue p-2 rounded-lg ${page >= paginator.total_pages ? "opacity-50 cursor-not-allowed" : "cursor-pointer"}`}
+                onClick={() => setPage(page + 1)}
+                disabled={page >= paginator.total_pages}
+              >Próxima</button>
+            </div>
+          )}
         </div>
 
         <div id="creditors-list" className={`flex flex-col gap-4 items-center w-full transition-all duration-300 ease-in-out ${showCreditors ? 'flex-1 min-h-0' : 'flex-shrink-0'}`}>
@@ -171,6 +232,34 @@ export default function SpreadsheetResultsPage() {
             </div>
           )}
         </div>
+
+        {(summary.errors > 0 || summary.warnings > 0) && (
+          <div id="messages-list" className={`flex flex-col gap-4 items-center w-full transition-all duration-300 ease-in-out ${showMessages ? 'flex-1 min-h-0' : 'flex-shrink-0'}`}>
+            <div className="flex items-center justify-between w-full self-start" onClick={switchShowMessages}>
+              <h2 className="text-[25px] flex-shrink-0 bg-white z-10">Erros e avisos</h2>
+              <FontAwesomeIcon
+                icon={showMessages ? faChevronUp : faChevronDown}
+                className="text-dark-blue text-[20px] cursor-pointer transition-transform duration-200 ease-in-out"
+              />
+            </div>
+            {showMessages && (
+              <div className="flex flex-col gap-2 overflow-y-auto scroll-smooth flex-1 w-full min-h-0 px-4 max-w-[90vw]">
+                {(["errors", "warnings"] as ResultMessageKind[]).map((kind) => (
+                  <div key={kind} className="flex flex-col gap-1">
+                    {messages[kind].items.map((message, index) => (
+                      <span key={index} className={`text-[15px] ${kind == "errors" ? "text-burnt-red" : ""}`}>{message}</span>
+                    ))}
+                    {messages[kind].page > 0 && messages[kind].page < messages[kind].totalPages && (
+                      <button className="self-start text-dark-blue underline cursor-pointer"
+                        onClick={() => loadMessages(kind)}
+                      >Carregar mais {kind == "errors" ? "erros" : "avisos"}</button>
+                    )}
+                  </div>
+                ))}
+              </div>
+            )}
+          </div>
+        )}
       </div>
       <div id="buttons" className="fixed bottom-0 left-0 right-0 flex justify-between w-full rounded-t-2xl border-b-0 border-2 border-dark-blue bg-white shadow-2xl p-4 z-10">
         <button className="bg-white text-dark-blue border-2 border-dark-blue p-3 rounded-lg mx-2 cursor-pointer"
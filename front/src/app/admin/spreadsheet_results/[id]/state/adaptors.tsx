@@ -1,19 +1,24 @@
-import { SpreadsheetDataSubmitPayload, SpreadsheetRetrieveResponse } from "@/components/api/returns/spreadsheetSchemas";
+import { SpreadsheetResultsPageResponse } from "@/components/api/returns/spreadsheetSchemas";
 import { SpreadsheetState } from "./types";
 
-export function normalizeSpreadsheet(
-	dto: SpreadsheetRetrieveResponse
+/*
+ * Acrescenta ao estado os pagadores de uma página. Itens já carregados não
+ * são substituídos, para não perder o que o administrador removeu neles.
+ */
+export function mergePage(
+	prev: SpreadsheetState | null,
+	dto: SpreadsheetResultsPageResponse
 ): SpreadsheetState {
 	const state: SpreadsheetState = {
-		payers: {},
-		agreements: {},
-		installments: {},
-		creditors: {},
-		errors: dto.errors,
-		warnings: dto.warnings,
+		payers: { ...prev?.payers },
+		agreements: { ...prev?.agreements },
+		installments: { ...prev?.installments },
+		creditors: { ...prev?.creditors },
 	};
 
 	for (const creditor of dto.creditors) {
+		if (state.creditors[creditor.name]) continue;
+
 		state.creditors[creditor.name] = {
 			id: creditor.name,
 			name: creditor.name,
@@ -23,8 +28,9 @@ export function normalizeSpreadsheet(
 		};
 	}
 
-	for (const payer of dto.payers) {
+	for (const payer of dto.page.items) {
 		const payerId = payer.user.cpf_cnpj;
+		if (state.payers[payerId]) continue;
 
 		state.payers[payerId] = {
 			id: payerId,
@@ -67,75 +73,3 @@ export function normalizeSpreadsheet(
 
 	return state;
 }
-
-
-export function denormalizeSpreadsheet(
-	state: SpreadsheetState
-): SpreadsheetDataSubmitPayload {
-	const dto: SpreadsheetDataSubmitPayload = {
-		creditors: [],
-		payers: []
-	};
-
-	for (const creditorName in state.creditors) {
-		const creditor = state.creditors[creditorName];
-		dto.creditors.push({
-			name: creditor.name,
-			reissue_margin: creditor.reissue_margin,
-			readonly: creditor.readonly,
-			deleted: creditor.deleted,
-		});
-	}
-
-	for (const payerId in state.payers) {
-		const payer = state.payers[payerId];
-		const payerDto = {
-			name: payer.name,
-			user: {
-				cpf_cnpj: payer.id,
-				readonly: payer.readonly,
-			},
-			phone: payer.phone,
-			agreements: [] as any[],
-			readonly: payer.readonly,
-			deleted: payer.deleted,
-		};
-
-		for (const agreementId of payer.agreementIds) {
-			const agreement = state.agreements[agreementId];
-			const agreementDto = {
-				number: agreement.id,
-				payer_cpf_cnpj: agreement.payerId,
-				creditor_name: agreement.creditor_name,
-				installments: [] as any[],
-				readonly: agreement.readonly,
-				deleted: agreement.deleted,
-			};
-
-			for (const instId of agreement.installmentIds) {
-				const inst = state.installments[instId];
-				const instDto = {
-					agreement_num: inst.agreementId,
-					number: inst.number,
-					due_date: inst.due_date,
-					boleto: inst.boletoPath
-						? {
-							path: inst.boletoPath,
-							readonly: inst.readonly,
-						}
-						: undefined,
-					readonly: inst.readonly,
-					deleted: inst.deleted,
-				};
-
-				agreementDto.installments.push(instDto);
-			}
-
-			payerDto.agreements.push(agreementDto);
-		}
-
-		dto.payers.push(payerDto);
-	}
-
-	return dto;
-}
\ No newline at end of file
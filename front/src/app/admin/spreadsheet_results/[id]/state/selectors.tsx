@@ -1,7 +1,7 @@
-import { SpreadsheetState } from "./types";
+import { Id, SpreadsheetState } from "./types";
 
-export function selectPayersView(state: SpreadsheetState) {
-  return Object.values(state.payers).map((payer) => ({
+export function selectPayersView(state: SpreadsheetState, payerIds: Id[]) {
+  return payerIds.map((id) => state.payers[id]).map((payer) => ({
     ...payer,
     agreements: payer.agreementIds.map((aid) => {
       const agreement = state.agreements[aid];
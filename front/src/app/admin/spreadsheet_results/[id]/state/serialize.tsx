@@ -1,19 +1,22 @@
+import { SpreadsheetRemovalsPayload } from "@/components/api/returns/spreadsheetSchemas";
 import { SpreadsheetState } from "./types";
 
-export function serializeForSubmit(state: SpreadsheetState) {
+export function serializeForSubmit(state: SpreadsheetState): SpreadsheetRemovalsPayload {
   return {
-    removed: {
-      payers: Object.values(state.payers)
-        .filter((p) => p.deleted && !p.readonly)
-        .map((p) => p.id),
+    creditors: Object.values(state.creditors)
+      .filter((c) => c.deleted && !c.readonly)
+      .map((c) => c.id),
 
-      agreements: Object.values(state.agreements)
-        .filter((a) => a.deleted && !a.readonly)
-        .map((a) => a.id),
+    payers: Object.values(state.payers)
+      .filter((p) => p.deleted && !p.readonly)
+      .map((p) => p.id),
 
-      installments: Object.values(state.installments)
-        .filter((i) => i.deleted && !i.readonly)
-        .map((i) => i.id),
-    },
+    agreements: Object.values(state.agreements)
+      .filter((a) => a.deleted && !a.readonly)
+      .map((a) => a.id),
+
+    installments: Object.values(state.installments)
+      .filter((i) => i.deleted && !i.readonly)
+      .map((i) => i.id),
   };
 }
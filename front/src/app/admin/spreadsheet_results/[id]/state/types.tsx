@@ -40,11 +40,10 @@ export interface CreditorEntity {
 
 /* Root state */
 
+// Só as páginas já carregadas; o restante dos resultados fica no servidor
 export interface SpreadsheetState {
   payers: Record<Id, PayerEntity>;
   agreements: Record<Id, AgreementEntity>;
   installments: Record<Id, InstallmentEntity>;
   creditors: Record<Id, CreditorEntity>;
-  errors: string[];
-  warnings: string[];
 }
@@ -1,3 +1,5 @@
+import { Page, Paginator } from "@/components/types";
+
 export interface BoletoResponse {
   path: string;
   readonly: boolean;
@@ -11,24 +13,6 @@ export interface InstallmentResponse {
   readonly: boolean;
 }
 
-export interface InstallmentPayload {
-  agreement_num: string;
-  number: number;
-  due_date: string;
-  boleto: BoletoResponse | null;
-  readonly: boolean;
-  deleted: boolean;
-}
-
-export interface AgreementPayload {
-  number: string;
-  payer_cpf_cnpj: string;
-  creditor_name: string;
-  installments: InstallmentPayload[];
-  readonly: boolean;
-  deleted: boolean;
-}
-
 export interface AgreementResponse {
   number: string;
   payer_cpf_cnpj: string;
@@ -42,20 +26,12 @@ export interface UserResponse {
   readonly: boolean;
 }
 
-export interface PayerPayload {
-  name: string;
-  user: UserResponse;
-  phone: string;
-  agreements: AgreementPayload[];
-  readonly: boolean;
-  deleted: boolean;
-}
-
 export interface PayerResponse {
   name: string;
   user: UserResponse;
   phone: string;
   agreements: AgreementResponse[];
+  warnings: string[];
   readonly: boolean;
 }
 
@@ -65,30 +41,69 @@ export interface CreditorResponse {
   readonly: boolean;
 }
 
-export interface CreditorPayload {
-  name: string;
-  reissue_margin: number;
-  readonly: boolean;
-  deleted: boolean;
+export interface SpreadsheetResultsSummary {
+  payers: number;
+  new_payers: number;
+  readonly_payers: number;
+  payers_with_warnings: number;
+  creditors: number;
+  new_creditors: number;
+  errors: number;
+  warnings: number;
+  unchanged_rows: number;
 }
 
-export interface SpreadsheetRetrieveResponse {
+export interface SpreadsheetResultsPageResponse {
+  paginator: Paginator;
+  page: Page<PayerResponse>;
+  summary: SpreadsheetResultsSummary;
   creditors: CreditorResponse[];
-  payers: PayerResponse[];
-  errors: string[];
-  warnings: string[];
 }
 
+export type ResultMessageKind = "errors" | "warnings";
+
+// Itens removidos pelo administrador; o restante dos resultados é aprovado pelo servidor
+export interface SpreadsheetRemovalsPayload {
+  creditors: string[];
+  payers: string[];
+  agreements: string[];
+  installments: string[];
+}
 
 export interface SpreadsheetSubmitResponse {
   job_id: string;
 }
 
-export interface SpreadsheetDataSubmitPayload {
-  creditors: CreditorPayload[];
-  payers: PayerPayload[];
+export type SpreadsheetJobStatus = "queued" | "running" | "done" | "failed";
+
+export interface SpreadsheetStatusResponse {
+  job_id: string;
+  status: SpreadsheetJobStatus;
+  message: string;
+  has_results: boolean;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+export interface SpreadsheetProgressCounters {
+  rows_parsed: number;
+  rows_resolved: number;
+  rows_unchanged: number;
+  boletos_matched: number;
+  errors: number;
+}
+
+export interface SpreadsheetProgressResponse {
+  job_id: string;
+  status: SpreadsheetJobStatus;
+  message: string;
+  has_results: boolean;
+  stage: string | null;
+  counters: SpreadsheetProgressCounters;
+  stages: Record<string, number>;
 }
 
 export interface SpreadsheetDataSubmitResponse {
   success: boolean;
-}
\ No newline at end of file
+}
@@ -1,19 +1,70 @@
 import axios from "axios";
 import { loggedApi } from "./baseApi";
-import { ApiResponse } from "../types";
-import { SpreadsheetSubmitResponse, SpreadsheetRetrieveResponse, SpreadsheetDataSubmitResponse, SpreadsheetDataSubmitPayload } from "./returns/spreadsheetSchemas";
-import { SpreadsheetState } from "@/app/admin/spreadsheet_results/[id]/state/types";
+import { ApiResponse, PaginatedApiResponse } from "../types";
+import { SpreadsheetSubmitResponse, SpreadsheetStatusResponse, SpreadsheetProgressResponse, SpreadsheetResultsPageResponse, SpreadsheetRemovalsPayload, ResultMessageKind } from "./returns/spreadsheetSchemas";
+
+// Tamanho de cada parte do ZIP de boletos enviado em partes
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+// Tentativas de reenvio de uma parte antes de desistir do envio
+const UPLOAD_CHUNK_RETRIES = 5;
+// Pagadores e mensagens por página na revisão dos resultados
+const RESULTS_PAGE_SIZE = 50;
+
+interface ChunkedUpload {
+  upload_id: string;
+  size: number;
+  received: number;
+  status: string;
+}
+
+async function sha256Hex(data: ArrayBuffer): Promise<string | undefined> {
+  // crypto.subtle só existe em contexto seguro (https ou localhost)
+  if (!globalThis.crypto?.subtle) return undefined;
+  const digest = await globalThis.crypto.subtle.digest("SHA-256", data);
+  return Array.from(new Uint8Array(digest)).map((byte) => byte.toString(16).padStart(2, "0")).join("");
+}
+
+async function uploadInChunks(file: File): Promise<string> {
+  let response = await loggedApi.post("/admin/spreadsheet/uploads", { filename: file.name, size: file.size });
+  let upload: ChunkedUpload = response.data.data;
+
+  let failures = 0;
+  while (upload.received < upload.size) {
+    const chunk = await file.slice(upload.received, upload.received + UPLOAD_CHUNK_SIZE).arrayBuffer();
+    const chunkHash = await sha256Hex(chunk);
+    try {
+      response = await loggedApi.put(`/admin/spreadsheet/uploads/${upload.upload_id}/chunks`, chunk, {
+        params: { offset: upload.received },
+        headers: {
+          "Content-Type": "application/octet-stream",
+          ...(chunkHash ? { "X-Chunk-SHA256": chunkHash } : {}),
+        },
+      });
+      upload = response.data.data;
+      failures = 0;
+    } catch (error) {
+      if (++failures > UPLOAD_CHUNK_RETRIES) throw error;
+      // Continua de onde o servidor parou, que pode estar além do que a resposta perdida informaria
+      response = await loggedApi.get(`/admin/spreadsheet/uploads/${upload.upload_id}`);
+      upload = response.data.data;
+    }
+  }
+
+  await loggedApi.post(`/admin/spreadsheet/uploads/${upload.upload_id}/finalize`, {});
+  return upload.upload_id;
+}
 
 async function callSendFiles(spreadSheet: File, boletosZip: File): Promise<ApiResponse<SpreadsheetSubmitResponse>> {
   interface Payload {
     spreadsheet: File;
-    boletos: File;
+    boletos_upload_id: string;
   }
 
   try {
+    // O ZIP de boletos pode ter alguns GB: vai em partes, que são reenviadas se a conexão cair
     let data: Payload = {
       "spreadsheet": spreadSheet,
-      "boletos": boletosZip
+      "boletos_upload_id": await uploadInChunks(boletosZip)
     }
 
     const response = await loggedApi.post("/admin/spreadsheet/process", data, {
@@ -32,9 +83,58 @@ async function callSendFiles(spreadSheet: File, boletosZip: File): Promise<ApiRe
 }
 
 
-async function callGetResults(jobId: string): Promise<ApiResponse<SpreadsheetRetrieveResponse>> {
+async function callGetStatus(jobId: string): Promise<ApiResponse<SpreadsheetStatusResponse>> {
+  try{
+    let response = await loggedApi.get('/admin/spreadsheet/status/' + jobId);
+    return response.data;
+  } catch (error) {
+    if (axios.isAxiosError(error) && error.response) {
+      // Retorna o corpo da resposta com erro (status 400, etc)
+        return error.response.data;
+    }
+
+    throw error;
+  }
+}
+
+
+async function callGetProgress(jobId: string): Promise<ApiResponse<SpreadsheetProgressResponse>> {
+  try{
+    let response = await loggedApi.get('/admin/spreadsheet/progress/' + jobId);
+    return response.data;
+  } catch (error) {
+    if (axios.isAxiosError(error) && error.response) {
+      // Retorna o corpo da resposta com erro (status 400, etc)
+        return error.response.data;
+    }
+
+    throw error;
+  }
+}
+
+
+async function callGetResultsPage(jobId: string, page: number): Promise<ApiResponse<SpreadsheetResultsPageResponse>> {
+  try{
+    let response = await loggedApi.get('/admin/spreadsheet/results/' + jobId, {
+      params: { page: page, page_size: RESULTS_PAGE_SIZE }
+    });
+    return response.data;
+  } catch (error) {
+    if (axios.isAxiosError(error) && error.response) {
+      // Retorna o corpo da resposta com erro (status 400, etc)
+        return error.response.data;
+    }
+
+    throw error;
+  }
+}
+
+
+async function callGetResultMessages(jobId: string, kind: ResultMessageKind, page: number): Promise<PaginatedApiResponse<string>> {
   try{
-    let response = await loggedApi.get('/admin/spreadsheet/results/' + jobId);
+    let response = await loggedApi.get('/admin/spreadsheet/results/' + jobId + '/messages', {
+      params: { kind: kind, page: page, page_size: RESULTS_PAGE_SIZE }
+    });
     return response.data;
   } catch (error) {
     if (axios.isAxiosError(error) && error.response) {
@@ -47,9 +147,9 @@ async function callGetResults(jobId: string): Promise<ApiResponse<SpreadsheetRet
 }
 
 
-async function callSaveSpreadsheetResults(jobId: string, data: SpreadsheetDataSubmitPayload): Promise<ApiResponse<SpreadsheetDataSubmitResponse>> {
+async function callSaveSpreadsheetRemovals(jobId: string, removals: SpreadsheetRemovalsPayload): Promise<ApiResponse<string>> {
   try{
-    let response = await loggedApi.post('/admin/spreadsheet/save_results/' + jobId, data);
+    let response = await loggedApi.post('/admin/spreadsheet/save_results/' + jobId + '/removals', removals);
     return response.data;
   }catch (error) {
     if (axios.isAxiosError(error) && error.response) {
@@ -61,4 +161,4 @@ async function callSaveSpreadsheetResults(jobId: string, data: SpreadsheetDataSu
   }
 }
 
-export { callSendFiles, callGetResults, callSaveSpreadsheetResults };
\ No newline at end of file
+export { callSendFiles, callGetStatus, callGetProgress, callGetResultsPage, callGetResultMessages, callSaveSpreadsheetRemovals };
\ No newline at end of file